@@ -0,0 +1,23 @@
+/*
+ * Predicates the v2 comparison benchmark passes to searchParallel() by
+ * reference.
+ */
+
+import { asUrn } from "../src/urn.ts";
+
+const HASH_ROUNDS = 400;
+
+/*
+ * A deliberately costly predicate, standing in for real ones that parse
+ * and match node strings: parses the URN, then hashes it repeatedly.
+ */
+export function isCostlyMatch(value: string): boolean {
+  const { id } = asUrn(value);
+  let hash = 0x811c9dc5;
+  for (let round = 0; round < HASH_ROUNDS; round++) {
+    for (let idx = 0; idx < id.length; idx++) {
+      hash = Math.imul(hash ^ id.charCodeAt(idx), 0x01000193);
+    }
+  }
+  return (hash >>> 0) % 3 === 0;
+}
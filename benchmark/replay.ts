@@ -0,0 +1,303 @@
+/*
+ * Replay a recorded query trace (TribbleDBOpts `trace`, see
+ * src/v2/trace.ts) against the v1 and v2 engines, both loaded from the
+ * same tribble file, and print the latencies in `deno bench --json`'s
+ * shape: bs/bench:replay.sh files them in benchmark_results/ next to the
+ * synthetic benchmarks, so benchmark_analysis plots both across commits.
+ *
+ * Each engine runs the whole trace `--repeat` times. The trace's own
+ * timings are reported too, as implementation "recorded". "Replay trace"
+ * totals a run over the queries both engines replay.
+ *
+ * v1 has no traversal, so hops replay there as a search per hop, the way
+ * v1 callers write them. Queries v1 cannot express (paged or range
+ * searches, hops with `where`) are replayed on v2 only. Predicates are
+ * looked up by name in the `predicates` export of `--predicates`; any
+ * not found replay as accepting everything, and are counted on stderr.
+ *
+ * Run: deno run --allow-read benchmark/replay.ts data.tribble trace.json
+ */
+
+import docopt from "docopt";
+import { TribbleDB as TribbleV1 } from "../src/tribble-db.ts";
+import { QueryTrace, revived, TribbleDB as TribbleV2 } from "../src/v2/mod.ts";
+import type { HopOpts, RangeSearch, TraceEntry } from "../src/v2/mod.ts";
+import { TribbleParser } from "../src/tribble/parse.ts";
+import type { Predicate, Search, Triple } from "../src/types.ts";
+
+const doc = `
+Usage:
+  replay.ts <tribble> <trace> [--repeat=<count>] [--predicates=<module>]
+
+Options:
+  --repeat=<count>        Runs of the whole trace per engine [default: 10].
+  --predicates=<module>   Module exporting \`predicates\`, by name.
+`;
+
+type Engine = "v1" | "v2";
+
+// a recorded query made runnable on each engine; absent where it cannot be
+type Replayable = {
+  operation: TraceEntry["operation"];
+  elapsedMs: number;
+  v1?: (db: TribbleV1) => unknown;
+  v2: (db: TribbleV2) => unknown;
+};
+
+const RANGE_KEYS = [
+  "gt",
+  "gte",
+  "lt",
+  "lte",
+  "prefix",
+  "contains",
+  "icontains",
+];
+
+function hasRange(query: unknown): boolean {
+  return typeof query === "object" && query !== null &&
+    !Array.isArray(query) && RANGE_KEYS.some((key) => key in query);
+}
+
+/*
+ * v1 cannot express paged searches or range bounds.
+ */
+function v1Searchable(params: RangeSearch, entry: TraceEntry): boolean {
+  if (entry.operation !== "search" || Object.keys(entry.page).length > 0) {
+    return false;
+  }
+  const [source, , target] = Array.isArray(params)
+    ? params
+    : [params.source, params.relation, params.target];
+  return !hasRange(source) && !hasRange(target);
+}
+
+/*
+ * A NodeView hop as v1 callers write it: a search per hop, from the nodes
+ * reached so far, until nothing new is reached or `maxDepth` runs out.
+ */
+function v1Hop(
+  db: TribbleV1,
+  from: string[],
+  forward: boolean,
+  relations: string | string[] | undefined,
+  opts: HopOpts,
+): Set<string> {
+  const reached = new Set<string>();
+  const maxDepth = opts.transitive ? opts.maxDepth ?? Infinity : 1;
+  let frontier = from;
+
+  for (let depth = 0; depth < maxDepth && frontier.length > 0; depth++) {
+    const matches = forward
+      ? db.search({ source: frontier, relation: relations }).targets()
+      : db.search({ target: frontier, relation: relations }).sources();
+    frontier = [];
+    for (const node of matches) {
+      if (!reached.has(node)) {
+        reached.add(node);
+        frontier.push(node);
+      }
+    }
+  }
+  return reached;
+}
+
+function replayable(
+  entry: TraceEntry,
+  predicates: Record<string, Predicate>,
+  missing: (name: string | null) => void,
+): Replayable {
+  const { operation, elapsedMs } = entry;
+
+  switch (entry.operation) {
+    case "search": {
+      const params = revived(entry.params, predicates, missing) as RangeSearch;
+      return {
+        operation,
+        elapsedMs,
+        v1: v1Searchable(params, entry)
+          ? (db) => db.search(params as Search)
+          : undefined,
+        v2: (db) => db.search(params, entry.page),
+      };
+    }
+    case "readThing": {
+      const { opts, urn } = entry;
+      const qs = opts.ignoreQs ?? opts.qs ?? false;
+      return {
+        operation,
+        elapsedMs,
+        v1: (db) => db.readThing(urn, { qs }),
+        v2: (db) => db.readThing(urn, opts),
+      };
+    }
+    default: {
+      const { from } = entry;
+      const forward = entry.operation === "follow";
+      const relations = entry.relations ?? undefined;
+      const opts = revived(entry.opts, predicates, missing) as HopOpts;
+      return {
+        operation,
+        elapsedMs,
+        v1: opts.where === undefined
+          ? (db) => v1Hop(db, from, forward, relations, opts)
+          : undefined,
+        v2: (db) => {
+          const nodes = db.nodes(from);
+          return forward
+            ? nodes.follow(relations, opts)
+            : nodes.referencedBy(relations, opts);
+        },
+      };
+    }
+  }
+}
+
+async function readTriples(path: string): Promise<Triple[]> {
+  const parser = new TribbleParser();
+  const triples: Triple[] = [];
+  for (const line of (await Deno.readTextFile(path)).split(/\r?\n/)) {
+    const triple = line.trim().length > 0 ? parser.parse(line) : undefined;
+    if (triple) {
+      triples.push(triple);
+    }
+  }
+  return triples;
+}
+
+async function readCpu(): Promise<string> {
+  try {
+    const cpuinfo = await Deno.readTextFile("/proc/cpuinfo");
+    return cpuinfo.match(/^model name\s*:\s*(.*)$/m)?.[1] ?? "";
+  } catch {
+    return "";
+  }
+}
+
+/*
+ * Summary statistics in nanoseconds, as `deno bench --json` reports them.
+ */
+function benchStats(samplesNs: number[]) {
+  const sorted = [...samplesNs].sort((left, right) => left - right);
+  const at = (fraction: number) => {
+    return sorted[
+      Math.min(sorted.length - 1, Math.floor(fraction * sorted.length))
+    ];
+  };
+  return {
+    n: sorted.length,
+    min: sorted[0],
+    max: sorted[sorted.length - 1],
+    avg: sorted.reduce((sum, sample) => sum + sample, 0) / sorted.length,
+    p75: at(0.75),
+    p99: at(0.99),
+    p995: at(0.995),
+    p999: at(0.999),
+    highPrecision: true,
+    usedExplicitTimers: true,
+  };
+}
+
+async function main(): Promise<void> {
+  const options = docopt(doc);
+  const tribblePath = options["<tribble>"] as string;
+  const tracePath = options["<trace>"] as string;
+  const repeats = Number(options["--repeat"]);
+
+  let predicates: Record<string, Predicate> = {};
+  if (options["--predicates"]) {
+    const module = await import(
+      new URL(options["--predicates"] as string, `file://${Deno.cwd()}/`).href
+    );
+    predicates = module.predicates;
+  }
+
+  const missing = new Map<string, number>();
+  const onMissing = (name: string | null) => {
+    const key = name ?? "(anonymous)";
+    missing.set(key, (missing.get(key) ?? 0) + 1);
+  };
+
+  const triples = await readTriples(tribblePath);
+  const trace = QueryTrace.parse(await Deno.readTextFile(tracePath));
+  const queries = trace.entries.map((entry) => {
+    return replayable(entry, predicates, onMissing);
+  });
+
+  const dbs = { v1: new TribbleV1(triples), v2: new TribbleV2(triples) };
+  const samples = new Map<string, number[]>();
+  const addSample = (
+    experiment: string,
+    implementation: string,
+    ns: number,
+  ) => {
+    const key = JSON.stringify([experiment, implementation]);
+    if (!samples.has(key)) {
+      samples.set(key, []);
+    }
+    samples.get(key)!.push(ns);
+  };
+
+  for (const query of queries) {
+    addSample(`Replay ${query.operation}`, "recorded", query.elapsedMs * 1e6);
+  }
+  for (const engine of ["v1", "v2"] as Engine[]) {
+    for (let run = 0; run < repeats; run++) {
+      let totalNs = 0;
+      for (const query of queries) {
+        const replay = query[engine] as ((db: unknown) => unknown) | undefined;
+        if (replay === undefined) {
+          continue;
+        }
+        const started = performance.now();
+        replay(dbs[engine]);
+        const elapsedNs = (performance.now() - started) * 1e6;
+        if (query.v1 !== undefined) {
+          totalNs += elapsedNs;
+        }
+        addSample(`Replay ${query.operation}`, engine, elapsedNs);
+      }
+      addSample("Replay trace", engine, totalNs);
+    }
+  }
+
+  const skipped = queries.filter((query) => query.v1 === undefined).length;
+  if (skipped > 0) {
+    console.error(`${skipped} queries v1 cannot express ran on v2 only.`);
+  }
+  for (const [name, count] of missing) {
+    console.error(
+      `predicate ${name} replayed as accept-all in ${count} queries.`,
+    );
+  }
+
+  const category = tracePath.split("/").pop();
+  const benches = [...samples].map(([key, samplesNs]) => {
+    const [experiment, implementation] = JSON.parse(key);
+    return {
+      origin: import.meta.url,
+      group: null,
+      name: JSON.stringify({
+        experiment,
+        implementation,
+        sampleSize: triples.length,
+        category,
+        parameters: { queries: queries.length, repeats },
+      }),
+      baseline: false,
+      results: [{ ok: benchStats(samplesNs) }],
+    };
+  });
+
+  console.log(JSON.stringify(
+    {
+      runtime: `Deno/${Deno.version.deno} ${Deno.build.target}`,
+      cpu: await readCpu(),
+      benches,
+    },
+    null,
+    2,
+  ));
+}
+
+await main();
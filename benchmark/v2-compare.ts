@@ -4,14 +4,40 @@
  * ingestion, chained search, batched point reads, and the two-hop
  * association walk that the photos site implements as N+1 loops.
  *
- * Run: deno run benchmark/v2-compare.ts
+ * It also compares the v2 storage backends (typed columns with CSR or
+ * bitmap posting lists vs number[] + Map/Set) on bytes per triple and
+ * ingest throughput, the Map and arena interners on bytes per string,
+ * tribble-text export throughput, durable mutation throughput under each
+ * fsync policy, the parallel byte loader and parallel predicate search
+ * across worker counts, and the memory PathView provenance holds on
+ * photos-shaped walks.
+ *
+ * Run: deno run --v8-flags=--expose-gc --allow-read --allow-write \
+ *   benchmark/v2-compare.ts
+ * (without --expose-gc the memory figures include collectable garbage;
+ * the durable databases are written to a temporary directory)
  */
 
 import { TribbleDB as TribbleV1 } from "../src/tribble-db.ts";
-import { TribbleDB as TribbleV2 } from "../src/v2/mod.ts";
+import {
+  EngineMetrics,
+  SearchWorkerPool,
+  TribbleDB as TribbleV2,
+} from "../src/v2/mod.ts";
+import { isCostlyMatch } from "./predicates.ts";
 import { TribbleParser } from "../src/tribble/parse.ts";
 import { TribbleStringifier } from "../src/tribble/stringify.ts";
 import { asUrn } from "../src/urn.ts";
+import { ArenaInterner, Interner } from "../src/v2/interner.ts";
+import type { StringTable } from "../src/v2/interner.ts";
+import type {
+  DurableFiles,
+  FsyncPolicy,
+  InternerKind,
+  MaterializedView,
+  PathView,
+  StoreBackend,
+} from "../src/v2/mod.ts";
 import type { Triple } from "../src/types.ts";
 
 const BOLD = "\x1b[1m";
@@ -26,8 +52,18 @@ const PHOTO_COUNTS = [1_500, 6_000, 24_000];
 const INGEST_BATCH = 500;
 // point-read batch size
 const READ_BATCH = 100;
+const PAGE_SIZE = 5000;
 // repetitions per measurement; minimum is reported
 const REPS = 3;
+// worker counts for the parallel-load scaling table
+const WORKER_COUNTS = [1, 2, 4, 8];
+// interners filled per measurement, so their footprint stands out of
+// heap noise
+const INTERNER_COPIES = 8;
+// triples per add() in the durability benchmark, and add()s per flush()
+// when commits are grouped
+const DURABLE_BATCH = 20;
+const DURABLE_GROUP = 32;
 
 function makeRandom(seed: number): () => number {
   let state = seed;
@@ -161,6 +197,81 @@ function chainedSearch(db: TribbleV1 | TribbleV2): number {
   return result.triples().length;
 }
 
+/*
+ * Searches pairing a one-node constraint with a relation matching a
+ * quarter of the rows: the planner drives from the node's few rows.
+ */
+function selectiveSearches(db: TribbleV1 | TribbleV2, urns: string[]): number {
+  let matched = 0;
+  for (const urn of urns) {
+    matched += db.search({ source: urn, relation: "location" }).triplesCount;
+  }
+  return matched;
+}
+
+/*
+ * The same few searches and reads over and over, as request handlers
+ * issue them between data reloads.
+ */
+function repeatedQueries(db: TribbleV2, urns: string[]): number {
+  let matched = 0;
+  for (let rep = 0; rep < READ_BATCH; rep++) {
+    matched += db.search({ relation: "location", target: { type: "place" } })
+      .triplesCount;
+    matched += db.readThing(urns[rep % 10]) === undefined ? 0 : 1;
+  }
+  return matched;
+}
+
+/*
+ * Top-rated photos: the README's predicate filter, its first page, and
+ * the same filter as a range bound.
+ */
+function predicateFilter(db: TribbleV1 | TribbleV2): number {
+  return db.search({
+    relation: "rating",
+    target: { predicate: (rating) => parseInt(rating) >= 4 },
+  }).triplesCount;
+}
+
+function firstPageFilter(db: TribbleV2): number {
+  return db.search({
+    relation: "rating",
+    target: { predicate: (rating) => parseInt(rating) >= 4 },
+  }, { limit: 50 }).triplesCount;
+}
+
+function rangeFilter(db: TribbleV2): number {
+  return db.search({ relation: "rating", target: { gte: 4 } }).triplesCount;
+}
+
+/*
+ * Case-insensitive text search over every target, as a predicate and as
+ * an icontains constraint.
+ */
+function textPredicate(db: TribbleV1 | TribbleV2): number {
+  return db.search({
+    target: {
+      predicate: (value) => value.toLowerCase().includes("species 1"),
+    },
+  }).triplesCount;
+}
+
+function textContains(db: TribbleV2): number {
+  return db.search({ target: { icontains: "Species 1" } }).triplesCount;
+}
+
+/*
+ * Search a large view, then patch a few triples into it for a preview.
+ */
+function patchedPreview(db: TribbleV1 | TribbleV2): number {
+  const preview = db.search({ source: { type: "photo" } });
+  for (let idx = 0; idx < 10; idx++) {
+    preview.add([[`urn:ró:photo:preview${idx}`, "rating", "5"]]);
+  }
+  return preview.triplesCount;
+}
+
 function pointReads(db: TribbleV1 | TribbleV2, urns: string[]): number {
   let found = 0;
   for (const urn of urns) {
@@ -206,7 +317,615 @@ function traversalWalk(db: TribbleV2, thingUrns: string[]): Set<string> {
     .ids();
 }
 
-function main(): void {
+/*
+ * Photos of a bird taken in a place directly inside a region, as a
+ * pattern match and as the equivalent traversal chain.
+ */
+const REGION = "urn:ró:place:p10";
+
+function birdInRegionMatch(db: TribbleV2, birdUrns: string[]): Set<string> {
+  const photos = new Set<string>();
+  for (const bird of birdUrns) {
+    const solutions = db.match([
+      ["?photo", "subject", bird],
+      ["?photo", "location", "?place"],
+      ["?place", "in", REGION],
+    ]);
+    for (const { photo } of solutions) {
+      photos.add(photo);
+    }
+  }
+  return photos;
+}
+
+function birdInRegionChain(db: TribbleV2, birdUrns: string[]): Set<string> {
+  const photos = new Set<string>();
+  for (const bird of birdUrns) {
+    const found = db.nodes(bird)
+      .referencedBy("subject")
+      .intersect(db.nodes(REGION).referencedBy("in").referencedBy("location"));
+    for (const photo of found.urns()) {
+      photos.add(photo);
+    }
+  }
+  return photos;
+}
+
+/*
+ * Photos per place for a faceted listing: counted from materialised
+ * triples, and from posting lists.
+ */
+function photosPerPlace(db: TribbleV1 | TribbleV2): number {
+  const counts = new Map<string, number>();
+  for (const [, , place] of db.search({ relation: "location" }).triples()) {
+    counts.set(place, (counts.get(place) ?? 0) + 1);
+  }
+  return counts.size;
+}
+
+function photosPerPlaceFacet(db: TribbleV2, top?: number): number {
+  return db.facets({ by: "target", within: { relation: "location" }, top })
+    .size;
+}
+
+/*
+ * Every ancestor place of a batch of photos, asked repeatedly as page
+ * renders would ask it.
+ */
+function placeAncestors(db: TribbleV2, photoUrns: string[]): number {
+  let pairs = 0;
+  for (let round = 0; round < 10; round++) {
+    pairs += db.paths(photoUrns)
+      .follow("location")
+      .follow("in", { transitive: true })
+      .pairs().length;
+  }
+  return pairs;
+}
+
+const ALBUM_SEARCH = { source: { type: "photo" }, relation: "albumId" };
+const EDIT_ROUNDS = 50;
+
+/*
+ * An always-open search kept current over EDIT_ROUNDS rounds of an add
+ * and the delete undoing it, by re-running the search after each edit.
+ */
+function alwaysOpenRerun(db: TribbleV2): number {
+  let total = 0;
+  for (let round = 0; round < EDIT_ROUNDS; round++) {
+    const triple: Triple = [`urn:ró:photo:new${round}`, "albumId", "a0"];
+    db.add([triple]);
+    total += db.search(ALBUM_SEARCH).triplesCount;
+    db.delete([triple]);
+    total += db.search(ALBUM_SEARCH).triplesCount;
+  }
+  return total;
+}
+
+/*
+ * The same edits, with the search materialised.
+ */
+function alwaysOpenMaterialized(
+  db: TribbleV2,
+  view: MaterializedView,
+): number {
+  let total = 0;
+  for (let round = 0; round < EDIT_ROUNDS; round++) {
+    const triple: Triple = [`urn:ró:photo:new${round}`, "albumId", "a0"];
+    db.add([triple]);
+    total += view.size;
+    db.delete([triple]);
+    total += view.size;
+  }
+  return total;
+}
+
+function heapBytes(): number {
+  const { gc } = globalThis as { gc?: () => void };
+  // typed-array backing stores are only released from `external` by the
+  // collection after the one that finds them dead
+  gc?.();
+  gc?.();
+  const { heapUsed, external } = Deno.memoryUsage();
+  return heapUsed + external;
+}
+
+type BackendFootprint = {
+  backend: StoreBackend;
+  bytesPerTriple: number;
+  triplesPerSecond: number;
+};
+
+/*
+ * Resident bytes per stored triple and bulk-ingest throughput for one
+ * storage backend. The database is kept alive across the second heap
+ * reading so the delta is its footprint.
+ */
+function measureBackend(
+  backend: StoreBackend,
+  lines: string[],
+  tripleCount: number,
+): BackendFootprint {
+  const before = heapBytes();
+  const db = TribbleV2.fromTribbleLines(lines, {}, { backend });
+  const bytes = heapBytes() - before;
+
+  const elapsed = timeIt(() => {
+    TribbleV2.fromTribbleLines(lines, {}, { backend });
+  });
+
+  return {
+    backend,
+    bytesPerTriple: bytes / Math.max(db.triplesCount, 1),
+    triplesPerSecond: tripleCount / (elapsed / 1000),
+  };
+}
+
+function reportBackends(sizes: number[], tribbleLines: string[][]): void {
+  console.log(
+    `\n${BOLD}${CYAN}${"storage backend".padEnd(30)}${"triples".padStart(10)}${
+      "bytes/triple".padStart(14)
+    }${"triples/s".padStart(14)}${RESET}`,
+  );
+
+  for (let idx = 0; idx < sizes.length; idx++) {
+    for (const backend of ["map", "typed", "bitmap"] as StoreBackend[]) {
+      const footprint = measureBackend(backend, tribbleLines[idx], sizes[idx]);
+      const colour = backend === "map" ? YELLOW : GREEN;
+
+      console.log(
+        `${colour}${backend.padEnd(30)}${RESET}${
+          String(sizes[idx]).padStart(10)
+        }${footprint.bytesPerTriple.toFixed(1).padStart(14)}${
+          Math.round(footprint.triplesPerSecond).toString().padStart(14)
+        }`,
+      );
+    }
+  }
+}
+
+type InternerFootprint = {
+  bytesPerString: number;
+  lookupsPerSecond: number;
+  bytesPerTriple: number;
+};
+
+/*
+ * Resident bytes per distinct node string for one interner, averaged over
+ * several copies each filled from freshly decoded strings, so the Map
+ * interner pays for the strings it keeps; idOf() throughput over every
+ * string; and the bytes per triple of a whole database using it.
+ */
+function measureInterner(
+  kind: InternerKind,
+  values: string[],
+  lines: string[],
+): InternerFootprint {
+  const encoder = new TextEncoder();
+  const decoder = new TextDecoder();
+  const text = encoder.encode(values.join(""));
+  const ends: number[] = [];
+  let end = 0;
+  for (const value of values) {
+    end += encoder.encode(value).length;
+    ends.push(end);
+  }
+
+  const before = heapBytes();
+  const interners: StringTable[] = [];
+  for (let copy = 0; copy < INTERNER_COPIES; copy++) {
+    const interner = kind === "arena"
+      ? new ArenaInterner(values.length)
+      : new Interner(values.length);
+    for (let idx = 0; idx < ends.length; idx++) {
+      const start = idx === 0 ? 0 : ends[idx - 1];
+      interner.intern(decoder.decode(text.subarray(start, ends[idx])));
+    }
+    interners.push(interner);
+  }
+  const bytes = (heapBytes() - before) / INTERNER_COPIES;
+  const [interner] = interners;
+
+  const elapsed = timeIt(() => {
+    for (const value of values) {
+      interner.idOf(value);
+    }
+  });
+
+  const dbBefore = heapBytes();
+  const db = TribbleV2.fromTribbleLines(lines, {}, { interner: kind });
+  const dbBytes = heapBytes() - dbBefore;
+
+  return {
+    bytesPerString: bytes / Math.max(interner.size, 1),
+    lookupsPerSecond: values.length / (elapsed / 1000),
+    bytesPerTriple: dbBytes / Math.max(db.triplesCount, 1),
+  };
+}
+
+function reportInterners(
+  datasets: Triple[][],
+  tribbleLines: string[][],
+): void {
+  console.log(
+    `\n${BOLD}${CYAN}${"string table".padEnd(30)}${"strings".padStart(10)}${
+      "bytes/string".padStart(14)
+    }${"idOf/s".padStart(14)}${"db bytes/triple".padStart(18)}${RESET}`,
+  );
+
+  for (let idx = 0; idx < datasets.length; idx++) {
+    const values = [
+      ...new Set(datasets[idx].flatMap(([source, , target]) => {
+        return [source, target];
+      })),
+    ];
+
+    for (const kind of ["map", "arena"] as InternerKind[]) {
+      const footprint = measureInterner(kind, values, tribbleLines[idx]);
+      const colour = kind === "map" ? YELLOW : GREEN;
+
+      console.log(
+        `${colour}${kind.padEnd(30)}${RESET}${
+          String(values.length).padStart(10)
+        }${footprint.bytesPerString.toFixed(1).padStart(14)}${
+          Math.round(footprint.lookupsPerSecond).toString().padStart(14)
+        }${footprint.bytesPerTriple.toFixed(1).padStart(18)}`,
+      );
+    }
+  }
+}
+
+const PATH_WALKS: [string, (db: TribbleV2) => PathView][] = [
+  ["photos > albums", (db) => db.paths({ type: "photo" }).follow("albumId")],
+  [
+    "photos > places > ancestors",
+    (db) =>
+      db.paths({ type: "photo" }).follow("location").follow("in", {
+        transitive: true,
+      }),
+  ],
+];
+
+/*
+ * Heap held by a walk's PathView and by its materialised pairs(), and
+ * the time to list the pairs eagerly, one by one, and grouped by end.
+ */
+function reportPathMemory(sizes: number[], datasets: Triple[][]): void {
+  console.log(
+    `\n${BOLD}${CYAN}${"path walk".padEnd(30)}${"triples".padStart(10)}${
+      "pairs".padStart(10)
+    }${"path bytes".padStart(14)}${"pairs() bytes".padStart(15)}${
+      "pairs() ms".padStart(12)
+    }${"iterPairs ms".padStart(14)}${"iterGroups ms".padStart(15)}${RESET}`,
+  );
+
+  for (let idx = 0; idx < datasets.length; idx++) {
+    const db = new TribbleV2(datasets[idx]);
+
+    for (const [name, walk] of PATH_WALKS) {
+      // settle the store's lazily built structures first
+      walk(db).pairCount();
+      const pathsBefore = heapBytes();
+      const paths = walk(db);
+      const pathBytes = heapBytes() - pathsBefore;
+
+      const pairsBefore = heapBytes();
+      const pairs = paths.pairs();
+      const pairsBytes = heapBytes() - pairsBefore;
+
+      const eagerMs = timeIt(() => paths.pairs());
+      const streamedMs = timeIt(() => {
+        let count = 0;
+        for (const _pair of paths.iterPairs()) {
+          count++;
+        }
+        return count;
+      });
+      const groupedMs = timeIt(() => {
+        let count = 0;
+        for (const [, starts] of paths.iterGroups()) {
+          count += starts.length;
+        }
+        return count;
+      });
+
+      console.log(
+        `${GREEN}${name.padEnd(30)}${RESET}${String(sizes[idx]).padStart(10)}${
+          String(pairs.length).padStart(10)
+        }${String(pathBytes).padStart(14)}${String(pairsBytes).padStart(15)}${
+          eagerMs.toFixed(2).padStart(12)
+        }${streamedMs.toFixed(2).padStart(14)}${
+          groupedMs.toFixed(2).padStart(15)
+        }`,
+      );
+    }
+  }
+}
+
+async function timeItAsync(action: () => Promise<unknown>): Promise<number> {
+  let best = Infinity;
+  for (let rep = 0; rep < REPS; rep++) {
+    const started = performance.now();
+    await action();
+    best = Math.min(best, performance.now() - started);
+  }
+  return best;
+}
+
+/*
+ * Wall-clock time of the parallel byte loader per worker count, against
+ * the sequential byte loader over the same bytes.
+ */
+async function reportParallelLoad(
+  sizes: number[],
+  tribbleLines: string[][],
+): Promise<void> {
+  const header = WORKER_COUNTS.map((workers) => `${workers}w`.padStart(10))
+    .join("");
+  console.log(
+    `\n${BOLD}${CYAN}${"parallel load (ms)".padEnd(30)}${
+      "sequential".padStart(12)
+    }${header}   cores: ${navigator.hardwareConcurrency}${RESET}`,
+  );
+
+  for (let idx = 0; idx < sizes.length; idx++) {
+    const bytes = new TextEncoder().encode(tribbleLines[idx].join("\n"));
+
+    const sequential = await timeItAsync(() => {
+      return TribbleV2.fromTribbleStream(new Blob([bytes]).stream());
+    });
+
+    const cells: string[] = [];
+    for (const workers of WORKER_COUNTS) {
+      const elapsed = await timeItAsync(() => {
+        return TribbleV2.fromTribbleParallel(bytes, {}, { workers });
+      });
+      cells.push(elapsed.toFixed(1).padStart(10));
+    }
+
+    console.log(
+      `${GREEN}${`${sizes[idx]} triples`.padEnd(30)}${RESET}${
+        sequential.toFixed(1).padStart(12)
+      }${cells.join("")}`,
+    );
+  }
+}
+
+/*
+ * Wall-clock time of a costly-predicate search per worker count, against
+ * search() over the same database. Each pool builds its shared store
+ * image and loads the predicate before timing starts.
+ */
+async function reportParallelSearch(
+  sizes: number[],
+  datasets: Triple[][],
+): Promise<void> {
+  const header = WORKER_COUNTS.map((workers) => `${workers}w`.padStart(10))
+    .join("");
+  console.log(
+    `\n${BOLD}${CYAN}${"parallel predicate search (ms)".padEnd(30)}${
+      "sequential".padStart(12)
+    }${header}   cores: ${navigator.hardwareConcurrency}${RESET}`,
+  );
+
+  const module = new URL("./predicates.ts", import.meta.url).href;
+  const byReference = {
+    source: {
+      type: "photo",
+      predicate: { module, name: "isCostlyMatch" },
+    },
+  };
+
+  for (let idx = 0; idx < sizes.length; idx++) {
+    const db = new TribbleV2(datasets[idx]);
+    const expected = db.search({
+      source: { type: "photo", predicate: isCostlyMatch },
+    }).triplesCount;
+
+    const sequential = timeIt(() => {
+      db.search({ source: { type: "photo", predicate: isCostlyMatch } });
+    });
+
+    const cells: string[] = [];
+    for (const workers of WORKER_COUNTS) {
+      const pool = new SearchWorkerPool({ workers, minRows: 0 });
+      const warm = await db.searchParallel(byReference, pool);
+      if (warm.triplesCount !== expected) {
+        throw new Error(`parallel search mismatch at size ${sizes[idx]}`);
+      }
+
+      const elapsed = await timeItAsync(() => {
+        return db.searchParallel(byReference, pool);
+      });
+      pool.close();
+      cells.push(elapsed.toFixed(1).padStart(10));
+    }
+
+    console.log(
+      `${GREEN}${`${sizes[idx]} triples`.padEnd(30)}${RESET}${
+        sequential.toFixed(1).padStart(12)
+      }${cells.join("")}`,
+    );
+  }
+}
+
+/*
+ * A sink that counts the bytes written to it and keeps none.
+ */
+function countingSink(): { stream: WritableStream<Uint8Array>; bytes: number } {
+  const sink = {
+    bytes: 0,
+    stream: new WritableStream<Uint8Array>({
+      write(chunk) {
+        sink.bytes += chunk.length;
+      },
+    }),
+  };
+  return sink;
+}
+
+/*
+ * Tribble-text export throughput: TribbleStringifier a triple at a time
+ * (encoded to UTF-8, as a file write would), against toTribble() with the
+ * store's ids and renumbered.
+ */
+async function reportExport(
+  sizes: number[],
+  datasets: Triple[][],
+): Promise<void> {
+  console.log(
+    `\n${BOLD}${CYAN}${"tribble export (MB/s)".padEnd(30)}${
+      sizes.map((size) => String(size).padStart(12)).join("")
+    }${RESET}`,
+  );
+
+  const dbs = datasets.map((dataset) => new TribbleV2(dataset));
+  const rows: [string, string, (db: TribbleV2) => Promise<number>][] = [
+    ["TribbleStringifier", YELLOW, (db) => {
+      const stringifier = new TribbleStringifier();
+      const lines = db.triples().map((triple) => {
+        return stringifier.stringify(triple);
+      });
+      return Promise.resolve(
+        new TextEncoder().encode(`${lines.join("\n")}\n`).length,
+      );
+    }],
+    ["toTribble()", GREEN, async (db) => {
+      const sink = countingSink();
+      await db.toTribble(sink.stream);
+      return sink.bytes;
+    }],
+    ["toTribble({ renumber })", GREEN, async (db) => {
+      const sink = countingSink();
+      await db.toTribble(sink.stream, { renumber: true });
+      return sink.bytes;
+    }],
+  ];
+
+  for (const [label, colour, run] of rows) {
+    const cells: string[] = [];
+    for (const db of dbs) {
+      let bytes = 0;
+      const elapsed = await timeItAsync(async () => {
+        bytes = await run(db);
+      });
+      const megabytesPerSecond = bytes / 1e6 / (elapsed / 1000);
+      cells.push(megabytesPerSecond.toFixed(1).padStart(12));
+    }
+    console.log(`${colour}${label.padEnd(30)}${RESET}${cells.join("")}`);
+  }
+}
+
+/*
+ * DurableFiles over a directory: an append-only log file, and a snapshot
+ * replaced by writing a temporary file and renaming it.
+ */
+async function directoryFiles(
+  dir: string,
+): Promise<DurableFiles & { close(): void }> {
+  const logPath = `${dir}/log`;
+  const snapshotPath = `${dir}/snapshot`;
+  const log = await Deno.open(logPath, { create: true, append: true });
+
+  return {
+    readLog: () => Deno.readFile(logPath),
+    async appendLog(bytes) {
+      let written = 0;
+      while (written < bytes.length) {
+        written += await log.write(bytes.subarray(written));
+      }
+    },
+    syncLog: () => log.syncData(),
+    truncateLog: (length) => Deno.truncate(logPath, length),
+    async readSnapshot() {
+      try {
+        return await Deno.readFile(snapshotPath);
+      } catch (err) {
+        if (err instanceof Deno.errors.NotFound) {
+          return undefined;
+        }
+        throw err;
+      }
+    },
+    async writeSnapshot(bytes) {
+      const file = await Deno.open(`${snapshotPath}.tmp`, {
+        create: true,
+        write: true,
+        truncate: true,
+      });
+      try {
+        let written = 0;
+        while (written < bytes.length) {
+          written += await file.write(bytes.subarray(written));
+        }
+        await file.syncData();
+      } finally {
+        file.close();
+      }
+      await Deno.rename(`${snapshotPath}.tmp`, snapshotPath);
+    },
+    close: () => log.close(),
+  };
+}
+
+/*
+ * Durable add() throughput per fsync policy, awaiting flush() after every
+ * add() or after every DURABLE_GROUP of them (one group commit), on the
+ * smallest dataset. Each run reopens its log to check nothing was lost.
+ */
+async function reportDurability(datasets: Triple[][]): Promise<void> {
+  const triples = datasets[0];
+  console.log(
+    `\n${BOLD}${CYAN}${
+      `durable add (triples/s, ${triples.length})`.padEnd(30)
+    }${"flush each".padStart(12)}${
+      `flush per ${DURABLE_GROUP}`.padStart(14)
+    }${RESET}`,
+  );
+
+  for (const fsync of ["always", "interval", "never"] as FsyncPolicy[]) {
+    const cells: string[] = [];
+    for (const group of [1, DURABLE_GROUP]) {
+      const dir = await Deno.makeTempDir({ prefix: "tribble-wal-" });
+      try {
+        const files = await directoryFiles(dir);
+        const db = await TribbleV2.openDurable(files, {}, { fsync });
+
+        const started = performance.now();
+        for (let idx = 0; idx < triples.length; idx += DURABLE_BATCH) {
+          db.add(triples.slice(idx, idx + DURABLE_BATCH));
+          if ((idx / DURABLE_BATCH + 1) % group === 0) {
+            await db.flush();
+          }
+        }
+        await db.flush();
+        const elapsed = performance.now() - started;
+        await db.close();
+        files.close();
+
+        const reopenedFiles = await directoryFiles(dir);
+        const reopened = await TribbleV2.openDurable(reopenedFiles);
+        if (reopened.triplesCount !== db.triplesCount) {
+          throw new Error(`durable replay mismatch under fsync ${fsync}`);
+        }
+        await reopened.close();
+        reopenedFiles.close();
+
+        const perSecond = triples.length / (elapsed / 1000);
+        cells.push(
+          perSecond.toFixed(0).padStart(group === 1 ? 12 : 14),
+        );
+      } finally {
+        await Deno.remove(dir, { recursive: true });
+      }
+    }
+    console.log(
+      `${GREEN}${`fsync: ${fsync}`.padEnd(30)}${RESET}${cells.join("")}`,
+    );
+  }
+}
+
+async function main(): Promise<void> {
   const sizes: number[] = [];
   const datasets: Triple[][] = [];
 
@@ -235,6 +954,10 @@ function main(): void {
     const sources = [...new Set(dataset.map((triple) => triple[0]))];
     return sources.slice(0, READ_BATCH);
   });
+  const pageUrns = datasets.map((dataset) => {
+    const sources = [...new Set(dataset.map((triple) => triple[0]))];
+    return sources.slice(-PAGE_SIZE);
+  });
   const thingUrns = datasets.map((dataset) => {
     const birds = [
       ...new Set(
@@ -246,6 +969,13 @@ function main(): void {
     return birds.slice(0, 50);
   });
 
+  const photoUrns = datasets.map((dataset) => {
+    const photos = dataset
+      .map((triple) => triple[0])
+      .filter((source) => source.startsWith("urn:ró:photo:"));
+    return [...new Set(photos)].slice(0, 100);
+  });
+
   const tribbleLines = datasets.map((dataset) => {
     const stringifier = new TribbleStringifier();
     return dataset
@@ -268,12 +998,93 @@ function main(): void {
     TribbleV2.fromTribbleLines(tribbleLines[idx]);
   });
 
+  const snapshots = tribbleLines.map((lines) => {
+    return TribbleV2.fromTribbleLines(lines).toSnapshot();
+  });
+  record("open binary snapshot", "v2", (idx) => {
+    TribbleV2.fromSnapshot(snapshots[idx]);
+  });
+
+  // one tombstoned database per timing rep, so every rep compacts
+  const tombstonedDbs = datasets.map((dataset, datasetIdx) => {
+    return Array.from({ length: REPS }, () => {
+      const db = TribbleV2.fromSnapshot(snapshots[datasetIdx]);
+      db.delete(dataset.filter((_, tripleIdx) => tripleIdx % 4 === 0));
+      return db;
+    });
+  });
+  record("compact (25% deleted)", "v2", (idx) => {
+    tombstonedDbs[idx].pop()!.compact({ pruneStrings: true });
+  });
+
   record("chained search x3", "v1", (idx) => {
     chainedSearch(v1Dbs[idx]);
   });
   record("chained search x3", "v2", (idx) => {
     chainedSearch(v2Dbs[idx]);
   });
+  const meteredDbs = datasets.map((dataset) => {
+    return new TribbleV2(dataset, {}, { metrics: new EngineMetrics() });
+  });
+  record("  ...with metrics", "v2", (idx) => {
+    chainedSearch(meteredDbs[idx]);
+  });
+
+  record(`selective search x${READ_BATCH}`, "v1", (idx) => {
+    selectiveSearches(v1Dbs[idx], readUrns[idx]);
+  });
+  record(`selective search x${READ_BATCH}`, "v2", (idx) => {
+    selectiveSearches(v2Dbs[idx], readUrns[idx]);
+  });
+
+  const indexedDbs = datasets.map((dataset) => {
+    return new TribbleV2(dataset, {}, { literalIndex: ["rating"] });
+  });
+  record("predicate filter", "v1", (idx) => {
+    predicateFilter(v1Dbs[idx]);
+  });
+  record("predicate filter", "v2", (idx) => {
+    predicateFilter(v2Dbs[idx]);
+  });
+  record("  ...as indexed range", "v2", (idx) => {
+    rangeFilter(indexedDbs[idx]);
+  });
+  record("  ...first page of 50", "v2", (idx) => {
+    firstPageFilter(v2Dbs[idx]);
+  });
+
+  const textDbs = datasets.map((dataset) => {
+    return new TribbleV2(dataset, {}, { textIndex: true });
+  });
+  record("text search predicate", "v1", (idx) => {
+    textPredicate(v1Dbs[idx]);
+  });
+  record("text search predicate", "v2", (idx) => {
+    textPredicate(v2Dbs[idx]);
+  });
+  record("  ...as icontains", "v2", (idx) => {
+    textContains(v2Dbs[idx]);
+  });
+  record("  ...with text index", "v2", (idx) => {
+    textContains(textDbs[idx]);
+  });
+
+  record("search + patch view x10", "v1", (idx) => {
+    patchedPreview(v1Dbs[idx]);
+  });
+  record("search + patch view x10", "v2", (idx) => {
+    patchedPreview(v2Dbs[idx]);
+  });
+
+  const cachedDbs = datasets.map((dataset) => {
+    return new TribbleV2(dataset, {}, { cacheSize: 64 });
+  });
+  record(`repeated queries x${READ_BATCH}`, "v2", (idx) => {
+    repeatedQueries(v2Dbs[idx], readUrns[idx]);
+  });
+  record(`  ...with result cache`, "v2", (idx) => {
+    repeatedQueries(cachedDbs[idx], readUrns[idx]);
+  });
 
   record(`readThing x${READ_BATCH}`, "v1", (idx) => {
     pointReads(v1Dbs[idx], readUrns[idx]);
@@ -281,6 +1092,18 @@ function main(): void {
   record(`readThing x${READ_BATCH}`, "v2", (idx) => {
     pointReads(v2Dbs[idx], readUrns[idx]);
   });
+  record("  ...with metrics", "v2", (idx) => {
+    pointReads(meteredDbs[idx], readUrns[idx]);
+  });
+
+  record(`readThings page of ${PAGE_SIZE}`, "v2", (idx) => {
+    v2Dbs[idx].readThings(pageUrns[idx]);
+  });
+  record("  ...projected (2 rels)", "v2", (idx) => {
+    v2Dbs[idx].readThings(pageUrns[idx], {
+      relations: ["location", "albumId"],
+    });
+  });
 
   record("things->albums walk x50", "v1", (idx) => {
     nPlusOneWalk(v1Dbs[idx], thingUrns[idx]);
@@ -289,6 +1112,46 @@ function main(): void {
     traversalWalk(v2Dbs[idx], thingUrns[idx]);
   });
 
+  record("photos per place", "v1", (idx) => {
+    photosPerPlace(v1Dbs[idx]);
+  });
+  record("photos per place", "v2", (idx) => {
+    photosPerPlace(v2Dbs[idx]);
+  });
+  record("  ...as facets()", "v2", (idx) => {
+    photosPerPlaceFacet(v2Dbs[idx]);
+  });
+  record("  ...as facets(), top 10", "v2", (idx) => {
+    photosPerPlaceFacet(v2Dbs[idx], 10);
+  });
+
+  const closureDbs = datasets.map((dataset) => {
+    return new TribbleV2(dataset, {}, { closureCache: true });
+  });
+  record("place ancestors x10", "v2", (idx) => {
+    placeAncestors(v2Dbs[idx], photoUrns[idx]);
+  });
+  record("  ...with closure cache", "v2", (idx) => {
+    placeAncestors(closureDbs[idx], photoUrns[idx]);
+  });
+
+  record("bird-in-region x10 (chain)", "v2", (idx) => {
+    birdInRegionChain(v2Dbs[idx], thingUrns[idx].slice(0, 10));
+  });
+  record("  ...as match() patterns", "v2", (idx) => {
+    birdInRegionMatch(v2Dbs[idx], thingUrns[idx].slice(0, 10));
+  });
+
+  const rerunDbs = datasets.map((dataset) => new TribbleV2(dataset));
+  const liveDbs = datasets.map((dataset) => new TribbleV2(dataset));
+  const liveViews = liveDbs.map((db) => db.materialize(ALBUM_SEARCH));
+  record(`always-open search, ${EDIT_ROUNDS} edits`, "v2", (idx) => {
+    alwaysOpenRerun(rerunDbs[idx]);
+  });
+  record("  ...materialized", "v2", (idx) => {
+    alwaysOpenMaterialized(liveDbs[idx], liveViews[idx]);
+  });
+
   // sanity: both walks agree at every size
   for (let idx = 0; idx < datasets.length; idx++) {
     const fromV1 = nPlusOneWalk(v1Dbs[idx], thingUrns[idx]);
@@ -299,6 +1162,15 @@ function main(): void {
     ) {
       throw new Error(`walk mismatch at size ${sizes[idx]}`);
     }
+
+    const matched = birdInRegionMatch(v2Dbs[idx], thingUrns[idx].slice(0, 10));
+    const chained = birdInRegionChain(v2Dbs[idx], thingUrns[idx].slice(0, 10));
+    if (
+      matched.size !== chained.size ||
+      [...matched].some((photo) => !chained.has(photo))
+    ) {
+      throw new Error(`bird-in-region mismatch at size ${sizes[idx]}`);
+    }
   }
 
   const header = sizes.map((size) => `${size} tr`.padStart(10)).join("");
@@ -312,6 +1184,23 @@ function main(): void {
     `\n${CYAN}scaling column: fitted exponent over dataset size ` +
       `(1.00 = linear).${RESET}`,
   );
+
+  for (let idx = 0; idx < datasets.length; idx++) {
+    if (
+      alwaysOpenRerun(rerunDbs[idx]) !==
+        alwaysOpenMaterialized(liveDbs[idx], liveViews[idx])
+    ) {
+      throw new Error(`materialized view mismatch at size ${sizes[idx]}`);
+    }
+  }
+
+  reportBackends(sizes, tribbleLines);
+  reportInterners(datasets, tribbleLines);
+  await reportExport(sizes, datasets);
+  await reportDurability(datasets);
+  await reportParallelLoad(sizes, tribbleLines);
+  await reportParallelSearch(sizes, datasets);
+  reportPathMemory(sizes, datasets);
 }
 
-main();
+await main();
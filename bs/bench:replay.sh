@@ -0,0 +1,15 @@
+#! /usr/bin/env bash
+# Replay a recorded query trace against v1 and v2, and file the results
+# with the synthetic benchmarks:
+#   bs/bench:replay.sh data.tribble trace.json [--repeat=N] [--predicates=module.ts]
+
+CURRENT_COMMIT_ID="$(git rev-parse HEAD)"
+CURRENT_DATE="$(date -Iseconds)"
+CURRENT_VERSION="$(jq '.version' package.json )"
+
+deno run --allow-read benchmark/replay.ts "$@" | jq "{
+  \"date\": \"$CURRENT_DATE\",
+  \"version\": $CURRENT_VERSION,
+  \"commit_id\": \"$CURRENT_COMMIT_ID\",
+  \"results\": .
+}" | tee "benchmark_results/replay_$CURRENT_DATE.json"
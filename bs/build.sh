@@ -3,3 +3,5 @@
 npx tsc -p tsconfig.json
 npx esbuild src/mod.ts --bundle --format=esm --outfile=dist/mod.js
 npx esbuild src/v2/mod.ts --bundle --format=esm --outfile=dist/v2/mod.js
+npx esbuild src/v2/ingest-worker.ts --bundle --format=esm --outfile=dist/v2/ingest-worker.js
+npx esbuild src/v2/search-worker.ts --bundle --format=esm --outfile=dist/v2/search-worker.js
@@ -2,7 +2,7 @@
 
 import docopt from "docopt";
 import { TribbleParser } from "./src/tribble/parse.ts";
-import { TribbleStringifier } from "./src/tribble/stringify.ts";
+import { TribbleDB } from "./src/v2/mod.ts";
 import type { Triple } from "./src/types.ts";
 
 const doc = `
@@ -49,13 +49,12 @@ function parse(lines: string[]) {
 }
 
 /*
- * Convert triples to tribbles and print
+ * Convert triples to tribbles and print, through the v2 store's buffered
+ * writer rather than a console.log per triple
  */
-function stringify(triples: Triple[]) {
-  const stringifier = new TribbleStringifier();
-  for (const triple of triples) {
-    console.log(stringifier.stringify(triple));
-  }
+async function stringify(triples: Triple[]) {
+  const db = new TribbleDB(triples);
+  await db.toTribble(Deno.stdout.writable, { renumber: true });
 }
 
 async function main() {
@@ -68,7 +67,7 @@ async function main() {
       console.error("Failed to parse input as JSON array of triples.");
       Deno.exit(1);
     }
-    stringify(triples);
+    await stringify(triples);
   } else if (options["parse"]) {
     const lines = await readStdinLines();
     parse(lines);
@@ -1,5 +1,9 @@
 /*
  * Metrics describing how many operations TribbleDB performed.
+ *
+ * These single counters are kept by the v1 engine's indices and sets. v2
+ * has EngineMetrics (src/v2/metrics.ts) instead: latency histograms and
+ * per-operation work counters.
  */
 
 export class IndexPerformanceMetrics {
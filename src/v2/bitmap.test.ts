@@ -0,0 +1,147 @@
+/*
+ * RowBitmap tests: every operation is checked against a plain Set model
+ * over value distributions that exercise both container kinds and several
+ * 65536-value chunks.
+ */
+
+import { assertEquals } from "@std/assert";
+import { RowBitmap } from "./bitmap.ts";
+
+function makeRandom(seed: number): () => number {
+  let state = seed;
+  return () => {
+    state |= 0;
+    state = (state + 0x6D2B79F5) | 0;
+    let mixed = Math.imul(state ^ (state >>> 15), 1 | state);
+    mixed = (mixed + Math.imul(mixed ^ (mixed >>> 7), 61 | mixed)) ^ mixed;
+    return ((mixed ^ (mixed >>> 14)) >>> 0) / 4294967296;
+  };
+}
+
+type Distribution = {
+  name: string;
+  generate: (random: () => number) => number[];
+};
+
+const DISTRIBUTIONS: Distribution[] = [
+  {
+    name: "sparse across chunks",
+    generate: (random) =>
+      Array.from({ length: 3_000 }, () => Math.floor(random() * 400_000)),
+  },
+  {
+    name: "dense within one chunk",
+    generate: (random) =>
+      Array.from({ length: 30_000 }, () => Math.floor(random() * 65_536)),
+  },
+  {
+    name: "ascending run crossing chunks",
+    generate: () => Array.from({ length: 70_000 }, (_, idx) => idx + 60_000),
+  },
+];
+
+function sortedValues(values: Iterable<number>): number[] {
+  return [...new Set(values)].sort((left, right) => left - right);
+}
+
+for (const distribution of DISTRIBUTIONS) {
+  Deno.test(`bitmap: ${distribution.name} matches a Set model`, () => {
+    const random = makeRandom(distribution.name.length);
+    const leftValues = distribution.generate(random);
+    const rightValues = distribution.generate(random);
+
+    const left = RowBitmap.from(leftValues);
+    const right = RowBitmap.from(rightValues);
+    const leftSet = new Set(leftValues);
+    const rightSet = new Set(rightValues);
+
+    assertEquals([...left], sortedValues(leftValues));
+    assertEquals(left.size, leftSet.size);
+
+    for (let probe = 0; probe < 2_000; probe++) {
+      const value = Math.floor(random() * 500_000);
+      assertEquals(left.has(value), leftSet.has(value));
+    }
+
+    assertEquals(
+      [...left.and(right)],
+      sortedValues(leftValues.filter((value) => rightSet.has(value))),
+    );
+    assertEquals(
+      [...left.or(right)],
+      sortedValues([
+        ...leftValues,
+        ...rightValues,
+      ]),
+    );
+    assertEquals(
+      [...left.andNot(right)],
+      sortedValues(leftValues.filter((value) => !rightSet.has(value))),
+    );
+    assertEquals(left.and(right).size, [...left.and(right)].length);
+    assertEquals(
+      [...RowBitmap.unionOf([rightValues, left])],
+      [...left.or(right)],
+    );
+
+    const visited: number[] = [];
+    left.forEach((value) => visited.push(value));
+    assertEquals(visited, [...left]);
+
+    const sorted = sortedValues(leftValues);
+    assertEquals(left.max(), sorted[sorted.length - 1]);
+    for (const start of [0, sorted[7], sorted[7] + 1, 65_536, 131_071]) {
+      const from: number[] = [];
+      left.forEachFrom(start, (value) => {
+        from.push(value);
+        return from.length < 100;
+      });
+      assertEquals(
+        from,
+        sorted.filter((value) => value >= start).slice(0, 100),
+      );
+    }
+
+    // delete every value of right from a copy, crossing back from bitset
+    // to array containers
+    const pruned = left.copy();
+    for (const value of rightValues) {
+      pruned.delete(value);
+    }
+    assertEquals([...pruned], [...left.andNot(right)]);
+    assertEquals(pruned.size, left.andNot(right).size);
+    assertEquals([...left], sorted);
+    for (const value of sorted) {
+      pruned.delete(value);
+    }
+    assertEquals(pruned.size, 0);
+    assertEquals(pruned.max(), undefined);
+  });
+}
+
+Deno.test("bitmap: set operations leave their operands untouched", () => {
+  const left = RowBitmap.from([1, 2, 3, 70_000]);
+  const right = RowBitmap.from([2, 70_000, 80_000]);
+
+  left.and(right);
+  left.or(right);
+  left.andNot(right);
+
+  assertEquals([...left], [1, 2, 3, 70_000]);
+  assertEquals([...right], [2, 70_000, 80_000]);
+});
+
+Deno.test("bitmap: empty bitmaps", () => {
+  const empty = new RowBitmap();
+  const some = RowBitmap.from([5]);
+
+  assertEquals(empty.size, 0);
+  assertEquals([...empty.and(some)], []);
+  assertEquals([...empty.or(some)], [5]);
+  assertEquals([...some.andNot(empty)], [5]);
+  assertEquals(empty.has(0), false);
+  assertEquals(empty.max(), undefined);
+  empty.forEachFrom(0, () => {
+    throw new Error("visited an empty bitmap");
+  });
+});
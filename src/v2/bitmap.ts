@@ -0,0 +1,624 @@
+/*
+ * Roaring-style compressed bitmap over unsigned 32-bit integers, used for
+ * row-sets (view rows, search results, tombstones) and optionally for
+ * posting lists.
+ *
+ * Values are split by their high 16 bits into chunks. Each chunk is a
+ * container over the low 16 bits: a sorted Uint16Array while it holds at
+ * most 4096 values, a 65536-bit Uint32Array bitset beyond that. Set
+ * operations work container by container, on whole words for bitsets, and
+ * iteration is always ascending.
+ */
+
+const ARRAY_MAX = 4096;
+const BITSET_WORDS = 2048;
+
+function popcount(word: number): number {
+  let bits = word - ((word >>> 1) & 0x55555555);
+  bits = (bits & 0x33333333) + ((bits >>> 2) & 0x33333333);
+  return (((bits + (bits >>> 4)) & 0x0F0F0F0F) * 0x01010101) >>> 24;
+}
+
+class ArrayContainer {
+  values: Uint16Array;
+  size: number;
+
+  constructor(values: Uint16Array = new Uint16Array(4), size: number = 0) {
+    this.values = values;
+    this.size = size;
+  }
+
+  indexOf(low: number): number {
+    let start = 0;
+    let end = this.size - 1;
+    while (start <= end) {
+      const mid = (start + end) >>> 1;
+      const value = this.values[mid];
+      if (value === low) {
+        return mid;
+      }
+      if (value < low) {
+        start = mid + 1;
+      } else {
+        end = mid - 1;
+      }
+    }
+    return -(start + 1);
+  }
+
+  has(low: number): boolean {
+    return this.indexOf(low) >= 0;
+  }
+
+  /*
+   * Add a value; returns the container now holding the set, which is a
+   * bitset once the array would exceed ARRAY_MAX values.
+   */
+  add(low: number): Container {
+    let position = this.size;
+    if (this.size > 0 && this.values[this.size - 1] >= low) {
+      const found = this.indexOf(low);
+      if (found >= 0) {
+        return this;
+      }
+      position = -found - 1;
+    }
+
+    if (this.size === ARRAY_MAX) {
+      const bitset = this.toBitset();
+      bitset.add(low);
+      return bitset;
+    }
+
+    if (this.size === this.values.length) {
+      const grown = new Uint16Array(
+        Math.min(Math.max(this.size * 2, 4), ARRAY_MAX),
+      );
+      grown.set(this.values);
+      this.values = grown;
+    }
+
+    this.values.copyWithin(position + 1, position, this.size);
+    this.values[position] = low;
+    this.size++;
+    return this;
+  }
+
+  remove(low: number): Container {
+    const found = this.indexOf(low);
+    if (found >= 0) {
+      this.values.copyWithin(found, found + 1, this.size);
+      this.size--;
+    }
+    return this;
+  }
+
+  toBitset(): BitsetContainer {
+    const words = new Uint32Array(BITSET_WORDS);
+    for (let idx = 0; idx < this.size; idx++) {
+      const low = this.values[idx];
+      words[low >>> 5] |= 1 << (low & 31);
+    }
+    return new BitsetContainer(words, this.size);
+  }
+
+  forEach(base: number, visit: (value: number) => void): void {
+    for (let idx = 0; idx < this.size; idx++) {
+      visit(base + this.values[idx]);
+    }
+  }
+
+  forEachFrom(
+    base: number,
+    low: number,
+    visit: (value: number) => boolean,
+  ): boolean {
+    const found = this.indexOf(low);
+    for (let idx = found >= 0 ? found : -(found + 1); idx < this.size; idx++) {
+      if (!visit(base + this.values[idx])) {
+        return false;
+      }
+    }
+    return true;
+  }
+
+  max(): number {
+    return this.values[this.size - 1];
+  }
+}
+
+class BitsetContainer {
+  words: Uint32Array;
+  size: number;
+
+  constructor(
+    words: Uint32Array = new Uint32Array(BITSET_WORDS),
+    size: number = 0,
+  ) {
+    this.words = words;
+    this.size = size;
+  }
+
+  has(low: number): boolean {
+    return (this.words[low >>> 5] & (1 << (low & 31))) !== 0;
+  }
+
+  add(low: number): Container {
+    const mask = 1 << (low & 31);
+    const idx = low >>> 5;
+    if ((this.words[idx] & mask) === 0) {
+      this.words[idx] |= mask;
+      this.size++;
+    }
+    return this;
+  }
+
+  /*
+   * Remove a value; returns the container now holding the set, which is
+   * an array again once the bitset is down to half of ARRAY_MAX, so a set
+   * hovering at the limit does not convert back and forth.
+   */
+  remove(low: number): Container {
+    const mask = 1 << (low & 31);
+    const idx = low >>> 5;
+    if ((this.words[idx] & mask) !== 0) {
+      this.words[idx] &= ~mask;
+      this.size--;
+    }
+    return this.size > ARRAY_MAX / 2 ? this : fromWords(this.words) ?? this;
+  }
+
+  forEach(base: number, visit: (value: number) => void): void {
+    for (let idx = 0; idx < BITSET_WORDS; idx++) {
+      let word = this.words[idx];
+      while (word !== 0) {
+        const lowest = word & -word;
+        visit(base + idx * 32 + 31 - Math.clz32(lowest));
+        word ^= lowest;
+      }
+    }
+  }
+
+  forEachFrom(
+    base: number,
+    low: number,
+    visit: (value: number) => boolean,
+  ): boolean {
+    // bits below `low` in its own word are masked off
+    let word = this.words[low >>> 5] & (~0 << (low & 31));
+    for (let idx = low >>> 5; idx < BITSET_WORDS;) {
+      while (word !== 0) {
+        const lowest = word & -word;
+        if (!visit(base + idx * 32 + 31 - Math.clz32(lowest))) {
+          return false;
+        }
+        word ^= lowest;
+      }
+      word = this.words[++idx];
+    }
+    return true;
+  }
+
+  max(): number {
+    let idx = BITSET_WORDS - 1;
+    while (this.words[idx] === 0) {
+      idx--;
+    }
+    return idx * 32 + 31 - Math.clz32(this.words[idx]);
+  }
+}
+
+type Container = ArrayContainer | BitsetContainer;
+
+/*
+ * Build a container from a word array, choosing the compact form.
+ */
+function fromWords(words: Uint32Array): Container | undefined {
+  let size = 0;
+  for (let idx = 0; idx < BITSET_WORDS; idx++) {
+    size += popcount(words[idx]);
+  }
+  if (size === 0) {
+    return undefined;
+  }
+  if (size > ARRAY_MAX) {
+    return new BitsetContainer(words, size);
+  }
+
+  const values = new Uint16Array(size);
+  let position = 0;
+  for (let idx = 0; idx < BITSET_WORDS; idx++) {
+    let word = words[idx];
+    while (word !== 0) {
+      const lowest = word & -word;
+      values[position++] = idx * 32 + 31 - Math.clz32(lowest);
+      word ^= lowest;
+    }
+  }
+  return new ArrayContainer(values, size);
+}
+
+function andContainers(
+  left: Container,
+  right: Container,
+): Container | undefined {
+  if (left instanceof BitsetContainer && right instanceof BitsetContainer) {
+    const words = new Uint32Array(BITSET_WORDS);
+    for (let idx = 0; idx < BITSET_WORDS; idx++) {
+      words[idx] = left.words[idx] & right.words[idx];
+    }
+    return fromWords(words);
+  }
+
+  // at least one side is an array: probe the array against the other side
+  const [array, other] = left instanceof ArrayContainer
+    ? [left, right]
+    : [right as ArrayContainer, left];
+
+  const values = new Uint16Array(array.size);
+  let size = 0;
+  for (let idx = 0; idx < array.size; idx++) {
+    const low = array.values[idx];
+    if (other.has(low)) {
+      values[size++] = low;
+    }
+  }
+  return size === 0 ? undefined : new ArrayContainer(values, size);
+}
+
+function orContainers(left: Container, right: Container): Container {
+  if (left instanceof ArrayContainer && right instanceof ArrayContainer) {
+    if (left.size + right.size <= ARRAY_MAX) {
+      const values = new Uint16Array(left.size + right.size);
+      let leftIdx = 0;
+      let rightIdx = 0;
+      let size = 0;
+
+      while (leftIdx < left.size || rightIdx < right.size) {
+        const leftValue = leftIdx < left.size ? left.values[leftIdx] : 65536;
+        const rightValue = rightIdx < right.size
+          ? right.values[rightIdx]
+          : 65536;
+
+        if (leftValue <= rightValue) {
+          values[size++] = leftValue;
+          leftIdx++;
+          if (leftValue === rightValue) {
+            rightIdx++;
+          }
+        } else {
+          values[size++] = rightValue;
+          rightIdx++;
+        }
+      }
+      return new ArrayContainer(values, size);
+    }
+  }
+
+  const words = left instanceof BitsetContainer
+    ? left.words.slice()
+    : (left as ArrayContainer).toBitset().words;
+
+  if (right instanceof BitsetContainer) {
+    for (let idx = 0; idx < BITSET_WORDS; idx++) {
+      words[idx] |= right.words[idx];
+    }
+  } else {
+    for (let idx = 0; idx < right.size; idx++) {
+      const low = right.values[idx];
+      words[low >>> 5] |= 1 << (low & 31);
+    }
+  }
+  return fromWords(words)!;
+}
+
+function andNotContainers(
+  left: Container,
+  right: Container,
+): Container | undefined {
+  if (left instanceof ArrayContainer) {
+    const values = new Uint16Array(left.size);
+    let size = 0;
+    for (let idx = 0; idx < left.size; idx++) {
+      const low = left.values[idx];
+      if (!right.has(low)) {
+        values[size++] = low;
+      }
+    }
+    return size === 0 ? undefined : new ArrayContainer(values, size);
+  }
+
+  const words = left.words.slice();
+  if (right instanceof BitsetContainer) {
+    for (let idx = 0; idx < BITSET_WORDS; idx++) {
+      words[idx] &= ~right.words[idx];
+    }
+  } else {
+    for (let idx = 0; idx < right.size; idx++) {
+      const low = right.values[idx];
+      words[low >>> 5] &= ~(1 << (low & 31));
+    }
+  }
+  return fromWords(words);
+}
+
+function copyContainer(container: Container): Container {
+  return container instanceof ArrayContainer
+    ? new ArrayContainer(
+      container.values.slice(0, container.size),
+      container.size,
+    )
+    : new BitsetContainer(container.words.slice(), container.size);
+}
+
+export class RowBitmap {
+  // sorted high-16-bit chunk keys, parallel to #containers
+  #keys: number[];
+  #containers: Container[];
+  #size: number;
+
+  constructor() {
+    this.#keys = [];
+    this.#containers = [];
+    this.#size = 0;
+  }
+
+  /*
+   * Build a bitmap from values in any order; ascending input is fastest.
+   */
+  static from(values: Iterable<number>): RowBitmap {
+    const bitmap = new RowBitmap();
+    for (const value of values) {
+      bitmap.add(value);
+    }
+    return bitmap;
+  }
+
+  /*
+   * Union many value lists given in any order. Values are set in one
+   * bitset per touched chunk, then each chunk is compacted, so no list
+   * needs sorting first.
+   */
+  static unionOf(lists: Iterable<Iterable<number>>): RowBitmap {
+    const chunks = new Map<number, Uint32Array>();
+    const setBit = (value: number) => {
+      const high = value >>> 16;
+      let words = chunks.get(high);
+      if (!words) {
+        words = new Uint32Array(BITSET_WORDS);
+        chunks.set(high, words);
+      }
+      const low = value & 0xFFFF;
+      words[low >>> 5] |= 1 << (low & 31);
+    };
+
+    for (const list of lists) {
+      if (list instanceof RowBitmap) {
+        list.forEach(setBit);
+      } else {
+        for (const value of list) {
+          setBit(value);
+        }
+      }
+    }
+
+    const result = new RowBitmap();
+    const highs = [...chunks.keys()].sort((highA, highB) => highA - highB);
+    for (const high of highs) {
+      const container = fromWords(chunks.get(high)!);
+      if (container !== undefined) {
+        result.#keys.push(high);
+        result.#containers.push(container);
+        result.#size += container.size;
+      }
+    }
+    return result;
+  }
+
+  #chunkIndex(high: number): number {
+    const keys = this.#keys;
+    const last = keys.length - 1;
+    if (last >= 0 && keys[last] === high) {
+      return last;
+    }
+
+    let start = 0;
+    let end = last;
+    while (start <= end) {
+      const mid = (start + end) >>> 1;
+      if (keys[mid] === high) {
+        return mid;
+      }
+      if (keys[mid] < high) {
+        start = mid + 1;
+      } else {
+        end = mid - 1;
+      }
+    }
+    return -(start + 1);
+  }
+
+  get size(): number {
+    return this.#size;
+  }
+
+  has(value: number): boolean {
+    const idx = this.#chunkIndex(value >>> 16);
+    return idx >= 0 && this.#containers[idx].has(value & 0xFFFF);
+  }
+
+  /*
+   * Add a value in place. Bitmaps handed out as view row-sets are never
+   * mutated afterwards; this is for building them and for tombstones.
+   */
+  add(value: number): void {
+    const high = value >>> 16;
+    let idx = this.#chunkIndex(high);
+
+    if (idx < 0) {
+      idx = -idx - 1;
+      this.#keys.splice(idx, 0, high);
+      this.#containers.splice(idx, 0, new ArrayContainer());
+    }
+
+    const container = this.#containers[idx];
+    const before = container.size;
+    const updated = container.add(value & 0xFFFF);
+
+    this.#containers[idx] = updated;
+    this.#size += updated.size - before;
+  }
+
+  /*
+   * Remove a value in place, under the same rule as add(): never from a
+   * bitmap already handed out as a row-set.
+   */
+  delete(value: number): void {
+    const idx = this.#chunkIndex(value >>> 16);
+    if (idx < 0) {
+      return;
+    }
+
+    const container = this.#containers[idx];
+    const before = container.size;
+    const updated = container.remove(value & 0xFFFF);
+    this.#size += updated.size - before;
+
+    if (updated.size === 0) {
+      this.#keys.splice(idx, 1);
+      this.#containers.splice(idx, 1);
+    } else {
+      this.#containers[idx] = updated;
+    }
+  }
+
+  copy(): RowBitmap {
+    const result = new RowBitmap();
+    result.#keys = this.#keys.slice();
+    result.#containers = this.#containers.map(copyContainer);
+    result.#size = this.#size;
+    return result;
+  }
+
+  #combine(
+    other: RowBitmap,
+    operation: (left: Container, right: Container) => Container | undefined,
+    keepLeft: boolean,
+    keepRight: boolean,
+  ): RowBitmap {
+    const result = new RowBitmap();
+    let leftIdx = 0;
+    let rightIdx = 0;
+
+    const push = (key: number, container: Container | undefined) => {
+      if (container !== undefined && container.size > 0) {
+        result.#keys.push(key);
+        result.#containers.push(container);
+        result.#size += container.size;
+      }
+    };
+
+    while (leftIdx < this.#keys.length || rightIdx < other.#keys.length) {
+      const leftKey = leftIdx < this.#keys.length
+        ? this.#keys[leftIdx]
+        : Infinity;
+      const rightKey = rightIdx < other.#keys.length
+        ? other.#keys[rightIdx]
+        : Infinity;
+
+      if (leftKey === rightKey) {
+        push(
+          leftKey,
+          operation(
+            this.#containers[leftIdx++],
+            other.#containers[rightIdx++],
+          ),
+        );
+      } else if (leftKey < rightKey) {
+        const container = this.#containers[leftIdx++];
+        push(leftKey, keepLeft ? copyContainer(container) : undefined);
+      } else {
+        const container = other.#containers[rightIdx++];
+        push(rightKey, keepRight ? copyContainer(container) : undefined);
+      }
+    }
+
+    return result;
+  }
+
+  and(other: RowBitmap): RowBitmap {
+    return this.#combine(other, andContainers, false, false);
+  }
+
+  or(other: RowBitmap): RowBitmap {
+    return this.#combine(other, orContainers, true, true);
+  }
+
+  andNot(other: RowBitmap): RowBitmap {
+    return this.#combine(other, andNotContainers, true, false);
+  }
+
+  /*
+   * Visit every value in ascending order. Cheaper than iteration on hot
+   * paths, since no generator is involved.
+   */
+  forEach(visit: (value: number) => void): void {
+    for (let idx = 0; idx < this.#keys.length; idx++) {
+      this.#containers[idx].forEach(this.#keys[idx] * 65536, visit);
+    }
+  }
+
+  /*
+   * Visit the values >= `start` in ascending order until `visit` returns
+   * false, skipping straight to `start`'s chunk and position.
+   */
+  forEachFrom(start: number, visit: (value: number) => boolean): void {
+    const high = start >>> 16;
+    const found = this.#chunkIndex(high);
+    for (
+      let idx = found >= 0 ? found : -(found + 1);
+      idx < this.#keys.length;
+      idx++
+    ) {
+      const key = this.#keys[idx];
+      const low = key === high ? start & 0xFFFF : 0;
+      if (!this.#containers[idx].forEachFrom(key * 65536, low, visit)) {
+        return;
+      }
+    }
+  }
+
+  /*
+   * The largest value, or undefined when empty.
+   */
+  max(): number | undefined {
+    const last = this.#keys.length - 1;
+    if (last < 0) {
+      return undefined;
+    }
+    return this.#keys[last] * 65536 + this.#containers[last].max();
+  }
+
+  *[Symbol.iterator](): Generator<number> {
+    for (let idx = 0; idx < this.#keys.length; idx++) {
+      const base = this.#keys[idx] * 65536;
+      const container = this.#containers[idx];
+
+      if (container instanceof ArrayContainer) {
+        for (let pos = 0; pos < container.size; pos++) {
+          yield base + container.values[pos];
+        }
+        continue;
+      }
+
+      for (let word = 0; word < BITSET_WORDS; word++) {
+        let bits = container.words[word];
+        while (bits !== 0) {
+          const lowest = bits & -bits;
+          yield base + word * 32 + 31 - Math.clz32(lowest);
+          bits ^= lowest;
+        }
+      }
+    }
+  }
+}
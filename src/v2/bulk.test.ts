@@ -2,9 +2,11 @@
  * Bulk-loader tests: fromTribbleLines must produce exactly what the
  * TribbleParser line-by-line path produces, including the parser's
  * no-unescaping quirk, and must reject what the parser rejects.
+ * fromTribbleStream must match fromTribbleLines however its bytes are
+ * chunked.
  */
 
-import { assertEquals, assertThrows } from "@std/assert";
+import { assertEquals, assertRejects, assertThrows } from "@std/assert";
 import { TribbleParser } from "../tribble/parse.ts";
 import { TribbleStringifier } from "../tribble/stringify.ts";
 import { TribbleDB } from "./mod.ts";
@@ -31,6 +33,22 @@ function viaParser(lines: string[]): TribbleDB {
   return db;
 }
 
+function streamOf(text: string, chunkSize: number): ReadableStream<Uint8Array> {
+  const bytes = new TextEncoder().encode(text);
+  let offset = 0;
+
+  return new ReadableStream({
+    pull(controller) {
+      if (offset >= bytes.length) {
+        controller.close();
+        return;
+      }
+      controller.enqueue(bytes.slice(offset, offset + chunkSize));
+      offset += chunkSize;
+    },
+  });
+}
+
 const FIXTURE: Triple[] = [
   ["urn:ró:photo:p1", "location", "urn:ró:place:dublin"],
   ["urn:ró:photo:p1", "subject", "urn:ró:bird:robin?context=wild"],
@@ -119,3 +137,47 @@ Deno.test("bulk: validations aggregate and throw", () => {
     "bad age: ancient",
   );
 });
+
+Deno.test("bulk: fromTribbleStream matches fromTribbleLines at every chunk size", async () => {
+  const text = toLines([
+    ...FIXTURE,
+    ["urn:ró:photo:p3", "name", "\u{1F426} — ó"],
+  ]).join("\n") + "\n";
+  const expected = TribbleDB.fromTribbleLines(text.split("\n")).triples();
+
+  const byteLength = new TextEncoder().encode(text).length;
+  for (let chunkSize = 1; chunkSize <= byteLength; chunkSize++) {
+    const db = await TribbleDB.fromTribbleStream(streamOf(text, chunkSize));
+    assertEquals(db.triples(), expected, `chunk size ${chunkSize}`);
+  }
+});
+
+Deno.test("bulk: fromTribbleStream keeps the decoded-text line semantics", async () => {
+  // a leading BOM is dropped as TextDecoder drops it, a BOM inside a value
+  // is kept, the last line needs no newline, and "\r" is not stripped
+  const texts = [
+    '\uFEFF0 "urn:ró:a:1"\n1 "rel"\n2 "\uFEFFvalue"\n\n0 1 2',
+    '0 "urn:ró:a:1"\n1 "rel"\n2 "value\r"\n0 1 2\n\n',
+  ];
+
+  for (const text of texts) {
+    const expected = TribbleDB.fromTribbleLines(
+      new TextDecoder().decode(new TextEncoder().encode(text)).split("\n"),
+    ).triples();
+
+    for (const chunkSize of [1, 2, 3, 1024]) {
+      const db = await TribbleDB.fromTribbleStream(streamOf(text, chunkSize));
+      assertEquals(db.triples(), expected);
+    }
+  }
+});
+
+for (const malformed of MALFORMED_CASES) {
+  Deno.test(`bulk: fromTribbleStream rejects ${malformed.name}`, async () => {
+    await assertRejects(
+      () =>
+        TribbleDB.fromTribbleStream(streamOf(malformed.lines.join("\n"), 2)),
+      SyntaxError,
+    );
+  });
+}
@@ -1,16 +1,26 @@
 /*
- * Bulk loader for the tribble text format. Feeds the format's dictionary
+ * Bulk loaders for the tribble text format. Feeds the format's dictionary
  * ids straight into the store's intern tables, so each distinct string is
  * hashed once at declaration rather than once per triple occurrence.
  *
  * Line handling matches TribbleParser exactly (including not unescaping
  * declaration values), with one leniency: blank lines are skipped.
+ *
+ * loadTribbleLines takes decoded lines; loadTribbleStream takes UTF-8
+ * bytes and only ever decodes declaration values, so a load never holds
+ * more text than one chunk plus one partial line.
  */
 
 import type { TargetValidator } from "../types.ts";
 import type { TripleStore } from "./store.ts";
 
 const QUOTE_CHAR_CODE = 34;
+const SPACE_CHAR_CODE = 32;
+const NEWLINE_BYTE = 10;
+
+// digit runs at least this long are handed to parseInt, so ids past 2^53
+// round exactly as the string path rounds them
+const EXACT_DIGITS = 15;
 
 function isDigits(text: string, from: number, to: number): boolean {
   if (to <= from) {
@@ -37,6 +47,136 @@ function parseDigits(
   return parseInt(line.slice(from, to), 10);
 }
 
+/*
+ * Receives parsed tribble lines in input order. addTriple returns false
+ * when an id was never declared, so the caller can report the line.
+ */
+export interface TribbleSink {
+  declare(dictId: number, value: string): void;
+  addTriple(srcDict: number, relDict: number, tgtDict: number): boolean;
+}
+
+/*
+ * Loader state shared by the text and byte front-ends: the dictionary
+ * and the validation failures seen so far.
+ *
+ * With `deferRows`, resolved rows are buffered and handed to the store in
+ * one addRowsByIds() call by finish(), so its posting lists are built in
+ * a single pass. Only worthwhile for a store that starts empty.
+ */
+export class TribbleLoader implements TribbleSink {
+  // dictionary id -> declared string / interned ids, resolved lazily
+  #dictValues: string[] = [];
+  #dictNodeIds: (number | undefined)[] = [];
+  #dictRelationIds: (number | undefined)[] = [];
+
+  #store: TripleStore;
+  #validations: Record<string, TargetValidator>;
+  #hasValidators: boolean;
+  #failures: string[] = [];
+
+  #deferred: Uint32Array | null;
+  #deferredCount = 0;
+
+  constructor(
+    store: TripleStore,
+    validations: Record<string, TargetValidator>,
+    deferRows = false,
+  ) {
+    this.#store = store;
+    this.#validations = validations;
+    this.#hasValidators = Object.keys(validations).length > 0;
+    this.#deferred = deferRows ? new Uint32Array(3 * 1024) : null;
+  }
+
+  declare(dictId: number, value: string): void {
+    this.#dictValues[dictId] = value;
+    this.#dictNodeIds[dictId] = undefined;
+    this.#dictRelationIds[dictId] = undefined;
+  }
+
+  /*
+   * Add a triple of dictionary ids. Returns false when an id was never
+   * declared, so the caller can report the offending line.
+   */
+  addTriple(srcDict: number, relDict: number, tgtDict: number): boolean {
+    const store = this.#store;
+    const srcValue = this.#dictValues[srcDict];
+    const relValue = this.#dictValues[relDict];
+    const tgtValue = this.#dictValues[tgtDict];
+    if (
+      srcValue === undefined || relValue === undefined ||
+      tgtValue === undefined
+    ) {
+      return false;
+    }
+
+    let sourceId = this.#dictNodeIds[srcDict];
+    if (sourceId === undefined) {
+      sourceId = store.internNode(srcValue);
+      this.#dictNodeIds[srcDict] = sourceId;
+    }
+
+    let relationId = this.#dictRelationIds[relDict];
+    if (relationId === undefined) {
+      relationId = store.relationNames.intern(relValue);
+      this.#dictRelationIds[relDict] = relationId;
+    }
+
+    let targetId = this.#dictNodeIds[tgtDict];
+    if (targetId === undefined) {
+      targetId = store.internNode(tgtValue);
+      this.#dictNodeIds[tgtDict] = targetId;
+    }
+
+    if (this.#hasValidators) {
+      const validator = this.#validations[relValue];
+      if (validator) {
+        const meta = store.nodeMeta.get(sourceId)!;
+        const sourceType = store.nodes.valueOf(meta.typeId);
+        const res = validator(sourceType, relValue, tgtValue);
+        if (typeof res === "string") {
+          this.#failures.push(res);
+        }
+      }
+    }
+
+    if (this.#deferred === null) {
+      store.addRowByIds(sourceId, relationId, targetId);
+      return true;
+    }
+
+    let deferred = this.#deferred;
+    const offset = 3 * this.#deferredCount;
+    if (offset === deferred.length) {
+      deferred = new Uint32Array(deferred.length * 2);
+      deferred.set(this.#deferred);
+      this.#deferred = deferred;
+    }
+    deferred[offset] = sourceId;
+    deferred[offset + 1] = relationId;
+    deferred[offset + 2] = targetId;
+    this.#deferredCount++;
+    return true;
+  }
+
+  /*
+   * Throw the aggregated validation failures, matching validateTriples
+   * output.
+   */
+  finish(): void {
+    if (this.#deferred !== null) {
+      this.#store.addRowsByIds(this.#deferred, this.#deferredCount);
+      this.#deferred = null;
+    }
+    if (this.#failures.length > 0) {
+      throw new Error(
+        `Triple validation failed:\n- ${this.#failures.join("\n- ")}`,
+      );
+    }
+  }
+}
+
 /*
  * Load tribble-format lines into a store. Validation failures are
  * aggregated and thrown after the load, matching validateTriples output.
@@ -46,13 +186,7 @@ export function loadTribbleLines(
   lines: Iterable<string>,
   validations: Record<string, TargetValidator>,
 ): void {
-  // dictionary id -> declared string / interned ids, resolved lazily
-  const dictValues: string[] = [];
-  const dictNodeIds: (number | undefined)[] = [];
-  const dictRelationIds: (number | undefined)[] = [];
-
-  const hasValidators = Object.keys(validations).length > 0;
-  const failures: string[] = [];
+  const loader = new TribbleLoader(store, validations, true);
 
   for (const line of lines) {
     if (line.length === 0) {
@@ -67,9 +201,7 @@ export function loadTribbleLines(
       }
 
       const dictId = parseDigits(line, 0, spaceIdx, "declaration");
-      dictValues[dictId] = line.slice(spaceIdx + 2, line.length - 1);
-      dictNodeIds[dictId] = undefined;
-      dictRelationIds[dictId] = undefined;
+      loader.declare(dictId, line.slice(spaceIdx + 2, line.length - 1));
       continue;
     }
 
@@ -84,50 +216,247 @@ export function loadTribbleLines(
     const relDict = parseDigits(line, firstSpace + 1, secondSpace, "triple");
     const tgtDict = parseDigits(line, secondSpace + 1, line.length, "triple");
 
-    const srcValue = dictValues[srcDict];
-    const relValue = dictValues[relDict];
-    const tgtValue = dictValues[tgtDict];
-    if (
-      srcValue === undefined || relValue === undefined ||
-      tgtValue === undefined
-    ) {
+    if (!loader.addTriple(srcDict, relDict, tgtDict)) {
       throw new SyntaxError(`Invalid triple reference: ${line}`);
     }
+  }
 
-    let sourceId = dictNodeIds[srcDict];
-    if (sourceId === undefined) {
-      sourceId = store.internNode(srcValue);
-      dictNodeIds[srcDict] = sourceId;
+  loader.finish();
+}
+
+/*
+ * Parse bytes[from, to) as a decimal integer, or -1 if the range is empty
+ * or holds a non-digit.
+ */
+function parseDigitBytes(bytes: Uint8Array, from: number, to: number): number {
+  if (to <= from) {
+    return -1;
+  }
+  if (to - from >= EXACT_DIGITS) {
+    for (let idx = from; idx < to; idx++) {
+      if (bytes[idx] < 48 || bytes[idx] > 57) {
+        return -1;
+      }
     }
+    return parseInt(String.fromCharCode(...bytes.subarray(from, to)), 10);
+  }
 
-    let relationId = dictRelationIds[relDict];
-    if (relationId === undefined) {
-      relationId = store.relationNames.intern(relValue);
-      dictRelationIds[relDict] = relationId;
+  let value = 0;
+  for (let idx = from; idx < to; idx++) {
+    const digit = bytes[idx] - 48;
+    if (digit < 0 || digit > 9) {
+      return -1;
     }
+    value = value * 10 + digit;
+  }
+  return value;
+}
 
-    let targetId = dictNodeIds[tgtDict];
-    if (targetId === undefined) {
-      targetId = store.internNode(tgtValue);
-      dictNodeIds[tgtDict] = targetId;
+function indexOfByte(
+  bytes: Uint8Array,
+  byte: number,
+  from: number,
+  to: number,
+): number {
+  const idx = bytes.indexOf(byte, from);
+  return idx === -1 || idx >= to ? -1 : idx;
+}
+
+/*
+ * The byte-level twin of one loadTribbleLines iteration, over the line
+ * bytes[from, to). Text is only decoded for declaration values and error
+ * messages.
+ */
+export function loadTribbleBytes(
+  loader: TribbleSink,
+  decoder: TextDecoder,
+  bytes: Uint8Array,
+  from: number,
+  to: number,
+): void {
+  if (to === from) {
+    return;
+  }
+  const lineText = () => decoder.decode(bytes.subarray(from, to));
+
+  if (bytes[to - 1] === QUOTE_CHAR_CODE) {
+    // declaration: <id> "<value>"
+    let spaceIdx = -1;
+    for (
+      let idx = indexOfByte(bytes, SPACE_CHAR_CODE, from, to);
+      idx !== -1;
+      idx = indexOfByte(bytes, SPACE_CHAR_CODE, idx + 1, to)
+    ) {
+      if (idx + 1 < to && bytes[idx + 1] === QUOTE_CHAR_CODE) {
+        spaceIdx = idx;
+        break;
+      }
     }
 
-    if (hasValidators) {
-      const validator = validations[relValue];
-      if (validator) {
-        const meta = store.nodeMeta.get(sourceId)!;
-        const sourceType = store.nodes.valueOf(meta.typeId);
-        const res = validator(sourceType, relValue, tgtValue);
-        if (typeof res === "string") {
-          failures.push(res);
-        }
+    const dictId = spaceIdx === -1
+      ? -1
+      : parseDigitBytes(bytes, from, spaceIdx);
+    if (dictId === -1) {
+      throw new SyntaxError(
+        `Invalid format for declaration line: ${lineText()}`,
+      );
+    }
+
+    loader.declare(
+      dictId,
+      decoder.decode(bytes.subarray(spaceIdx + 2, to - 1)),
+    );
+    return;
+  }
+
+  // triple: <srcId> <relId> <tgtId>
+  const firstSpace = indexOfByte(bytes, SPACE_CHAR_CODE, from, to);
+  const secondSpace = firstSpace === -1
+    ? -1
+    : indexOfByte(bytes, SPACE_CHAR_CODE, firstSpace + 1, to);
+
+  const srcDict = secondSpace === -1
+    ? -1
+    : parseDigitBytes(bytes, from, firstSpace);
+  const relDict = srcDict === -1
+    ? -1
+    : parseDigitBytes(bytes, firstSpace + 1, secondSpace);
+  const tgtDict = relDict === -1
+    ? -1
+    : parseDigitBytes(bytes, secondSpace + 1, to);
+
+  if (tgtDict === -1) {
+    throw new SyntaxError(`Invalid format for triple line: ${lineText()}`);
+  }
+  if (!loader.addTriple(srcDict, relDict, tgtDict)) {
+    throw new SyntaxError(`Invalid triple reference: ${lineText()}`);
+  }
+}
+
+/*
+ * Load every line of an in-memory buffer, the last one unterminated.
+ */
+export function loadTribbleBuffer(
+  loader: TribbleSink,
+  decoder: TextDecoder,
+  bytes: Uint8Array,
+): void {
+  let lineStart = 0;
+  let newline = bytes.indexOf(NEWLINE_BYTE);
+  while (newline !== -1) {
+    loadTribbleBytes(loader, decoder, bytes, lineStart, newline);
+    lineStart = newline + 1;
+    newline = bytes.indexOf(NEWLINE_BYTE, lineStart);
+  }
+  loadTribbleBytes(loader, decoder, bytes, lineStart, bytes.length);
+}
+
+export function stripBom(bytes: Uint8Array): Uint8Array {
+  const hasBom = bytes.length >= 3 && bytes[0] === 0xef &&
+    bytes[1] === 0xbb && bytes[2] === 0xbf;
+  return hasBom ? bytes.subarray(3) : bytes;
+}
+
+/*
+ * Write extra after the first `length` bytes of buffer, growing it by
+ * doubling when needed.
+ */
+function appendBytes(
+  buffer: Uint8Array,
+  length: number,
+  extra: Uint8Array,
+): Uint8Array {
+  let target = buffer;
+  if (length + extra.length > buffer.length) {
+    target = new Uint8Array(Math.max(length + extra.length, buffer.length * 2));
+    target.set(buffer.subarray(0, length));
+  }
+  target.set(extra, length);
+  return target;
+}
+
+/*
+ * Load a UTF-8 tribble stream into a store, chunk by chunk. Equivalent to
+ * decoding the whole stream with TextDecoder, splitting on "\n" and calling
+ * loadTribbleLines, without ever materialising that text.
+ */
+export async function loadTribbleStream(
+  store: TripleStore,
+  stream: ReadableStream<Uint8Array>,
+  validations: Record<string, TargetValidator>,
+): Promise<void> {
+  const loader = new TribbleLoader(store, validations, true);
+  // ignoreBOM keeps a U+FEFF that opens a declaration value; the stream's
+  // own leading BOM is stripped separately, as TextDecoder would strip it
+  const decoder = new TextDecoder("utf-8", { ignoreBOM: true });
+
+  // a line split across chunks is carried here until its newline arrives
+  let carry: Uint8Array = new Uint8Array(0);
+  let carryLength = 0;
+
+  const feed = (chunk: Uint8Array) => {
+    let lineStart = 0;
+    let newline = chunk.indexOf(NEWLINE_BYTE);
+
+    if (carryLength > 0) {
+      if (newline === -1) {
+        carry = appendBytes(carry, carryLength, chunk);
+        carryLength += chunk.length;
+        return;
       }
+
+      carry = appendBytes(carry, carryLength, chunk.subarray(0, newline));
+      loadTribbleBytes(loader, decoder, carry, 0, carryLength + newline);
+      carryLength = 0;
+
+      lineStart = newline + 1;
+      newline = chunk.indexOf(NEWLINE_BYTE, lineStart);
+    }
+
+    while (newline !== -1) {
+      loadTribbleBytes(loader, decoder, chunk, lineStart, newline);
+      lineStart = newline + 1;
+      newline = chunk.indexOf(NEWLINE_BYTE, lineStart);
     }
 
-    store.addRowByIds(sourceId, relationId, targetId);
+    if (lineStart < chunk.length) {
+      carry = appendBytes(carry, 0, chunk.subarray(lineStart));
+      carryLength = chunk.length - lineStart;
+    }
+  };
+
+  // the first bytes are held back until a leading BOM can be ruled out
+  let head: Uint8Array | null = new Uint8Array(0);
+
+  const reader = stream.getReader();
+  try {
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) {
+        break;
+      }
+
+      if (head === null) {
+        feed(value);
+        continue;
+      }
+
+      const joined: Uint8Array = new Uint8Array(head.length + value.length);
+      joined.set(head);
+      joined.set(value, head.length);
+      head = joined;
+      if (head.length >= 3) {
+        feed(stripBom(head));
+        head = null;
+      }
+    }
+  } finally {
+    reader.releaseLock();
   }
 
-  if (failures.length > 0) {
-    throw new Error(`Triple validation failed:\n- ${failures.join("\n- ")}`);
+  if (head !== null) {
+    feed(stripBom(head));
   }
+  loadTribbleBytes(loader, decoder, carry, 0, carryLength);
+  loader.finish();
 }
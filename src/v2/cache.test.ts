@@ -0,0 +1,117 @@
+/*
+ * Result cache tests: cached searches and reads must be indistinguishable
+ * from uncached ones across mutation, views must keep their snapshot
+ * semantics, and the counters must account for every lookup.
+ */
+
+import { assertEquals } from "@std/assert";
+import { TribbleDB } from "./mod.ts";
+import type { Triple } from "../types.ts";
+
+const FIXTURE: Triple[] = [
+  ["urn:ró:photo:p1", "location", "urn:ró:place:dublin"],
+  ["urn:ró:photo:p1", "rating", "5"],
+  ["urn:ró:photo:p2", "location", "urn:ró:place:cork"],
+  ["urn:ró:photo:p2", "rating", "3"],
+];
+
+function cachedDb(cacheSize = 16): TribbleDB {
+  return new TribbleDB([...FIXTURE], {}, { cacheSize });
+}
+
+Deno.test("cache: repeated searches and reads are served from the cache", () => {
+  const db = cachedDb();
+
+  const first = db.search({ relation: "rating" }).triples();
+  const second = db.search({ relation: "rating" }).triples();
+  assertEquals(second, first);
+
+  db.readThing("urn:ró:photo:p1");
+  db.readThing("urn:ró:photo:p1");
+
+  assertEquals(db.cacheStats(), {
+    entries: 2,
+    hits: 2,
+    misses: 2,
+    evictions: 0,
+    invalidations: 0,
+  });
+  assertEquals(new TribbleDB([]).cacheStats(), undefined);
+});
+
+Deno.test("cache: equivalent searches share one entry", () => {
+  const db = cachedDb();
+
+  db.search({ relation: ["rating", "location"] });
+  db.search({ relation: ["location", "rating", "location"] });
+  db.search({ source: { type: "photo", id: ["p2", "p1"] } });
+  db.search({ source: { type: "photo", id: ["p1", "p2"] } });
+
+  assertEquals(db.cacheStats()?.hits, 2);
+  assertEquals(db.cacheStats()?.entries, 2);
+});
+
+Deno.test("cache: mutations invalidate, views keep their snapshot", () => {
+  const db = cachedDb();
+  const before = db.search({ relation: "rating" });
+  const beforeThing = db.readThing("urn:ró:photo:p1");
+
+  db.add([["urn:ró:photo:p3", "rating", "4"]]);
+  db.delete([["urn:ró:photo:p1", "rating", "5"]]);
+
+  assertEquals(before.triplesCount, 2);
+  assertEquals(db.search({ relation: "rating" }).triples(), [
+    ["urn:ró:photo:p2", "rating", "3"],
+    ["urn:ró:photo:p3", "rating", "4"],
+  ]);
+  assertEquals(beforeThing?.rating, "5");
+  assertEquals(db.readThing("urn:ró:photo:p1")?.rating, undefined);
+  assertEquals(db.cacheStats()?.invalidations, 1);
+
+  db.searchFlatmap({ relation: "rating" }, () => []);
+  assertEquals(db.search({ relation: "rating" }).triplesCount, 0);
+
+  db.compact();
+  assertEquals(db.search({ relation: "location" }).triplesCount, 2);
+  assertEquals(db.cacheStats()?.invalidations, 3);
+});
+
+Deno.test("cache: chained searches over cached views are cached", () => {
+  const db = cachedDb();
+
+  const chain = () =>
+    db.search({ source: { type: "photo" } })
+      .search({ relation: "location" })
+      .search({ target: { id: "cork" } })
+      .triples();
+
+  assertEquals(chain(), chain());
+  assertEquals(db.cacheStats()?.hits, 3);
+  assertEquals(chain(), [FIXTURE[2]]);
+});
+
+Deno.test("cache: results are copies and predicates bypass the cache", () => {
+  const db = cachedDb();
+
+  const thing = db.readThing("urn:ró:photo:p1")!;
+  thing.rating = "0";
+  assertEquals(db.readThing("urn:ró:photo:p1")?.rating, "5");
+
+  db.search({ target: { predicate: (value: string) => value === "5" } });
+  assertEquals(db.cacheStats()?.misses, 1);
+});
+
+Deno.test("cache: the least recently used entry is evicted", () => {
+  const db = cachedDb(2);
+
+  db.search({ relation: "rating" });
+  db.search({ relation: "location" });
+  db.search({ relation: "rating" });
+  db.search({ source: "urn:ró:photo:p1" });
+
+  assertEquals(db.cacheStats()?.evictions, 1);
+  db.search({ relation: "rating" });
+  assertEquals(db.cacheStats()?.hits, 2);
+  db.search({ relation: "location" });
+  assertEquals(db.cacheStats()?.hits, 2);
+});
@@ -0,0 +1,116 @@
+/*
+ * Opt-in result cache for search() and readThing() (TribbleDBOpts
+ * cacheSize). Entries are keyed by a canonical, predicate-free rendering
+ * of the query plus the row-set it ran over, and evicted least recently
+ * used first.
+ *
+ * The cache is stamped with the store it was filled from and that
+ * store's generation, which every mutation bumps; on the first access
+ * after a mutation (or after the owning database swapped stores) every
+ * entry is dropped, so stale results are never served. Cached row-sets
+ * are shared with the views built from them, which never mutate them.
+ */
+
+import type { TripleObject } from "../types.ts";
+import type { RowBitmap } from "./bitmap.ts";
+import type { TripleStore } from "./store.ts";
+import type { CacheStats } from "./types.ts";
+
+// readThing misses are cached too, as null
+export type CachedResult = RowBitmap | TripleObject | null;
+
+export class ResultCache {
+  readonly capacity: number;
+
+  // Map iteration order doubles as recency order: oldest first
+  #entries: Map<string, CachedResult>;
+  #store: TripleStore | null;
+  #generation: number;
+
+  // views are scoped by the identity of their row-set
+  #scopes: WeakMap<RowBitmap, number>;
+  #nextScope: number;
+
+  #hits = 0;
+  #misses = 0;
+  #evictions = 0;
+  #invalidations = 0;
+
+  constructor(capacity: number) {
+    this.capacity = capacity;
+    this.#entries = new Map();
+    this.#store = null;
+    this.#generation = 0;
+    this.#scopes = new WeakMap();
+    this.#nextScope = 1;
+  }
+
+  /*
+   * The cache key for a query run over a row-set (null: a root's live
+   * rows).
+   */
+  scopedKey(rows: RowBitmap | null, key: string): string {
+    if (rows === null) {
+      return `0|${key}`;
+    }
+
+    let scope = this.#scopes.get(rows);
+    if (scope === undefined) {
+      scope = this.#nextScope++;
+      this.#scopes.set(rows, scope);
+    }
+    return `${scope}|${key}`;
+  }
+
+  #validate(store: TripleStore): void {
+    if (store === this.#store && store.generation === this.#generation) {
+      return;
+    }
+
+    if (this.#entries.size > 0) {
+      this.#invalidations++;
+      this.#entries.clear();
+    }
+    this.#store = store;
+    this.#generation = store.generation;
+  }
+
+  /*
+   * The cached result, or undefined on a miss.
+   */
+  get(store: TripleStore, key: string): CachedResult | undefined {
+    this.#validate(store);
+
+    const cached = this.#entries.get(key);
+    if (cached === undefined) {
+      this.#misses++;
+      return undefined;
+    }
+
+    this.#hits++;
+    this.#entries.delete(key);
+    this.#entries.set(key, cached);
+    return cached;
+  }
+
+  set(store: TripleStore, key: string, result: CachedResult): void {
+    this.#validate(store);
+
+    this.#entries.set(key, result);
+    while (this.#entries.size > this.capacity) {
+      const oldest = this.#entries.keys().next().value as string;
+      this.#entries.delete(oldest);
+      this.#evictions++;
+    }
+  }
+
+  stats(): CacheStats {
+    return {
+      entries: this.#entries.size,
+      hits: this.#hits,
+      misses: this.#misses,
+      evictions: this.#evictions,
+      invalidations: this.#invalidations,
+    };
+  }
+}
@@ -0,0 +1,76 @@
+/*
+ * Opt-in transitive-closure cache for transitive hops (TribbleDBOpts
+ * closureCache). Per direction and relation set, it remembers for each
+ * node every node reachable from it in one or more hops. Over a
+ * tree-shaped relation (place "in" place) a closure is a handful of
+ * ancestors, and asking for the ancestors of every photo's place becomes
+ * one lookup per place.
+ *
+ * Like ResultCache, it is stamped with the store and generation it was
+ * filled from and emptied on first use after either changes, and
+ * closures are scoped by the identity of the row-set they were computed
+ * over, so views never see each other's closures.
+ */
+
+import type { RowBitmap } from "./bitmap.ts";
+import type { TripleStore } from "./store.ts";
+
+export class ClosureCache {
+  // "scope|direction|relation ids" -> node id -> its closure
+  #closures: Map<string, Map<number, Uint32Array>>;
+  #store: TripleStore | null;
+  #generation: number;
+
+  #scopes: WeakMap<RowBitmap, number>;
+  #nextScope: number;
+
+  constructor() {
+    this.#closures = new Map();
+    this.#store = null;
+    this.#generation = 0;
+    this.#scopes = new WeakMap();
+    this.#nextScope = 1;
+  }
+
+  #scopeOf(rows: RowBitmap | null): number {
+    if (rows === null) {
+      return 0;
+    }
+
+    let scope = this.#scopes.get(rows);
+    if (scope === undefined) {
+      scope = this.#nextScope++;
+      this.#scopes.set(rows, scope);
+    }
+    return scope;
+  }
+
+  /*
+   * The closures known for hops in one direction over a relation set
+   * (null: every relation), for the caller to read and fill in.
+   */
+  closuresFor(
+    store: TripleStore,
+    rows: RowBitmap | null,
+    forward: boolean,
+    relationIds: Set<number> | null,
+  ): Map<number, Uint32Array> {
+    if (store !== this.#store || store.generation !== this.#generation) {
+      this.#closures.clear();
+      this.#store = store;
+      this.#generation = store.generation;
+    }
+
+    const relations = relationIds === null
+      ? "*"
+      : [...relationIds].sort((idA, idB) => idA - idB).join(",");
+    const key = `${this.#scopeOf(rows)}|${forward}|${relations}`;
+
+    let closures = this.#closures.get(key);
+    if (!closures) {
+      closures = new Map();
+      this.#closures.set(key, closures);
+    }
+    return closures;
+  }
+}
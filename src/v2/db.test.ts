@@ -53,6 +53,30 @@ Deno.test("v2: first* skip deleted rows instead of returning undefined", () => {
   assertEquals(db.firstSource(), "urn:ró:person:alice");
 });
 
+Deno.test("v2: iterTriples and iterObjects stream what the arrays hold", () => {
+  const db = new TribbleDB([
+    ...FIXTURE,
+    ["urn:ró:person:alice", "name", "Ali"],
+    ["urn:ró:person:bob", "age", "41"],
+  ]);
+  db.delete([FIXTURE[0]]);
+  const view = db.search({ relation: ["name", "age"] });
+  view.delete([["urn:ró:person:bob", "age", "41"]]);
+  view.add([["urn:ró:person:carol", "name", "Carol Byrne"]]);
+
+  for (const source of [db, view]) {
+    assertEquals([...source.iterTriples()], source.triples());
+    assertEquals([...source.iterObjects()], source.objects());
+    assertEquals(
+      [...source.iterObjects({ arrays: true })],
+      source.objects({ arrays: true }),
+    );
+  }
+
+  const stream = db.iterObjects();
+  assertEquals(stream.next().value?.id, "urn:ró:person:alice");
+});
+
 Deno.test("v2: triple identity is exact for terms containing spaces", () => {
   const db = new TribbleDB([]);
   const tricky: Triple[] = [
@@ -79,6 +103,44 @@ Deno.test("v2: compact reclaims tombstones without changing content", () => {
   );
 });
 
+Deno.test("v2: compact can prune strings no live triple references", () => {
+  for (const backend of ["map", "bitmap", "typed"] as const) {
+    const db = new TribbleDB([...FIXTURE], {}, { backend });
+    db.delete([FIXTURE[2]]);
+
+    db.compact();
+    const unpruned = db.toSnapshot().byteLength;
+    db.compact({ pruneStrings: true });
+
+    assertEquals(db.toSnapshot().byteLength < unpruned, true);
+    assertEquals(db.triples(), FIXTURE.slice(0, 2));
+    assertEquals(db.search({ source: { id: "bob" } }).triplesCount, 0);
+    assertEquals(db.readThing("urn:ró:person:alice"), {
+      id: "urn:ró:person:alice",
+      name: "Alice Smith",
+      age: "30",
+    });
+
+    db.add([FIXTURE[2]]);
+    assertEquals(db.search({ source: { type: "person" } }).triplesCount, 3);
+  }
+});
+
+Deno.test("v2: autoCompact compacts once tombstones pass the ratio", () => {
+  const db = new TribbleDB([...FIXTURE], {}, {
+    autoCompact: { tombstoneRatio: 0.5, minTombstones: 2 },
+  });
+  const view = db.search({ source: { type: "person" } });
+
+  db.delete([FIXTURE[0]]);
+  const snapshot = db.toSnapshot();
+  db.delete([FIXTURE[1]]);
+
+  assertEquals(db.toSnapshot().byteLength < snapshot.byteLength, true);
+  assertEquals(db.triples(), [FIXTURE[2]]);
+  assertEquals(view.triples(), FIXTURE);
+});
+
 Deno.test("v2: validations run on add, as in v1", () => {
   const db = new TribbleDB([], {
     age: (_type, _relation, value) => {
@@ -131,3 +193,157 @@ Deno.test("v2: searchFlatmap rewrites in place", () => {
   assertEquals(db.readThing("urn:ró:person:alice")?.age, "31");
   assertEquals(db.triplesCount, FIXTURE.length);
 });
+
+Deno.test("v2: readThings projects onto the requested relations", () => {
+  const db = new TribbleDB([
+    ...FIXTURE,
+    ["urn:ró:person:alice?v=2", "name", "Alice B. Smith"],
+    ["urn:ró:person:bob", "age", "41"],
+  ]);
+  const urns = [
+    "urn:ró:person:alice",
+    "urn:ró:person:nobody",
+    "urn:ró:person:bob",
+  ];
+
+  assertEquals(db.readThings(urns, { relations: ["name", "unknown"] }), [
+    { id: "urn:ró:person:alice", name: "Alice Smith" },
+    { id: "urn:ró:person:bob", name: "Bob Jones" },
+  ]);
+  assertEquals(db.readThings(urns, { relations: [] }), [
+    { id: "urn:ró:person:alice" },
+    { id: "urn:ró:person:bob" },
+  ]);
+  assertEquals(
+    db.readThings(["urn:ró:person:alice"], {
+      ignoreQs: true,
+      relations: ["name"],
+    }),
+    [{ id: "urn:ró:person:alice", name: ["Alice Smith", "Alice B. Smith"] }],
+  );
+  assertEquals(
+    db.readThings(urns),
+    urns.map((urn) => db.readThing(urn)).filter((thing) => thing),
+  );
+});
+
+Deno.test("v2: projected readThing respects views and the cache", () => {
+  const db = new TribbleDB([...FIXTURE], {}, { cacheSize: 8 });
+  const view = db.search({ relation: "age" });
+
+  assertEquals(db.readThing("urn:ró:person:alice", { relations: ["age"] }), {
+    id: "urn:ró:person:alice",
+    age: "30",
+  });
+  assertEquals(db.readThing("urn:ró:person:alice", { relations: ["name"] }), {
+    id: "urn:ró:person:alice",
+    name: "Alice Smith",
+  });
+  assertEquals(
+    view.readThing("urn:ró:person:alice", { relations: ["name"] }),
+    { id: "urn:ró:person:alice" },
+  );
+  assertEquals(view.readThings(["urn:ró:person:bob"]), []);
+});
+
+Deno.test("v2: a view reads its added rows as a copy of it would", () => {
+  const db = new TribbleDB(
+    [
+      ["urn:ró:person:alice", "knows", "urn:ró:person:bob"],
+      ["urn:ró:person:bob", "knows", "urn:ró:person:carol"],
+      ["urn:ró:person:carol", "lives", "urn:ró:place:cork"],
+      ["urn:ró:person:alice", "lives", "urn:ró:place:dublin"],
+      ["urn:ró:place:cork", "in", "urn:ró:place:ireland"],
+    ],
+    {},
+    { cacheSize: 8, closureCache: true },
+  );
+  const view = db.search({ relation: ["knows", "lives"] });
+  view.readThing("urn:ró:person:alice");
+  view.nodes("urn:ró:person:alice").follow("knows", { transitive: true });
+
+  view.add([
+    ["urn:ró:person:carol", "knows", "urn:ró:person:dave"],
+    ["urn:ró:person:alice", "name", "Alice"],
+    ["urn:ró:place:cork", "in", "urn:ró:place:ireland"],
+    ["urn:ró:person:dave", "lives", "urn:ró:place:cork"],
+  ]);
+  view.delete([
+    ["urn:ró:person:alice", "lives", "urn:ró:place:dublin"],
+    ["urn:ró:person:dave", "lives", "urn:ró:place:cork"],
+  ]);
+  const copy = new TribbleDB(view.triples());
+
+  assertEquals(view.triplesCount, 6);
+  assertEquals(view.objects(), copy.objects());
+  assertEquals([...view.iterObjects()], copy.objects());
+  assertEquals(view.targets(), copy.targets());
+  for (const urn of copy.sources()) {
+    assertEquals(view.readThing(urn), copy.readThing(urn));
+  }
+
+  const searches = [{}, { relation: "knows" }, { source: { type: "place" } }];
+  for (const search of searches) {
+    assertEquals(view.search(search).triples(), copy.search(search).triples());
+    assertEquals(
+      view.explain(search).rows,
+      copy.search(search).triplesCount,
+    );
+
+    const paged: Triple[] = [];
+    let after: string | undefined;
+    do {
+      const page = view.search(search, { limit: 2, after });
+      paged.push(...page.triples());
+      after = page.cursor();
+    } while (after !== undefined);
+    assertEquals(paged, copy.search(search).triples());
+    assertEquals(
+      view.search(search, { offset: 3, limit: 2 }).triples(),
+      copy.search(search).triples().slice(3, 5),
+    );
+  }
+
+  const knows = view.nodes("urn:ró:person:alice")
+    .follow("knows", { transitive: true });
+  assertEquals(
+    knows.urns(),
+    new Set([
+      "urn:ró:person:bob",
+      "urn:ró:person:carol",
+      "urn:ró:person:dave",
+    ]),
+  );
+  assertEquals(
+    view.shortestPath("urn:ró:person:alice", "urn:ró:place:ireland"),
+    copy.shortestPath("urn:ró:person:alice", "urn:ró:place:ireland"),
+  );
+  assertEquals(
+    view.match([["?person", "knows", "?friend"], [
+      "?friend",
+      "knows",
+      "?next",
+    ]]),
+    copy.match([["?person", "knows", "?friend"], [
+      "?friend",
+      "knows",
+      "?next",
+    ]]),
+  );
+  assertEquals(
+    view.facets({ by: "relation" }),
+    copy.facets({ by: "relation" }),
+  );
+  assertEquals(
+    TribbleDB.fromSnapshot(view.toSnapshot()).triples(),
+    copy.triples(),
+  );
+
+  // a clone shares the added rows until either side writes
+  const clone = view.clone();
+  clone.add([["urn:ró:person:erin", "knows", "urn:ró:person:alice"]]);
+  view.delete([["urn:ró:person:alice", "name", "Alice"]]);
+  assertEquals(view.triplesCount, 5);
+  assertEquals(clone.triplesCount, 7);
+  assertEquals(clone.readThing("urn:ró:person:alice")?.name, "Alice");
+});
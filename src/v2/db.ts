@@ -8,12 +8,15 @@
  *   - root add() appends rows a frozen row-set cannot contain;
  *   - root delete() tombstones without erasing column data, so existing
  *     views still resolve their rows;
- *   - mutating a view first materialises it into its own store (COW).
+ *   - a view's delete() swaps in a smaller row-set over the same store;
+ *   - a view's add() writes to its delta: a small store of its own laid
+ *     over the shared one (see TripleStore.layer()), whose rows its reads
+ *     take after the shared ones. The shared store's rows and generation,
+ *     and so every cache stamped with them, are untouched.
  */
 
 import type {
   Parser,
-  Search,
   TargetValidator,
   Triple,
   TripleObject,
@@ -21,19 +24,175 @@ import type {
 import { asUrn } from "../urn.ts";
 import { parseSearch } from "../db/inputs.ts";
 import { TripleStore } from "./store.ts";
-import { executeSearch } from "./search.ts";
-import { loadTribbleLines } from "./bulk.ts";
-import { NodeView, PathView, resolveSelector } from "./traverse.ts";
+import type { DeltaLayer, StoreLayer } from "./store.ts";
+import { RowBitmap } from "./bitmap.ts";
+import { SearchPlan } from "./search.ts";
+import { matchPatterns } from "./match.ts";
+import { countFacets } from "./facets.ts";
+import { ResultCache } from "./cache.ts";
+import { ClosureCache } from "./closure.ts";
+import type { RowWindow, SearchExplanation } from "./search.ts";
+import { loadTribbleLines, loadTribbleStream } from "./bulk.ts";
+import { loadTribbleParallel } from "./parallel.ts";
+import { resolvePredicates, splitPredicates } from "./parallel-search.ts";
+import type { SearchWorkerPool } from "./parallel-search.ts";
+import { readSnapshot, writeSnapshot } from "./snapshot.ts";
+import { writeTribble } from "./writer.ts";
+import { LOG_ADD, LOG_DELETE, replayLog, WriteAheadLog } from "./wal.ts";
+import type { DurableFiles } from "./wal.ts";
+import { MaterializedView } from "./materialize.ts";
+import type { EngineMetrics } from "./metrics.ts";
+import type { QueryTrace } from "./trace.ts";
+import {
+  NodeView,
+  PathView,
+  resolveRelationIds,
+  resolveSelector,
+  shortestPath,
+} from "./traverse.ts";
 import type { Visibility } from "./traverse.ts";
-import type { AddReport, NodeSelector, ObjectOpts, ReadOpts } from "./types.ts";
+import type {
+  AddReport,
+  Bindings,
+  CacheStats,
+  CompactionPolicy,
+  CompactOpts,
+  DurableOpts,
+  FacetOpts,
+  NodeSelector,
+  ObjectOpts,
+  ParallelLoadOpts,
+  ParallelSearch,
+  PathOpts,
+  RangeSearch,
+  ReadOpts,
+  SearchPage,
+  TribbleDBOpts,
+  TribbleExportOpts,
+  TriplePattern,
+  ViewChange,
+} from "./types.ts";
 
 // separator for exact string-level triple keys; cannot appear in terms
 const TRIPLE_KEY_SEPARATOR = "\u0000";
 
+// a view folds into a store of its own once its delta holds more rows
+// than both of these allow
+const DELTA_FOLD_MIN = 4096;
+const DELTA_FOLD_RATIO = 0.5;
+
+// cursors from here on name rows of a view's delta, which follow the
+// shared rows
+const DELTA_CURSOR_START = 2 ** 32;
+
 function tripleKey(triple: Triple): string {
   return triple.join(TRIPLE_KEY_SEPARATOR);
 }
 
+/*
+ * Cursors are row ids, in base 36 to keep them opaque-looking and short.
+ * A delta row's cursor is its row offset by DELTA_CURSOR_START.
+ */
+function encodeCursor(row: number): string {
+  return row.toString(36);
+}
+
+function decodeCursor(cursor: string): number {
+  const row = /^[0-9a-z]+$/.test(cursor) ? parseInt(cursor, 36) : NaN;
+  if (!Number.isSafeInteger(row)) {
+    throw new Error(`Invalid search cursor: ${JSON.stringify(cursor)}`);
+  }
+  return row;
+}
+
+function pageCount(name: string, value: number | undefined): number {
+  if (value === undefined) {
+    return name === "limit" ? Infinity : 0;
+  }
+  if (!Number.isInteger(value) || value < 0) {
+    throw new Error(`Search ${name} must be a non-negative integer`);
+  }
+  return value;
+}
+
+/*
+ * The row window a page asks for; undefined when it asks for everything.
+ */
+function windowOf(page: SearchPage): RowWindow | undefined {
+  if (
+    page.limit === undefined && page.offset === undefined &&
+    page.after === undefined
+  ) {
+    return undefined;
+  }
+
+  return {
+    after: page.after === undefined ? -1 : decodeCursor(page.after),
+    offset: pageCount("offset", page.offset),
+    limit: pageCount("limit", page.limit),
+  };
+}
+
+/*
+ * A row-set less its first `count` rows.
+ */
+function withoutFirst(rows: RowBitmap, count: number): RowBitmap {
+  if (count === 0) {
+    return rows;
+  }
+
+  const kept = new RowBitmap();
+  let seen = 0;
+  rows.forEach((row) => {
+    if (seen++ >= count) {
+      kept.add(row);
+    }
+  });
+  return kept;
+}
+
+function emptyReport(): SearchExplanation {
+  return {
+    steps: [],
+    rows: 0,
+    timings: { plan: 0, scan: 0, predicates: 0 },
+    predicateCalls: { made: 0, saved: 0 },
+  };
+}
+
+/*
+ * Fold one layer's explain() report into the report for the whole view.
+ */
+function addReport(
+  report: SearchExplanation,
+  layer: SearchExplanation,
+): void {
+  report.steps.push(...layer.steps);
+  report.rows += layer.rows;
+  report.timings.plan += layer.timings.plan;
+  report.timings.scan += layer.timings.scan;
+  report.timings.predicates += layer.timings.predicates;
+  report.predicateCalls.made += layer.predicateCalls.made;
+  report.predicateCalls.saved += layer.predicateCalls.saved;
+}
+
+function isVisibleIn({ store, rows }: StoreLayer, row: number): boolean {
+  return rows !== null ? rows.has(row) : store.isAlive(row);
+}
+
+function* visibleRowsOf({ store, rows }: StoreLayer): Generator<number> {
+  if (rows !== null) {
+    yield* rows;
+    return;
+  }
+
+  for (let row = 0; row < store.rowCount; row++) {
+    if (store.isAlive(row)) {
+      yield row;
+    }
+  }
+}
+
 function wantsArrays(opts: boolean | ObjectOpts): boolean {
   return typeof opts === "boolean" ? opts : opts.arrays ?? false;
 }
@@ -68,19 +227,60 @@ function accumulateRelation(
   }
 }
 
+/*
+ * A caller-owned copy of a cached readThing() result.
+ */
+function copyThing(thing: TripleObject): TripleObject {
+  const copy: TripleObject = {};
+  for (const [relation, value] of Object.entries(thing)) {
+    copy[relation] = Array.isArray(value) ? [...value] : value;
+  }
+  return copy;
+}
+
 export class TribbleDB {
   private store: TripleStore;
-  // null = live root database; a Set = frozen view over the shared store
-  private rows: Set<number> | null;
+  // null = live root database; a bitmap = frozen view over the shared store
+  private rows: RowBitmap | null;
   private validations: Record<string, TargetValidator>;
+  // shared by a root database and the views derived from it
+  private cache: ResultCache | null;
+  private closures: ClosureCache | null;
+  private autoCompact: CompactionPolicy | undefined;
+  // the rows a view has added, and whether the view may write to that
+  // store or shares it with the view it was derived from
+  private delta: DeltaLayer | null;
+  private ownsDelta: boolean;
+  // a durable root's log; views never write to it
+  private wal: WriteAheadLog | null;
+  // a root's materialised searches, once it has any
+  private materialized: Set<MaterializedView> | null;
+  // shared by a root database and the views derived from it
+  private metrics: EngineMetrics | null;
+  // shared by a root database and the views derived from it
+  private trace: QueryTrace | null;
 
   constructor(
     triples: Triple[],
     validations: Record<string, TargetValidator> = {},
+    opts: TribbleDBOpts = {},
   ) {
-    this.store = new TripleStore();
+    this.store = new TripleStore(opts.backend, opts.interner);
     this.rows = null;
     this.validations = validations;
+    this.cache = opts.cacheSize ? new ResultCache(opts.cacheSize) : null;
+    this.closures = opts.closureCache ? new ClosureCache() : null;
+    this.autoCompact = opts.autoCompact;
+    this.delta = null;
+    this.ownsDelta = false;
+    this.wal = null;
+    this.materialized = null;
+    this.metrics = opts.metrics ?? null;
+    this.trace = opts.trace ?? null;
+    this.indexLiterals(opts.literalIndex);
+    if (opts.textIndex) {
+      this.store.indexText();
+    }
     this.add(triples);
   }
 
@@ -119,59 +319,265 @@ export class TribbleDB {
   static fromTribbleLines(
     lines: Iterable<string>,
     validations: Record<string, TargetValidator> = {},
+    opts: TribbleDBOpts = {},
   ): TribbleDB {
-    const db = new TribbleDB([], validations);
+    const db = new TribbleDB([], validations, opts);
     loadTribbleLines(db.store, lines, validations);
     return db;
   }
 
+  /*
+   * Construct a TribbleDB from a stream of UTF-8 tribble-format bytes, such
+   * as a fetch() body or Deno.stdin.readable. Lines are parsed as chunks
+   * arrive, with the same semantics as fromTribbleLines over the decoded
+   * text split on "\n"; only declaration values are ever decoded.
+   */
+  static async fromTribbleStream(
+    stream: ReadableStream<Uint8Array>,
+    validations: Record<string, TargetValidator> = {},
+    opts: TribbleDBOpts = {},
+  ): Promise<TribbleDB> {
+    const db = new TribbleDB([], validations, opts);
+    await loadTribbleStream(db.store, stream, validations);
+    return db;
+  }
+
+  /*
+   * Construct a TribbleDB from UTF-8 tribble-format bytes, parsing slices
+   * of the input on `opts.workers` Web Workers. The result (rows, errors,
+   * validation failures) is identical to fromTribbleStream over the same
+   * bytes; interning stays on the calling thread, so this pays off for
+   * large inputs.
+   */
+  static async fromTribbleParallel(
+    bytes: Uint8Array,
+    validations: Record<string, TargetValidator> = {},
+    opts: ParallelLoadOpts = {},
+  ): Promise<TribbleDB> {
+    const { workers = navigator.hardwareConcurrency, ...dbOpts } = opts;
+
+    const db = new TribbleDB([], validations, dbOpts);
+    await loadTribbleParallel(db.store, bytes, validations, workers);
+    return db;
+  }
+
+  /*
+   * Open a binary snapshot (see toSnapshot()) from bytes already in
+   * memory. No tribble text or URN is re-parsed.
+   */
+  static fromSnapshot(
+    bytes: ArrayBuffer | Uint8Array,
+    validations: Record<string, TargetValidator> = {},
+    opts: TribbleDBOpts = {},
+  ): TribbleDB {
+    const db = new TribbleDB([], validations, opts);
+    db.store = readSnapshot(bytes, opts.backend, opts.interner);
+    db.indexLiterals(opts.literalIndex);
+    if (opts.textIndex) {
+      db.store.indexText();
+    }
+    return db;
+  }
+
+  /*
+   * Fetch a snapshot in one bulk read into an ArrayBuffer and open it.
+   * Accepts file: URLs under Deno as well as http(s) URLs.
+   */
+  static async openSnapshot(
+    url: URL | string,
+    validations: Record<string, TargetValidator> = {},
+    opts: TribbleDBOpts = {},
+  ): Promise<TribbleDB> {
+    const response = await fetch(url);
+    if (!response.ok) {
+      throw new Error(`Failed to fetch snapshot ${url}: ${response.status}`);
+    }
+    return TribbleDB.fromSnapshot(
+      await response.arrayBuffer(),
+      validations,
+      opts,
+    );
+  }
+
+  /*
+   * Open a durable database: load the last snapshot, replay the log
+   * written since, and log each later root add() and delete(). A record
+   * torn by a crash is truncated away. See wal.ts for commit, fsync and
+   * checkpoint semantics.
+   */
+  static async openDurable(
+    files: DurableFiles,
+    validations: Record<string, TargetValidator> = {},
+    opts: DurableOpts = {},
+  ): Promise<TribbleDB> {
+    const snapshot = await files.readSnapshot();
+    const db = snapshot
+      ? TribbleDB.fromSnapshot(snapshot, validations, opts)
+      : new TribbleDB([], validations, opts);
+
+    const log = await files.readLog();
+    const { length, declared } = replayLog(log, (op, triples) => {
+      for (const triple of triples) {
+        if (op === LOG_ADD) {
+          db.store.addTriple(triple);
+        } else {
+          db.store.deleteTriple(triple);
+        }
+      }
+    });
+    if (length < log.length) {
+      await files.truncateLog(length);
+    }
+
+    db.wal = new WriteAheadLog(
+      files,
+      length,
+      declared,
+      opts,
+      () => db.toSnapshot(),
+    );
+    return db;
+  }
+
+  /*
+   * A view of `source`'s store and delta store, seeing `rows` of the one
+   * and `delta`'s rows of the other. It shares the delta read-only.
+   */
   private static view(
-    store: TripleStore,
-    rows: Set<number>,
-    validations: Record<string, TargetValidator>,
+    source: TribbleDB,
+    rows: RowBitmap,
+    delta: DeltaLayer | null = source.delta,
   ): TribbleDB {
     // bypass the constructor: views share the store, so allocating a
     // fresh TripleStore per search result would be pure waste
     const db = Object.create(TribbleDB.prototype) as TribbleDB;
-    db.store = store;
+    db.store = source.store;
     db.rows = rows;
-    db.validations = validations;
+    db.validations = source.validations;
+    db.cache = source.cache;
+    db.closures = source.closures;
+    db.autoCompact = source.autoCompact;
+    db.delta = delta !== null && delta.rows.size > 0 ? delta : null;
+    db.ownsDelta = false;
+    db.wal = null;
+    db.materialized = null;
+    db.metrics = source.metrics;
+    db.trace = source.trace;
     return db;
   }
 
-  private visibility(): Visibility {
-    return { store: this.store, rows: this.rows };
+  /*
+   * Options that make a derived database use this one's storage layout,
+   * caches, compaction policy and literal and text indexes.
+   */
+  private storeOpts(): TribbleDBOpts {
+    return {
+      backend: this.store.backend,
+      interner: this.store.interner,
+      cacheSize: this.cache?.capacity,
+      closureCache: this.closures !== null,
+      autoCompact: this.autoCompact,
+      literalIndex: [...this.store.literalIndexes.keys()],
+      metrics: this.metrics ?? undefined,
+      trace: this.trace ?? undefined,
+      textIndex: this.store.textIndex !== null,
+    };
   }
 
-  private *visibleRows(): Generator<number> {
-    if (this.rows !== null) {
-      yield* this.rows;
-      return;
+  private indexLiterals(relations: string[] = []): void {
+    for (const relation of relations) {
+      this.store.indexLiterals(relation);
     }
+  }
 
-    for (let row = 0; row < this.store.rowCount; row++) {
-      if (this.store.isAlive(row)) {
-        yield row;
-      }
-    }
+  private visibility(): Visibility {
+    return {
+      store: this.store,
+      rows: this.rows,
+      delta: this.delta,
+      // closures are cached per shared row-set, which a delta adds to
+      closures: this.delta === null ? this.closures : null,
+      metrics: this.metrics,
+      trace: this.trace,
+    };
   }
 
   /*
-   * Copy-on-write: a view about to be mutated first becomes a root
-   * database over its own store.
+   * The layers this database reads, in row order: the shared store, then
+   * a view's delta when it has one.
    */
-  private ensureOwned(): void {
+  private layers(): StoreLayer[] {
+    const shared = { store: this.store, rows: this.rows };
+    return this.delta === null ? [shared] : [shared, this.delta];
+  }
+
+  /*
+   * Turn a view into a root database over its own store, holding only
+   * its rows.
+   */
+  private fold(): void {
     if (this.rows === null) {
       return;
     }
 
-    const owned = new TripleStore();
-    for (const triple of this.triples()) {
-      owned.addTriple(triple);
+    this.store = this.store.compacted(
+      this.rows,
+      { pruneStrings: true },
+      this.delta ?? undefined,
+    );
+    this.rows = null;
+    this.delta = null;
+    this.ownsDelta = false;
+    // the shared caches stay with the store they were filled from
+    this.cache = this.cache && new ResultCache(this.cache.capacity);
+    this.closures = this.closures && new ClosureCache();
+  }
+
+  /*
+   * The delta a view writes to: a new one on its first add(), or, when
+   * it shares its delta with the view it was derived from, a copy of the
+   * rows it sees. Either way the cost is O(delta), not O(view).
+   */
+  private ownDelta(): DeltaLayer {
+    if (this.delta === null) {
+      this.delta = { store: this.store.layer(), rows: new RowBitmap() };
+    } else if (!this.ownsDelta) {
+      const store = this.delta.store.layer(this.delta.rows);
+      this.delta = { store, rows: store.liveRows() };
     }
+    this.ownsDelta = true;
+    return this.delta;
+  }
 
-    this.store = owned;
-    this.rows = null;
+  /*
+   * A view whose delta has outgrown the rows it sees from the shared
+   * store is better off owning all its rows outright.
+   */
+  private foldIfDue(): void {
+    const threshold = Math.max(
+      DELTA_FOLD_MIN,
+      this.triplesCount * DELTA_FOLD_RATIO,
+    );
+    if (this.delta !== null && this.delta.store.rowCount > threshold) {
+      this.fold();
+    }
+  }
+
+  /*
+   * A triple's interned ids, or undefined when a term was never seen.
+   */
+  private idsOf(triple: Triple): [number, number, number] | undefined {
+    const sourceId = this.store.nodes.idOf(triple[0]);
+    const relationId = this.store.relationNames.idOf(triple[1]);
+    const targetId = this.store.nodes.idOf(triple[2]);
+
+    if (sourceId === undefined || relationId === undefined) {
+      return undefined;
+    }
+    if (targetId === undefined) {
+      return undefined;
+    }
+    return [sourceId, relationId, targetId];
   }
 
   validateTriples(triples: Triple[]): void {
@@ -197,8 +603,17 @@ export class TribbleDB {
 
   add(triples: Triple[]): AddReport {
     this.validateTriples(triples);
-    this.ensureOwned();
 
+    const frame = this.metrics?.start(this.store);
+    const report = this.rows !== null
+      ? this.addToView(triples)
+      : this.addToRoot(triples);
+    this.metrics?.end("add", frame!);
+    return report;
+  }
+
+  private addToRoot(triples: Triple[]): AddReport {
+    const firstRow = this.store.rowCount;
     let added = 0;
     for (const triple of triples) {
       if (this.store.addTriple(triple)) {
@@ -206,30 +621,141 @@ export class TribbleDB {
       }
     }
 
+    if (added > 0 && (this.wal !== null || this.materialized !== null)) {
+      const rows: number[] = [];
+      for (let row = firstRow; row < this.store.rowCount; row++) {
+        rows.push(row);
+      }
+      this.wal?.record(LOG_ADD, this.store, rows);
+      this.materialized?.forEach((view) => view.rowsAdded(rows));
+    }
     return { added, duplicates: triples.length - added };
   }
 
+  /*
+   * Rows a view adds go to its delta. Row-sets are never mutated in
+   * place, as search results, clones and cache entries share them.
+   */
+  private addToView(triples: Triple[]): AddReport {
+    const rows = this.rows!;
+    const added = new RowBitmap();
+
+    for (const triple of triples) {
+      const sourceId = this.store.internNode(triple[0]);
+      const relationId = this.store.relationNames.intern(triple[1]);
+      const targetId = this.store.internNode(triple[2]);
+
+      if (
+        this.store.rowIn(rows, sourceId, relationId, targetId) !== undefined
+      ) {
+        continue;
+      }
+      // an owned delta's live rows are exactly the ones its view sees
+      const delta = this.ownDelta().store;
+      if (delta.addRowByIds(sourceId, relationId, targetId)) {
+        added.add(delta.rowCount - 1);
+      }
+    }
+
+    if (added.size > 0) {
+      const { store, rows: deltaRows } = this.delta!;
+      this.delta = { store, rows: deltaRows.or(added) };
+      this.foldIfDue();
+    }
+    return { added: added.size, duplicates: triples.length - added.size };
+  }
+
   delete(triples: Triple[]): TribbleDB {
-    this.ensureOwned();
+    if (this.rows !== null) {
+      this.deleteFromView(triples);
+      return this;
+    }
 
+    const deleted: number[] = [];
     for (const triple of triples) {
-      this.store.deleteTriple(triple);
+      const row = this.store.deleteTriple(triple);
+      if (row !== undefined) {
+        deleted.push(row);
+      }
+    }
+    this.wal?.record(LOG_DELETE, this.store, deleted);
+    this.materialized?.forEach((view) => view.rowsDeleted(deleted));
+
+    if (this.autoCompact && this.dueForCompaction(this.autoCompact)) {
+      this.compact(this.autoCompact);
     }
     return this;
   }
 
+  /*
+   * Shared rows a view deletes just leave its row-set; rows it added are
+   * tombstoned in its delta, so adding them again appends afresh.
+   */
+  private deleteFromView(triples: Triple[]): void {
+    const removed = new RowBitmap();
+    const retired = new RowBitmap();
+
+    for (const triple of triples) {
+      const ids = this.idsOf(triple);
+      if (ids === undefined) {
+        continue;
+      }
+
+      const row = this.store.rowIn(this.rows!, ...ids);
+      if (row !== undefined) {
+        removed.add(row);
+      } else if (
+        this.delta !== null &&
+        this.delta.store.rowIn(this.delta.rows, ...ids) !== undefined
+      ) {
+        retired.add(this.ownDelta().store.deleteTriple(triple)!);
+      }
+    }
+
+    if (removed.size > 0) {
+      this.rows = this.rows!.andNot(removed);
+    }
+    if (retired.size > 0) {
+      const { store, rows } = this.delta!;
+      this.delta = { store, rows: rows.andNot(retired) };
+    }
+  }
+
+  private dueForCompaction(policy: CompactionPolicy): boolean {
+    const tombstones = this.store.deletedRows.size;
+    return tombstones >= (policy.minTombstones ?? 1) &&
+      tombstones > policy.tombstoneRatio * this.store.rowCount;
+  }
+
   triples(): Triple[] {
     const result: Triple[] = [];
-    for (const row of this.visibleRows()) {
-      result.push(this.store.resolveRow(row));
+    for (const layer of this.layers()) {
+      for (const row of visibleRowsOf(layer)) {
+        result.push(layer.store.resolveRow(row));
+      }
     }
     return result;
   }
 
-  private uniqueTerms(column: number[]): Set<string> {
+  /*
+   * As triples(), resolving each triple only when it is pulled, so a
+   * large result can be streamed or abandoned part way.
+   */
+  *iterTriples(): Generator<Triple> {
+    for (const layer of this.layers()) {
+      for (const row of visibleRowsOf(layer)) {
+        yield layer.store.resolveRow(row);
+      }
+    }
+  }
+
+  private uniqueTerms(column: "sourceIds" | "targetIds"): Set<string> {
     const termIds = new Set<number>();
-    for (const row of this.visibleRows()) {
-      termIds.add(column[row]);
+    for (const layer of this.layers()) {
+      const ids = layer.store[column];
+      for (const row of visibleRowsOf(layer)) {
+        termIds.add(ids[row]);
+      }
     }
 
     const terms = new Set<string>();
@@ -240,13 +766,15 @@ export class TribbleDB {
   }
 
   sources(): Set<string> {
-    return this.uniqueTerms(this.store.sourceIds);
+    return this.uniqueTerms("sourceIds");
   }
 
   relations(): Set<string> {
     const relationIds = new Set<number>();
-    for (const row of this.visibleRows()) {
-      relationIds.add(this.store.relationIds[row]);
+    for (const layer of this.layers()) {
+      for (const row of visibleRowsOf(layer)) {
+        relationIds.add(layer.store.relationIds[row]);
+      }
     }
 
     const names = new Set<string>();
@@ -257,7 +785,7 @@ export class TribbleDB {
   }
 
   targets(): Set<string> {
-    return this.uniqueTerms(this.store.targetIds);
+    return this.uniqueTerms("targetIds");
   }
 
   /*
@@ -265,8 +793,10 @@ export class TribbleDB {
    * rather than returning undefined once row zero is deleted.
    */
   firstTriple(): Triple | undefined {
-    for (const row of this.visibleRows()) {
-      return this.store.resolveRow(row);
+    for (const layer of this.layers()) {
+      for (const row of visibleRowsOf(layer)) {
+        return layer.store.resolveRow(row);
+      }
     }
     return undefined;
   }
@@ -288,58 +818,117 @@ export class TribbleDB {
     let firstId: number | undefined = undefined;
     const obj: TripleObject = {};
 
-    for (const row of this.visibleRows()) {
-      const sourceId = this.store.sourceIds[row];
+    for (const { store, rows } of this.layers()) {
+      for (const row of visibleRowsOf({ store, rows })) {
+        const sourceId = store.sourceIds[row];
 
-      if (firstId === undefined) {
-        firstId = sourceId;
-        obj.id = this.store.nodes.valueOf(sourceId);
-      }
-      if (sourceId !== firstId) {
-        continue;
-      }
+        if (firstId === undefined) {
+          firstId = sourceId;
+          obj.id = store.nodes.valueOf(sourceId);
+        }
+        if (sourceId !== firstId) {
+          continue;
+        }
 
-      accumulateRelation(
-        obj,
-        this.store.relationNames.valueOf(this.store.relationIds[row]),
-        this.store.nodes.valueOf(this.store.targetIds[row]),
-        arrays,
-      );
+        accumulateRelation(
+          obj,
+          store.relationNames.valueOf(store.relationIds[row]),
+          store.nodes.valueOf(store.targetIds[row]),
+          arrays,
+        );
+      }
     }
 
     return firstId === undefined ? undefined : obj;
   }
 
   objects(opts: boolean | ObjectOpts = false): TripleObject[] {
+    const frame = this.metrics?.start(this.store);
     const arrays = wantsArrays(opts);
     const objs = new Map<number, TripleObject>();
 
-    for (const row of this.visibleRows()) {
-      const sourceId = this.store.sourceIds[row];
+    for (const { store, rows } of this.layers()) {
+      for (const row of visibleRowsOf({ store, rows })) {
+        const sourceId = store.sourceIds[row];
 
-      let obj = objs.get(sourceId);
-      if (!obj) {
-        obj = { id: this.store.nodes.valueOf(sourceId) };
-        objs.set(sourceId, obj);
-      }
+        let obj = objs.get(sourceId);
+        if (!obj) {
+          obj = { id: store.nodes.valueOf(sourceId) };
+          objs.set(sourceId, obj);
+        }
 
-      accumulateRelation(
-        obj,
-        this.store.relationNames.valueOf(this.store.relationIds[row]),
-        this.store.nodes.valueOf(this.store.targetIds[row]),
-        arrays,
-      );
+        accumulateRelation(
+          obj,
+          store.relationNames.valueOf(store.relationIds[row]),
+          store.nodes.valueOf(store.targetIds[row]),
+          arrays,
+        );
+      }
     }
 
+    this.metrics?.end("objects", frame!);
     return Array.from(objs.values());
   }
 
+  /*
+   * As objects(), one object at a time: each source is materialised from
+   * its own postings when its first row is reached, so only the sources
+   * already emitted are held, not the objects.
+   */
+  *iterObjects(opts: boolean | ObjectOpts = false): Generator<TripleObject> {
+    const arrays = wantsArrays(opts);
+    const emitted = new Set<number>();
+    const layers = this.layers();
+
+    for (let depth = 0; depth < layers.length; depth++) {
+      const layer = layers[depth];
+      for (const row of visibleRowsOf(layer)) {
+        const sourceId = layer.store.sourceIds[row];
+        if (emitted.has(sourceId)) {
+          continue;
+        }
+        emitted.add(sourceId);
+        yield this.objectOf(sourceId, layers.slice(depth), row, arrays);
+      }
+    }
+  }
+
+  /*
+   * One source's object from its visible rows in `layers`, starting at
+   * `firstRow` of the first: earlier rows are not visible, or the source
+   * would have been reached sooner.
+   */
+  private objectOf(
+    sourceId: number,
+    layers: StoreLayer[],
+    firstRow: number,
+    arrays: boolean,
+  ): TripleObject {
+    const obj: TripleObject = { id: this.store.nodes.valueOf(sourceId) };
+
+    layers.forEach((layer, depth) => {
+      const { store } = layer;
+      for (const row of store.rowsBySource.get(sourceId) ?? []) {
+        if ((depth === 0 && row < firstRow) || !isVisibleIn(layer, row)) {
+          continue;
+        }
+        accumulateRelation(
+          obj,
+          store.relationNames.valueOf(store.relationIds[row]),
+          store.nodes.valueOf(store.targetIds[row]),
+          arrays,
+        );
+      }
+    });
+    return obj;
+  }
+
   map(fnc: (triple: Triple) => Triple): TribbleDB {
-    return new TribbleDB(this.triples().map(fnc));
+    return new TribbleDB(this.triples().map(fnc), {}, this.storeOpts());
   }
 
   flatMap(fnc: (triple: Triple) => Triple[]): TribbleDB {
-    return new TribbleDB(this.triples().flatMap(fnc));
+    return new TribbleDB(this.triples().flatMap(fnc), {}, this.storeOpts());
   }
 
   deduplicateTriples(triples: Triple[]): Triple[] {
@@ -366,102 +955,226 @@ export class TribbleDB {
   }
 
   mergedWith(other: TribbleDB): TribbleDB {
-    const combined = new TribbleDB(this.triples(), this.validations);
+    const combined = new TribbleDB(
+      this.triples(),
+      this.validations,
+      this.storeOpts(),
+    );
     combined.add(other.triples());
     return combined;
   }
 
+  /*
+   * An independent copy, as a view over this database's store and delta:
+   * O(rows) bits to build, and mutations on either side stay invisible to
+   * the other.
+   */
   clone(): TribbleDB {
-    return new TribbleDB(this.triples(), this.validations);
+    return TribbleDB.view(this, this.rows ?? this.store.liveRows());
   }
 
-  private rowsForUrn(urn: string, ignoreQs: boolean): number[] {
-    let candidate: Set<number> | undefined;
-
+  /*
+   * The node ids a readThing() URN names: the exact node, or with
+   * ignoreQs every node sharing its type and id.
+   */
+  private nodesForUrn(urn: string, ignoreQs: boolean): number[] {
     if (!ignoreQs) {
       const nodeId = this.store.nodes.idOf(urn);
-      candidate = nodeId === undefined
-        ? undefined
-        : this.store.rowsBySource.get(nodeId);
-    } else {
-      const { type, id } = asUrn(urn);
-      const typeId = this.store.nodes.idOf(type);
-      const idId = this.store.nodes.idOf(id);
-
-      const typeNodes = typeId === undefined
-        ? undefined
-        : this.store.nodesByType.get(typeId);
-      const idNodes = idId === undefined
-        ? undefined
-        : this.store.nodesById.get(idId);
-
-      if (typeNodes && idNodes) {
-        candidate = new Set<number>();
-        const [small, large] = typeNodes.size <= idNodes.size
-          ? [typeNodes, idNodes]
-          : [idNodes, typeNodes];
-
-        for (const nodeId of small) {
-          if (!large.has(nodeId)) {
-            continue;
-          }
-          const nodeRows = this.store.rowsBySource.get(nodeId);
-          if (nodeRows) {
-            for (const row of nodeRows) {
-              candidate.add(row);
-            }
-          }
-        }
-      }
+      return nodeId === undefined ? [] : [nodeId];
+    }
+
+    const { type, id } = asUrn(urn);
+    const typeId = this.store.nodes.idOf(type);
+    const idId = this.store.nodes.idOf(id);
+    if (typeId === undefined || idId === undefined) {
+      return [];
     }
 
-    if (!candidate) {
+    const typeNodes = this.store.nodesByType.get(typeId);
+    const idNodes = this.store.nodesById.get(idId);
+    if (!typeNodes || !idNodes) {
       return [];
     }
 
-    const visible: number[] = [];
-    for (const row of candidate) {
-      if (this.rows !== null ? this.rows.has(row) : this.store.isAlive(row)) {
-        visible.push(row);
+    const [small, large] = typeNodes.size <= idNodes.size
+      ? [typeNodes, idNodes]
+      : [idNodes, typeNodes];
+
+    const nodeIds: number[] = [];
+    for (const nodeId of small) {
+      if (large.has(nodeId)) {
+        nodeIds.push(nodeId);
       }
     }
-    return visible.sort((rowA, rowB) => rowA - rowB);
+    return nodeIds;
   }
 
   /*
-   * Indexed point read: O(degree of the node), not O(triples).
+   * Relation ids a `relations` projection keeps; null keeps every
+   * relation. Names this store has never seen are dropped.
    */
-  readThing(urn: string, opts: ReadOpts = {}): TripleObject | undefined {
-    const rows = this.rowsForUrn(urn, wantsIgnoreQs(opts));
-    if (rows.length === 0) {
+  private projectionOf(opts: ReadOpts): Set<number> | null {
+    if (opts.relations === undefined) {
+      return null;
+    }
+
+    const relationIds = new Set<number>();
+    for (const relation of opts.relations) {
+      const relationId = this.store.relationNames.idOf(relation);
+      if (relationId !== undefined) {
+        relationIds.add(relationId);
+      }
+    }
+    return relationIds;
+  }
+
+  /*
+   * Materialise one thing from its nodes' source postings: visible rows
+   * in row order, the id taken from the first, and strings decoded only
+   * for the projected relations.
+   */
+  private thingOf(
+    urn: string,
+    ignoreQs: boolean,
+    projection: Set<number> | null,
+  ): TripleObject | undefined {
+    const nodeIds = this.nodesForUrn(urn, ignoreQs);
+    const layers = this.layers();
+
+    let idStore: TripleStore | undefined;
+    let firstRow = -1;
+    const projected: number[][] = [];
+    let matched = 0;
+    let scanned = 0;
+    let lists = 0;
+    let tombstones = 0;
+
+    for (const { store, rows: viewRows } of layers) {
+      const deletedRows = store.deletedRows;
+      const relationIds = store.relationIds;
+      const layerRows: number[] = [];
+      let layerFirst = -1;
+
+      for (const nodeId of nodeIds) {
+        const nodeRows = store.rowsBySource.get(nodeId);
+        if (!nodeRows) {
+          continue;
+        }
+        lists++;
+        scanned += nodeRows.size;
+
+        for (const row of nodeRows) {
+          const visible = viewRows !== null
+            ? viewRows.has(row)
+            : !deletedRows.has(row);
+          if (!visible) {
+            tombstones += viewRows === null ? 1 : 0;
+            continue;
+          }
+
+          if (layerFirst === -1 || row < layerFirst) {
+            layerFirst = row;
+          }
+          if (projection === null || projection.has(relationIds[row])) {
+            layerRows.push(row);
+          }
+        }
+      }
+
+      // one node's postings are already ascending
+      if (nodeIds.length > 1) {
+        layerRows.sort((rowA, rowB) => rowA - rowB);
+      }
+      if (idStore === undefined && layerFirst !== -1) {
+        idStore = store;
+        firstRow = layerFirst;
+      }
+      projected.push(layerRows);
+      matched += layerRows.length;
+    }
+
+    const counters = this.metrics?.counters;
+    if (counters) {
+      counters.rowsScanned += scanned;
+      counters.rowsMatched += matched;
+      counters.postingListsTouched += lists;
+      counters.tombstonesSkipped += tombstones;
+    }
+
+    if (idStore === undefined) {
       return undefined;
     }
 
     const obj: TripleObject = {
-      id: this.store.nodes.valueOf(this.store.sourceIds[rows[0]]),
+      id: this.store.nodes.valueOf(idStore.sourceIds[firstRow]),
     };
+    layers.forEach(({ store }, depth) => {
+      for (const row of projected[depth]) {
+        accumulateRelation(
+          obj,
+          store.relationNames.valueOf(store.relationIds[row]),
+          store.nodes.valueOf(store.targetIds[row]),
+          false,
+          false,
+        );
+      }
+    });
+    return obj;
+  }
 
-    for (const row of rows) {
-      accumulateRelation(
-        obj,
-        this.store.relationNames.valueOf(this.store.relationIds[row]),
-        this.store.nodes.valueOf(this.store.targetIds[row]),
-        false,
-        false,
-      );
+  /*
+   * Indexed point read: O(degree of the node), not O(triples). With
+   * `relations`, only those relations (and the id) are materialised.
+   */
+  readThing(urn: string, opts: ReadOpts = {}): TripleObject | undefined {
+    const started = this.trace === null ? 0 : performance.now();
+    const frame = this.metrics?.start(this.store);
+    const thing = this.cachedThing(urn, opts);
+    this.metrics?.end("readThing", frame!);
+    this.trace?.readThing(urn, opts, performance.now() - started);
+    return thing;
+  }
+
+  private cachedThing(
+    urn: string,
+    opts: ReadOpts,
+  ): TripleObject | undefined {
+    const ignoreQs = wantsIgnoreQs(opts);
+    // the cache is stamped with the shared store alone, so it cannot tell
+    // when a delta changes
+    if (this.cache === null || this.delta !== null) {
+      return this.thingOf(urn, ignoreQs, this.projectionOf(opts));
     }
 
-    return obj;
+    const projected = opts.relations?.join(TRIPLE_KEY_SEPARATOR) ?? "*";
+    const key = this.cache.scopedKey(
+      this.rows,
+      `thing|${ignoreQs}|${projected}|${urn}`,
+    );
+    let thing = this.cache.get(this.store, key) as TripleObject | null;
+    if (thing === undefined) {
+      thing = this.thingOf(urn, ignoreQs, this.projectionOf(opts)) ?? null;
+      this.cache.set(this.store, key, thing);
+    }
+    return thing === null ? undefined : copyThing(thing);
   }
 
+  /*
+   * Batched point reads, in URN order, skipping URNs with no visible
+   * triples. The options and the projection are resolved once for the
+   * batch, and reads bypass the result cache: a page of thousands of
+   * URNs would only evict it.
+   */
   readThings(
     urns: Set<string> | string[],
     opts: ReadOpts = {},
   ): TripleObject[] {
+    const ignoreQs = wantsIgnoreQs(opts);
+    const projection = this.projectionOf(opts);
     const results: TripleObject[] = [];
 
     for (const urn of urns) {
-      const thing = this.readThing(urn, opts);
+      const thing = this.thingOf(urn, ignoreQs, projection);
       if (thing !== undefined) {
         results.push(thing);
       }
@@ -485,8 +1198,8 @@ export class TribbleDB {
   ): Parsed[] {
     const results: Parsed[] = [];
 
-    for (const urn of urns) {
-      const res = this.parseThing(parser, urn, opts);
+    for (const thing of this.readThings(urns, opts)) {
+      const res = parser(thing);
       if (res) {
         results.push(res);
       }
@@ -496,26 +1209,269 @@ export class TribbleDB {
 
   /*
    * Search over this database or view. Returns a view sharing the store;
-   * cost is proportional to the matches, not the database size.
+   * cost is proportional to the matches, not the database size. With a
+   * `page`, the scan stops once the page is full.
    */
-  search(params: Search): TribbleDB {
-    const parsed = parseSearch(params);
-    const matched = executeSearch(this.store, parsed, this.rows);
-    return TribbleDB.view(this.store, matched, this.validations);
+  search(
+    params: RangeSearch | PreparedSearch,
+    page: SearchPage = {},
+  ): TribbleDB {
+    const started = this.trace === null ? 0 : performance.now();
+    const frame = this.metrics?.start(this.store);
+    const matched = this.matches(this.planOf(params), windowOf(page));
+    this.metrics?.end("search", frame!);
+    this.trace?.searched(
+      params instanceof PreparedSearch ? params.params : params,
+      page,
+      performance.now() - started,
+    );
+    return matched;
   }
 
   /*
-   * Search for matching triples and apply a transformation in place.
+   * search() with the predicate pass spread over a worker pool, for large
+   * predicate-heavy searches. Predicates are given as PredicateRefs; the
+   * result is the view search() gives with the referenced functions.
+   */
+  async searchParallel(
+    params: ParallelSearch,
+    pool: SearchWorkerPool,
+  ): Promise<TribbleDB> {
+    const store = this.store;
+    const delta = this.delta;
+    const { search, refs } = splitPredicates(params);
+    const candidates = this.runPlan(new SearchPlan(parseSearch(search)));
+    const matched = await pool.filter(store, candidates, refs);
+
+    // compaction renumbered the rows while the workers ran
+    if (this.store !== store) {
+      return this.search(await resolvePredicates(params));
+    }
+    if (delta === null) {
+      return TribbleDB.view(this, matched, null);
+    }
+
+    // a delta is small, so its rows are filtered on this thread
+    const plan = new SearchPlan(parseSearch(await resolvePredicates(params)));
+    return TribbleDB.view(this, matched, {
+      store: delta.store,
+      rows: plan.execute(delta.store, delta.rows),
+    });
+  }
+
+  /*
+   * A cursor for the last triple in this database or view: pass it as
+   * `after` to continue a paged search from there. Undefined when empty.
+   */
+  cursor(): string | undefined {
+    const lastAdded = this.delta?.rows.max();
+    if (lastAdded !== undefined) {
+      return encodeCursor(DELTA_CURSOR_START + lastAdded);
+    }
+    if (this.rows !== null) {
+      const last = this.rows.max();
+      return last === undefined ? undefined : encodeCursor(last);
+    }
+
+    for (let row = this.store.rowCount - 1; row >= 0; row--) {
+      if (this.store.isAlive(row)) {
+        return encodeCursor(row);
+      }
+    }
+    return undefined;
+  }
+
+  /*
+   * Parse and compile a search once, for repeated runs. Each run resolves
+   * its constraints against the current store, so the plan stays correct
+   * as this database changes.
+   */
+  prepare(params: RangeSearch): PreparedSearch {
+    return new PreparedSearch(
+      this,
+      new SearchPlan(parseSearch(params)),
+      params,
+    );
+  }
+
+  /*
+   * Run a search and report how it executed: the stages in order (the
+   * first drives the scan), estimated vs actual rows per stage, the
+   * time spent per phase, and the predicate calls the memo saved.
+   */
+  explain(
+    params: RangeSearch | PreparedSearch,
+    page: SearchPage = {},
+  ): SearchExplanation {
+    const report = emptyReport();
+    this.matches(this.planOf(params), windowOf(page), report);
+    return report;
+  }
+
+  private planOf(params: RangeSearch | PreparedSearch): SearchPlan {
+    return params instanceof PreparedSearch
+      ? params.plan
+      : new SearchPlan(parseSearch(params));
+  }
+
+  /*
+   * A plan's matches, as a view. A view's delta is searched after the
+   * shared rows, whose rows it follows: a page takes delta rows once the
+   * shared matches run out, and a delta row's cursor skips the shared
+   * rows entirely. With a `report`, the layers' reports are summed into
+   * it and the result cache is bypassed.
    */
-  searchFlatmap(search: Search, fnc: (triple: Triple) => Triple[]): TribbleDB {
-    const parsed = parseSearch(search);
-    const matchedRows = executeSearch(this.store, parsed, this.rows);
+  private matches(
+    plan: SearchPlan,
+    window?: RowWindow,
+    report?: SearchExplanation,
+  ): TribbleDB {
+    const pastShared = window !== undefined &&
+      window.after >= DELTA_CURSOR_START;
+    const runShared = (sharedWindow?: RowWindow) => {
+      if (pastShared) {
+        return new RowBitmap();
+      }
+      return report
+        ? plan.execute(this.store, this.rows, report, sharedWindow)
+        : this.runPlan(plan, sharedWindow);
+    };
 
-    const matchingTriples: Triple[] = [];
-    for (const row of matchedRows) {
-      matchingTriples.push(this.store.resolveRow(row));
+    const delta = this.delta;
+    if (delta === null) {
+      return TribbleDB.view(this, runShared(window), null);
+    }
+
+    let shared: RowBitmap;
+    let deltaWindow: RowWindow | undefined;
+    if (window === undefined) {
+      shared = runShared();
+    } else {
+      // the shared page keeps the rows the offset skips, so the delta's
+      // page knows how many are left to skip
+      const page = runShared({
+        after: window.after,
+        offset: 0,
+        limit: window.offset + window.limit,
+      });
+      const skipped = Math.min(window.offset, page.size);
+      shared = withoutFirst(page, skipped);
+      deltaWindow = {
+        after: pastShared ? window.after - DELTA_CURSOR_START : -1,
+        offset: window.offset - skipped,
+        limit: window.limit - shared.size,
+      };
     }
 
+    let added = new RowBitmap();
+    if (deltaWindow === undefined || deltaWindow.limit > 0) {
+      const layerReport = report && emptyReport();
+      added = plan.execute(
+        delta.store,
+        delta.rows,
+        layerReport,
+        deltaWindow,
+        this.metrics?.counters,
+      );
+      if (report) {
+        addReport(report, layerReport!);
+      }
+    }
+    return TribbleDB.view(this, shared, { store: delta.store, rows: added });
+  }
+
+  private runPlan(plan: SearchPlan, window?: RowWindow): RowBitmap {
+    const counters = this.metrics?.counters;
+    if (this.cache === null || plan.cacheKey === undefined) {
+      return plan.execute(this.store, this.rows, undefined, window, counters);
+    }
+
+    const windowKey = window === undefined
+      ? ""
+      : `|${window.after},${window.offset},${window.limit}`;
+    const key = this.cache.scopedKey(
+      this.rows,
+      `search|${plan.cacheKey}${windowKey}`,
+    );
+    let matched = this.cache.get(this.store, key) as RowBitmap | undefined;
+    if (matched === undefined) {
+      matched = plan.execute(
+        this.store,
+        this.rows,
+        undefined,
+        window,
+        counters,
+      );
+      this.cache.set(this.store, key, matched);
+    }
+    return matched;
+  }
+
+  /*
+   * A live result for a search on a root database. Each add() and
+   * delete() updates it at the cost of the rows they change, instead of
+   * the search being re-run; `onChange` hears of each change to it. See
+   * materialize.ts.
+   */
+  materialize(
+    search: RangeSearch | PreparedSearch,
+    onChange?: (change: ViewChange) => void,
+  ): MaterializedView {
+    if (this.rows !== null) {
+      throw new Error("materialize() needs a root database, not a view");
+    }
+
+    const materialized = this.materialized ??= new Set();
+    const view = new MaterializedView(
+      this.planOf(search),
+      this.store,
+      onChange,
+      (rows) => TribbleDB.view(this, rows),
+      (closed) => materialized.delete(closed),
+    );
+    materialized.add(view);
+    return view;
+  }
+
+  /*
+   * Solve a conjunction of triple patterns with variables, e.g.
+   * [["?photo", "subject", bird], ["?photo", "location", "?place"]].
+   * Returns one bindings object per solution. Patterns are joined in the
+   * store over interned ids, most selective first; see match.ts.
+   */
+  match(patterns: TriplePattern[]): Bindings[] {
+    return matchPatterns(this.layers(), patterns);
+  }
+
+  /*
+   * Counts for a faceted listing: triples per relation, source or target,
+   * or distinct source/target nodes per URN type, over this database or
+   * the matches of `within`. Computed from posting lists and id columns;
+   * only the facet keys are decoded. With `top`, the K largest counts,
+   * largest first.
+   */
+  facets(opts: FacetOpts): Map<string, number> {
+    const scope = opts.within === undefined
+      ? this
+      : this.matches(this.planOf(opts.within));
+    return countFacets(scope.layers(), opts.by, opts.top);
+  }
+
+  /*
+   * Result cache counters, or undefined when caching is off.
+   */
+  cacheStats(): CacheStats | undefined {
+    return this.cache?.stats();
+  }
+
+  /*
+   * Search for matching triples and apply a transformation in place.
+   */
+  searchFlatmap(
+    search: RangeSearch | PreparedSearch,
+    fnc: (triple: Triple) => Triple[],
+  ): TribbleDB {
+    const matchingTriples = this.matches(this.planOf(search)).triples();
     const transformed = matchingTriples.flatMap(fnc);
 
     const originalKeys = new Set(matchingTriples.map(tripleKey));
@@ -554,29 +1510,170 @@ export class TribbleDB {
   }
 
   /*
-   * Rebuild the store without tombstones. Views created earlier keep
-   * their own snapshot semantics only if not shared with this database's
-   * new store, so compaction is explicit rather than automatic.
+   * Is there a path from one node to another? See shortestPath().
+   */
+  reachable(
+    from: string,
+    to: string,
+    relations?: string | string[],
+    opts: PathOpts = {},
+  ): boolean {
+    return this.shortestPath(from, to, relations, opts) !== undefined;
+  }
+
+  /*
+   * The URNs along a shortest path from one node to another, following
+   * the relations forward, or undefined when there is none within
+   * `maxDepth` hops. A node reaches itself by the empty path, [from].
+   * Searches from both ends at once, so the cost grows with the
+   * neighbourhoods of half the path length rather than the whole.
+   */
+  shortestPath(
+    from: string,
+    to: string,
+    relations?: string | string[],
+    opts: PathOpts = {},
+  ): string[] | undefined {
+    const visibility = this.visibility();
+    const fromId = this.store.nodes.idOf(from);
+    const toId = this.store.nodes.idOf(to);
+    if (
+      fromId === undefined || toId === undefined ||
+      !this.store.nodeMeta.has(fromId) || !this.store.nodeMeta.has(toId)
+    ) {
+      return undefined;
+    }
+
+    const path = shortestPath(
+      visibility,
+      fromId,
+      toId,
+      resolveRelationIds(this.store, relations),
+      opts.maxDepth,
+    );
+    return path?.map((nodeId) => this.store.nodes.valueOf(nodeId));
+  }
+
+  /*
+   * Rebuild the store without tombstones, directly from interned ids.
+   * With `pruneStrings`, interned strings no live triple references are
+   * dropped too. Views created earlier keep the old store, so they are
+   * unaffected. Runs automatically after delete() when the database was
+   * created with an `autoCompact` policy.
    */
-  compact(): TribbleDB {
+  compact(opts: CompactOpts = {}): TribbleDB {
     if (this.rows !== null) {
-      this.ensureOwned();
+      this.fold();
       return this;
     }
 
-    if (this.store.deletedRows.size === 0) {
+    if (this.store.deletedRows.size === 0 && !opts.pruneStrings) {
       return this;
     }
 
-    const compacted = new TripleStore();
-    for (const triple of this.triples()) {
-      compacted.addTriple(triple);
-    }
-    this.store = compacted;
+    this.store = this.store.compacted(undefined, opts);
+    this.materialized?.forEach((view) => view.rebuild(this.store));
     return this;
   }
 
+  /*
+   * Serialise to the binary snapshot format. A root database is written
+   * as-is, tombstones included; a view is written as its visible rows.
+   */
+  toSnapshot(): Uint8Array {
+    if (this.rows === null) {
+      return writeSnapshot(this.store);
+    }
+    return writeSnapshot(this.flattened());
+  }
+
+  /*
+   * A view's visible rows, from both layers, as a store of their own.
+   */
+  private flattened(): TripleStore {
+    return this.store.compacted(
+      this.rows!,
+      { pruneStrings: true },
+      this.delta ?? undefined,
+    );
+  }
+
+  /*
+   * Stream the visible triples to `writable` as tribble text, loadable by
+   * fromTribbleLines() and fromTribbleStream(). Lines are encoded from
+   * interned ids into one reused buffer (see writer.ts) and each chunk
+   * written is a copy, so sinks may keep them; the stream is left open.
+   * A view with added rows is written from a compacted copy.
+   */
+  toTribble(
+    writable: WritableStream<Uint8Array>,
+    opts: TribbleExportOpts = {},
+  ): Promise<void> {
+    if (this.delta !== null) {
+      return writeTribble(this.flattened(), null, writable, opts);
+    }
+    return writeTribble(this.store, this.rows, writable, opts);
+  }
+
+  /*
+   * Resolves once every mutation so far is committed to a durable
+   * database's log, under its fsync policy; rejects with the first log
+   * failure since the last flush(), checkpoint() or close().
+   */
+  async flush(): Promise<void> {
+    await this.wal?.flush();
+  }
+
+  /*
+   * Write a durable database's snapshot and truncate its log.
+   */
+  async checkpoint(): Promise<void> {
+    if (this.wal === null) {
+      throw new Error("checkpoint() needs a database opened by openDurable()");
+    }
+    await this.wal.checkpoint();
+  }
+
+  /*
+   * Flush and sync a durable database's log, and stop logging: later
+   * mutations are in memory only.
+   */
+  async close(): Promise<void> {
+    const wal = this.wal;
+    this.wal = null;
+    await wal?.close();
+  }
+
   get triplesCount(): number {
-    return this.rows !== null ? this.rows.size : this.store.aliveCount;
+    if (this.rows === null) {
+      return this.store.aliveCount;
+    }
+    return this.rows.size + (this.delta?.rows.size ?? 0);
+  }
+}
+
+/*
+ * A search parsed and compiled once by TribbleDB.prepare(). run() and
+ * explain() evaluate it against the database it was prepared on, as that
+ * database is now; any database's search() also accepts it.
+ */
+export class PreparedSearch {
+  readonly plan: SearchPlan;
+  // as given to prepare(), for query traces
+  readonly params: RangeSearch;
+  #db: TribbleDB;
+
+  constructor(db: TribbleDB, plan: SearchPlan, params: RangeSearch) {
+    this.#db = db;
+    this.plan = plan;
+    this.params = params;
+  }
+
+  run(page: SearchPage = {}): TribbleDB {
+    return this.#db.search(this, page);
+  }
+
+  explain(page: SearchPage = {}): SearchExplanation {
+    return this.#db.explain(this, page);
   }
 }
@@ -0,0 +1,118 @@
+/*
+ * Facet tests: counts must equal counting materialised triples, over
+ * roots with tombstones, views with overlays and searches, and top-K
+ * must agree with a full sort.
+ */
+
+import { assertEquals, assertThrows } from "@std/assert";
+import { TribbleDB } from "./mod.ts";
+import type { FacetKey, StoreBackend } from "./mod.ts";
+import type { Triple } from "../types.ts";
+import { asUrn } from "../urn.ts";
+
+function fixture(): Triple[] {
+  const triples: Triple[] = [];
+  for (let idx = 0; idx < 80; idx++) {
+    const photo = `urn:ró:photo:x${idx}`;
+    triples.push([photo, "location", `urn:ró:place:p${idx % 7}`]);
+    triples.push([photo, "rating", String(idx % 5)]);
+    if (idx % 3 === 0) {
+      triples.push([photo, "subject", `urn:ró:bird:b${idx % 4}`]);
+    }
+  }
+  triples.push(["urn:ró:place:p1", "in", "urn:ró:country:ie"]);
+  return triples;
+}
+
+/*
+ * Reference semantics: count over the triples themselves.
+ */
+function naiveFacets(triples: Triple[], by: FacetKey): Map<string, number> {
+  const counts = new Map<string, number>();
+  const seen = new Set<string>();
+
+  for (const [source, relation, target] of triples) {
+    let key: string;
+    if (by === "source.type" || by === "target.type") {
+      const node = by === "source.type" ? source : target;
+      if (seen.has(node)) {
+        continue;
+      }
+      seen.add(node);
+      key = asUrn(node).type;
+    } else {
+      key = by === "relation" ? relation : by === "source" ? source : target;
+    }
+    counts.set(key, (counts.get(key) ?? 0) + 1);
+  }
+  return counts;
+}
+
+function sortedEntries(counts: Map<string, number>): [string, number][] {
+  return [...counts].sort(([keyA], [keyB]) => keyA < keyB ? -1 : 1);
+}
+
+const KEYS: FacetKey[] = [
+  "relation",
+  "source",
+  "target",
+  "source.type",
+  "target.type",
+];
+
+Deno.test("facets: counts equal counting the triples", () => {
+  for (const backend of ["typed", "bitmap", "map"] as StoreBackend[]) {
+    const db = new TribbleDB(fixture(), {}, { backend });
+    db.delete([
+      ["urn:ró:photo:x3", "subject", "urn:ró:bird:b3"],
+      ["urn:ró:photo:x0", "location", "urn:ró:place:p0"],
+      ["urn:ró:place:p1", "in", "urn:ró:country:ie"],
+    ]);
+    const view = db.search({ relation: ["location", "subject"] });
+    view.add([["urn:ró:photo:x99", "subject", "urn:ró:bird:b9"]]);
+    view.delete([["urn:ró:photo:x1", "location", "urn:ró:place:p1"]]);
+
+    for (const source of [db, view]) {
+      for (const by of KEYS) {
+        assertEquals(
+          sortedEntries(source.facets({ by })),
+          sortedEntries(naiveFacets(source.triples(), by)),
+        );
+
+        const within = { target: { type: "place" } };
+        assertEquals(
+          sortedEntries(source.facets({ by, within })),
+          sortedEntries(naiveFacets(source.search(within).triples(), by)),
+        );
+      }
+    }
+  }
+});
+
+Deno.test("facets: top-K keeps the largest counts, largest first", () => {
+  const db = new TribbleDB(fixture());
+
+  assertEquals(
+    [...db.facets({ by: "target", within: { relation: "location" }, top: 3 })],
+    [
+      ["urn:ró:place:p0", 12],
+      ["urn:ró:place:p1", 12],
+      ["urn:ró:place:p2", 12],
+    ],
+  );
+
+  for (const by of KEYS) {
+    const full = [...db.facets({ by })]
+      .sort(([, countA], [, countB]) => countB - countA);
+    for (const top of [0, 1, 4, 1000]) {
+      const counts = [...db.facets({ by, top })].map(([, count]) => count);
+      assertEquals(counts, full.slice(0, top).map(([, count]) => count));
+    }
+  }
+});
+
+Deno.test("facets: bad options are rejected", () => {
+  const db = new TribbleDB(fixture());
+  assertThrows(() => db.facets({ by: "colour" as FacetKey }));
+  assertThrows(() => db.facets({ by: "relation", top: -1 }));
+});
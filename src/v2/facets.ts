@@ -0,0 +1,232 @@
+/*
+ * Facet counts for TribbleDB.facets(), read off posting lists and id
+ * columns. No row is resolved to a triple, and the only strings decoded
+ * are the facet keys returned.
+ *
+ * By relation, source or target, a facet counts triples. Over a root's
+ * live rows the counts are posting-list sizes, less the tombstoned rows
+ * in each list, so they cost O(keys + tombstones) whatever the size of
+ * the database. Over a row-set (a view, or the matches of a search) each
+ * row adds one to its key, read from the id column.
+ *
+ * By source.type or target.type, a facet counts distinct nodes: the
+ * nodes of each type with a visible triple in that position.
+ *
+ * A view's added rows are a second layer over the same ids, whose counts
+ * add to the first's; a node is counted once whichever layers hold it.
+ *
+ * With `top`, only the K largest counts are kept, in a K-entry min-heap,
+ * so the full key set is never sorted.
+ */
+
+import type { RowBitmap } from "./bitmap.ts";
+import type { IdColumn, StoreLayer, TripleStore } from "./store.ts";
+import type { PostingIndex } from "./postings.ts";
+import type { FacetKey } from "./types.ts";
+
+const FACET_KEYS: FacetKey[] = [
+  "relation",
+  "source",
+  "target",
+  "source.type",
+  "target.type",
+];
+
+/*
+ * Add triples per key id over a root's live rows, from posting-list
+ * sizes.
+ */
+function addLiveTriples(
+  counts: Uint32Array,
+  store: TripleStore,
+  postings: PostingIndex,
+  column: IdColumn,
+): void {
+  for (let key = 0; key < counts.length; key++) {
+    counts[key] += postings.get(key)?.size ?? 0;
+  }
+  store.deletedRows.forEach((row) => {
+    counts[column[row]]--;
+  });
+}
+
+function addRowTriples(
+  counts: Uint32Array,
+  rows: RowBitmap,
+  column: IdColumn,
+): void {
+  rows.forEach((row) => {
+    counts[column[row]]++;
+  });
+}
+
+/*
+ * Add distinct nodes per type id among the nodes with a visible row in
+ * one position, skipping and marking the nodes already `seen`.
+ */
+function addNodeTypes(
+  counts: Uint32Array,
+  seen: Uint8Array,
+  { store, rows }: StoreLayer,
+  isSource: boolean,
+): void {
+  const countNode = (nodeId: number) => {
+    if (seen[nodeId] === 0) {
+      seen[nodeId] = 1;
+      counts[store.nodeMeta.get(nodeId)!.typeId]++;
+    }
+  };
+
+  if (rows !== null) {
+    const column = isSource ? store.sourceIds : store.targetIds;
+    rows.forEach((row) => countNode(column[row]));
+    return;
+  }
+
+  const postings = isSource ? store.rowsBySource : store.rowsByTarget;
+  const hasTombstones = store.deletedRows.size > 0;
+
+  for (const nodeId of store.nodeMeta.keys()) {
+    const list = postings.get(nodeId);
+    if (!list) {
+      continue;
+    }
+
+    let visible = !hasTombstones;
+    if (!visible) {
+      for (const row of list) {
+        if (store.isAlive(row)) {
+          visible = true;
+          break;
+        }
+      }
+    }
+    if (visible) {
+      countNode(nodeId);
+    }
+  }
+}
+
+/*
+ * Key ids of the `top` largest counts, largest first; ties go to the
+ * earlier-interned key. A min-heap of the best so far keeps its weakest
+ * entry at the root, to be replaced by each better key.
+ */
+function topKeys(counts: Uint32Array, top: number): number[] {
+  const heap: number[] = [];
+  const weaker = (keyA: number, keyB: number) => {
+    return counts[keyA] < counts[keyB] ||
+      (counts[keyA] === counts[keyB] && keyA > keyB);
+  };
+
+  const siftDown = (start: number) => {
+    let idx = start;
+    while (true) {
+      const left = 2 * idx + 1;
+      const right = left + 1;
+      let weakest = idx;
+      if (left < heap.length && weaker(heap[left], heap[weakest])) {
+        weakest = left;
+      }
+      if (right < heap.length && weaker(heap[right], heap[weakest])) {
+        weakest = right;
+      }
+      if (weakest === idx) {
+        return;
+      }
+      [heap[idx], heap[weakest]] = [heap[weakest], heap[idx]];
+      idx = weakest;
+    }
+  };
+
+  for (let key = 0; key < counts.length; key++) {
+    if (counts[key] === 0) {
+      continue;
+    }
+
+    if (heap.length < top) {
+      heap.push(key);
+      for (let idx = heap.length - 1; idx > 0;) {
+        const parent = (idx - 1) >>> 1;
+        if (!weaker(heap[idx], heap[parent])) {
+          break;
+        }
+        [heap[idx], heap[parent]] = [heap[parent], heap[idx]];
+        idx = parent;
+      }
+    } else if (top > 0 && weaker(heap[0], key)) {
+      heap[0] = key;
+      siftDown(0);
+    }
+  }
+
+  return heap.sort((keyA, keyB) => weaker(keyA, keyB) ? 1 : -1);
+}
+
+/*
+ * Counts per facet key over the visible rows of `layers`, in key order,
+ * or the `top` largest in descending order. The layers share their
+ * string tables.
+ */
+export function countFacets(
+  layers: StoreLayer[],
+  by: FacetKey,
+  top?: number,
+): Map<string, number> {
+  if (!FACET_KEYS.includes(by)) {
+    throw new Error(`Unknown facet: ${JSON.stringify(by)}`);
+  }
+  if (top !== undefined && (!Number.isInteger(top) || top < 0)) {
+    throw new Error("Facet top must be a non-negative integer");
+  }
+
+  const { nodes, relationNames } = layers[0].store;
+  const counts = new Uint32Array(
+    by === "relation" ? relationNames.size : nodes.size,
+  );
+
+  if (by === "source.type" || by === "target.type") {
+    const seen = new Uint8Array(nodes.size);
+    for (const layer of layers) {
+      addNodeTypes(counts, seen, layer, by === "source.type");
+    }
+  } else {
+    for (const { store, rows } of layers) {
+      const column = by === "relation"
+        ? store.relationIds
+        : by === "source"
+        ? store.sourceIds
+        : store.targetIds;
+
+      if (rows !== null) {
+        addRowTriples(counts, rows, column);
+      } else {
+        const postings = by === "relation"
+          ? store.rowsByRelation
+          : by === "source"
+          ? store.rowsBySource
+          : store.rowsByTarget;
+        addLiveTriples(counts, store, postings, column);
+      }
+    }
+  }
+
+  const keyOf = by === "relation"
+    ? (key: number) => relationNames.valueOf(key)
+    : (key: number) => nodes.valueOf(key);
+
+  const result = new Map<string, number>();
+  if (top !== undefined) {
+    for (const key of topKeys(counts, top)) {
+      result.set(keyOf(key), counts[key]);
+    }
+    return result;
+  }
+
+  for (let key = 0; key < counts.length; key++) {
+    if (counts[key] > 0) {
+      result.set(keyOf(key), counts[key]);
+    }
+  }
+  return result;
+}
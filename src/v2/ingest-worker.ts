@@ -0,0 +1,86 @@
+/*
+ * Worker half of the parallel tribble loader. Parses one shard of the
+ * input into dictionary ids and declarations, in line order, without
+ * touching a store: the main thread replays the result into the store
+ * shard by shard (see parallel.ts).
+ */
+
+import { loadTribbleBuffer } from "./bulk.ts";
+import type { TribbleSink } from "./bulk.ts";
+
+/*
+ * One parsed shard. Declaration i takes effect just before triple
+ * declAt[i]; triple j is triples[3j..3j+2] as dictionary ids. A shard
+ * with a malformed line reports it in `error`, after everything parsed
+ * before it.
+ */
+export type ShardResult = {
+  declIds: Float64Array;
+  declAt: Uint32Array;
+  declValues: string[];
+  triples: Float64Array;
+  tripleCount: number;
+  error?: string;
+};
+
+class ShardRecorder implements TribbleSink {
+  declIds: number[] = [];
+  declAt: number[] = [];
+  declValues: string[] = [];
+  triples = new Float64Array(3 * 1024);
+  tripleCount = 0;
+
+  declare(dictId: number, value: string): void {
+    this.declIds.push(dictId);
+    this.declAt.push(this.tripleCount);
+    this.declValues.push(value);
+  }
+
+  addTriple(srcDict: number, relDict: number, tgtDict: number): boolean {
+    const offset = 3 * this.tripleCount;
+    if (offset === this.triples.length) {
+      const grown = new Float64Array(this.triples.length * 2);
+      grown.set(this.triples);
+      this.triples = grown;
+    }
+
+    this.triples[offset] = srcDict;
+    this.triples[offset + 1] = relDict;
+    this.triples[offset + 2] = tgtDict;
+    this.tripleCount++;
+    return true;
+  }
+}
+
+type WorkerScope = {
+  onmessage: ((event: MessageEvent<Uint8Array>) => void) | null;
+  postMessage(message: ShardResult, transfer: Transferable[]): void;
+};
+
+const scope = self as unknown as WorkerScope;
+
+scope.onmessage = (event) => {
+  const recorder = new ShardRecorder();
+  const decoder = new TextDecoder("utf-8", { ignoreBOM: true });
+
+  let error: string | undefined;
+  try {
+    loadTribbleBuffer(recorder, decoder, event.data);
+  } catch (err) {
+    error = (err as Error).message;
+  }
+
+  const result: ShardResult = {
+    declIds: Float64Array.from(recorder.declIds),
+    declAt: Uint32Array.from(recorder.declAt),
+    declValues: recorder.declValues,
+    triples: recorder.triples,
+    tripleCount: recorder.tripleCount,
+    error,
+  };
+  scope.postMessage(result, [
+    result.declIds.buffer as ArrayBuffer,
+    result.declAt.buffer as ArrayBuffer,
+    result.triples.buffer as ArrayBuffer,
+  ]);
+};
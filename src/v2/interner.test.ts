@@ -0,0 +1,132 @@
+/*
+ * Interner tests: the arena interner must hand out the same ids and
+ * strings as the Map-backed one, through table growth, non-ASCII text
+ * and its decoded-string cache, and databases built on either must be
+ * indistinguishable.
+ */
+
+import { assertEquals, assertThrows } from "@std/assert";
+import { ArenaInterner, Interner } from "./interner.ts";
+import { TribbleDB } from "./mod.ts";
+import type { Triple } from "../types.ts";
+
+const ODD_STRINGS = [
+  "",
+  ":",
+  "::",
+  "no colon at all",
+  "urn:ró:photo:",
+  "urn:ró:photo:x1",
+  "urn:ró:photo:x1?context=wild",
+  "urn:ró:bird:🐦",
+  "urn:ró:place:Baile Átha Cliath",
+  "https://example.com/a:b",
+  "12:30:00",
+  "x".repeat(5_000),
+  `urn:ró:note:${"é".repeat(200)}`,
+];
+
+Deno.test("interner: the arena interner agrees with the Map interner", () => {
+  const values = [...ODD_STRINGS];
+  for (let idx = 0; idx < 5_000; idx++) {
+    values.push(
+      `urn:ró:${["photo", "place", "bird"][idx % 3]}:x${idx % 2_500}`,
+    );
+    values.push(String(idx % 700));
+  }
+
+  const reference = new Interner(100_000);
+  const arena = new ArenaInterner(100_000);
+  for (const value of values) {
+    assertEquals(arena.intern(value), reference.intern(value));
+  }
+  assertEquals(arena.size, reference.size);
+
+  for (let id = 0; id < reference.size; id++) {
+    assertEquals(arena.valueOf(id), reference.valueOf(id));
+  }
+  // again, now through the decoded-string cache
+  for (let id = reference.size - 1; id >= 0; id--) {
+    assertEquals(arena.valueOf(id), reference.valueOf(id));
+  }
+
+  for (const value of [...values, "urn:ró:photo:missing", "urn:ró:zz:x1"]) {
+    assertEquals(arena.idOf(value), reference.idOf(value));
+  }
+
+  const restored = ArenaInterner.fromValues(
+    Array.from({ length: reference.size }, (_, id) => reference.valueOf(id)),
+    100_000,
+  );
+  assertEquals(
+    restored.idOf("urn:ró:bird:🐦"),
+    reference.idOf("urn:ró:bird:🐦"),
+  );
+});
+
+Deno.test("interner: the arena interner enforces its limits", () => {
+  const arena = new ArenaInterner(2);
+  arena.intern("urn:ró:photo:x1");
+  arena.intern("urn:ró:photo:x2");
+  assertEquals(arena.intern("urn:ró:photo:x1"), 0);
+  assertThrows(() => arena.intern("urn:ró:photo:x3"));
+  assertThrows(() => arena.intern("urn:ró:photo:\ud800"));
+  assertEquals(arena.idOf("urn:ró:photo:\ud800"), undefined);
+  // past 2^16 - 1 distinct prefixes, strings are stored whole
+  const prefixed = new ArenaInterner(100_000);
+  for (let idx = 0; idx < 70_000; idx++) {
+    assertEquals(prefixed.intern(`p${idx}:x`), idx);
+  }
+  for (const idx of [0, 65_534, 65_535, 69_999]) {
+    assertEquals(prefixed.valueOf(idx), `p${idx}:x`);
+    assertEquals(prefixed.idOf(`p${idx}:x`), idx);
+  }
+});
+
+Deno.test("interner: databases on either interner are indistinguishable", () => {
+  const triples: Triple[] = [];
+  for (let idx = 0; idx < 2_000; idx++) {
+    triples.push([
+      `urn:ró:photo:x${idx % 600}`,
+      ["location", "subject", "rating"][idx % 3],
+      idx % 2 === 0
+        ? `urn:ró:place:p${idx % 40}?context=wild`
+        : String(idx % 5),
+    ]);
+  }
+
+  const reference = new TribbleDB(triples, {}, { literalIndex: ["rating"] });
+  const db = new TribbleDB(triples, {}, {
+    interner: "arena",
+    literalIndex: ["rating"],
+  });
+  for (const source of [reference, db]) {
+    source.delete(triples.slice(0, 300));
+  }
+
+  const searches = [
+    { source: { type: "photo" }, relation: "location" },
+    { target: { type: "place", qs: { context: "wild" } } },
+    { relation: "rating", target: { gte: 3 } },
+    { source: { id: ["x1", "x2", "x3"] } },
+  ];
+  for (const search of searches) {
+    assertEquals(
+      db.search(search).triples(),
+      reference.search(search).triples(),
+    );
+  }
+
+  const compacted = db.search({ relation: "rating" }).compact({
+    pruneStrings: true,
+  });
+  assertEquals(
+    compacted.triples(),
+    reference.search({ relation: "rating" }).triples(),
+  );
+  assertEquals(
+    TribbleDB.fromSnapshot(db.toSnapshot(), {}, { interner: "arena" })
+      .triples(),
+    reference.triples(),
+  );
+});
@@ -1,25 +1,72 @@
 /*
- * String interner: maps strings to dense numeric ids and back.
+ * String interners: map strings to dense numeric ids and back.
  * Identity and index structures in the v2 engine only handle these ids;
- * strings appear at ingest and at materialisation.
+ * strings appear at ingest and at materialisation. Interner keeps JS
+ * strings; ArenaInterner keeps UTF-8 bytes with shared prefixes.
  */
 
-export class Interner {
-  #ids: Map<string, number>;
+import type { InternerKind } from "./types.ts";
+
+/*
+ * The string table of a TripleStore. Interner and ArenaInterner differ
+ * only in how they hold the strings.
+ */
+export interface StringTable {
+  intern(value: string): number;
+  idOf(value: string): number | undefined;
+  valueOf(id: number): string;
+  readonly size: number;
+  // valueOf() calls so far, for EngineMetrics
+  readonly resolved: number;
+}
+
+export class Interner implements StringTable {
+  // built lazily for interners restored from a snapshot
+  #ids: Map<string, number> | null;
   #values: string[];
   #maxIds: number;
+  resolved: number;
 
   constructor(maxIds: number) {
     this.#ids = new Map();
     this.#values = [];
     this.#maxIds = maxIds;
+    this.resolved = 0;
+  }
+
+  /*
+   * Restore an interner from its id-ordered values. The reverse lookup
+   * table is only built on the first idOf()/intern() call, so read paths
+   * that only resolve ids pay nothing for it.
+   */
+  static fromValues(values: string[], maxIds: number): Interner {
+    if (values.length > maxIds) {
+      throw new Error(`Interner exceeded ${maxIds} distinct strings.`);
+    }
+
+    const interner = new Interner(maxIds);
+    interner.#values = values;
+    interner.#ids = null;
+    return interner;
+  }
+
+  #lookup(): Map<string, number> {
+    if (this.#ids === null) {
+      const ids = new Map<string, number>();
+      for (let id = 0; id < this.#values.length; id++) {
+        ids.set(this.#values[id], id);
+      }
+      this.#ids = ids;
+    }
+    return this.#ids;
   }
 
   /*
    * Intern a string, returning its id. Idempotent.
    */
   intern(value: string): number {
-    const existing = this.#ids.get(value);
+    const ids = this.#lookup();
+    const existing = ids.get(value);
     if (existing !== undefined) {
       return existing;
     }
@@ -29,7 +76,7 @@ export class Interner {
       throw new Error(`Interner exceeded ${this.#maxIds} distinct strings.`);
     }
 
-    this.#ids.set(value, id);
+    ids.set(value, id);
     this.#values.push(value);
     return id;
   }
@@ -38,13 +85,14 @@ export class Interner {
    * Look up the id of a string without interning it.
    */
   idOf(value: string): number | undefined {
-    return this.#ids.get(value);
+    return this.#lookup().get(value);
   }
 
   /*
    * Resolve an id back to its string.
    */
   valueOf(id: number): string {
+    this.resolved++;
     return this.#values[id];
   }
 
@@ -52,3 +100,369 @@ export class Interner {
     return this.#values.length;
   }
 }
+
+const decoder = new TextDecoder();
+
+const COLON = 0x3a;
+const FNV_OFFSET = 0x811c9dc5;
+const FNV_PRIME = 0x01000193;
+// prefix ids are 16-bit; strings past this many prefixes are kept whole
+const MAX_PREFIXES = 0xffff;
+// direct-mapped cache of decoded strings, by id
+const HOT_STRINGS = 1024;
+
+function hashBytes(bytes: Uint8Array): number {
+  let hash = FNV_OFFSET;
+  for (let idx = 0; idx < bytes.length; idx++) {
+    hash = Math.imul(hash ^ bytes[idx], FNV_PRIME);
+  }
+  return hash >>> 0;
+}
+
+function bytesEqual(
+  left: Uint8Array,
+  leftStart: number,
+  right: Uint8Array,
+  rightStart: number,
+  length: number,
+): boolean {
+  for (let idx = 0; idx < length; idx++) {
+    if (left[leftStart + idx] !== right[rightStart + idx]) {
+      return false;
+    }
+  }
+  return true;
+}
+
+function grownTo<Column extends Uint32Array | Uint16Array | Uint8Array>(
+  column: Column,
+  needed: number,
+): Column {
+  if (needed <= column.length) {
+    return column;
+  }
+  const grown = new (column.constructor as new (length: number) => Column)(
+    Math.max(needed, column.length * 2),
+  );
+  grown.set(column);
+  return grown;
+}
+
+/*
+ * An interner that keeps its strings as UTF-8 bytes in one arena instead
+ * of as JS strings, for stores holding many long, similar URNs
+ * (TribbleDBOpts interner: "arena").
+ *
+ * Each string is split after its last ":". The prefix ("urn:ró:photo:")
+ * is stored once, in a small shared table; per string only a prefix id
+ * and the suffix's bytes are kept. Lookups encode the probe into a
+ * reused scratch buffer, hashing as they go, and compare bytes, so no
+ * string is created per probe. valueOf() decodes on demand, through a
+ * small cache of recently decoded strings.
+ */
+export class ArenaInterner implements StringTable {
+  #maxIds: number;
+  #size: number;
+
+  // suffix bytes, back to back; id's suffix is [offsets[id], offsets[id + 1])
+  #arena: Uint8Array;
+  #offsets: Uint32Array;
+  #prefixOf: Uint16Array;
+  #hashes: Uint32Array;
+  // open addressing over ids: id + 1, or 0 when empty
+  #slots: Uint32Array;
+
+  // prefix id 0 is the empty prefix
+  #prefixes: string[];
+  #prefixBytes: Uint8Array[];
+  #prefixSlots: Uint32Array;
+
+  // the last string encoded: its UTF-8 bytes, their hash and where the
+  // suffix starts
+  #scratch: Uint8Array;
+  #hash: number;
+  #prefixLength: number;
+
+  #hotIds: Int32Array;
+  #hotValues: string[];
+  resolved: number;
+
+  constructor(maxIds: number) {
+    this.#maxIds = maxIds;
+    this.#size = 0;
+    this.#arena = new Uint8Array(4096);
+    this.#offsets = new Uint32Array(256);
+    this.#prefixOf = new Uint16Array(256);
+    this.#hashes = new Uint32Array(256);
+    this.#slots = new Uint32Array(512);
+    this.#prefixes = [""];
+    this.#prefixBytes = [new Uint8Array(0)];
+    this.#prefixSlots = new Uint32Array(64);
+    this.#scratch = new Uint8Array(256);
+    this.#hash = 0;
+    this.#prefixLength = 0;
+    this.#hotIds = new Int32Array(HOT_STRINGS).fill(-1);
+    this.#hotValues = new Array<string>(HOT_STRINGS);
+    this.resolved = 0;
+  }
+
+  static fromValues(values: string[], maxIds: number): ArenaInterner {
+    if (values.length > maxIds) {
+      throw new Error(`Interner exceeded ${maxIds} distinct strings.`);
+    }
+
+    const interner = new ArenaInterner(maxIds);
+    for (const value of values) {
+      interner.intern(value);
+    }
+    return interner;
+  }
+
+  /*
+   * Encode a string as UTF-8 into the scratch buffer, returning its byte
+   * length, or -1 when it holds a lone surrogate. The hash is taken over
+   * UTF-16 code units in the same pass. Inline rather than through
+   * TextEncoder, whose per-call overhead dominates short strings.
+   */
+  #encode(value: string): number {
+    // at most three UTF-8 bytes per UTF-16 code unit
+    if (this.#scratch.length < value.length * 3) {
+      this.#scratch = new Uint8Array(value.length * 3);
+    }
+
+    const scratch = this.#scratch;
+    let length = 0;
+    let hash = FNV_OFFSET;
+    let prefixLength = 0;
+
+    for (let idx = 0; idx < value.length; idx++) {
+      let code = value.charCodeAt(idx);
+      hash = Math.imul(hash ^ code, FNV_PRIME);
+
+      if (code < 0x80) {
+        scratch[length++] = code;
+        if (code === COLON) {
+          prefixLength = length;
+        }
+      } else if (code < 0x800) {
+        scratch[length++] = 0xc0 | (code >> 6);
+        scratch[length++] = 0x80 | (code & 0x3f);
+      } else if (code < 0xd800 || code >= 0xe000) {
+        scratch[length++] = 0xe0 | (code >> 12);
+        scratch[length++] = 0x80 | ((code >> 6) & 0x3f);
+        scratch[length++] = 0x80 | (code & 0x3f);
+      } else {
+        const low = value.charCodeAt(idx + 1);
+        if (code >= 0xdc00 || !(low >= 0xdc00 && low < 0xe000)) {
+          return -1;
+        }
+        hash = Math.imul(hash ^ low, FNV_PRIME);
+        code = 0x10000 + ((code - 0xd800) << 10) + (low - 0xdc00);
+        idx++;
+        scratch[length++] = 0xf0 | (code >> 18);
+        scratch[length++] = 0x80 | ((code >> 12) & 0x3f);
+        scratch[length++] = 0x80 | ((code >> 6) & 0x3f);
+        scratch[length++] = 0x80 | (code & 0x3f);
+      }
+    }
+
+    this.#hash = hash >>> 0;
+    this.#prefixLength = prefixLength;
+    return length;
+  }
+
+  /*
+   * The id of the encoded string's prefix, registering it if new; 0 (no
+   * prefix) once the prefix table is full.
+   */
+  #internPrefix(): number {
+    const length = this.#prefixLength;
+    if (length === 0) {
+      return 0;
+    }
+
+    const bytes = this.#scratch.slice(0, length);
+    const hash = hashBytes(bytes);
+    let slots = this.#prefixSlots;
+    let slot = hash & (slots.length - 1);
+
+    while (slots[slot] !== 0) {
+      const known = this.#prefixBytes[slots[slot] - 1];
+      if (
+        known.length === length && bytesEqual(known, 0, bytes, 0, length)
+      ) {
+        return slots[slot] - 1;
+      }
+      slot = (slot + 1) & (slots.length - 1);
+    }
+
+    const prefixId = this.#prefixes.length;
+    if (prefixId === MAX_PREFIXES) {
+      return 0;
+    }
+    this.#prefixBytes.push(bytes);
+    this.#prefixes.push(decoder.decode(bytes));
+    slots[slot] = prefixId + 1;
+
+    if (this.#prefixes.length * 2 > slots.length) {
+      slots = new Uint32Array(slots.length * 2);
+      for (let id = 1; id < this.#prefixes.length; id++) {
+        let free = hashBytes(this.#prefixBytes[id]) & (slots.length - 1);
+        while (slots[free] !== 0) {
+          free = (free + 1) & (slots.length - 1);
+        }
+        slots[free] = id + 1;
+      }
+      this.#prefixSlots = slots;
+    }
+    return prefixId;
+  }
+
+  /*
+   * Whether an id's string is the encoded string, `length` bytes long.
+   */
+  #holds(id: number, length: number): boolean {
+    const prefix = this.#prefixBytes[this.#prefixOf[id]];
+    const start = this.#offsets[id];
+    const suffixLength = this.#offsets[id + 1] - start;
+
+    return prefix.length + suffixLength === length &&
+      bytesEqual(prefix, 0, this.#scratch, 0, prefix.length) &&
+      bytesEqual(
+        this.#arena,
+        start,
+        this.#scratch,
+        prefix.length,
+        suffixLength,
+      );
+  }
+
+  /*
+   * The slot holding the encoded string, or the empty slot it would go in.
+   */
+  #slotOf(length: number): number {
+    const slots = this.#slots;
+    const mask = slots.length - 1;
+    const hash = this.#hash;
+    let slot = hash & mask;
+
+    while (slots[slot] !== 0) {
+      const id = slots[slot] - 1;
+      if (this.#hashes[id] === hash && this.#holds(id, length)) {
+        return slot;
+      }
+      slot = (slot + 1) & mask;
+    }
+    return slot;
+  }
+
+  #grow(suffixLength: number): void {
+    const size = this.#size;
+    this.#offsets = grownTo(this.#offsets, size + 2);
+    this.#prefixOf = grownTo(this.#prefixOf, size + 1);
+    this.#hashes = grownTo(this.#hashes, size + 1);
+    this.#arena = grownTo(this.#arena, this.#offsets[size] + suffixLength);
+
+    if ((size + 1) * 2 <= this.#slots.length) {
+      return;
+    }
+
+    const slots = new Uint32Array(this.#slots.length * 2);
+    const mask = slots.length - 1;
+    for (let id = 0; id < size; id++) {
+      let slot = this.#hashes[id] & mask;
+      while (slots[slot] !== 0) {
+        slot = (slot + 1) & mask;
+      }
+      slots[slot] = id + 1;
+    }
+    this.#slots = slots;
+  }
+
+  intern(value: string): number {
+    const length = this.#encode(value);
+    if (length === -1) {
+      throw new Error("Cannot intern strings containing lone surrogates.");
+    }
+
+    const existing = this.#slots[this.#slotOf(length)];
+    if (existing !== 0) {
+      return existing - 1;
+    }
+
+    const id = this.#size;
+    if (id >= this.#maxIds) {
+      throw new Error(`Interner exceeded ${this.#maxIds} distinct strings.`);
+    }
+
+    const prefixId = this.#internPrefix();
+    const prefixLength = this.#prefixBytes[prefixId].length;
+    const suffixLength = length - prefixLength;
+    this.#grow(suffixLength);
+
+    const start = this.#offsets[id];
+    this.#arena.set(this.#scratch.subarray(prefixLength, length), start);
+    this.#offsets[id + 1] = start + suffixLength;
+    this.#prefixOf[id] = prefixId;
+    this.#hashes[id] = this.#hash;
+
+    // after #grow, which may have rebuilt the table
+    this.#slots[this.#slotOf(length)] = id + 1;
+    this.#size++;
+    return id;
+  }
+
+  idOf(value: string): number | undefined {
+    const length = this.#encode(value);
+    if (length === -1) {
+      return undefined;
+    }
+
+    const id = this.#slots[this.#slotOf(length)];
+    return id === 0 ? undefined : id - 1;
+  }
+
+  valueOf(id: number): string {
+    this.resolved++;
+    const hot = id & (HOT_STRINGS - 1);
+    if (this.#hotIds[hot] === id) {
+      return this.#hotValues[hot];
+    }
+
+    const value = this.#prefixes[this.#prefixOf[id]] + this.#suffixOf(id);
+    this.#hotIds[hot] = id;
+    this.#hotValues[hot] = value;
+    return value;
+  }
+
+  #suffixOf(id: number): string {
+    return decoder.decode(
+      this.#arena.subarray(this.#offsets[id], this.#offsets[id + 1]),
+    );
+  }
+
+  get size(): number {
+    return this.#size;
+  }
+}
+
+/*
+ * An empty string table of the given kind.
+ */
+export function emptyStrings(kind: InternerKind, maxIds: number): StringTable {
+  return kind === "arena" ? new ArenaInterner(maxIds) : new Interner(maxIds);
+}
+
+/*
+ * A string table of the given kind holding `values`, which must be
+ * distinct, with ids in array order.
+ */
+export function stringsFrom(
+  kind: InternerKind,
+  values: string[],
+  maxIds: number,
+): StringTable {
+  return kind === "arena"
+    ? ArenaInterner.fromValues(values, maxIds)
+    : Interner.fromValues(values, maxIds);
+}
@@ -0,0 +1,123 @@
+/*
+ * Range search tests: range bounds must select exactly what the
+ * equivalent predicate selects, with or without a literal index, and the
+ * index must follow later changes to the database.
+ */
+
+import { assertEquals } from "@std/assert";
+import { TribbleDB } from "./mod.ts";
+import type { RangeSearch, StoreBackend } from "./mod.ts";
+import type { Triple } from "../types.ts";
+
+const PEOPLE: Triple[] = [
+  ["urn:ró:person:ann", "age", "17"],
+  ["urn:ró:person:bo", "age", "18"],
+  ["urn:ró:person:cy", "age", "42"],
+  ["urn:ró:person:di", "age", "unknown"],
+  ["urn:ró:person:ann", "joined", "2023-06-01"],
+  ["urn:ró:person:bo", "joined", "2024-02-29"],
+  ["urn:ró:person:ann", "lives", "urn:ró:place:cork"],
+  ["urn:ró:person:bo", "lives", "urn:ró:place:dublin"],
+  ["urn:ró:person:cy", "lives", "urn:ró:city:paris"],
+  ["urn:ró:person:cy", "rating", "42"],
+];
+
+const CASES: [RangeSearch, RangeSearch][] = [
+  [
+    { relation: "age", target: { gte: 18 } },
+    { relation: "age", target: { predicate: (age) => Number(age) >= 18 } },
+  ],
+  [
+    { relation: "age", target: { gt: 17, lt: 42 } },
+    { relation: "age", target: { predicate: (age) => age === "18" } },
+  ],
+  [
+    { relation: "joined", target: { lt: "2024-01-01" } },
+    { relation: "joined", target: { predicate: (day) => day < "2024-01-01" } },
+  ],
+  [
+    { relation: "lives", target: { prefix: "urn:ró:place:" } },
+    {
+      relation: "lives",
+      target: { predicate: (place) => place.startsWith("urn:ró:place:") },
+    },
+  ],
+  [
+    { target: { gte: 40 } },
+    { target: { predicate: (value) => Number(value) >= 40 } },
+  ],
+  [
+    { source: { id: ["ann", "cy"] }, target: { type: "place", prefix: "urn" } },
+    { source: { id: ["ann", "cy"] }, target: { type: "place" } },
+  ],
+];
+
+Deno.test("range: bounds select what the equivalent predicate selects", () => {
+  for (const backend of ["typed", "bitmap", "map"] as StoreBackend[]) {
+    for (const literalIndex of [[], ["age", "joined", "lives"]]) {
+      const db = new TribbleDB(PEOPLE, {}, { backend, literalIndex });
+
+      for (const [ranged, predicated] of CASES) {
+        assertEquals(
+          db.search(ranged).triples(),
+          db.search(predicated).triples(),
+        );
+      }
+    }
+  }
+});
+
+Deno.test("range: an indexed range is resolved before any row is touched", () => {
+  const db = new TribbleDB(PEOPLE, {}, { literalIndex: ["age"] });
+
+  const explained = db.explain({ relation: "age", target: { gte: 18 } });
+  assertEquals(explained.rows, 2);
+  assertEquals(explained.steps[0], {
+    stage: "target",
+    estimated: 3,
+    actual: 3,
+  });
+  assertEquals(
+    explained.steps.some((step) => step.stage === "predicates"),
+    false,
+  );
+});
+
+Deno.test("range: the literal index follows adds, deletes and views", () => {
+  const db = new TribbleDB(PEOPLE, {}, { literalIndex: ["age"] });
+  const adults = { relation: "age", target: { gte: 18 } };
+  assertEquals(db.search(adults).triplesCount, 2);
+
+  db.add([["urn:ró:person:ed", "age", "70"]]);
+  db.delete([["urn:ró:person:cy", "age", "42"]]);
+  assertEquals(db.search(adults).triples(), [
+    ["urn:ró:person:bo", "age", "18"],
+    ["urn:ró:person:ed", "age", "70"],
+  ]);
+
+  const view = db.search({ source: { id: ["ann", "ed"] } });
+  assertEquals(view.search(adults).triples(), [
+    ["urn:ró:person:ed", "age", "70"],
+  ]);
+
+  db.compact({ pruneStrings: true });
+  db.add([["urn:ró:person:fi", "age", "19"]]);
+  assertEquals(db.search(adults).triplesCount, 3);
+});
+
+Deno.test("range: cached results are keyed by their bounds", () => {
+  const db = new TribbleDB(PEOPLE, {}, { cacheSize: 8 });
+
+  assertEquals(
+    db.search({ relation: "age", target: { gte: 18 } }).triplesCount,
+    2,
+  );
+  assertEquals(
+    db.search({ relation: "age", target: { gte: 40 } }).triplesCount,
+    1,
+  );
+  assertEquals(
+    db.search({ relation: "age", target: { gte: "18" } }).triplesCount,
+    3,
+  );
+});
@@ -0,0 +1,378 @@
+/*
+ * Range, prefix and substring constraints over node strings, and the
+ * opt-in sorted literal index that answers ranges for one relation's
+ * targets.
+ *
+ * Number bounds compare numerically and only admit nodes whose string
+ * parses as a number; string bounds and prefixes compare by UTF-16 code
+ * unit, as JS string comparison does. A range resolves to a set of node
+ * ids, like a type or id constraint, so the planner intersects it with
+ * the other constraints before any row is touched.
+ *
+ * Without an index a range is checked against every distinct node (not
+ * every row). A LiteralIndex keeps the distinct targets of one relation
+ * sorted twice, by numeric value and by string, and answers a range by
+ * binary search. It catches up with rows added since its last use on
+ * first use, so writes never pay for it.
+ *
+ * Substring constraints (`contains`, `icontains`) only admit literal
+ * nodes. With the store's text index (see text.ts) they are answered from
+ * its trigram candidates, which takes precedence over literal indexes.
+ */
+
+import type { TripleStore } from "./store.ts";
+import type { LiteralRange } from "./types.ts";
+import { folded } from "./text.ts";
+
+const RANGE_KEYS = [
+  "gt",
+  "gte",
+  "lt",
+  "lte",
+  "prefix",
+  "contains",
+  "icontains",
+] as const;
+
+/*
+ * The range part of a node query, or undefined when it has none.
+ */
+export function rangeOf(query: LiteralRange): LiteralRange | undefined {
+  let range: LiteralRange | undefined;
+  for (const key of RANGE_KEYS) {
+    if (query[key] !== undefined) {
+      range = { ...range, [key]: query[key] };
+    }
+  }
+  return range;
+}
+
+/*
+ * A node string as a number; NaN when it does not parse as one.
+ */
+function numericValue(value: string): number {
+  return value.trim() === "" ? NaN : Number(value);
+}
+
+function passesBound(
+  value: string,
+  bound: number | string,
+  accepts: (order: number) => boolean,
+): boolean {
+  if (typeof bound === "number") {
+    const numeric = numericValue(value);
+    return !Number.isNaN(numeric) && accepts(numeric - bound);
+  }
+  return accepts(value < bound ? -1 : value > bound ? 1 : 0);
+}
+
+export function inRange(value: string, range: LiteralRange): boolean {
+  if (range.prefix !== undefined && !value.startsWith(range.prefix)) {
+    return false;
+  }
+  if (range.contains !== undefined && !value.includes(range.contains)) {
+    return false;
+  }
+  if (
+    range.icontains !== undefined &&
+    !folded(value).includes(folded(range.icontains))
+  ) {
+    return false;
+  }
+  if (
+    range.gt !== undefined && !passesBound(value, range.gt, (ord) => ord > 0)
+  ) {
+    return false;
+  }
+  if (
+    range.gte !== undefined &&
+    !passesBound(value, range.gte, (ord) => ord >= 0)
+  ) {
+    return false;
+  }
+  if (
+    range.lt !== undefined && !passesBound(value, range.lt, (ord) => ord < 0)
+  ) {
+    return false;
+  }
+  return range.lte === undefined ||
+    passesBound(value, range.lte, (ord) => ord <= 0);
+}
+
+function hasSubstring(range: LiteralRange): boolean {
+  return range.contains !== undefined || range.icontains !== undefined;
+}
+
+/*
+ * Whether a node is within the range; substring constraints also require
+ * it to be a literal.
+ */
+export function nodeInRange(
+  store: TripleStore,
+  nodeId: number,
+  range: LiteralRange,
+): boolean {
+  return (!hasSubstring(range) || store.isLiteral(nodeId)) &&
+    inRange(store.nodes.valueOf(nodeId), range);
+}
+
+function numericBound(bound: number | string | undefined): number | undefined {
+  return typeof bound === "number" ? bound : undefined;
+}
+
+function stringBound(bound: number | string | undefined): string | undefined {
+  return typeof bound === "string" ? bound : undefined;
+}
+
+/*
+ * First index in [0, length) not `before` the bound, where `before`
+ * holds for a prefix of the indices.
+ */
+function lowerBound(length: number, before: (idx: number) => boolean): number {
+  let from = 0;
+  let to = length;
+  while (from < to) {
+    const mid = (from + to) >>> 1;
+    if (before(mid)) {
+      from = mid + 1;
+    } else {
+      to = mid;
+    }
+  }
+  return from;
+}
+
+/*
+ * Merge two ascending runs of node ids into one.
+ */
+function mergeSorted(
+  frozen: Uint32Array,
+  fresh: number[],
+  compare: (nodeA: number, nodeB: number) => number,
+): Uint32Array {
+  const merged = new Uint32Array(frozen.length + fresh.length);
+  let frozenIdx = 0;
+  let freshIdx = 0;
+  for (let idx = 0; idx < merged.length; idx++) {
+    if (
+      freshIdx >= fresh.length ||
+      (frozenIdx < frozen.length &&
+        compare(frozen[frozenIdx], fresh[freshIdx]) <= 0)
+    ) {
+      merged[idx] = frozen[frozenIdx++];
+    } else {
+      merged[idx] = fresh[freshIdx++];
+    }
+  }
+  return merged;
+}
+
+export class LiteralIndex {
+  readonly relation: string;
+
+  // rows [0, coveredRows) have been indexed
+  #coveredRows: number;
+  #indexed: Set<number>;
+
+  // numeric targets by ascending value, and their values
+  #numberNodes: Uint32Array;
+  #numbers: Float64Array;
+  // every target by ascending string
+  #strings: Uint32Array;
+
+  constructor(relation: string) {
+    this.relation = relation;
+    this.#coveredRows = 0;
+    this.#indexed = new Set();
+    this.#numberNodes = new Uint32Array(0);
+    this.#numbers = new Float64Array(0);
+    this.#strings = new Uint32Array(0);
+  }
+
+  /*
+   * Merge in the targets of rows added since the last call.
+   */
+  #refresh(store: TripleStore): void {
+    const relationId = store.relationNames.idOf(this.relation);
+    if (relationId === undefined || this.#coveredRows === store.rowCount) {
+      return;
+    }
+
+    const fresh: number[] = [];
+    for (let row = this.#coveredRows; row < store.rowCount; row++) {
+      const targetId = store.targetIds[row];
+      if (
+        store.relationIds[row] === relationId && !this.#indexed.has(targetId)
+      ) {
+        this.#indexed.add(targetId);
+        fresh.push(targetId);
+      }
+    }
+    this.#coveredRows = store.rowCount;
+
+    if (fresh.length === 0) {
+      return;
+    }
+
+    const valueOf = (nodeId: number) => store.nodes.valueOf(nodeId);
+    const byString = (nodeA: number, nodeB: number) => {
+      const valueA = valueOf(nodeA);
+      const valueB = valueOf(nodeB);
+      return valueA < valueB ? -1 : valueA > valueB ? 1 : 0;
+    };
+    this.#strings = mergeSorted(this.#strings, fresh.sort(byString), byString);
+
+    const values = new Map<number, number>();
+    const freshNumbers: number[] = [];
+    for (const nodeId of fresh) {
+      const value = numericValue(valueOf(nodeId));
+      if (!Number.isNaN(value)) {
+        values.set(nodeId, value);
+        freshNumbers.push(nodeId);
+      }
+    }
+    if (freshNumbers.length === 0) {
+      return;
+    }
+
+    const known = this.#numbers;
+    for (let idx = 0; idx < known.length; idx++) {
+      values.set(this.#numberNodes[idx], known[idx]);
+    }
+    const byNumber = (nodeA: number, nodeB: number) => {
+      return values.get(nodeA)! - values.get(nodeB)!;
+    };
+    this.#numberNodes = mergeSorted(
+      this.#numberNodes,
+      freshNumbers.sort(byNumber),
+      byNumber,
+    );
+    this.#numbers = Float64Array.from(
+      this.#numberNodes,
+      (nodeId) => values.get(nodeId)!,
+    );
+  }
+
+  /*
+   * Targets of this relation within the range. Number bounds drive a
+   * binary search over the numeric order, otherwise string bounds and
+   * the prefix drive one over the string order; the remaining bounds are
+   * checked per node.
+   */
+  nodesInRange(store: TripleStore, range: LiteralRange): number[] {
+    this.#refresh(store);
+
+    const valueOf = (nodeId: number) => store.nodes.valueOf(nodeId);
+    const matched: number[] = [];
+
+    const lowNumber = numericBound(range.gt) ?? numericBound(range.gte);
+    const highNumber = numericBound(range.lt) ?? numericBound(range.lte);
+
+    if (lowNumber !== undefined || highNumber !== undefined) {
+      const numbers = this.#numbers;
+      const exclusive = numericBound(range.gt) !== undefined;
+      let idx = lowNumber === undefined ? 0 : lowerBound(
+        numbers.length,
+        (at) =>
+          numbers[at] < lowNumber || (exclusive && numbers[at] === lowNumber),
+      );
+
+      for (; idx < numbers.length; idx++) {
+        if (highNumber !== undefined && numbers[idx] > highNumber) {
+          break;
+        }
+        const nodeId = this.#numberNodes[idx];
+        if (nodeInRange(store, nodeId, range)) {
+          matched.push(nodeId);
+        }
+      }
+      return matched;
+    }
+
+    const lowString = [
+      stringBound(range.gt),
+      stringBound(range.gte),
+      range.prefix,
+    ]
+      .filter((bound): bound is string => bound !== undefined)
+      .reduce<string | undefined>((low, bound) => {
+        return low === undefined || bound > low ? bound : low;
+      }, undefined);
+    const highString = stringBound(range.lt) ?? stringBound(range.lte);
+
+    const strings = this.#strings;
+    let idx = lowString === undefined
+      ? 0
+      : lowerBound(strings.length, (at) => valueOf(strings[at]) < lowString);
+
+    for (; idx < strings.length; idx++) {
+      const value = valueOf(strings[idx]);
+      if (highString !== undefined && value > highString) {
+        break;
+      }
+      // prefix matches are contiguous in string order
+      if (range.prefix !== undefined && !value.startsWith(range.prefix)) {
+        break;
+      }
+      if (nodeInRange(store, strings[idx], range)) {
+        matched.push(strings[idx]);
+      }
+    }
+    return matched;
+  }
+}
+
+/*
+ * Node ids within a range. A substring constraint is answered from the
+ * text index when the store has one, and a target range over relations
+ * that all have a literal index from those indexes; anything else checks
+ * every distinct node once.
+ */
+export function nodesInRange(
+  store: TripleStore,
+  range: LiteralRange,
+  relations: string[] | undefined,
+): Set<number> {
+  if (store.textIndex !== null && hasSubstring(range)) {
+    const needle = range.contains ?? range.icontains!;
+    const nodes = new Set<number>();
+    store.textIndex.candidates(needle).forEach((nodeId) => {
+      if (inRange(store.nodes.valueOf(nodeId), range)) {
+        nodes.add(nodeId);
+      }
+    });
+    return nodes;
+  }
+
+  const indexes = relations?.map((relation) => {
+    return store.literalIndexes.get(relation);
+  });
+
+  if (
+    indexes !== undefined && indexes.length > 0 &&
+    indexes.every((index) => index !== undefined)
+  ) {
+    const nodes = new Set<number>();
+    for (const index of indexes) {
+      for (const nodeId of index!.nodesInRange(store, range)) {
+        nodes.add(nodeId);
+      }
+    }
+    return nodes;
+  }
+
+  // -1 when there are no literals, so no node matches
+  const literalType = hasSubstring(range)
+    ? store.nodes.idOf("unknown") ?? -1
+    : undefined;
+  const nodes = new Set<number>();
+  for (const [nodeId, meta] of store.nodeMeta) {
+    if (
+      (literalType === undefined || meta.typeId === literalType) &&
+      inRange(store.nodes.valueOf(nodeId), range)
+    ) {
+      nodes.add(nodeId);
+    }
+  }
+  return nodes;
+}
@@ -0,0 +1,124 @@
+/*
+ * Pattern matching tests: match() must return exactly the solutions a
+ * naive nested loop over every triple finds, whatever join order and
+ * join kind the matcher picks, over roots and views alike.
+ */
+
+import { assertEquals, assertThrows } from "@std/assert";
+import { TribbleDB } from "./mod.ts";
+import type { Bindings, StoreBackend, TriplePattern } from "./mod.ts";
+import type { Triple } from "../types.ts";
+
+const BIRD = "urn:ró:bird:b1";
+const IRELAND = "urn:ró:country:ie";
+
+function fixture(): Triple[] {
+  const triples: Triple[] = [];
+  for (let idx = 0; idx < 12; idx++) {
+    const place = `urn:ró:place:p${idx}`;
+    triples.push([place, "in", idx % 3 === 0 ? IRELAND : "urn:ró:country:fr"]);
+    triples.push([place, "near", `urn:ró:place:p${(idx + 1) % 12}`]);
+  }
+  for (let idx = 0; idx < 60; idx++) {
+    const photo = `urn:ró:photo:x${idx}`;
+    triples.push([photo, "subject", `urn:ró:bird:b${idx % 4}`]);
+    triples.push([photo, "place", `urn:ró:place:p${idx % 12}`]);
+    if (idx % 5 === 0) {
+      triples.push([photo, "subject", `urn:ró:bird:b${(idx + 1) % 4}`]);
+    }
+  }
+  triples.push(["urn:ró:place:p4", "near", "urn:ró:place:p4"]);
+  return triples;
+}
+
+/*
+ * Reference semantics: extend every solution by every triple.
+ */
+function naiveMatch(triples: Triple[], patterns: TriplePattern[]): Bindings[] {
+  let solutions: Bindings[] = [{}];
+  for (const pattern of patterns) {
+    const next: Bindings[] = [];
+    for (const solution of solutions) {
+      for (const triple of triples) {
+        const extended: Bindings = { ...solution };
+        const agrees = pattern.every((term, position) => {
+          if (!term.startsWith("?")) {
+            return term === triple[position];
+          }
+          const name = term.slice(1);
+          extended[name] ??= triple[position];
+          return extended[name] === triple[position];
+        });
+        if (agrees) {
+          next.push(extended);
+        }
+      }
+    }
+    solutions = next;
+  }
+  return solutions;
+}
+
+function sorted(solutions: Bindings[]): string[] {
+  return solutions.map((solution) => {
+    return JSON.stringify(Object.entries(solution).sort());
+  }).sort();
+}
+
+const QUERIES: TriplePattern[][] = [
+  [
+    ["?photo", "subject", BIRD],
+    ["?photo", "place", "?place"],
+    ["?place", "in", IRELAND],
+  ],
+  [
+    ["?place", "in", IRELAND],
+    ["?photo", "place", "?place"],
+    ["?photo", "subject", "?bird"],
+  ],
+  [["?photo", "?relation", BIRD]],
+  [["?place", "near", "?place"]],
+  [
+    ["?first", "near", "?second"],
+    ["?second", "near", "?third"],
+    ["?third", "in", "?country"],
+  ],
+  [["?place", "in", IRELAND], ["?bird", "subject", BIRD]],
+  [["urn:ró:photo:x5", "subject", "?bird"], ["?other", "subject", "?bird"]],
+  [["urn:ró:photo:x5", "subject", "urn:ró:bird:b2"]],
+  [["urn:ró:photo:x5", "subject", "urn:ró:bird:missing"]],
+  [["?photo", "missing", "?bird"]],
+];
+
+Deno.test("match: solutions equal a naive nested loop", () => {
+  for (const backend of ["typed", "bitmap", "map"] as StoreBackend[]) {
+    const db = new TribbleDB(fixture(), {}, { backend });
+    db.delete([["urn:ró:photo:x6", "place", "urn:ró:place:p6"]]);
+    const view = db.search({ relation: ["subject", "place", "in"] });
+    view.add([["urn:ró:photo:x99", "subject", BIRD]]);
+
+    for (const source of [db, view]) {
+      for (const query of QUERIES) {
+        assertEquals(
+          sorted(source.match(query)),
+          sorted(naiveMatch(source.triples(), query)),
+        );
+      }
+    }
+  }
+});
+
+Deno.test("match: constant-only patterns act as an existence check", () => {
+  const db = new TribbleDB(fixture());
+
+  assertEquals(db.match([]), [{}]);
+  assertEquals(db.match([["urn:ró:photo:x1", "subject", "urn:ró:bird:b1"]]), [
+    {},
+  ]);
+  assertEquals(db.match([["urn:ró:photo:x1", "subject", IRELAND]]), []);
+});
+
+Deno.test("match: a variable cannot be both a relation and a node", () => {
+  const db = new TribbleDB(fixture());
+  assertThrows(() => db.match([["?thing", "?thing", BIRD]]));
+});
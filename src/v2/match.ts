@@ -0,0 +1,440 @@
+/*
+ * Basic graph pattern matching for TribbleDB.match(): a conjunction of
+ * triple patterns whose terms may be variables ("?photo"), evaluated over
+ * interned ids.
+ *
+ * Patterns are joined one at a time, in an order read off posting-list
+ * sizes: first the pattern whose constants admit the fewest rows, then
+ * repeatedly the cheapest pattern sharing a variable with those already
+ * joined, so a cross product is only taken when the patterns are
+ * disconnected. Each join is whichever touches fewer rows by estimate:
+ *   - an index nested-loop join, scanning per partial solution the
+ *     smallest posting list among the pattern's constants and bound
+ *     variables; or
+ *   - a hash join, scanning the pattern's rows once from its constants,
+ *     hashing them by the shared variables and probing per solution.
+ * Solutions are id tuples throughout; strings are decoded once, for the
+ * final solutions only. A view's added rows are a second layer over the
+ * same ids, so each join extends a solution by the rows of both.
+ */
+
+import type { PostingList } from "./postings.ts";
+import type { IdColumn, StoreLayer, TripleStore } from "./store.ts";
+import type { Bindings, TriplePattern } from "./types.ts";
+
+const RELATION = 1;
+
+/*
+ * A pattern against a store. Per position (source, relation, target),
+ * `slots` holds the variable's slot or -1 for a constant, and `ids` the
+ * constant's interned id or -1 for a variable.
+ */
+type CompiledPattern = {
+  slots: number[];
+  ids: number[];
+  // rows its constants admit on their own, before visibility
+  estimate: number;
+};
+
+// a partial solution: an id per variable slot, -1 while unbound
+type Solution = number[];
+
+function isVariable(term: string): boolean {
+  return term.startsWith("?") && term.length > 1;
+}
+
+function postingsAt(
+  store: TripleStore,
+  position: number,
+  id: number,
+): PostingList | undefined {
+  const index = position === 0
+    ? store.rowsBySource
+    : position === RELATION
+    ? store.rowsByRelation
+    : store.rowsByTarget;
+  return index.get(id);
+}
+
+/*
+ * One layer of the database being matched, with its columns by position.
+ */
+type MatchLayer = StoreLayer & {
+  columns: IdColumn[];
+};
+
+class Matcher {
+  #layers: MatchLayer[];
+
+  // variable names by slot, and whether each slot holds a relation id
+  names: string[];
+  relationSlots: boolean[];
+
+  constructor(layers: StoreLayer[]) {
+    this.#layers = layers.map(({ store, rows }) => {
+      return {
+        store,
+        rows,
+        columns: [store.sourceIds, store.relationIds, store.targetIds],
+      };
+    });
+    this.names = [];
+    this.relationSlots = [];
+  }
+
+  #visible(layer: MatchLayer, row: number): boolean {
+    return layer.rows !== null ? layer.rows.has(row) : layer.store.isAlive(row);
+  }
+
+  #visibleCount(): number {
+    let count = 0;
+    for (const { store, rows } of this.#layers) {
+      count += rows !== null ? rows.size : store.aliveCount;
+    }
+    return count;
+  }
+
+  #slotOf(variable: string, isRelation: boolean): number {
+    const name = variable.slice(1);
+    let slot = this.names.indexOf(name);
+    if (slot === -1) {
+      slot = this.names.length;
+      this.names.push(name);
+      this.relationSlots.push(isRelation);
+    }
+    if (this.relationSlots[slot] !== isRelation) {
+      throw new Error(
+        `Variable ${variable} is used as both a relation and a node`,
+      );
+    }
+    return slot;
+  }
+
+  /*
+   * Compile a pattern; undefined when one of its constants is not in the
+   * store, so it cannot match.
+   */
+  compile(pattern: TriplePattern): CompiledPattern | undefined {
+    // the layers share their string tables
+    const { store } = this.#layers[0];
+    const slots: number[] = [];
+    const ids: number[] = [];
+    let estimate = this.#visibleCount();
+    let known = true;
+
+    pattern.forEach((term, position) => {
+      const isRelation = position === RELATION;
+      if (isVariable(term)) {
+        slots.push(this.#slotOf(term, isRelation));
+        ids.push(-1);
+        return;
+      }
+
+      const id = isRelation
+        ? store.relationNames.idOf(term)
+        : store.nodes.idOf(term);
+      slots.push(-1);
+      ids.push(id ?? -1);
+      if (id === undefined) {
+        known = false;
+        return;
+      }
+
+      let admitted = 0;
+      for (const layer of this.#layers) {
+        admitted += postingsAt(layer.store, position, id)?.size ?? 0;
+      }
+      estimate = Math.min(estimate, admitted);
+    });
+
+    return known ? { slots, ids, estimate } : undefined;
+  }
+
+  /*
+   * Extend a solution with a row, or undefined when the row disagrees
+   * with the pattern's constants or the solution's bindings.
+   */
+  #extend(
+    layer: MatchLayer,
+    pattern: CompiledPattern,
+    solution: Solution,
+    row: number,
+  ): Solution | undefined {
+    let extended: Solution | undefined;
+
+    for (let position = 0; position < 3; position++) {
+      const value = layer.columns[position][row];
+      const slot = pattern.slots[position];
+
+      if (slot === -1) {
+        if (value !== pattern.ids[position]) {
+          return undefined;
+        }
+        continue;
+      }
+
+      const bound = (extended ?? solution)[slot];
+      if (bound === -1) {
+        extended ??= solution.slice();
+        extended[slot] = value;
+      } else if (bound !== value) {
+        return undefined;
+      }
+    }
+    return extended ?? solution;
+  }
+
+  /*
+   * The smallest posting list in a layer among a pattern's constants:
+   * undefined when it has none, null when one admits no rows at all.
+   */
+  #smallestConstantList(
+    layer: MatchLayer,
+    pattern: CompiledPattern,
+  ): PostingList | undefined | null {
+    let smallest: PostingList | undefined;
+    for (let position = 0; position < 3; position++) {
+      if (pattern.ids[position] === -1) {
+        continue;
+      }
+      const list = postingsAt(layer.store, position, pattern.ids[position]);
+      if (!list) {
+        return null;
+      }
+      if (!smallest || list.size < smallest.size) {
+        smallest = list;
+      }
+    }
+    return smallest;
+  }
+
+  /*
+   * The visible rows of a layer matching a pattern's constants, from its
+   * smallest constant posting list, or every visible row when it has
+   * none.
+   */
+  #scan(layer: MatchLayer, pattern: CompiledPattern): number[] {
+    const smallest = this.#smallestConstantList(layer, pattern);
+    if (smallest === null) {
+      return [];
+    }
+
+    const rows: number[] = [];
+    if (smallest) {
+      for (const row of smallest) {
+        if (this.#visible(layer, row)) {
+          rows.push(row);
+        }
+      }
+      return rows;
+    }
+
+    if (layer.rows !== null) {
+      layer.rows.forEach((row) => rows.push(row));
+      return rows;
+    }
+    for (let row = 0; row < layer.store.rowCount; row++) {
+      if (layer.store.isAlive(row)) {
+        rows.push(row);
+      }
+    }
+    return rows;
+  }
+
+  /*
+   * Join a pattern into the solutions, given which slots they bind. Each
+   * solution is extended by rows of every layer in turn.
+   */
+  join(
+    pattern: CompiledPattern,
+    solutions: Solution[],
+    bound: Set<number>,
+  ): Solution[] {
+    const joinPositions = [0, 1, 2].filter((position) => {
+      return bound.has(pattern.slots[position]);
+    });
+    const joined: Solution[] = [];
+
+    // nothing shared: every solution pairs with every row
+    if (joinPositions.length === 0) {
+      const scanned = this.#layers.map((layer) => this.#scan(layer, pattern));
+      for (const solution of solutions) {
+        this.#layers.forEach((layer, depth) => {
+          for (const row of scanned[depth]) {
+            const extended = this.#extend(layer, pattern, solution, row);
+            if (extended) {
+              joined.push(extended);
+            }
+          }
+        });
+      }
+      return joined;
+    }
+
+    if (pattern.estimate < solutions.length) {
+      return this.#hashJoin(pattern, solutions, joinPositions);
+    }
+
+    // the constants' lists are the same for every solution
+    const constantLists = this.#layers.map((layer) => {
+      return this.#smallestConstantList(layer, pattern);
+    });
+
+    for (const solution of solutions) {
+      this.#layers.forEach((layer, depth) => {
+        let smallest = constantLists[depth];
+        if (smallest === null) {
+          return;
+        }
+
+        for (const position of joinPositions) {
+          const list = postingsAt(
+            layer.store,
+            position,
+            solution[pattern.slots[position]],
+          );
+          if (!list) {
+            smallest = null;
+            break;
+          }
+          if (!smallest || list.size < smallest.size) {
+            smallest = list;
+          }
+        }
+
+        for (const row of smallest ?? []) {
+          if (!this.#visible(layer, row)) {
+            continue;
+          }
+          const extended = this.#extend(layer, pattern, solution, row);
+          if (extended) {
+            joined.push(extended);
+          }
+        }
+      });
+    }
+    return joined;
+  }
+
+  #hashJoin(
+    pattern: CompiledPattern,
+    solutions: Solution[],
+    joinPositions: number[],
+  ): Solution[] {
+    const keyOf = (values: (position: number) => number) => {
+      return joinPositions.map(values).join(",");
+    };
+
+    const tables = this.#layers.map((layer) => {
+      const byKey = new Map<string, number[]>();
+      for (const row of this.#scan(layer, pattern)) {
+        const key = keyOf((position) => layer.columns[position][row]);
+        const rows = byKey.get(key);
+        if (rows) {
+          rows.push(row);
+        } else {
+          byKey.set(key, [row]);
+        }
+      }
+      return byKey;
+    });
+
+    const joined: Solution[] = [];
+    for (const solution of solutions) {
+      const key = keyOf((position) => solution[pattern.slots[position]]);
+      this.#layers.forEach((layer, depth) => {
+        for (const row of tables[depth].get(key) ?? []) {
+          const extended = this.#extend(layer, pattern, solution, row);
+          if (extended) {
+            joined.push(extended);
+          }
+        }
+      });
+    }
+    return joined;
+  }
+
+  /*
+   * Greedy join order: the cheapest pattern connected to the variables
+   * bound so far, or the cheapest of all when none is.
+   */
+  order(patterns: CompiledPattern[]): CompiledPattern[] {
+    const remaining = [...patterns];
+    const bound = new Set<number>();
+    const ordered: CompiledPattern[] = [];
+
+    while (remaining.length > 0) {
+      let best = -1;
+      let bestConnected = false;
+
+      remaining.forEach((pattern, idx) => {
+        const connected = pattern.slots.some((slot) => bound.has(slot));
+        if (
+          best === -1 || (connected && !bestConnected) ||
+          (connected === bestConnected &&
+            pattern.estimate < remaining[best].estimate)
+        ) {
+          best = idx;
+          bestConnected = connected;
+        }
+      });
+
+      const [next] = remaining.splice(best, 1);
+      for (const slot of next.slots) {
+        if (slot !== -1) {
+          bound.add(slot);
+        }
+      }
+      ordered.push(next);
+    }
+    return ordered;
+  }
+}
+
+/*
+ * Every assignment of the patterns' variables under which each pattern
+ * is a visible triple of one of the layers, as variable name (without
+ * "?") -> term. The layers share their string tables, so a solution may
+ * join rows from several.
+ */
+export function matchPatterns(
+  layers: StoreLayer[],
+  patterns: TriplePattern[],
+): Bindings[] {
+  const { store } = layers[0];
+  const matcher = new Matcher(layers);
+  const compiled: CompiledPattern[] = [];
+  for (const pattern of patterns) {
+    const entry = matcher.compile(pattern);
+    if (!entry) {
+      return [];
+    }
+    compiled.push(entry);
+  }
+
+  const slotCount = matcher.names.length;
+  let solutions: Solution[] = [new Array<number>(slotCount).fill(-1)];
+  const bound = new Set<number>();
+
+  for (const pattern of matcher.order(compiled)) {
+    solutions = matcher.join(pattern, solutions, bound);
+    if (solutions.length === 0) {
+      return [];
+    }
+    for (const slot of pattern.slots) {
+      if (slot !== -1) {
+        bound.add(slot);
+      }
+    }
+  }
+
+  return solutions.map((solution) => {
+    const bindings: Bindings = {};
+    for (let slot = 0; slot < slotCount; slot++) {
+      bindings[matcher.names[slot]] = matcher.relationSlots[slot]
+        ? store.relationNames.valueOf(solution[slot])
+        : store.nodes.valueOf(solution[slot]);
+    }
+    return bindings;
+  });
+}
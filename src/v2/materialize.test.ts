@@ -0,0 +1,174 @@
+/*
+ * Materialised search tests: after every edit, a live result must equal
+ * re-running its search, its change callbacks must replay to the same
+ * triples, and frozen copies must not see later edits.
+ */
+
+import { assertEquals, assertThrows } from "@std/assert";
+import { TribbleDB } from "./mod.ts";
+import type { MaterializedView, RangeSearch, StoreBackend } from "./mod.ts";
+import type { Triple } from "../types.ts";
+
+function makeRandom(seed: number): () => number {
+  let state = seed;
+  return () => {
+    state |= 0;
+    state = (state + 0x6D2B79F5) | 0;
+    let mixed = Math.imul(state ^ (state >>> 15), 1 | state);
+    mixed = (mixed + Math.imul(mixed ^ (mixed >>> 7), 61 | mixed)) ^ mixed;
+    return ((mixed ^ (mixed >>> 14)) >>> 0) / 4294967296;
+  };
+}
+
+function pick<Item>(random: () => number, items: Item[]): Item {
+  return items[Math.floor(random() * items.length)];
+}
+
+/*
+ * A random triple; photo, album and context numbers run past the
+ * initial data so edits keep bringing in new nodes.
+ */
+function randomTriple(random: () => number): Triple {
+  const photo = `urn:ró:photo:x${Math.floor(random() * 120)}`;
+  switch (Math.floor(random() * 5)) {
+    case 0:
+      return [photo, "album", `urn:ró:album:a${Math.floor(random() * 8)}`];
+    case 1:
+      return [photo, "rating", String(Math.floor(random() * 6))];
+    case 2: {
+      const context = pick(random, ["", "?context=wild", "?context=zoo"]);
+      return [
+        photo,
+        "subject",
+        `urn:ró:bird:b${Math.floor(random() * 6)}${context}`,
+      ];
+    }
+    case 3:
+      return [
+        `urn:ró:album:a${Math.floor(random() * 8)}`,
+        "name",
+        `Album ${Math.floor(random() * 8)}`,
+      ];
+    default:
+      return [photo, "location", `urn:ró:place:p${Math.floor(random() * 5)}`];
+  }
+}
+
+const SEARCHES: RangeSearch[] = [
+  { source: { type: "photo" }, relation: "album" },
+  { source: { type: "photo" } },
+  { relation: ["subject", "location"] },
+  { relation: [] },
+  { relation: [], target: { type: "bird" } },
+  { target: { type: "bird", qs: { context: "wild" } } },
+  { target: { id: ["b1", "b2", "p3"] } },
+  { source: { id: "x7" } },
+  { relation: "rating", target: { gte: 2, lt: 5 } },
+  { target: { prefix: "Album" } },
+  { target: { predicate: (value: string) => value.endsWith("3") } },
+  {
+    source: { type: "photo", predicate: (value) => value.length > 14 },
+    relation: { relation: "subject", predicate: (value) => value !== "" },
+  },
+  { source: { type: "missing" } },
+  {},
+];
+
+function sorted(triples: Triple[]): string[] {
+  return triples.map((triple) => triple.join(" | ")).sort();
+}
+
+Deno.test("materialize: live results equal re-running the search", () => {
+  for (const backend of ["typed", "bitmap", "map"] as StoreBackend[]) {
+    const random = makeRandom(backend.length);
+    const initial = Array.from({ length: 200 }, () => randomTriple(random));
+    const db = new TribbleDB(initial, {}, {
+      backend,
+      cacheSize: 16,
+      literalIndex: ["rating"],
+    });
+
+    const views: MaterializedView[] = SEARCHES.map((search, idx) => {
+      return db.materialize(idx % 2 === 0 ? search : db.prepare(search));
+    });
+
+    for (let step = 0; step < 60; step++) {
+      const roll = random();
+      if (roll < 0.45) {
+        db.add(Array.from({ length: 1 + Math.floor(random() * 8) }, () => {
+          return randomTriple(random);
+        }));
+      } else if (roll < 0.9) {
+        const live = db.triples();
+        db.delete(Array.from({ length: 1 + Math.floor(random() * 6) }, () => {
+          return random() < 0.8 ? pick(random, live) : randomTriple(random);
+        }));
+      } else if (roll < 0.95) {
+        db.compact({ pruneStrings: random() < 0.5 });
+      } else {
+        db.searchFlatmap({ relation: "rating" }, ([source, , target]) => {
+          return [[source, "rating", String((Number(target) + 1) % 6)]];
+        });
+      }
+
+      SEARCHES.forEach((search, idx) => {
+        const expected = sorted(db.search(search).triples());
+        assertEquals(sorted(views[idx].triples()), expected);
+        assertEquals(sorted(views[idx].current().triples()), expected);
+        assertEquals(views[idx].size, expected.length);
+      });
+    }
+  }
+});
+
+Deno.test("materialize: change callbacks replay to the result", () => {
+  const random = makeRandom(7);
+  const db = new TribbleDB([], {}, { autoCompact: { tombstoneRatio: 0.2 } });
+  const replayed = new Set<string>();
+  const view = db.materialize(
+    { source: { type: "photo" }, relation: "album" },
+    ({ added, removed }) => {
+      for (const triple of removed) {
+        replayed.delete(triple.join(" | "));
+      }
+      for (const triple of added) {
+        replayed.add(triple.join(" | "));
+      }
+    },
+  );
+
+  for (let step = 0; step < 200; step++) {
+    if (random() < 0.6) {
+      db.add([randomTriple(random), randomTriple(random)]);
+    } else {
+      db.delete([pick(random, db.triples())]);
+    }
+    assertEquals([...replayed].sort(), sorted(view.triples()));
+  }
+
+  view.close();
+  db.add([["urn:ró:photo:x999", "album", "urn:ró:album:a1"]]);
+  assertEquals(
+    replayed.has("urn:ró:photo:x999 | album | urn:ró:album:a1"),
+    false,
+  );
+});
+
+Deno.test("materialize: frozen copies keep their rows", () => {
+  const db = new TribbleDB([
+    ["urn:ró:photo:x1", "album", "urn:ró:album:a1"],
+    ["urn:ró:photo:x2", "album", "urn:ró:album:a1"],
+  ]);
+  const view = db.materialize({ relation: "album" });
+  const before = view.current();
+
+  db.delete([["urn:ró:photo:x1", "album", "urn:ró:album:a1"]]);
+  db.add([["urn:ró:photo:x3", "album", "urn:ró:album:a2"]]);
+
+  assertEquals(before.triplesCount, 2);
+  assertEquals(sorted(view.triples()), [
+    "urn:ró:photo:x2 | album | urn:ró:album:a1",
+    "urn:ró:photo:x3 | album | urn:ró:album:a2",
+  ]);
+  assertThrows(() => db.search({ relation: "album" }).materialize({}));
+});
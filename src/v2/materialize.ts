@@ -0,0 +1,139 @@
+/*
+ * Materialised searches: results kept current as a root database changes,
+ * rather than re-run after every edit.
+ *
+ * A MaterializedView holds the rows one search matches on its root. The
+ * root hands it the rows each add() appended and each delete() tombstoned:
+ * appended rows are checked one at a time against the plan (see
+ * SearchPlan.rowFilter()), and tombstoned rows are removed from the
+ * row-set in place, so keeping the result current costs O(changed rows)
+ * whatever its size. Compaction renumbers rows, so the search is re-run
+ * once then.
+ *
+ * current() hands the row-set out as an ordinary frozen view. Row-sets
+ * handed out are never mutated, so the next change copies it first.
+ */
+
+import type { RowBitmap } from "./bitmap.ts";
+import type { TribbleDB } from "./db.ts";
+import type { SearchPlan } from "./search.ts";
+import type { TripleStore } from "./store.ts";
+import type { ViewChange } from "./types.ts";
+import type { Triple } from "../types.ts";
+
+export class MaterializedView {
+  #plan: SearchPlan;
+  #store: TripleStore;
+  #rows: RowBitmap;
+  // whether #rows has been handed out, and must be copied before a change
+  #shared: boolean;
+  #onChange: ((change: ViewChange) => void) | undefined;
+  #freeze: (rows: RowBitmap) => TribbleDB;
+  #detach: (view: MaterializedView) => void;
+
+  constructor(
+    plan: SearchPlan,
+    store: TripleStore,
+    onChange: ((change: ViewChange) => void) | undefined,
+    freeze: (rows: RowBitmap) => TribbleDB,
+    detach: (view: MaterializedView) => void,
+  ) {
+    this.#plan = plan;
+    this.#store = store;
+    this.#onChange = onChange;
+    this.#freeze = freeze;
+    this.#detach = detach;
+    // execute() may return a row-set it shares, such as the live rows
+    this.#rows = plan.execute(store, null);
+    this.#shared = true;
+  }
+
+  get size(): number {
+    return this.#rows.size;
+  }
+
+  /*
+   * The result as it stands, as a frozen view: later changes do not
+   * reach it.
+   */
+  current(): TribbleDB {
+    this.#shared = true;
+    return this.#freeze(this.#rows);
+  }
+
+  triples(): Triple[] {
+    const triples: Triple[] = [];
+    this.#rows.forEach((row) => {
+      triples.push(this.#store.resolveRow(row));
+    });
+    return triples;
+  }
+
+  /*
+   * Stop keeping the result current.
+   */
+  close(): void {
+    this.#detach(this);
+  }
+
+  #ownRows(): RowBitmap {
+    if (this.#shared) {
+      this.#rows = this.#rows.copy();
+      this.#shared = false;
+    }
+    return this.#rows;
+  }
+
+  #notify(added: number[], removed: number[]): void {
+    if (this.#onChange === undefined) {
+      return;
+    }
+    if (added.length > 0 || removed.length > 0) {
+      const store = this.#store;
+      this.#onChange({
+        added: added.map((row) => store.resolveRow(row)),
+        removed: removed.map((row) => store.resolveRow(row)),
+      });
+    }
+  }
+
+  /*
+   * Called by the root with the rows an add() appended.
+   */
+  rowsAdded(rows: number[]): void {
+    const filter = this.#plan.rowFilter(this.#store);
+    const added: number[] = [];
+
+    for (const row of rows) {
+      if (filter(row)) {
+        this.#ownRows().add(row);
+        added.push(row);
+      }
+    }
+    this.#notify(added, []);
+  }
+
+  /*
+   * Called by the root with the rows a delete() tombstoned.
+   */
+  rowsDeleted(rows: number[]): void {
+    const removed: number[] = [];
+
+    for (const row of rows) {
+      if (this.#rows.has(row)) {
+        this.#ownRows().delete(row);
+        removed.push(row);
+      }
+    }
+    this.#notify([], removed);
+  }
+
+  /*
+   * Called by the root when compaction has replaced its store.
+   */
+  rebuild(store: TripleStore): void {
+    this.#store = store;
+    this.#rows = this.#plan.execute(store, null);
+    this.#shared = true;
+  }
+}
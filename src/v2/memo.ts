@@ -0,0 +1,53 @@
+/*
+ * Per-query memoisation of user predicates by interned id. A node string
+ * can sit on a large share of the rows a query checks (a boolean literal,
+ * a popular album URN); its verdict is computed once per distinct
+ * predicate and read back from a byte table afterwards, so predicates
+ * must be pure: one call per distinct string may stand in for many.
+ */
+
+const UNKNOWN = 0;
+const PASSED = 1;
+const FAILED = 2;
+
+export class PredicateMemo {
+  #size: number;
+  #verdicts: Map<(value: string) => boolean, Uint8Array>;
+
+  // predicate calls made, and calls answered from the memo instead
+  calls: number;
+  saved: number;
+
+  /*
+   * `size` bounds the ids that will be tested: the interner's size.
+   */
+  constructor(size: number) {
+    this.#size = size;
+    this.#verdicts = new Map();
+    this.calls = 0;
+    this.saved = 0;
+  }
+
+  test(
+    predicate: (value: string) => boolean,
+    id: number,
+    valueOf: (id: number) => string,
+  ): boolean {
+    let verdicts = this.#verdicts.get(predicate);
+    if (!verdicts) {
+      verdicts = new Uint8Array(this.#size);
+      this.#verdicts.set(predicate, verdicts);
+    }
+
+    const known = verdicts[id];
+    if (known !== UNKNOWN) {
+      this.saved++;
+      return known === PASSED;
+    }
+
+    this.calls++;
+    const passed = predicate(valueOf(id));
+    verdicts[id] = passed ? PASSED : FAILED;
+    return passed;
+  }
+}
@@ -0,0 +1,103 @@
+/*
+ * Engine metrics tests: every instrumented operation lands in its
+ * histogram, the counters agree with the work done, subscribers hear each
+ * operation's own share, and views report to their source's metrics.
+ */
+
+import { assertEquals } from "@std/assert";
+import { EngineMetrics, TribbleDB } from "./mod.ts";
+import type { OperationEvent, StoreBackend } from "./mod.ts";
+import type { Triple } from "../types.ts";
+
+function photos(count: number): Triple[] {
+  const triples: Triple[] = [];
+  for (let idx = 0; idx < count; idx++) {
+    triples.push([
+      `urn:ró:photo:x${idx}`,
+      "album",
+      `urn:ró:album:a${idx % 3}`,
+    ]);
+    triples.push([`urn:ró:photo:x${idx}`, "rating", String(idx % 5)]);
+  }
+  return triples;
+}
+
+Deno.test("metrics: each operation is timed in its histogram", () => {
+  const metrics = new EngineMetrics();
+  const db = new TribbleDB(photos(20), {}, { metrics });
+
+  db.search({ relation: "album" });
+  db.search({ source: { type: "photo" }, relation: "rating" });
+  db.readThing("urn:ró:photo:x1");
+  db.objects();
+  db.nodes("urn:ró:photo:x1").follow("album").referencedBy("album");
+  db.paths("urn:ró:photo:x2").follow("album");
+
+  const { operations } = metrics.snapshot();
+  assertEquals(operations.add.count, 1);
+  assertEquals(operations.search.count, 2);
+  assertEquals(operations.readThing.count, 1);
+  assertEquals(operations.objects.count, 1);
+  assertEquals(operations.hop.count, 3);
+
+  const { buckets, count, maxMs, p50Ms, p99Ms } = operations.search;
+  assertEquals(buckets.reduce((sum, [, hits]) => sum + hits, 0), count);
+  assertEquals(p50Ms <= p99Ms && p99Ms <= maxMs, true);
+
+  metrics.reset();
+  assertEquals(metrics.snapshot().operations.search.count, 0);
+  assertEquals(metrics.counters.rowsMatched, 0);
+});
+
+Deno.test("metrics: searches count matched rows and tombstones", () => {
+  for (const backend of ["typed", "bitmap", "map"] as StoreBackend[]) {
+    const metrics = new EngineMetrics();
+    const db = new TribbleDB(photos(30), {}, { backend, metrics });
+    db.delete(photos(10));
+
+    const events: OperationEvent[] = [];
+    const unsubscribe = metrics.subscribe((event) => events.push(event));
+
+    const rated = db.search({ source: { type: "photo" }, relation: "rating" });
+    assertEquals(events.length, 1);
+    const [{ operation, counters }] = events;
+    assertEquals(operation, "search");
+    assertEquals(counters.rowsMatched, rated.triplesCount);
+    assertEquals(counters.rowsScanned >= counters.rowsMatched, true);
+
+    db.search({ source: { type: "photo" } });
+    assertEquals(events[1].counters.tombstonesSkipped, 20);
+    assertEquals(events[1].counters.rowsMatched, 40);
+
+    unsubscribe();
+    db.search({ relation: "album" });
+    assertEquals(events.length, 2);
+    assertEquals(metrics.snapshot().operations.search.count, 3);
+  }
+});
+
+Deno.test("metrics: reads and hops count their work", () => {
+  const metrics = new EngineMetrics();
+  const db = new TribbleDB(photos(12), {}, { metrics, cacheSize: 0 });
+  db.delete([["urn:ró:photo:x0", "album", "urn:ró:album:a0"]]);
+
+  const events: OperationEvent[] = [];
+  metrics.subscribe((event) => events.push(event));
+
+  db.readThing("urn:ró:photo:x1");
+  assertEquals(events[0].counters.rowsMatched, 2);
+  assertEquals(events[0].counters.stringsResolved > 0, true);
+
+  const albums = db.nodes("urn:ró:album:a0").referencedBy("album");
+  assertEquals(albums.count(), 3);
+  assertEquals(events[1].operation, "hop");
+  assertEquals(events[1].counters.postingListsTouched, 1);
+  assertEquals(events[1].counters.rowsMatched, 3);
+  assertEquals(events[1].counters.tombstonesSkipped, 1);
+
+  // a view of the database reports to the same metrics
+  db.search({ relation: "rating" }).readThing("urn:ró:photo:x2");
+  assertEquals(events.at(-1)!.operation, "readThing");
+  assertEquals(events.at(-1)!.counters.rowsMatched, 1);
+  assertEquals(metrics.snapshot().operations.readThing.count, 2);
+});
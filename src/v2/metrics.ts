@@ -0,0 +1,195 @@
+/*
+ * Opt-in instrumentation (TribbleDBOpts `metrics`): latency histograms for
+ * search(), readThing(), add(), traversal hops and objects(), and counters
+ * for the work behind them.
+ *
+ * A database without metrics pays one null check per instrumented
+ * operation. With metrics, each operation is bracketed by start() and
+ * end(), and the engine adds to `counters` where the work happens: the
+ * search planner, point reads and hops count rows and posting lists as
+ * they go, and the interners count strings decoded. A frame copies the
+ * counters at start(), so end() can report what the operation itself did.
+ *
+ * One EngineMetrics can be shared by many databases; views and derived
+ * databases report to their source's.
+ */
+
+import type { StringTable } from "./interner.ts";
+import type { TripleStore } from "./store.ts";
+import type {
+  InstrumentedOperation,
+  LatencyHistogram,
+  MetricCounters,
+  MetricsSnapshot,
+  OperationEvent,
+} from "./types.ts";
+
+const OPERATIONS: InstrumentedOperation[] = [
+  "search",
+  "readThing",
+  "add",
+  "hop",
+  "objects",
+];
+
+// bucket upper bounds: 1µs doubling to ~16.8s, then everything slower
+const BUCKET_BOUNDS_MS = [
+  ...Array.from({ length: 25 }, (_, idx) => 2 ** idx / 1000),
+  Infinity,
+];
+
+function zeroCounters(): MetricCounters {
+  return {
+    rowsScanned: 0,
+    rowsMatched: 0,
+    postingListsTouched: 0,
+    tombstonesSkipped: 0,
+    stringsResolved: 0,
+  };
+}
+
+class Histogram {
+  counts: Uint32Array;
+  count: number;
+  totalMs: number;
+  maxMs: number;
+
+  constructor() {
+    this.counts = new Uint32Array(BUCKET_BOUNDS_MS.length);
+    this.count = 0;
+    this.totalMs = 0;
+    this.maxMs = 0;
+  }
+
+  record(durationMs: number): void {
+    let bucket = 0;
+    while (durationMs > BUCKET_BOUNDS_MS[bucket]) {
+      bucket++;
+    }
+    this.counts[bucket]++;
+    this.count++;
+    this.totalMs += durationMs;
+    this.maxMs = Math.max(this.maxMs, durationMs);
+  }
+
+  #percentile(fraction: number): number {
+    const rank = Math.ceil(fraction * this.count);
+    let seen = 0;
+    for (let bucket = 0; bucket < this.counts.length; bucket++) {
+      seen += this.counts[bucket];
+      if (seen >= rank && seen > 0) {
+        return Math.min(BUCKET_BOUNDS_MS[bucket], this.maxMs);
+      }
+    }
+    return 0;
+  }
+
+  snapshot(): LatencyHistogram {
+    return {
+      count: this.count,
+      totalMs: this.totalMs,
+      maxMs: this.maxMs,
+      p50Ms: this.#percentile(0.5),
+      p95Ms: this.#percentile(0.95),
+      p99Ms: this.#percentile(0.99),
+      buckets: BUCKET_BOUNDS_MS.map((bound, bucket) => {
+        return [bound, this.counts[bucket]];
+      }),
+    };
+  }
+}
+
+/*
+ * An operation in progress: when it started, where the counters stood,
+ * and the store whose interners it reads.
+ */
+export type OperationFrame = {
+  started: number;
+  store: TripleStore;
+  counters: MetricCounters;
+};
+
+export class EngineMetrics {
+  // cumulative; added to by the engine as it works
+  readonly counters: MetricCounters;
+
+  #histograms: Map<InstrumentedOperation, Histogram>;
+  #listeners: Set<(event: OperationEvent) => void>;
+  // each interner's decode count when the counters last caught up with it
+  #resolvedSeen: WeakMap<StringTable, number>;
+
+  constructor() {
+    this.counters = zeroCounters();
+    this.#histograms = new Map(
+      OPERATIONS.map((operation) => [operation, new Histogram()]),
+    );
+    this.#listeners = new Set();
+    this.#resolvedSeen = new WeakMap();
+  }
+
+  /*
+   * Add the strings a store's interners have decoded since last seen. An
+   * interner seen for the first time only sets the baseline.
+   */
+  #catchUp(store: TripleStore): void {
+    for (const table of [store.nodes, store.relationNames]) {
+      const seen = this.#resolvedSeen.get(table);
+      if (seen !== undefined) {
+        this.counters.stringsResolved += table.resolved - seen;
+      }
+      this.#resolvedSeen.set(table, table.resolved);
+    }
+  }
+
+  start(store: TripleStore): OperationFrame {
+    this.#catchUp(store);
+    return {
+      started: performance.now(),
+      store,
+      counters: { ...this.counters },
+    };
+  }
+
+  end(operation: InstrumentedOperation, frame: OperationFrame): void {
+    const durationMs = performance.now() - frame.started;
+    this.#catchUp(frame.store);
+    this.#histograms.get(operation)!.record(durationMs);
+
+    if (this.#listeners.size === 0) {
+      return;
+    }
+    const counters = zeroCounters();
+    for (const key of Object.keys(counters) as (keyof MetricCounters)[]) {
+      counters[key] = this.counters[key] - frame.counters[key];
+    }
+    for (const listener of this.#listeners) {
+      listener({ operation, durationMs, counters });
+    }
+  }
+
+  /*
+   * Hear of every completed operation, for export to another metrics
+   * system. Returns a function that unsubscribes.
+   */
+  subscribe(listener: (event: OperationEvent) => void): () => void {
+    this.#listeners.add(listener);
+    return () => {
+      this.#listeners.delete(listener);
+    };
+  }
+
+  snapshot(): MetricsSnapshot {
+    const operations = {} as Record<InstrumentedOperation, LatencyHistogram>;
+    for (const [operation, histogram] of this.#histograms) {
+      operations[operation] = histogram.snapshot();
+    }
+    return { operations, counters: { ...this.counters } };
+  }
+
+  reset(): void {
+    Object.assign(this.counters, zeroCounters());
+    for (const operation of OPERATIONS) {
+      this.#histograms.set(operation, new Histogram());
+    }
+  }
+}
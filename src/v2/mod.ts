@@ -3,14 +3,52 @@
  * additive traversal layer.
  */
 
-export { TribbleDB } from "./db.ts";
+export { PreparedSearch, TribbleDB } from "./db.ts";
 export { NodeView, PathView } from "./traverse.ts";
 export { TripleStore } from "./store.ts";
+export { MaterializedView } from "./materialize.ts";
+export { EngineMetrics } from "./metrics.ts";
+export { SearchWorkerPool } from "./parallel-search.ts";
+export { QueryTrace, revived, traced } from "./trace.ts";
 export type {
   AddReport,
+  Bindings,
+  CacheStats,
+  CompactionPolicy,
+  CompactOpts,
+  DurableOpts,
+  FacetKey,
+  FacetOpts,
+  FsyncPolicy,
   HopOpts,
+  InstrumentedOperation,
+  InternerKind,
+  LatencyHistogram,
+  LiteralRange,
+  MetricCounters,
+  MetricsSnapshot,
   NodeFilterQuery,
   NodeSelector,
   ObjectOpts,
+  OperationEvent,
+  ParallelLoadOpts,
+  ParallelNodeQuery,
+  ParallelSearch,
+  PathOpts,
+  PredicateRef,
+  RangeNodeQuery,
+  RangeSearch,
   ReadOpts,
+  SearchPage,
+  SearchPoolOpts,
+  StoreBackend,
+  TracedPredicate,
+  TracedValue,
+  TraceEntry,
+  TribbleDBOpts,
+  TribbleExportOpts,
+  TriplePattern,
+  ViewChange,
 } from "./types.ts";
+export type { DurableFiles } from "./wal.ts";
+export type { PlanStage, PlanStep, SearchExplanation } from "./search.ts";
@@ -0,0 +1,138 @@
+/*
+ * Parallel search tests: searchParallel() must return exactly the rows
+ * search() returns with the referenced predicates, on roots with deleted
+ * rows and on views, for every backend, whether the predicate pass runs
+ * on workers or the calling thread, and as the store grows.
+ */
+
+import { assertEquals, assertRejects } from "@std/assert";
+import { SearchWorkerPool, TribbleDB } from "./mod.ts";
+import type { ParallelSearch, RangeSearch, StoreBackend } from "./mod.ts";
+import type { Predicate, Triple } from "../types.ts";
+import * as predicates from "./testdata/predicates.ts";
+
+const MODULE = new URL("./testdata/predicates.ts", import.meta.url).href;
+
+function ref(name: keyof typeof predicates) {
+  return { module: MODULE, name };
+}
+
+function photos(from: number, count: number): Triple[] {
+  const triples: Triple[] = [];
+  for (let idx = from; idx < from + count; idx++) {
+    const photo = `urn:ró:photo:x${idx}`;
+    triples.push([photo, "rating", String(idx % 5)]);
+    triples.push([photo, "subject", `urn:ró:bird:b${idx % 13}`]);
+    triples.push([photo, "location", `urn:ró:place:p${idx % 7}`]);
+  }
+  return triples;
+}
+
+const SEARCHES: ParallelSearch[] = [
+  { source: { type: "photo", predicate: ref("endsInOddDigit") } },
+  { relation: "rating", target: { predicate: ref("isHighRating") } },
+  {
+    source: { predicate: ref("endsInOddDigit") },
+    relation: { relation: ["subject", "location"] },
+    target: { type: "bird", predicate: ref("endsInOddDigit") },
+  },
+  { relation: { relation: [], predicate: ref("isShortRelation") } },
+  { source: "urn:ró:photo:x3", target: { predicate: ref("isHighRating") } },
+  { target: { type: "place" } },
+];
+
+/*
+ * The search with its references swapped for the functions themselves.
+ */
+function direct(search: ParallelSearch): RangeSearch {
+  const resolved: Record<string, unknown> = { ...search };
+  for (const position of ["source", "relation", "target"] as const) {
+    const query = search[position];
+    if (typeof query === "object" && !Array.isArray(query) && query.predicate) {
+      const name = query.predicate.name as keyof typeof predicates;
+      resolved[position] = {
+        ...query,
+        predicate: predicates[name] as Predicate,
+      };
+    }
+  }
+  return resolved as RangeSearch;
+}
+
+function sorted(triples: Triple[]): string[] {
+  return triples.map((triple) => triple.join(" | ")).sort();
+}
+
+Deno.test("parallel search: matches search() on workers and inline", async () => {
+  const pools = [
+    new SearchWorkerPool({ workers: 3, chunkRows: 100, minRows: 0 }),
+    new SearchWorkerPool({ workers: 2, minRows: Infinity }),
+  ];
+
+  try {
+    for (const backend of ["typed", "bitmap", "map"] as StoreBackend[]) {
+      const db = new TribbleDB(photos(0, 400), {}, { backend });
+      db.delete(photos(100, 50));
+      const view = db.search({ relation: ["rating", "subject"] });
+
+      for (const pool of pools) {
+        for (const search of SEARCHES) {
+          for (const target of [db, view]) {
+            const expected = target.search(direct(search)).triples();
+            const actual = await target.searchParallel(search, pool);
+            assertEquals(actual.triples(), expected);
+          }
+        }
+
+        // the image is rebuilt once the store grows
+        db.add(photos(1000, 20));
+        const grown = await db.searchParallel(SEARCHES[0], pool);
+        assertEquals(
+          sorted(grown.triples()),
+          sorted(db.search(direct(SEARCHES[0])).triples()),
+        );
+      }
+    }
+  } finally {
+    for (const pool of pools) {
+      pool.close();
+    }
+  }
+});
+
+Deno.test("parallel search: predicate failures reject", async () => {
+  const pool = new SearchWorkerPool({ workers: 2, chunkRows: 50, minRows: 0 });
+  const db = new TribbleDB(photos(0, 100));
+
+  try {
+    await assertRejects(
+      () =>
+        db.searchParallel(
+          { target: { predicate: ref("throwsOnBirds") } },
+          pool,
+        ),
+      Error,
+      "no birds",
+    );
+    await assertRejects(
+      () =>
+        db.searchParallel({
+          target: { predicate: { module: MODULE, name: "missing" } },
+        }, pool),
+      Error,
+      "missing",
+    );
+
+    // the pool keeps working after a failed search
+    const rated = await db.searchParallel(SEARCHES[1], pool);
+    assertEquals(rated.triplesCount, 40);
+  } finally {
+    pool.close();
+  }
+
+  await assertRejects(
+    () => db.searchParallel(SEARCHES[1], pool),
+    Error,
+    "closed",
+  );
+});
@@ -0,0 +1,509 @@
+/*
+ * Parallel search (TribbleDB.searchParallel()). The posting lists narrow a
+ * search to its candidate rows on the calling thread as usual; only the
+ * predicate pass, a loop over candidate rows decoding node strings, is
+ * spread over a pool of workers.
+ *
+ * Workers read a StoreImage: the store's id columns and its node and
+ * relation strings (UTF-8, with offsets) copied into SharedArrayBuffers.
+ * An image is built once per store and state, and shared, not copied,
+ * with every worker. The candidate rows are shared the same way and
+ * handed out in chunks; each chunk comes back as its passing rows in
+ * ascending order, so the chunks concatenate into the sorted result.
+ *
+ * Predicates are PredicateRefs, which each worker imports once. Small
+ * candidate sets, and runtimes without SharedArrayBuffer, run the same
+ * pass on the calling thread.
+ */
+
+import { RowBitmap } from "./bitmap.ts";
+import { PredicateMemo } from "./memo.ts";
+import type { TripleStore } from "./store.ts";
+import type {
+  ParallelSearch,
+  PredicateRef,
+  RangeSearch,
+  SearchPoolOpts,
+} from "./types.ts";
+import type { Predicate } from "../types.ts";
+
+// the npm build bundles the worker next to mod.js as plain JavaScript
+const WORKER_URL = new URL(
+  import.meta.url.endsWith(".ts") ? "./search-worker.ts" : "./search-worker.js",
+  import.meta.url,
+);
+
+const DEFAULT_CHUNK_ROWS = 16_384;
+const DEFAULT_MIN_ROWS = 8_192;
+
+/*
+ * A store's columns and strings in shared memory. Node id `id` is
+ * nodeBytes[nodeOffsets[id], nodeOffsets[id + 1]); likewise relations.
+ */
+export type StoreImage = {
+  id: number;
+  sourceIds: Uint32Array;
+  relationIds: Uint32Array;
+  targetIds: Uint32Array;
+  nodeBytes: Uint8Array;
+  nodeOffsets: Uint32Array;
+  relationBytes: Uint8Array;
+  relationOffsets: Uint32Array;
+};
+
+/*
+ * The predicate each position is tested against; null when the position
+ * has none.
+ */
+export type PositionRefs = {
+  source: PredicateRef | null;
+  relation: PredicateRef | null;
+  target: PredicateRef | null;
+};
+
+/*
+ * Rows [start, end) of `rows` to test. `image` is sent only to workers
+ * holding another image.
+ */
+export type ChunkTask = {
+  image: StoreImage | undefined;
+  imageId: number;
+  rows: Uint32Array;
+  start: number;
+  end: number;
+  refs: PositionRefs;
+};
+
+export type ChunkResult = {
+  passed?: Uint32Array;
+  error?: string;
+};
+
+/*
+ * What a predicate pass reads: a store's own columns and interners, or a
+ * worker's StoreImage.
+ */
+export type RowSource = {
+  sourceIds: ArrayLike<number>;
+  relationIds: ArrayLike<number>;
+  targetIds: ArrayLike<number>;
+  nodeCount: number;
+  relationCount: number;
+  nodeValue(id: number): string;
+  relationValue(id: number): string;
+};
+
+const predicateModules = new Map<string, Promise<Record<string, unknown>>>();
+
+export async function loadPredicate(ref: PredicateRef): Promise<Predicate> {
+  let loading = predicateModules.get(ref.module);
+  if (loading === undefined) {
+    loading = import(ref.module);
+    predicateModules.set(ref.module, loading);
+  }
+
+  const predicate = (await loading)[ref.name];
+  if (typeof predicate !== "function") {
+    throw new TypeError(
+      `Predicate ${ref.name} is not a function exported by ${ref.module}`,
+    );
+  }
+  return predicate as Predicate;
+}
+
+/*
+ * The search without its predicates, which selects the same candidate
+ * rows (predicates never narrow the posting-list stages), and the
+ * predicates by position.
+ */
+export function splitPredicates(
+  params: ParallelSearch,
+): { search: RangeSearch; refs: PositionRefs } {
+  const refs: PositionRefs = { source: null, relation: null, target: null };
+  const search: Record<string, unknown> = {};
+
+  for (const position of ["source", "relation", "target"] as const) {
+    const query = params[position];
+    if (typeof query !== "object" || Array.isArray(query)) {
+      search[position] = query;
+      continue;
+    }
+    const { predicate, ...rest } = query;
+    search[position] = rest;
+    refs[position] = predicate ?? null;
+  }
+  return { search: search as RangeSearch, refs };
+}
+
+/*
+ * The search with each PredicateRef loaded, for search().
+ */
+export async function resolvePredicates(
+  params: ParallelSearch,
+): Promise<RangeSearch> {
+  const { search, refs } = splitPredicates(params);
+  const resolved: Record<string, unknown> = { ...search };
+
+  for (const position of ["source", "relation", "target"] as const) {
+    const ref = refs[position];
+    if (ref !== null) {
+      resolved[position] = {
+        ...resolved[position] as object,
+        predicate: await loadPredicate(ref),
+      };
+    }
+  }
+  return resolved as RangeSearch;
+}
+
+export async function loadPositions(
+  refs: PositionRefs,
+): Promise<Record<keyof PositionRefs, Predicate | null>> {
+  return {
+    source: refs.source && await loadPredicate(refs.source),
+    relation: refs.relation && await loadPredicate(refs.relation),
+    target: refs.target && await loadPredicate(refs.target),
+  };
+}
+
+/*
+ * Memoised predicate verdicts for one RowSource.
+ */
+export class SourceMemos {
+  node: PredicateMemo;
+  relation: PredicateMemo;
+
+  constructor(source: RowSource) {
+    this.node = new PredicateMemo(source.nodeCount);
+    this.relation = new PredicateMemo(source.relationCount);
+  }
+}
+
+/*
+ * The rows of rows[start, end) whose positions pass their predicates, in
+ * the order given.
+ */
+export function filterRows(
+  source: RowSource,
+  predicates: Record<keyof PositionRefs, Predicate | null>,
+  memos: SourceMemos,
+  rows: ArrayLike<number>,
+  start: number,
+  end: number,
+): Uint32Array {
+  const { node, relation } = memos;
+  const nodeValue = (id: number) => source.nodeValue(id);
+  const relationValue = (id: number) => source.relationValue(id);
+  const passed = new Uint32Array(end - start);
+  let count = 0;
+
+  for (let idx = start; idx < end; idx++) {
+    const row = rows[idx];
+    if (
+      predicates.source !== null &&
+      !node.test(predicates.source, source.sourceIds[row], nodeValue)
+    ) {
+      continue;
+    }
+    if (
+      predicates.relation !== null &&
+      !relation.test(
+        predicates.relation,
+        source.relationIds[row],
+        relationValue,
+      )
+    ) {
+      continue;
+    }
+    if (
+      predicates.target !== null &&
+      !node.test(predicates.target, source.targetIds[row], nodeValue)
+    ) {
+      continue;
+    }
+    passed[count++] = row;
+  }
+  return passed.slice(0, count);
+}
+
+function storeSource(store: TripleStore): RowSource {
+  return {
+    sourceIds: store.sourceIds,
+    relationIds: store.relationIds,
+    targetIds: store.targetIds,
+    nodeCount: store.nodes.size,
+    relationCount: store.relationNames.size,
+    nodeValue: (id) => store.nodes.valueOf(id),
+    relationValue: (id) => store.relationNames.valueOf(id),
+  };
+}
+
+export function imageSource(image: StoreImage): RowSource {
+  const decoder = new TextDecoder();
+  // decode() rejects views of shared memory, so each string is copied out
+  const valueOf = (bytes: Uint8Array, offsets: Uint32Array, id: number) => {
+    return decoder.decode(bytes.slice(offsets[id], offsets[id + 1]));
+  };
+
+  return {
+    sourceIds: image.sourceIds,
+    relationIds: image.relationIds,
+    targetIds: image.targetIds,
+    nodeCount: image.nodeOffsets.length - 1,
+    relationCount: image.relationOffsets.length - 1,
+    nodeValue: (id) => valueOf(image.nodeBytes, image.nodeOffsets, id),
+    relationValue: (id) => {
+      return valueOf(image.relationBytes, image.relationOffsets, id);
+    },
+  };
+}
+
+function sharedColumn(column: ArrayLike<number>, length: number): Uint32Array {
+  const shared = new Uint32Array(new SharedArrayBuffer(4 * length));
+  for (let row = 0; row < length; row++) {
+    shared[row] = column[row];
+  }
+  return shared;
+}
+
+/*
+ * `count` strings as UTF-8 in shared memory, with count + 1 offsets.
+ */
+function sharedStrings(
+  count: number,
+  valueOf: (id: number) => string,
+): { bytes: Uint8Array; offsets: Uint32Array } {
+  const encoder = new TextEncoder();
+  const offsets = new Uint32Array(new SharedArrayBuffer(4 * (count + 1)));
+  let staged = new Uint8Array(1024);
+  let length = 0;
+
+  for (let id = 0; id < count; id++) {
+    const value = valueOf(id);
+    // UTF-8 takes at most 3 bytes per UTF-16 code unit
+    if (length + 3 * value.length > staged.length) {
+      const grown = new Uint8Array(
+        Math.max(2 * staged.length, length + 3 * value.length),
+      );
+      grown.set(staged.subarray(0, length));
+      staged = grown;
+    }
+    length += encoder.encodeInto(value, staged.subarray(length)).written;
+    offsets[id + 1] = length;
+  }
+
+  const bytes = new Uint8Array(new SharedArrayBuffer(length));
+  bytes.set(staged.subarray(0, length));
+  return { bytes, offsets };
+}
+
+type CachedImage = {
+  rowCount: number;
+  nodeCount: number;
+  relationCount: number;
+  image: StoreImage;
+};
+
+type PoolWorker = {
+  worker: Worker;
+  imageId: number;
+  task: PendingChunk | undefined;
+};
+
+type PendingChunk = {
+  task: ChunkTask;
+  resolve: (passed: Uint32Array) => void;
+  reject: (err: Error) => void;
+};
+
+export class SearchWorkerPool {
+  readonly size: number;
+  readonly chunkRows: number;
+  readonly minRows: number;
+
+  #workers: PoolWorker[];
+  #queue: PendingChunk[];
+  #images: WeakMap<TripleStore, CachedImage>;
+  #nextImageId: number;
+  #closed: boolean;
+
+  constructor(opts: SearchPoolOpts = {}) {
+    this.size = Math.max(1, opts.workers ?? navigator.hardwareConcurrency);
+    this.chunkRows = opts.chunkRows ?? DEFAULT_CHUNK_ROWS;
+    this.minRows = opts.minRows ?? DEFAULT_MIN_ROWS;
+    this.#workers = [];
+    this.#queue = [];
+    this.#images = new WeakMap();
+    this.#nextImageId = 1;
+    this.#closed = false;
+  }
+
+  /*
+   * The store's image, rebuilt once the store has grown. Deletes do not
+   * touch an image: candidate rows are already visible ones.
+   */
+  #imageOf(store: TripleStore): StoreImage {
+    const cached = this.#images.get(store);
+    if (
+      cached !== undefined && cached.rowCount === store.rowCount &&
+      cached.nodeCount === store.nodes.size &&
+      cached.relationCount === store.relationNames.size
+    ) {
+      return cached.image;
+    }
+
+    const rowCount = store.rowCount;
+    const nodes = sharedStrings(store.nodes.size, (id) => {
+      return store.nodes.valueOf(id);
+    });
+    const relations = sharedStrings(store.relationNames.size, (id) => {
+      return store.relationNames.valueOf(id);
+    });
+    const image: StoreImage = {
+      id: this.#nextImageId++,
+      sourceIds: sharedColumn(store.sourceIds, rowCount),
+      relationIds: sharedColumn(store.relationIds, rowCount),
+      targetIds: sharedColumn(store.targetIds, rowCount),
+      nodeBytes: nodes.bytes,
+      nodeOffsets: nodes.offsets,
+      relationBytes: relations.bytes,
+      relationOffsets: relations.offsets,
+    };
+
+    this.#images.set(store, {
+      rowCount,
+      nodeCount: store.nodes.size,
+      relationCount: store.relationNames.size,
+      image,
+    });
+    return image;
+  }
+
+  #spawn(): PoolWorker {
+    const entry: PoolWorker = {
+      worker: new Worker(WORKER_URL, { type: "module" }),
+      imageId: 0,
+      task: undefined,
+    };
+
+    entry.worker.onmessage = (event: MessageEvent<ChunkResult>) => {
+      const pending = entry.task!;
+      entry.task = undefined;
+      if (event.data.error !== undefined) {
+        pending.reject(new Error(event.data.error));
+      } else {
+        pending.resolve(event.data.passed!);
+      }
+      this.#dispatch();
+    };
+    entry.worker.onerror = (event: ErrorEvent) => {
+      event.preventDefault();
+      entry.task?.reject(new Error(`Search worker failed: ${event.message}`));
+      entry.worker.terminate();
+      this.#workers.splice(this.#workers.indexOf(entry), 1);
+      this.#dispatch();
+    };
+
+    this.#workers.push(entry);
+    return entry;
+  }
+
+  #dispatch(): void {
+    while (this.#queue.length > 0) {
+      let idle = this.#workers.find((entry) => entry.task === undefined);
+      if (idle === undefined && this.#workers.length < this.size) {
+        idle = this.#spawn();
+      }
+      if (idle === undefined) {
+        return;
+      }
+
+      const pending = this.#queue.shift()!;
+      const { task } = pending;
+      idle.task = pending;
+      idle.worker.postMessage({
+        ...task,
+        image: idle.imageId === task.imageId ? undefined : task.image,
+      });
+      idle.imageId = task.imageId;
+    }
+  }
+
+  #runChunk(task: ChunkTask): Promise<Uint32Array> {
+    if (this.#closed) {
+      return Promise.reject(new Error("The search worker pool is closed"));
+    }
+    return new Promise((resolve, reject) => {
+      this.#queue.push({ task, resolve, reject });
+      this.#dispatch();
+    });
+  }
+
+  /*
+   * The candidate rows passing the predicates in `refs`.
+   */
+  async filter(
+    store: TripleStore,
+    candidates: RowBitmap,
+    refs: PositionRefs,
+  ): Promise<RowBitmap> {
+    if (
+      refs.source === null && refs.relation === null && refs.target === null
+    ) {
+      return candidates;
+    }
+
+    if (
+      candidates.size < this.minRows ||
+      typeof SharedArrayBuffer === "undefined"
+    ) {
+      const source = storeSource(store);
+      const predicates = await loadPositions(refs);
+      const rows = new Uint32Array(candidates.size);
+      let idx = 0;
+      candidates.forEach((row) => {
+        rows[idx++] = row;
+      });
+      const memos = new SourceMemos(source);
+      return RowBitmap.unionOf([
+        filterRows(source, predicates, memos, rows, 0, rows.length),
+      ]);
+    }
+
+    const image = this.#imageOf(store);
+    const rows = new Uint32Array(new SharedArrayBuffer(4 * candidates.size));
+    let idx = 0;
+    candidates.forEach((row) => {
+      rows[idx++] = row;
+    });
+
+    const chunks: Promise<Uint32Array>[] = [];
+    for (let start = 0; start < rows.length; start += this.chunkRows) {
+      chunks.push(this.#runChunk({
+        image,
+        imageId: image.id,
+        rows,
+        start,
+        end: Math.min(rows.length, start + this.chunkRows),
+        refs,
+      }));
+    }
+    return RowBitmap.unionOf(await Promise.all(chunks));
+  }
+
+  /*
+   * Stop the workers. Chunks not yet handed out are rejected.
+   */
+  close(): void {
+    this.#closed = true;
+    for (const pending of this.#queue) {
+      pending.reject(new Error("The search worker pool is closed"));
+    }
+    this.#queue = [];
+    for (const entry of this.#workers) {
+      entry.task?.reject(new Error("The search worker pool is closed"));
+      entry.worker.terminate();
+    }
+    this.#workers = [];
+  }
+}
@@ -0,0 +1,140 @@
+/*
+ * Parallel loader tests: fromTribbleParallel must build exactly the store
+ * the sequential loader builds from the same bytes (down to the snapshot
+ * bytes, so interned ids and row order agree too) for any worker count,
+ * and must fail the way the sequential loader fails.
+ */
+
+import { assertEquals, assertRejects } from "@std/assert";
+import { TribbleStringifier } from "../tribble/stringify.ts";
+import { TribbleDB } from "./mod.ts";
+import type { Triple } from "../types.ts";
+
+const WORKER_COUNTS = [1, 2, 3, 8];
+
+function makeRandom(seed: number): () => number {
+  let state = seed;
+  return () => {
+    state |= 0;
+    state = (state + 0x6D2B79F5) | 0;
+    let mixed = Math.imul(state ^ (state >>> 15), 1 | state);
+    mixed = (mixed + Math.imul(mixed ^ (mixed >>> 7), 61 | mixed)) ^ mixed;
+    return ((mixed ^ (mixed >>> 14)) >>> 0) / 4294967296;
+  };
+}
+
+function generateText(random: () => number, photoCount: number): string {
+  const stringifier = new TribbleStringifier();
+  const lines: string[] = [];
+
+  for (let idx = 0; idx < photoCount; idx++) {
+    const photo = `urn:ró:photo:x${idx}`;
+    const place = `urn:ró:place:p${Math.floor(random() * 20)}`;
+    const bird = `urn:ró:bird:b${Math.floor(random() * 15)}`;
+    const triples: Triple[] = [
+      [photo, "location", place],
+      [photo, "subject", random() < 0.5 ? `${bird}?context=wild` : bird],
+      [photo, "rating", String(Math.floor(random() * 5))],
+    ];
+    if (random() < 0.1) {
+      // a duplicate of an earlier photo's triple, usually in another shard
+      triples.push([`urn:ró:photo:x${Math.floor(idx / 2)}`, "rating", "1"]);
+    }
+
+    for (const triple of triples) {
+      lines.push(stringifier.stringify(triple));
+    }
+  }
+
+  return lines.join("\n") + "\n";
+}
+
+function sequential(text: string): Promise<TribbleDB> {
+  return TribbleDB.fromTribbleStream(new Blob([text]).stream());
+}
+
+function parallel(text: string, workers: number): Promise<TribbleDB> {
+  return TribbleDB.fromTribbleParallel(new TextEncoder().encode(text), {}, {
+    workers,
+  });
+}
+
+Deno.test("parallel: generated data loads identically to the sequential loader", async () => {
+  const text = generateText(makeRandom(42), 400);
+  const expected = await sequential(text);
+
+  for (const workers of WORKER_COUNTS) {
+    const db = await parallel(text, workers);
+    assertEquals(db.triples(), expected.triples());
+    assertEquals(db.toSnapshot(), expected.toSnapshot());
+  }
+});
+
+Deno.test("parallel: redeclared ids resolve to the declaration in force", async () => {
+  // dictionary ids are reassigned mid-stream, a BOM leads the input and
+  // the last line has no newline
+  const text = [
+    '﻿0 "urn:ró:photo:a"',
+    '1 "name"',
+    '2 "first"',
+    "0 1 2",
+    "",
+    '2 "second"',
+    "0 1 2",
+    '0 "urn:ró:photo:b"',
+    "0 1 2",
+    '1 "title"',
+    "0 1 2",
+  ].join("\n");
+  const expected = await sequential(text);
+
+  for (const workers of WORKER_COUNTS) {
+    const db = await parallel(text, workers);
+    assertEquals(db.toSnapshot(), expected.toSnapshot());
+  }
+  assertEquals(expected.triplesCount, 4);
+});
+
+Deno.test("parallel: the first error in input order is reported", async () => {
+  const valid = generateText(makeRandom(7), 50);
+  const texts = [
+    `${valid}0 0 99999\n${valid}bad line\n`,
+    `${valid}bad line\n${valid}0 0 99999\n`,
+  ];
+
+  for (const text of texts) {
+    const failure = await assertRejects(() => sequential(text), SyntaxError);
+    for (const workers of WORKER_COUNTS) {
+      await assertRejects(
+        () => parallel(text, workers),
+        SyntaxError,
+        failure.message,
+      );
+    }
+  }
+});
+
+Deno.test("parallel: validations aggregate in input order", async () => {
+  const text = generateText(makeRandom(3), 100);
+  const validations = {
+    rating: (_type: string, _relation: string, value: string) => {
+      return value === "4" ? undefined : `bad rating: ${value}`;
+    },
+  };
+
+  const failure = await assertRejects(() =>
+    TribbleDB.fromTribbleStream(new Blob([text]).stream(), validations)
+  );
+  for (const workers of WORKER_COUNTS) {
+    await assertRejects(
+      () =>
+        TribbleDB.fromTribbleParallel(
+          new TextEncoder().encode(text),
+          validations,
+          { workers },
+        ),
+      Error,
+      failure.message,
+    );
+  }
+});
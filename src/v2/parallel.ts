@@ -0,0 +1,149 @@
+/*
+ * Parallel tribble loader. The input is cut into one shard per worker at
+ * line boundaries; workers parse their shard into dictionary ids and
+ * declarations, and the main thread replays the shards in input order
+ * through the same TribbleLoader the sequential loaders use. Interning
+ * stays on the main thread, so ids, rows and errors are exactly those of
+ * fromTribbleLines; row posting lists are built in one pass at the end.
+ */
+
+import type { TargetValidator } from "../types.ts";
+import type { TripleStore } from "./store.ts";
+import { stripBom, TribbleLoader } from "./bulk.ts";
+import type { ShardResult } from "./ingest-worker.ts";
+
+const NEWLINE_BYTE = 10;
+const QUOTE_CHAR_CODE = 34;
+
+// the npm build bundles the worker next to mod.js as plain JavaScript
+const WORKER_URL = new URL(
+  import.meta.url.endsWith(".ts") ? "./ingest-worker.ts" : "./ingest-worker.js",
+  import.meta.url,
+);
+
+/*
+ * Split bytes into at most `count` [start, end) ranges, each ending just
+ * after a newline (or at the end of the input).
+ */
+function shardBounds(bytes: Uint8Array, count: number): [number, number][] {
+  const bounds: [number, number][] = [];
+
+  let start = 0;
+  for (let shard = 1; shard <= count && start < bytes.length; shard++) {
+    let end = bytes.length;
+    if (shard < count) {
+      const newline = bytes.indexOf(
+        NEWLINE_BYTE,
+        Math.max(start, Math.floor((bytes.length * shard) / count)),
+      );
+      end = newline === -1 ? bytes.length : newline + 1;
+    }
+
+    bounds.push([start, end]);
+    start = end;
+  }
+  return bounds;
+}
+
+function parseShard(bytes: Uint8Array): Promise<ShardResult> {
+  const worker = new Worker(WORKER_URL, { type: "module" });
+
+  return new Promise<ShardResult>((resolve, reject) => {
+    worker.onmessage = (event: MessageEvent<ShardResult>) => {
+      resolve(event.data);
+    };
+    worker.onerror = (event: ErrorEvent) => {
+      event.preventDefault();
+      reject(new Error(`Ingest worker failed: ${event.message}`));
+    };
+    worker.postMessage(bytes, [bytes.buffer as ArrayBuffer]);
+  }).finally(() => worker.terminate());
+}
+
+/*
+ * The text of the tripleIdx-th triple line in a shard, for error messages.
+ */
+function tripleLineText(bytes: Uint8Array, tripleIdx: number): string {
+  let seen = 0;
+  let lineStart = 0;
+
+  while (lineStart <= bytes.length) {
+    let lineEnd = bytes.indexOf(NEWLINE_BYTE, lineStart);
+    if (lineEnd === -1) {
+      lineEnd = bytes.length;
+    }
+
+    const isTriple = lineEnd > lineStart &&
+      bytes[lineEnd - 1] !== QUOTE_CHAR_CODE;
+    if (isTriple && seen++ === tripleIdx) {
+      return new TextDecoder().decode(bytes.subarray(lineStart, lineEnd));
+    }
+    lineStart = lineEnd + 1;
+  }
+  return "";
+}
+
+/*
+ * Feed one parsed shard into the loader in its original line order.
+ */
+function replayShard(
+  loader: TribbleLoader,
+  shard: ShardResult,
+  bytes: Uint8Array,
+): void {
+  const { declIds, declAt, declValues, triples, tripleCount } = shard;
+
+  let decl = 0;
+  for (let triple = 0; triple < tripleCount; triple++) {
+    while (decl < declIds.length && declAt[decl] <= triple) {
+      loader.declare(declIds[decl], declValues[decl]);
+      decl++;
+    }
+
+    const offset = 3 * triple;
+    if (
+      !loader.addTriple(
+        triples[offset],
+        triples[offset + 1],
+        triples[offset + 2],
+      )
+    ) {
+      throw new SyntaxError(
+        `Invalid triple reference: ${tripleLineText(bytes, triple)}`,
+      );
+    }
+  }
+
+  for (; decl < declIds.length; decl++) {
+    loader.declare(declIds[decl], declValues[decl]);
+  }
+
+  if (shard.error !== undefined) {
+    throw new SyntaxError(shard.error);
+  }
+}
+
+/*
+ * Load UTF-8 tribble bytes into an empty store using `workerCount` parsing
+ * workers. Equivalent to loadTribbleStream over the same bytes.
+ */
+export async function loadTribbleParallel(
+  store: TripleStore,
+  bytes: Uint8Array,
+  validations: Record<string, TargetValidator>,
+  workerCount: number,
+): Promise<void> {
+  const input = stripBom(bytes);
+  const bounds = shardBounds(input, Math.max(1, workerCount));
+
+  const shards = await Promise.all(
+    bounds.map(([start, end]) => parseShard(input.slice(start, end))),
+  );
+
+  const loader = new TribbleLoader(store, validations, true);
+  for (let idx = 0; idx < shards.length; idx++) {
+    const [start, end] = bounds[idx];
+    replayShard(loader, shards[idx], input.subarray(start, end));
+  }
+  loader.finish();
+}
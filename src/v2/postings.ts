@@ -0,0 +1,345 @@
+/*
+ * Posting-list indices for the v2 store: dense integer keys (interned ids)
+ * mapped to lists of integer entries (rows or node ids).
+ *
+ * Three layouts sit behind one interface:
+ *   - MapPostings: a Map of Sets, the original layout;
+ *   - BitmapPostings: a Map of compressed RowBitmaps, so search can
+ *     intersect and union posting lists word by word;
+ *   - CsrPostings: compressed sparse rows. A frozen offsets array indexed
+ *     by key plus one Uint32Array of entries, sorted within each key, and
+ *     a mutable tail of sorted number[] per key for fresh appends. The tail
+ *     is merged into the frozen arrays once it reaches a fraction of them,
+ *     so appends stay amortised O(1) and the tail stays small.
+ */
+
+import { RowBitmap } from "./bitmap.ts";
+
+/*
+ * The read surface of one posting list. Set<number> and RowBitmap
+ * satisfy it.
+ */
+export interface PostingList extends Iterable<number> {
+  readonly size: number;
+  has(entry: number): boolean;
+}
+
+export interface PostingIndex {
+  get(key: number): PostingList | undefined;
+  add(key: number, entry: number): void;
+}
+
+export class MapPostings implements PostingIndex {
+  #lists: Map<number, Set<number>>;
+
+  constructor(lists: Map<number, Set<number>> = new Map()) {
+    this.#lists = lists;
+  }
+
+  get(key: number): Set<number> | undefined {
+    return this.#lists.get(key);
+  }
+
+  add(key: number, entry: number): void {
+    let entries = this.#lists.get(key);
+    if (!entries) {
+      entries = new Set();
+      this.#lists.set(key, entries);
+    }
+    entries.add(entry);
+  }
+}
+
+export class BitmapPostings implements PostingIndex {
+  #lists: Map<number, RowBitmap>;
+
+  constructor(lists: Map<number, RowBitmap> = new Map()) {
+    this.#lists = lists;
+  }
+
+  get(key: number): RowBitmap | undefined {
+    return this.#lists.get(key);
+  }
+
+  add(key: number, entry: number): void {
+    let entries = this.#lists.get(key);
+    if (!entries) {
+      entries = new RowBitmap();
+      this.#lists.set(key, entries);
+    }
+    entries.add(entry);
+  }
+}
+
+// the tail is merged once it holds this many entries...
+const MIN_TAIL_ENTRIES = 4096;
+// ...or this fraction of the frozen entries, whichever is larger
+const TAIL_FRACTION = 0.25;
+
+function binarySearch(
+  sorted: ArrayLike<number>,
+  from: number,
+  to: number,
+  entry: number,
+): boolean {
+  let low = from;
+  let high = to - 1;
+
+  while (low <= high) {
+    const mid = (low + high) >>> 1;
+    const value = sorted[mid];
+    if (value === entry) {
+      return true;
+    }
+    if (value < entry) {
+      low = mid + 1;
+    } else {
+      high = mid - 1;
+    }
+  }
+  return false;
+}
+
+/*
+ * Insert into a sorted array, keeping it sorted and duplicate-free. Row
+ * entries always arrive in ascending order, so this is a push in practice.
+ */
+function insertSorted(sorted: number[], entry: number): void {
+  const last = sorted.length - 1;
+  if (last < 0 || sorted[last] < entry) {
+    sorted.push(entry);
+    return;
+  }
+
+  let low = 0;
+  let high = last;
+  while (low <= high) {
+    const mid = (low + high) >>> 1;
+    if (sorted[mid] === entry) {
+      return;
+    }
+    if (sorted[mid] < entry) {
+      low = mid + 1;
+    } else {
+      high = mid - 1;
+    }
+  }
+  sorted.splice(low, 0, entry);
+}
+
+/*
+ * One key's entries: a slice of the frozen entries plus its tail.
+ */
+class CsrList implements PostingList {
+  #entries: Uint32Array;
+  #start: number;
+  #end: number;
+  #tail: number[] | undefined;
+
+  constructor(
+    entries: Uint32Array,
+    start: number,
+    end: number,
+    tail: number[] | undefined,
+  ) {
+    this.#entries = entries;
+    this.#start = start;
+    this.#end = end;
+    this.#tail = tail;
+  }
+
+  get size(): number {
+    return this.#end - this.#start + (this.#tail?.length ?? 0);
+  }
+
+  has(entry: number): boolean {
+    if (binarySearch(this.#entries, this.#start, this.#end, entry)) {
+      return true;
+    }
+    return this.#tail !== undefined &&
+      binarySearch(this.#tail, 0, this.#tail.length, entry);
+  }
+
+  *[Symbol.iterator](): Generator<number> {
+    for (let idx = this.#start; idx < this.#end; idx++) {
+      yield this.#entries[idx];
+    }
+    if (this.#tail !== undefined) {
+      yield* this.#tail;
+    }
+  }
+}
+
+export class CsrPostings implements PostingIndex {
+  #offsets: Uint32Array;
+  #entries: Uint32Array;
+  #tail: Map<number, number[]>;
+  #tailSize: number;
+
+  constructor() {
+    this.#offsets = new Uint32Array(1);
+    this.#entries = new Uint32Array(0);
+    this.#tail = new Map();
+    this.#tailSize = 0;
+  }
+
+  /*
+   * Adopt prebuilt CSR arrays without copying (the snapshot loader).
+   * Keys whose entries are not ascending are re-sorted into a copy.
+   */
+  static fromCsr(offsets: Uint32Array, entries: Uint32Array): CsrPostings {
+    const postings = new CsrPostings();
+
+    let sortedEntries = entries;
+    for (let key = 0; key + 1 < offsets.length; key++) {
+      for (let idx = offsets[key] + 1; idx < offsets[key + 1]; idx++) {
+        if (sortedEntries[idx - 1] >= sortedEntries[idx]) {
+          if (sortedEntries === entries) {
+            sortedEntries = entries.slice();
+          }
+          sortedEntries.subarray(offsets[key], offsets[key + 1]).sort();
+          break;
+        }
+      }
+    }
+
+    postings.#offsets = offsets.length > 0 ? offsets : new Uint32Array(1);
+    postings.#entries = sortedEntries;
+    return postings;
+  }
+
+  /*
+   * Build the index mapping each key to the positions it occupies in
+   * keys[0, count), by counting sort. Keys must be below keySpace.
+   */
+  static fromKeys(
+    keys: ArrayLike<number>,
+    count: number,
+    keySpace: number,
+  ): CsrPostings {
+    const offsets = new Uint32Array(keySpace + 1);
+    for (let idx = 0; idx < count; idx++) {
+      offsets[keys[idx] + 1]++;
+    }
+    for (let key = 0; key < keySpace; key++) {
+      offsets[key + 1] += offsets[key];
+    }
+
+    const cursors = offsets.slice(0, keySpace);
+    const entries = new Uint32Array(count);
+    for (let idx = 0; idx < count; idx++) {
+      entries[cursors[keys[idx]]++] = idx;
+    }
+
+    const postings = new CsrPostings();
+    postings.#offsets = offsets;
+    postings.#entries = entries;
+    return postings;
+  }
+
+  get(key: number): PostingList | undefined {
+    const keySpace = this.#offsets.length - 1;
+    const start = key < keySpace ? this.#offsets[key] : 0;
+    const end = key < keySpace ? this.#offsets[key + 1] : 0;
+    const tail = this.#tail.get(key);
+
+    if (start === end && tail === undefined) {
+      return undefined;
+    }
+    return new CsrList(this.#entries, start, end, tail);
+  }
+
+  add(key: number, entry: number): void {
+    const keySpace = this.#offsets.length - 1;
+    if (key < keySpace) {
+      const start = this.#offsets[key];
+      const end = this.#offsets[key + 1];
+
+      // rows arrive ascending, so the common case skips the search
+      const beyondFrozen = start === end || this.#entries[end - 1] < entry;
+      if (
+        !beyondFrozen && binarySearch(this.#entries, start, end, entry)
+      ) {
+        return;
+      }
+    }
+
+    let tail = this.#tail.get(key);
+    if (!tail) {
+      tail = [];
+      this.#tail.set(key, tail);
+    }
+
+    const before = tail.length;
+    insertSorted(tail, entry);
+    if (tail.length === before) {
+      return;
+    }
+
+    this.#tailSize++;
+    const threshold = Math.max(
+      MIN_TAIL_ENTRIES,
+      this.#entries.length * TAIL_FRACTION,
+    );
+    if (this.#tailSize >= threshold) {
+      this.seal();
+    }
+  }
+
+  /*
+   * Merge the tail into the frozen arrays. Live CsrList views keep the
+   * arrays they were created over, so they stay valid.
+   */
+  seal(): void {
+    if (this.#tailSize === 0) {
+      return;
+    }
+
+    const oldOffsets = this.#offsets;
+    const oldEntries = this.#entries;
+    const oldKeySpace = oldOffsets.length - 1;
+
+    let keySpace = oldKeySpace;
+    for (const key of this.#tail.keys()) {
+      keySpace = Math.max(keySpace, key + 1);
+    }
+
+    const offsets = new Uint32Array(keySpace + 1);
+    const entries = new Uint32Array(oldEntries.length + this.#tailSize);
+
+    let position = 0;
+    for (let key = 0; key < keySpace; key++) {
+      offsets[key] = position;
+
+      const start = key < oldKeySpace ? oldOffsets[key] : 0;
+      const end = key < oldKeySpace ? oldOffsets[key + 1] : 0;
+      const tail = this.#tail.get(key);
+
+      if (tail === undefined) {
+        entries.set(oldEntries.subarray(start, end), position);
+        position += end - start;
+        continue;
+      }
+
+      // merge two sorted runs
+      let frozenIdx = start;
+      let tailIdx = 0;
+      while (frozenIdx < end || tailIdx < tail.length) {
+        if (
+          tailIdx >= tail.length ||
+          (frozenIdx < end && oldEntries[frozenIdx] < tail[tailIdx])
+        ) {
+          entries[position++] = oldEntries[frozenIdx++];
+        } else {
+          entries[position++] = tail[tailIdx++];
+        }
+      }
+    }
+    offsets[keySpace] = position;
+
+    this.#offsets = offsets;
+    this.#entries = entries;
+    this.#tail = new Map();
+    this.#tailSize = 0;
+  }
+}
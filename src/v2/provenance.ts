@@ -0,0 +1,168 @@
+/*
+ * Start-node sets for PathView provenance.
+ *
+ * A PathView pairs each end node with the set of start nodes it was
+ * reached from. On wide fan-out walks many end nodes have the same start
+ * set, so each view keeps its sets in one CSR pool (a Uint32Array of
+ * sorted runs plus their offsets) and an end node holds only a set id.
+ * Equal sets are pooled once. A set of one start is not pooled at all:
+ * its id is the start's node id with SINGLE_FLAG set, which node ids
+ * (below 2^28) never have. Pools are never modified once their view is
+ * built.
+ */
+
+import { RowBitmap } from "./bitmap.ts";
+
+const SINGLE_FLAG = 0x80000000;
+const INITIAL_CAPACITY = 64;
+// unions of at most this many members are sorted rather than merged
+const SORTED_UNION_MAX = 4096;
+
+// FNV-1a over the members of a set, to find equal sets
+function hashOf(members: ArrayLike<number>): number {
+  let hash = 0x811c9dc5;
+  for (let idx = 0; idx < members.length; idx++) {
+    hash = Math.imul(hash ^ members[idx], 0x01000193);
+  }
+  return hash >>> 0;
+}
+
+export class StartSets {
+  // pooled set `setId` is #starts[#offsets[setId], #offsets[setId + 1])
+  #offsets: number[];
+  #starts: Uint32Array;
+  // pooled set ids by the hash of their members
+  #byHash: Map<number, number[]>;
+
+  constructor() {
+    this.#offsets = [0];
+    this.#starts = new Uint32Array(INITIAL_CAPACITY);
+    this.#byHash = new Map();
+  }
+
+  /*
+   * The id of the set holding only `startId`.
+   */
+  static single(startId: number): number {
+    return (SINGLE_FLAG | startId) >>> 0;
+  }
+
+  /*
+   * The start node ids of a set, ascending.
+   */
+  members(setId: number): Uint32Array {
+    if (setId >= SINGLE_FLAG) {
+      return Uint32Array.of(setId - SINGLE_FLAG);
+    }
+    return this.#starts.subarray(
+      this.#offsets[setId],
+      this.#offsets[setId + 1],
+    );
+  }
+
+  size(setId: number): number {
+    if (setId >= SINGLE_FLAG) {
+      return 1;
+    }
+    return this.#offsets[setId + 1] - this.#offsets[setId];
+  }
+
+  /*
+   * The id of a set of ascending, distinct start ids, pooling it unless
+   * an equal set is already pooled.
+   */
+  add(startIds: ArrayLike<number>): number {
+    if (startIds.length === 1) {
+      return StartSets.single(startIds[0]);
+    }
+
+    const hash = hashOf(startIds);
+    const candidates = this.#byHash.get(hash);
+    const existing = candidates?.find((setId) => {
+      return this.#equals(setId, startIds);
+    });
+    if (existing !== undefined) {
+      return existing;
+    }
+
+    const from = this.#offsets[this.#offsets.length - 1];
+    if (from + startIds.length > this.#starts.length) {
+      const grown = new Uint32Array(
+        Math.max(this.#starts.length * 2, from + startIds.length),
+      );
+      grown.set(this.#starts.subarray(0, from));
+      this.#starts = grown;
+    }
+    this.#starts.set(startIds, from);
+    this.#offsets.push(from + startIds.length);
+
+    const setId = this.#offsets.length - 2;
+    if (candidates) {
+      candidates.push(setId);
+    } else {
+      this.#byHash.set(hash, [setId]);
+    }
+    return setId;
+  }
+
+  /*
+   * The id in this pool of the union of `source`'s sets `setIds`. Small
+   * unions are sorted, large ones merged through a bitmap.
+   */
+  union(source: StartSets, setIds: Iterable<number>): number {
+    let total = 0;
+    let lists = 0;
+    for (const setId of setIds) {
+      total += source.size(setId);
+      lists++;
+    }
+
+    if (lists > 1 && total > SORTED_UNION_MAX) {
+      const union = RowBitmap.unionOf(
+        Array.from(setIds, (setId) => source.members(setId)),
+      );
+      const startIds = new Uint32Array(union.size);
+      let idx = 0;
+      union.forEach((startId) => {
+        startIds[idx++] = startId;
+      });
+      return this.add(startIds);
+    }
+
+    const startIds = new Uint32Array(total);
+    let filled = 0;
+    for (const setId of setIds) {
+      if (setId >= SINGLE_FLAG) {
+        startIds[filled++] = setId - SINGLE_FLAG;
+      } else {
+        startIds.set(source.members(setId), filled);
+        filled += source.size(setId);
+      }
+    }
+    if (lists === 1) {
+      return this.add(startIds);
+    }
+
+    startIds.sort();
+    let kept = 0;
+    for (let idx = 0; idx < startIds.length; idx++) {
+      if (kept === 0 || startIds[idx] !== startIds[kept - 1]) {
+        startIds[kept++] = startIds[idx];
+      }
+    }
+    return this.add(startIds.subarray(0, kept));
+  }
+
+  #equals(setId: number, startIds: ArrayLike<number>): boolean {
+    const members = this.members(setId);
+    if (members.length !== startIds.length) {
+      return false;
+    }
+    for (let idx = 0; idx < members.length; idx++) {
+      if (members[idx] !== startIds[idx]) {
+        return false;
+      }
+    }
+    return true;
+  }
+}
@@ -0,0 +1,39 @@
+/*
+ * Worker half of parallel search. Tests chunks of candidate rows against
+ * a search's predicates, reading the store from the shared StoreImage it
+ * was last sent (see parallel-search.ts). As in search(), predicate
+ * verdicts are memoised per node, here within each chunk.
+ */
+
+import {
+  filterRows,
+  imageSource,
+  loadPositions,
+  SourceMemos,
+} from "./parallel-search.ts";
+import type { ChunkResult, ChunkTask, RowSource } from "./parallel-search.ts";
+
+type WorkerScope = {
+  onmessage: ((event: MessageEvent<ChunkTask>) => void) | null;
+  postMessage(message: ChunkResult, transfer?: Transferable[]): void;
+};
+
+const scope = self as unknown as WorkerScope;
+
+let source: RowSource | undefined;
+
+scope.onmessage = async (event) => {
+  const { image, rows, start, end, refs } = event.data;
+  if (image !== undefined) {
+    source = imageSource(image);
+  }
+
+  try {
+    const predicates = await loadPositions(refs);
+    const memos = new SourceMemos(source!);
+    const passed = filterRows(source!, predicates, memos, rows, start, end);
+    scope.postMessage({ passed }, [passed.buffer as ArrayBuffer]);
+  } catch (err) {
+    scope.postMessage({ error: (err as Error).message });
+  }
+};
@@ -0,0 +1,194 @@
+/*
+ * Planner tests: prepared searches must return what search() returns and
+ * stay correct as the database changes; explain() must report the stage
+ * order the cost model picks, with exact row counts.
+ */
+
+import { assert, assertEquals, assertThrows } from "@std/assert";
+import { TribbleDB } from "./mod.ts";
+import type { Triple } from "../types.ts";
+
+function photoDb(photoCount: number): TribbleDB {
+  const triples: Triple[] = [];
+  for (let idx = 0; idx < photoCount; idx++) {
+    const photo = `urn:ró:photo:p${idx}`;
+    triples.push([photo, "location", `urn:ró:place:l${idx % 10}`]);
+    triples.push([photo, "rating", String(idx % 5)]);
+  }
+  return new TribbleDB(triples);
+}
+
+Deno.test("plan: prepared searches match search() and follow later changes", () => {
+  const db = photoDb(50);
+  const search = { relation: "location", target: { type: "place", id: "l3" } };
+  const prepared = db.prepare(search);
+
+  assertEquals(prepared.run().triples(), db.search(search).triples());
+  assertEquals(prepared.run().triplesCount, 5);
+
+  // "l10" is interned after the plan was compiled
+  db.add([["urn:ró:photo:new", "location", "urn:ró:place:l3"]]);
+  db.delete([["urn:ró:photo:p3", "location", "urn:ró:place:l3"]]);
+  assertEquals(prepared.run().triples(), db.search(search).triples());
+
+  const late = db.prepare({ target: { id: "l10" } });
+  assertEquals(late.run().triplesCount, 0);
+  db.add([["urn:ró:photo:p0", "location", "urn:ró:place:l10"]]);
+  assertEquals(late.run().triplesCount, 1);
+});
+
+Deno.test("plan: a prepared search runs against views", () => {
+  const db = photoDb(50);
+  const rated = db.search({ relation: "rating" });
+  const prepared = db.prepare({ source: { type: "photo", id: "p7" } });
+
+  assertEquals(rated.search(prepared).triples(), [
+    ["urn:ró:photo:p7", "rating", "2"],
+  ]);
+});
+
+Deno.test("plan: the most selective constraint drives the scan", () => {
+  const db = photoDb(200);
+  const explanation = db.explain({
+    source: "urn:ró:photo:p42",
+    relation: ["location", "rating"],
+    target: { type: "place" },
+  });
+
+  assertEquals(explanation.steps, [
+    { stage: "source", estimated: 2, actual: 2 },
+    { stage: "target", estimated: 200, actual: 1 },
+    { stage: "relation", estimated: 400, actual: 1 },
+    { stage: "live", estimated: 400, actual: 1 },
+  ]);
+  assertEquals(explanation.rows, 1);
+  assert(explanation.timings.scan >= 0);
+});
+
+Deno.test("plan: a small view drives the scan and predicates run last", () => {
+  const db = photoDb(200);
+  const view = db.search({ source: "urn:ró:photo:p9" });
+  const explanation = view.explain({
+    relation: "rating",
+    target: { predicate: (value: string) => value === "4" },
+  });
+
+  assertEquals(explanation.steps, [
+    { stage: "view", estimated: 2, actual: 2 },
+    { stage: "relation", estimated: 200, actual: 1 },
+    { stage: "predicates", estimated: 1, actual: 1 },
+  ]);
+});
+
+Deno.test("plan: predicates run once per distinct node", () => {
+  const db = photoDb(200);
+  const seen: string[] = [];
+  const search = {
+    relation: "rating",
+    target: {
+      predicate: (value: string) => {
+        seen.push(value);
+        return Number(value) >= 3;
+      },
+    },
+  };
+
+  const explanation = db.explain(search);
+  assertEquals(seen.sort(), ["0", "1", "2", "3", "4"]);
+  assertEquals(explanation.predicateCalls, { made: 5, saved: 195 });
+  assertEquals(explanation.rows, 80);
+  assertEquals(db.search(search).triplesCount, 80);
+});
+
+Deno.test("plan: explain() of a prepared search reports its rows", () => {
+  const db = photoDb(30);
+  const prepared = db.prepare({ relation: "rating", target: "3" });
+
+  assertEquals(prepared.explain().rows, prepared.run().triplesCount);
+  assertEquals(prepared.explain().steps[0].stage, "target");
+});
+
+Deno.test("plan: pages match slices of the full result", () => {
+  const db = photoDb(300);
+  const view = db.search({ target: { type: "place" } });
+  const searches = [
+    { relation: "rating" },
+    {
+      relation: "rating",
+      target: { predicate: (value: string) => value > "2" },
+    },
+    { source: { type: "photo", id: ["p3", "p4", "p250"] } },
+    { target: "urn:ró:place:l4" },
+  ];
+
+  for (const base of [db, view]) {
+    for (const search of searches) {
+      const all = base.search(search).triples();
+      for (const [offset, limit] of [[0, 1], [0, 50], [7, 20], [590, 40]]) {
+        assertEquals(
+          base.search(search, { offset, limit }).triples(),
+          all.slice(offset, offset + limit),
+        );
+      }
+
+      const paged = [];
+      let after: string | undefined = undefined;
+      while (true) {
+        const page: TribbleDB = base.search(search, { after, limit: 37 });
+        if (page.triplesCount === 0) {
+          break;
+        }
+        paged.push(...page.triples());
+        after = page.cursor();
+      }
+      assertEquals(paged, all);
+    }
+  }
+});
+
+Deno.test("plan: a limit stops the scan once the page is full", () => {
+  const db = photoDb(1000);
+  let calls = 0;
+  const search = {
+    source: {
+      predicate: (value: string) => {
+        calls++;
+        return value.endsWith("7");
+      },
+    },
+  };
+
+  const explanation = db.explain(search, { limit: 3 });
+  assertEquals(explanation.rows, 3);
+  assertEquals(explanation.steps, [
+    { stage: "live", estimated: 2000, actual: 35 },
+    { stage: "predicates", estimated: 35, actual: 3 },
+    { stage: "window", estimated: 3, actual: 3 },
+  ]);
+  assertEquals(calls, 18);
+
+  assertEquals(
+    db.search(search, { limit: 3 }).sources(),
+    new Set([
+      "urn:ró:photo:p7",
+      "urn:ró:photo:p17",
+    ]),
+  );
+});
+
+Deno.test("plan: cursors survive later writes and reject garbage", () => {
+  const db = photoDb(20);
+  const search = { relation: "location" };
+  const first = db.search(search, { limit: 5 });
+
+  db.delete([["urn:ró:photo:p5", "location", "urn:ró:place:l5"]]);
+  db.add([["urn:ró:photo:p99", "location", "urn:ró:place:l9"]]);
+
+  const rest = db.search(search, { after: first.cursor() });
+  assertEquals(rest.triplesCount, 15);
+  assertEquals(rest.firstSource(), "urn:ró:photo:p6");
+  assertEquals(db.search({ relation: "nothing" }).cursor(), undefined);
+
+  assertThrows(() => db.search(search, { after: "not a cursor" }));
+  assertThrows(() => db.search(search, { limit: -1 }));
+});
@@ -1,47 +1,206 @@
 /*
- * v2 search execution: evaluates a parsed SearchObject (v1's parseSearch
- * output, so the query grammar is shared) against a TripleStore and a base
- * row-set (a view's rows, or all live rows for a root database).
+ * v2 search execution: compiles a parsed SearchObject (v1's parseSearch
+ * output, so the query grammar is shared) into a SearchPlan, and runs the
+ * plan against a TripleStore and a base row-set (a view's rows, or all
+ * live rows for a root database).
  *
  * Semantics mirror v1's index search exactly: per-subquery constraints are
  * intersected (type ∩ id-union ∩ qs-intersection), subqueries are unioned,
  * positions are intersected, and predicates run last against the survivors.
+ *
+ * Execution is cost-based. Each position's constraint is resolved to the
+ * set of interned ids it admits, and its row count is read off the posting
+ * list sizes without touching a row. The most selective constraint (or the
+ * view's row-set, when that is smaller) drives the scan, and every other
+ * constraint is probed per driven row against the row's id columns, so
+ * only the driver's rows are ever enumerated.
  */
 
 import type { NodeObjectQuery, SearchObject } from "../types.ts";
 import type { TripleStore } from "./store.ts";
+import type { IdColumn } from "./store.ts";
+import type { PostingList } from "./postings.ts";
+import { RowBitmap } from "./bitmap.ts";
+import { nodeInRange, nodesInRange, rangeOf } from "./literals.ts";
+import { PredicateMemo } from "./memo.ts";
+import type { LiteralRange, MetricCounters, RangeNodeQuery } from "./types.ts";
+
+/*
+ * A stage of an executed plan: a position constraint, the visibility
+ * check (a view's row-set, or the root's live rows), the predicates or
+ * the result window.
+ */
+export type PlanStage =
+  | "source"
+  | "relation"
+  | "target"
+  | "view"
+  | "live"
+  | "predicates"
+  | "window";
+
+/*
+ * A page of a search's result, in row order: the rows after row `after`
+ * (-1 for the start), less the first `offset` matches, up to `limit`.
+ */
+export type RowWindow = {
+  after: number;
+  offset: number;
+  limit: number;
+};
+
+/*
+ * One stage as executed. `estimated` is the number of rows the stage
+ * admits on its own, from posting-list sizes (predicates are opaque, so
+ * theirs is the number of rows reaching them, as is the window's);
+ * `actual` is the number of rows still matching after it.
+ */
+export type PlanStep = {
+  stage: PlanStage;
+  estimated: number;
+  actual: number;
+};
+
+/*
+ * What explain() reports: the stages in execution order (the first one
+ * drives the scan), the final row count, the milliseconds spent
+ * resolving constraints (plan), scanning and probing (scan) and running
+ * predicates, and how many predicate calls were made and how many were
+ * answered from the per-node memo instead.
+ */
+export type SearchExplanation = {
+  steps: PlanStep[];
+  rows: number;
+  timings: {
+    plan: number;
+    scan: number;
+    predicates: number;
+  };
+  predicateCalls: {
+    made: number;
+    saved: number;
+  };
+};
+
+/*
+ * A node subquery with its strings prepared for interner lookups.
+ */
+type CompiledNodeQuery = {
+  indexable: boolean;
+  type: string | undefined;
+  ids: string[] | undefined;
+  // "key=value" composites, as interned for the qs index
+  qsPairs: string[];
+  range: LiteralRange | undefined;
+};
+
+/*
+ * A position constraint resolved against a store: the interned ids it
+ * admits, their row posting lists, and the rows those lists hold. Each
+ * row has one id per position, so the lists are disjoint and the
+ * estimate is exact before visibility.
+ */
+type Constraint = {
+  stage: "source" | "relation" | "target";
+  ids: Set<number>;
+  lists: PostingList[];
+  estimate: number;
+};
 
 /*
- * The index-phase result for one position (source or target):
- * - a set of candidate rows;
+ * A position's resolution:
+ * - a Constraint;
  * - "unconstrained": no indexable constraint (predicate-only subqueries),
  *   which in v1 admits every row into the candidate set;
  * - "skip": the position contributes nothing to candidate seeding. This
  *   preserves a v1 quirk: an empty relation list is ignored when other
  *   constraints exist, but yields an empty result when it stands alone.
  */
-type PositionRows = Set<number> | "unconstrained" | "skip";
+type Resolution = Constraint | "unconstrained" | "skip";
+
+function compileNodeQuery(query: RangeNodeQuery): CompiledNodeQuery {
+  const qsPairs = Object.entries(query.qs ?? {}).map(([qsKey, qsValue]) => {
+    return `${qsKey}=${qsValue}`;
+  });
+
+  let ids: string[] | undefined;
+  if (query.id !== undefined) {
+    ids = Array.isArray(query.id) ? query.id : [query.id];
+  }
+
+  const range = rangeOf(query);
+
+  return {
+    indexable: query.type !== undefined || ids !== undefined ||
+      qsPairs.length > 0 || range !== undefined,
+    type: query.type,
+    ids,
+    qsPairs,
+    range,
+  };
+}
 
 /*
- * Rows matching one node subquery's indexable constraints. The type/id/qs
- * constraints are intersected at NODE level (small sets, one entry per
- * distinct URN), then the surviving nodes' row lists are unioned — so the
- * cost is proportional to the result, and ingest never maintains
- * per-triple type/id/qs posting lists.
+ * An order-insensitive rendering of a position's subqueries: subqueries
+ * are unioned and their id lists and qs pairs are sets, so sorting them
+ * does not change the search.
  */
-function subqueryRows(
-  store: TripleStore,
-  query: NodeObjectQuery,
-  isSource: boolean,
-): Set<number> | "unconstrained" | "no-match" {
-  const hasQs = query.qs !== undefined && Object.keys(query.qs).length > 0;
-  const indexable = query.type !== undefined || query.id !== undefined || hasQs;
-
-  if (!indexable) {
-    return "unconstrained";
+function canonicalPosition(
+  queries: CompiledNodeQuery[] | undefined,
+): string[] | null {
+  if (queries === undefined) {
+    return null;
+  }
+
+  const rendered = queries.map((query) => {
+    return JSON.stringify([
+      query.type ?? null,
+      query.ids === undefined ? null : [...new Set(query.ids)].sort(),
+      [...new Set(query.qsPairs)].sort(),
+      query.range ?? null,
+    ]);
+  });
+  return [...new Set(rendered)].sort();
+}
+
+function intersectAll(sets: PostingList[]): Set<number> {
+  sets.sort((setA, setB) => setA.size - setB.size);
+
+  const result = new Set<number>();
+  const [smallest, ...rest] = sets;
+
+  outer: for (const row of smallest) {
+    for (const other of rest) {
+      if (!other.has(row)) {
+        continue outer;
+      }
+    }
+    result.add(row);
   }
 
-  const nodeSets: Set<number>[] = [];
+  return result;
+}
+
+/*
+ * Nodes matching one subquery's indexable constraints, intersected at
+ * NODE level (small sets, one entry per distinct URN), or undefined when
+ * some constraint matches nothing. `relations` lets a target range use
+ * those relations' literal indexes.
+ */
+function matchNodes(
+  store: TripleStore,
+  query: CompiledNodeQuery,
+  relations: string[] | undefined,
+): Set<number> | undefined {
+  const nodeSets: PostingList[] = [];
+
+  if (query.range !== undefined) {
+    const nodes = nodesInRange(store, query.range, relations);
+    if (nodes.size === 0) {
+      return undefined;
+    }
+    nodeSets.push(nodes);
+  }
 
   if (query.type !== undefined) {
     const typeId = store.nodes.idOf(query.type);
@@ -50,16 +209,15 @@ function subqueryRows(
       : store.nodesByType.get(typeId);
 
     if (!nodes) {
-      return "no-match";
+      return undefined;
     }
     nodeSets.push(nodes);
   }
 
-  if (query.id !== undefined) {
-    const wantedIds = Array.isArray(query.id) ? query.id : [query.id];
+  if (query.ids !== undefined) {
     const idUnion = new Set<number>();
 
-    for (const wantedId of wantedIds) {
+    for (const wantedId of query.ids) {
       const idId = store.nodes.idOf(wantedId);
       const nodes = idId === undefined ? undefined : store.nodesById.get(idId);
 
@@ -71,113 +229,99 @@ function subqueryRows(
     }
 
     if (idUnion.size === 0) {
-      return "no-match";
+      return undefined;
     }
     nodeSets.push(idUnion);
   }
 
-  if (hasQs) {
-    for (const [qsKey, qsValue] of Object.entries(query.qs ?? {})) {
-      const compositeId = store.nodes.idOf(`${qsKey}=${qsValue}`);
-      const nodes = compositeId === undefined
-        ? undefined
-        : store.nodesByQs.get(compositeId);
-
-      if (!nodes) {
-        return "no-match";
-      }
-      nodeSets.push(nodes);
-    }
-  }
-
-  const matchedNodes = intersectAll(nodeSets);
-
-  const adjacency = isSource ? store.rowsBySource : store.rowsByTarget;
-  const rows = new Set<number>();
-  for (const nodeId of matchedNodes) {
-    const nodeRows = adjacency.get(nodeId);
-    if (nodeRows) {
-      for (const row of nodeRows) {
-        rows.add(row);
-      }
-    }
-  }
-
-  return rows;
-}
-
-function intersectAll(sets: Set<number>[]): Set<number> {
-  sets.sort((setA, setB) => setA.size - setB.size);
-
-  const result = new Set<number>();
-  const [smallest, ...rest] = sets;
+  for (const qsPair of query.qsPairs) {
+    const compositeId = store.nodes.idOf(qsPair);
+    const nodes = compositeId === undefined
+      ? undefined
+      : store.nodesByQs.get(compositeId);
 
-  outer: for (const row of smallest) {
-    for (const other of rest) {
-      if (!other.has(row)) {
-        continue outer;
-      }
+    if (!nodes) {
+      return undefined;
     }
-    result.add(row);
+    nodeSets.push(nodes);
   }
 
-  return result;
+  return intersectAll(nodeSets);
 }
 
 /*
- * Index-phase rows for one position: union over subqueries, or
- * "unconstrained" when any subquery is predicate-only (v1 behaviour:
- * such subqueries admit every row into the candidate set).
+ * Whether one node satisfies a subquery's indexable constraints: the
+ * per-node form of matchNodes(), read off the node's URN metadata.
  */
-function positionRows(
+function nodeMatches(
   store: TripleStore,
-  queries: NodeObjectQuery[],
-  isSource: boolean,
-): PositionRows {
-  const union = new Set<number>();
-
-  for (const query of queries) {
-    const rows = subqueryRows(store, query, isSource);
+  query: CompiledNodeQuery,
+  nodeId: number,
+): boolean {
+  const meta = store.nodeMeta.get(nodeId)!;
 
-    if (rows === "unconstrained") {
-      return "unconstrained";
-    }
-    if (rows === "no-match") {
-      continue;
-    }
-    for (const row of rows) {
-      union.add(row);
-    }
+  if (
+    query.range !== undefined && !nodeInRange(store, nodeId, query.range)
+  ) {
+    return false;
   }
-
-  return union;
+  if (
+    query.type !== undefined && store.nodes.idOf(query.type) !== meta.typeId
+  ) {
+    return false;
+  }
+  if (
+    query.ids !== undefined &&
+    !query.ids.some((wantedId) => store.nodes.idOf(wantedId) === meta.idId)
+  ) {
+    return false;
+  }
+  return query.qsPairs.every((qsPair) => {
+    const compositeId = store.nodes.idOf(qsPair);
+    return compositeId !== undefined && meta.qsIds.includes(compositeId);
+  });
 }
 
-function relationRows(
-  store: TripleStore,
-  relations: string | string[],
-): PositionRows {
-  const names = Array.isArray(relations) ? relations : [relations];
+// up to this many bitmap lists are unioned pairwise, word by word
+const PAIRWISE_UNION_MAX = 8;
 
-  if (names.length === 0) {
-    return "skip";
+/*
+ * Union posting lists into one bitmap. A few bitmap posting lists are
+ * combined container by container; otherwise entries are scattered into
+ * per-chunk bitsets, which needs no sorting.
+ */
+function unionLists(lists: PostingList[]): RowBitmap {
+  const allBitmaps = lists.every((list) => list instanceof RowBitmap);
+  if (!allBitmaps || lists.length > PAIRWISE_UNION_MAX) {
+    return RowBitmap.unionOf(lists);
   }
 
-  const union = new Set<number>();
-  for (const name of names) {
-    const relationId = store.relationNames.idOf(name);
-    const rows = relationId === undefined
-      ? undefined
-      : store.rowsByRelation.get(relationId);
+  let union = new RowBitmap();
+  for (const list of lists as RowBitmap[]) {
+    union = union.or(list);
+  }
+  return union;
+}
 
+/*
+ * Attach each id's row posting list and total their sizes.
+ */
+function constraintOf(
+  stage: Constraint["stage"],
+  ids: Set<number>,
+  postings: { get(key: number): PostingList | undefined },
+): Constraint {
+  const lists: PostingList[] = [];
+  let estimate = 0;
+
+  for (const id of ids) {
+    const rows = postings.get(id);
     if (rows) {
-      for (const row of rows) {
-        union.add(row);
-      }
+      lists.push(rows);
+      estimate += rows.size;
     }
   }
-
-  return union;
+  return { stage, ids, lists, estimate };
 }
 
 /*
@@ -185,98 +329,545 @@ function relationRows(
  * predicate is absent or accepts the row's node string.
  */
 function passesNodePredicates(
+  store: TripleStore,
   queries: NodeObjectQuery[],
-  value: string,
+  nodeId: number,
+  memo: PredicateMemo,
 ): boolean {
   for (const query of queries) {
-    if (!query.predicate || query.predicate(value)) {
+    if (
+      !query.predicate ||
+      memo.test(query.predicate, nodeId, (id) => store.nodes.valueOf(id))
+    ) {
       return true;
     }
   }
   return false;
 }
 
-function baseRowsIterable(
-  store: TripleStore,
-  baseRows: Set<number> | null,
-): Iterable<number> {
-  if (baseRows !== null) {
-    return baseRows;
-  }
+/*
+ * A position needs its predicates checked only when every subquery has
+ * one: a predicate-free subquery accepts any row.
+ */
+function needsPredicates(queries: NodeObjectQuery[] | undefined): boolean {
+  return queries !== undefined &&
+    queries.every((query) => query.predicate !== undefined);
+}
 
-  return (function* liveRows() {
-    for (let row = 0; row < store.rowCount; row++) {
-      if (store.isAlive(row)) {
-        yield row;
-      }
-    }
-  })();
+function columnOf(store: TripleStore, stage: Constraint["stage"]): IdColumn {
+  if (stage === "source") {
+    return store.sourceIds;
+  }
+  return stage === "relation" ? store.relationIds : store.targetIds;
 }
 
 /*
- * Execute a parsed search. Returns matching rows in ascending row order
- * (insertion order), so materialised results are deterministic.
+ * A compiled search. Compiling normalises the query once (id lists, qs
+ * composites, which positions need predicates); constraints are resolved
+ * against the store on every run, so a plan stays valid as the store
+ * changes and can run against any database.
  */
-export function executeSearch(
-  store: TripleStore,
-  parsed: SearchObject,
-  baseRows: Set<number> | null,
-): Set<number> {
-  const constraints: PositionRows[] = [];
+export class SearchPlan {
+  #parsed: SearchObject;
+  #source: CompiledNodeQuery[] | undefined;
+  #target: CompiledNodeQuery[] | undefined;
+  #relations: string[] | undefined;
+
+  #checkSource: boolean;
+  #checkRelation: boolean;
+  #checkTarget: boolean;
+
+  // canonical form of the search, for result caching; undefined when
+  // the search has predicates, whose behaviour cannot be keyed
+  readonly cacheKey: string | undefined;
+
+  constructor(parsed: SearchObject) {
+    this.#parsed = parsed;
+    this.#source = parsed.source?.map(compileNodeQuery);
+    this.#target = parsed.target?.map(compileNodeQuery);
+
+    const relation = parsed.relation?.relation;
+    if (relation !== undefined) {
+      this.#relations = Array.isArray(relation) ? relation : [relation];
+    }
+
+    this.#checkSource = needsPredicates(parsed.source);
+    this.#checkRelation = parsed.relation?.predicate !== undefined;
+    this.#checkTarget = needsPredicates(parsed.target);
+
+    const hasPredicates = [...parsed.source ?? [], ...parsed.target ?? []]
+      .some((query) => query.predicate !== undefined) ||
+      this.#checkRelation;
+
+    this.cacheKey = hasPredicates ? undefined : JSON.stringify([
+      canonicalPosition(this.#source),
+      this.#relations === undefined
+        ? null
+        : [...new Set(this.#relations)].sort(),
+      canonicalPosition(this.#target),
+    ]);
+  }
+
+  #resolveNodes(
+    store: TripleStore,
+    queries: CompiledNodeQuery[],
+    isSource: boolean,
+  ): Resolution {
+    const nodes = new Set<number>();
+
+    for (const query of queries) {
+      if (!query.indexable) {
+        return "unconstrained";
+      }
 
-  if (parsed.source) {
-    constraints.push(positionRows(store, parsed.source, true));
+      const matched = matchNodes(
+        store,
+        query,
+        isSource ? undefined : this.#relations,
+      );
+      if (matched) {
+        for (const nodeId of matched) {
+          nodes.add(nodeId);
+        }
+      }
+    }
+
+    return isSource
+      ? constraintOf("source", nodes, store.rowsBySource)
+      : constraintOf("target", nodes, store.rowsByTarget);
+  }
+
+  #resolveRelations(store: TripleStore, names: string[]): Resolution {
+    if (names.length === 0) {
+      return "skip";
+    }
+
+    const relationIds = new Set<number>();
+    for (const name of names) {
+      const relationId = store.relationNames.idOf(name);
+      if (relationId !== undefined) {
+        relationIds.add(relationId);
+      }
+    }
+    return constraintOf("relation", relationIds, store.rowsByRelation);
   }
-  if (parsed.relation) {
-    constraints.push(relationRows(store, parsed.relation.relation));
+
+  #resolve(store: TripleStore): Resolution[] {
+    const resolved: Resolution[] = [];
+
+    if (this.#source) {
+      resolved.push(this.#resolveNodes(store, this.#source, true));
+    }
+    if (this.#relations) {
+      resolved.push(this.#resolveRelations(store, this.#relations));
+    }
+    if (this.#target) {
+      resolved.push(this.#resolveNodes(store, this.#target, false));
+    }
+    return resolved;
   }
-  if (parsed.target) {
-    constraints.push(positionRows(store, parsed.target, false));
+
+  /*
+   * Node predicates are memoised by node id in `nodeMemo`, the relation
+   * predicate by relation id in `relationMemo`.
+   */
+  #passesPredicates(
+    store: TripleStore,
+    row: number,
+    nodeMemo: PredicateMemo,
+    relationMemo: PredicateMemo,
+  ): boolean {
+    const parsed = this.#parsed;
+
+    if (this.#checkSource) {
+      const sourceId = store.sourceIds[row];
+      if (!passesNodePredicates(store, parsed.source!, sourceId, nodeMemo)) {
+        return false;
+      }
+    }
+
+    if (
+      this.#checkRelation && !relationMemo.test(
+        parsed.relation!.predicate!,
+        store.relationIds[row],
+        (id) => store.relationNames.valueOf(id),
+      )
+    ) {
+      return false;
+    }
+
+    if (this.#checkTarget) {
+      const targetId = store.targetIds[row];
+      if (!passesNodePredicates(store, parsed.target!, targetId, nodeMemo)) {
+        return false;
+      }
+    }
+
+    return true;
   }
 
-  const indexSets = constraints
-    .filter((rows): rows is Set<number> => rows instanceof Set);
-  const hasUnconstrained = constraints.includes("unconstrained");
-
-  let candidates: Iterable<number>;
-  if (indexSets.length > 0) {
-    candidates = intersectAll(indexSets);
-  } else if (hasUnconstrained || constraints.length === 0) {
-    candidates = baseRowsIterable(store, baseRows);
-  } else {
-    // every constraint was "skip": v1 returns an empty result here
-    return new Set();
+  /*
+   * A test of single rows against the plan, for keeping a materialised
+   * result current: a row passes when execute() would return it, were it
+   * visible. Nodes are checked against their own metadata and memoised,
+   * so no constraint is resolved to its full node set; the filter is
+   * meant for one batch of rows, as its memos are sized to the store as
+   * it is now.
+   */
+  rowFilter(store: TripleStore): (row: number) => boolean {
+    const resolvable = [this.#source, this.#relations, this.#target]
+      .filter((position) => position !== undefined);
+    // every position was "skip", so execute() returns nothing
+    if (
+      resolvable.length > 0 &&
+      resolvable.every((position) => position.length === 0)
+    ) {
+      return () => false;
+    }
+
+    const positionTest = (
+      queries: CompiledNodeQuery[] | undefined,
+      column: IdColumn,
+    ): ((row: number) => boolean) | undefined => {
+      if (queries === undefined || queries.some((query) => !query.indexable)) {
+        return undefined;
+      }
+
+      const verdicts = new Map<number, boolean>();
+      return (row) => {
+        const nodeId = column[row];
+        let passed = verdicts.get(nodeId);
+        if (passed === undefined) {
+          passed = queries.some((query) => nodeMatches(store, query, nodeId));
+          verdicts.set(nodeId, passed);
+        }
+        return passed;
+      };
+    };
+
+    const tests: ((row: number) => boolean)[] = [];
+    const sourceTest = positionTest(this.#source, store.sourceIds);
+    if (sourceTest) {
+      tests.push(sourceTest);
+    }
+    if (this.#relations !== undefined && this.#relations.length > 0) {
+      const relationIds = new Set<number>();
+      for (const name of this.#relations) {
+        const relationId = store.relationNames.idOf(name);
+        if (relationId !== undefined) {
+          relationIds.add(relationId);
+        }
+      }
+      tests.push((row) => relationIds.has(store.relationIds[row]));
+    }
+    const targetTest = positionTest(this.#target, store.targetIds);
+    if (targetTest) {
+      tests.push(targetTest);
+    }
+
+    const checkPredicates = this.#checkSource || this.#checkRelation ||
+      this.#checkTarget;
+    const nodeMemo = new PredicateMemo(store.nodes.size);
+    const relationMemo = new PredicateMemo(store.relationNames.size);
+
+    return (row) => {
+      for (const test of tests) {
+        if (!test(row)) {
+          return false;
+        }
+      }
+      return !checkPredicates ||
+        this.#passesPredicates(store, row, nodeMemo, relationMemo);
+    };
   }
 
-  const matched: number[] = [];
+  /*
+   * Run the plan. Returns the matching rows as a bitmap, which iterates in
+   * ascending row order (insertion order), so materialised results are
+   * deterministic. When `report` is given it is filled in with the
+   * executed stages and their timings.
+   *
+   * With a `window`, only the rows of that page are returned, and the
+   * scan stops once it is full. When the view drives the scan, probes and
+   * predicates run row by row in ascending order, so rows past the page
+   * are never touched (and predicate time is reported as scan time);
+   * otherwise the driver's rows are probed as usual and only the
+   * predicates stop early.
+   *
+   * `counters`, when given, is added to as in EngineMetrics.
+   */
+  execute(
+    store: TripleStore,
+    baseRows: RowBitmap | null,
+    report?: SearchExplanation,
+    window?: RowWindow,
+    counters?: MetricCounters,
+  ): RowBitmap {
+    const clock = report ? () => performance.now() : () => 0;
+    const planStarted = clock();
+
+    const resolved = this.#resolve(store);
+    const constraints = resolved
+      .filter((entry): entry is Constraint => typeof entry === "object")
+      .sort((left, right) => left.estimate - right.estimate);
+    const hasUnconstrained = resolved.includes("unconstrained");
+    const checkPredicates = this.#checkSource || this.#checkRelation ||
+      this.#checkTarget;
+
+    // every position was "skip": v1 returns an empty result here
+    if (
+      constraints.length === 0 && !hasUnconstrained && resolved.length > 0
+    ) {
+      if (report) {
+        report.steps = [];
+        report.rows = 0;
+        report.timings = {
+          plan: clock() - planStarted,
+          scan: 0,
+          predicates: 0,
+        };
+        report.predicateCalls = { made: 0, saved: 0 };
+      }
+      return new RowBitmap();
+    }
+
+    const visibleStage: PlanStage = baseRows !== null ? "view" : "live";
+    const visibleCount = baseRows !== null ? baseRows.size : store.aliveCount;
+    const driveFromView = constraints.length === 0 ||
+      visibleCount < constraints[0].estimate;
+
+    const probes = driveFromView ? constraints : constraints.slice(1);
+    const probeColumns = probes.map((probe) => columnOf(store, probe.stage));
+    const survivors = new Uint32Array(probes.length);
+    let driven = 0;
+
+    const planEnded = clock();
+
+    // a view or root with nothing to probe or filter matches all its rows
+    if (
+      driveFromView && probes.length === 0 && !checkPredicates &&
+      window === undefined
+    ) {
+      const rows = baseRows ?? store.liveRows();
+      if (counters) {
+        counters.rowsMatched += rows.size;
+      }
+      if (report) {
+        report.steps = [
+          { stage: visibleStage, estimated: visibleCount, actual: rows.size },
+        ];
+        report.rows = rows.size;
+        report.timings = {
+          plan: planEnded - planStarted,
+          scan: clock() - planEnded,
+          predicates: 0,
+        };
+        report.predicateCalls = { made: 0, saved: 0 };
+      }
+      return rows;
+    }
+
+    const deletedRows = store.deletedRows;
+    const nodeMemo = new PredicateMemo(store.nodes.size);
+    const relationMemo = new PredicateMemo(store.relationNames.size);
+
+    const passesProbes = (row: number): boolean => {
+      driven++;
+      for (let idx = 0; idx < probes.length; idx++) {
+        if (!probes[idx].ids.has(probeColumns[idx][row])) {
+          return false;
+        }
+        survivors[idx]++;
+      }
+      return true;
+    };
+
+    // the window's rows are collected into `page`; take() returns false
+    // once it is full
+    const page = new RowBitmap();
+    let checked = 0;
+    let passed = 0;
+    let skipped = 0;
+    let tombstones = 0;
+
+    const take = (row: number): boolean => {
+      checked++;
+      if (
+        checkPredicates &&
+        !this.#passesPredicates(store, row, nodeMemo, relationMemo)
+      ) {
+        return true;
+      }
+      passed++;
+      if (skipped < window!.offset) {
+        skipped++;
+        return true;
+      }
+      if (page.size >= window!.limit) {
+        return false;
+      }
+      page.add(row);
+      return page.size < window!.limit;
+    };
+
+    // rows matching every constraint and visible to this database; not
+    // built when a window is filled straight from the view
+    let candidates: RowBitmap | undefined;
+    if (driveFromView && window !== undefined) {
+      const visit = (row: number) => !passesProbes(row) || take(row);
+      const start = window.after + 1;
 
-  for (const row of candidates) {
-    if (indexSets.length > 0) {
       if (baseRows !== null) {
-        if (!baseRows.has(row)) continue;
-      } else if (!store.isAlive(row)) {
-        continue;
+        baseRows.forEachFrom(start, visit);
+      } else {
+        for (let row = start; row < store.rowCount; row++) {
+          if (deletedRows.has(row)) {
+            tombstones++;
+          } else if (!visit(row)) {
+            break;
+          }
+        }
+      }
+    } else {
+      const probed: number[] = [];
+      const probe = (row: number) => {
+        if (passesProbes(row)) {
+          probed.push(row);
+        }
+      };
+
+      if (driveFromView) {
+        if (baseRows !== null) {
+          baseRows.forEach(probe);
+        } else {
+          for (let row = 0; row < store.rowCount; row++) {
+            if (deletedRows.has(row)) {
+              tombstones++;
+            } else {
+              probe(row);
+            }
+          }
+        }
+        candidates = RowBitmap.unionOf([probed]);
+      } else {
+        // visibility is applied after probing, as one bitmap operation
+        let matching: RowBitmap;
+        if (probes.length === 0) {
+          matching = unionLists(constraints[0].lists);
+          driven = matching.size;
+        } else {
+          for (const list of constraints[0].lists) {
+            if (list instanceof RowBitmap) {
+              list.forEach(probe);
+            } else {
+              for (const row of list) {
+                probe(row);
+              }
+            }
+          }
+          matching = RowBitmap.unionOf([probed]);
+        }
+
+        if (baseRows !== null) {
+          candidates = matching.and(baseRows);
+        } else {
+          candidates = matching.andNot(deletedRows);
+          tombstones = matching.size - candidates.size;
+        }
       }
     }
 
-    if (parsed.source) {
-      const source = store.nodes.valueOf(store.sourceIds[row]);
-      if (!passesNodePredicates(parsed.source, source)) continue;
+    const scanEnded = clock();
+
+    let result: RowBitmap;
+    if (window !== undefined) {
+      candidates?.forEachFrom(window.after + 1, take);
+      result = page;
+    } else if (checkPredicates) {
+      result = new RowBitmap();
+      candidates!.forEach((row) => {
+        if (this.#passesPredicates(store, row, nodeMemo, relationMemo)) {
+          result.add(row);
+        }
+      });
+    } else {
+      result = candidates!;
     }
 
-    if (parsed.relation?.predicate) {
-      const relation = store.relationNames.valueOf(store.relationIds[row]);
-      if (!parsed.relation.predicate(relation)) continue;
+    if (counters) {
+      // a scan driven from a root's rows passes over its tombstones
+      // before probing; posting-list drivers count them in `driven`
+      counters.rowsScanned += driveFromView ? driven + tombstones : driven;
+      counters.rowsMatched += result.size;
+      counters.tombstonesSkipped += tombstones;
+      if (!driveFromView) {
+        counters.postingListsTouched += constraints[0].lists.length;
+      }
     }
 
-    if (parsed.target) {
-      const target = store.nodes.valueOf(store.targetIds[row]);
-      if (!passesNodePredicates(parsed.target, target)) continue;
+    if (report) {
+      const driver = driveFromView
+        ? { stage: visibleStage, estimated: visibleCount, actual: driven }
+        : {
+          stage: constraints[0].stage,
+          estimated: constraints[0].estimate,
+          actual: driven,
+        };
+      const steps: PlanStep[] = [driver];
+
+      probes.forEach((entry, idx) => {
+        steps.push({
+          stage: entry.stage,
+          estimated: entry.estimate,
+          actual: survivors[idx],
+        });
+      });
+      if (!driveFromView) {
+        steps.push({
+          stage: visibleStage,
+          estimated: visibleCount,
+          actual: candidates!.size,
+        });
+      }
+      if (checkPredicates) {
+        steps.push(
+          window !== undefined
+            ? { stage: "predicates", estimated: checked, actual: passed }
+            : {
+              stage: "predicates",
+              estimated: candidates!.size,
+              actual: result.size,
+            },
+        );
+      }
+      if (window !== undefined) {
+        steps.push({ stage: "window", estimated: passed, actual: page.size });
+      }
+
+      report.steps = steps;
+      report.rows = result.size;
+      report.timings = {
+        plan: planEnded - planStarted,
+        scan: scanEnded - planEnded,
+        predicates: clock() - scanEnded,
+      };
+      report.predicateCalls = {
+        made: nodeMemo.calls + relationMemo.calls,
+        saved: nodeMemo.saved + relationMemo.saved,
+      };
     }
 
-    matched.push(row);
+    return result;
   }
+}
 
-  matched.sort((rowA, rowB) => rowA - rowB);
-  return new Set(matched);
+/*
+ * Compile and run a parsed search in one go.
+ */
+export function executeSearch(
+  store: TripleStore,
+  parsed: SearchObject,
+  baseRows: RowBitmap | null,
+): RowBitmap {
+  return new SearchPlan(parsed).execute(store, baseRows);
 }
@@ -0,0 +1,118 @@
+/*
+ * Snapshot tests: a store written with toSnapshot() and reopened must be
+ * indistinguishable from the original, for reads, searches, traversal and
+ * further mutation, and corrupt input must be rejected.
+ */
+
+import { assertEquals, assertThrows } from "@std/assert";
+import { TribbleDB } from "./mod.ts";
+import type { Triple } from "../types.ts";
+
+const FIXTURE: Triple[] = [
+  ["urn:ró:photo:p1", "location", "urn:ró:place:dublin"],
+  ["urn:ró:photo:p1", "subject", "urn:ró:bird:robin?context=wild"],
+  ["urn:ró:photo:p2", "location", "urn:ró:place:dublin"],
+  ["urn:ró:photo:p2", "name", 'she said "hello" — ó'],
+  ["urn:ró:place:dublin", "in", "urn:ró:place:ireland"],
+  ["urn:ró:album:2023", "name", "Year Album"],
+  ["urn:ró:photo:p3", "year", "2023"],
+];
+
+function reopened(db: TribbleDB): TribbleDB {
+  return TribbleDB.fromSnapshot(db.toSnapshot());
+}
+
+Deno.test("snapshot: round trip preserves content", () => {
+  const db = new TribbleDB([...FIXTURE]);
+  db.delete([FIXTURE[1]]);
+
+  const copy = reopened(db);
+
+  assertEquals(copy.triples(), db.triples());
+  assertEquals(copy.triplesCount, db.triplesCount);
+  assertEquals(copy.objects(), db.objects());
+  assertEquals(copy.relations(), db.relations());
+});
+
+Deno.test("snapshot: searches, reads and traversal work after opening", () => {
+  const db = new TribbleDB([...FIXTURE]);
+  const copy = reopened(db);
+
+  const search = { relation: "location", target: { type: "place" } };
+  assertEquals(copy.search(search).triples(), db.search(search).triples());
+  assertEquals(
+    copy.search({ target: { id: "2023" } }).triples(),
+    db.search({ target: { id: "2023" } }).triples(),
+  );
+  assertEquals(
+    copy.readThing("urn:ró:bird:robin", { ignoreQs: true }),
+    db.readThing("urn:ró:bird:robin", { ignoreQs: true }),
+  );
+  assertEquals(
+    copy.nodes("urn:ró:photo:p1").follow("location").follow("in").urns(),
+    new Set(["urn:ró:place:ireland"]),
+  );
+});
+
+Deno.test("snapshot: an opened store accepts further mutation", () => {
+  const db = new TribbleDB([...FIXTURE]);
+  db.delete([FIXTURE[0]]);
+  const copy = reopened(db);
+
+  assertEquals(copy.add([FIXTURE[0], FIXTURE[2]]), {
+    added: 1,
+    duplicates: 1,
+  });
+  copy.delete([FIXTURE[4]]);
+  db.add([FIXTURE[0]]);
+  db.delete([FIXTURE[4]]);
+
+  assertEquals(copy.triples(), db.triples());
+});
+
+Deno.test("snapshot: a view is written as its visible rows", () => {
+  const db = new TribbleDB([...FIXTURE]);
+  const view = db.search({ relation: "location" });
+
+  assertEquals(reopened(view).triples(), view.triples());
+});
+
+Deno.test("snapshot: unaligned input is accepted", () => {
+  const bytes = new TribbleDB([...FIXTURE]).toSnapshot();
+  const padded = new Uint8Array(bytes.length + 1);
+  padded.set(bytes, 1);
+
+  const copy = TribbleDB.fromSnapshot(padded.subarray(1));
+  assertEquals(copy.triplesCount, FIXTURE.length);
+});
+
+Deno.test("snapshot: corrupt and foreign input is rejected", () => {
+  const bytes = new TribbleDB([...FIXTURE]).toSnapshot();
+
+  assertThrows(
+    () => TribbleDB.fromSnapshot(new TextEncoder().encode('0 "a"\n')),
+    SyntaxError,
+  );
+  assertThrows(
+    () => TribbleDB.fromSnapshot(bytes.slice(0, 64)),
+    SyntaxError,
+  );
+
+  const future = bytes.slice();
+  new Uint32Array(future.buffer)[2] = 999;
+  assertThrows(() => TribbleDB.fromSnapshot(future), Error, "version 999");
+});
+
+Deno.test("snapshot: openSnapshot reads a file URL", async () => {
+  const path = await Deno.makeTempFile({ suffix: ".tribsnap" });
+  try {
+    await Deno.writeFile(path, new TribbleDB([...FIXTURE]).toSnapshot());
+
+    const opened = await TribbleDB.openSnapshot(
+      new URL(`file://${path}`),
+    );
+    assertEquals(opened.triples(), FIXTURE);
+  } finally {
+    await Deno.remove(path);
+  }
+});
@@ -0,0 +1,448 @@
+/*
+ * Binary columnar snapshots of a TripleStore.
+ *
+ * A snapshot is a header followed by flat, 8-byte aligned sections: the two
+ * interner string tables, the three id columns, the tombstones, the parsed
+ * URN metadata, and every posting list in compressed-sparse-row form
+ * (an offsets array indexed by key plus one concatenated entries array).
+ * Opening a snapshot re-parses no text, re-parses no URNs and re-interns
+ * nothing. With the typed backend the id columns and CSR posting lists
+ * are adopted as Uint32Array views over the input buffer, with no copy;
+ * the other backends populate their structures from the same views.
+ *
+ * Layout (all integers u32, platform byte order, checked on open):
+ *
+ *   magic "TRIBSNAP" | version | byte-order mark | section count
+ *   section directory: (byte offset, byte length) per section
+ *   sections, in SECTION_NAMES order
+ *
+ * String tables are stored as one UTF-8 blob per interner plus UTF-16
+ * offsets, so the whole table decodes with a single TextDecoder call and
+ * each string is a slice of it.
+ */
+
+import { stringsFrom } from "./interner.ts";
+import type { StringTable } from "./interner.ts";
+import { MAX_NODE_IDS, MAX_RELATION_IDS } from "./constants.ts";
+import { TripleStore } from "./store.ts";
+import type { IdColumn, NodeMeta } from "./store.ts";
+import { RowBitmap } from "./bitmap.ts";
+import { BitmapPostings, CsrPostings, MapPostings } from "./postings.ts";
+import type { PostingIndex } from "./postings.ts";
+import type { InternerKind, StoreBackend } from "./types.ts";
+
+export const SNAPSHOT_VERSION = 1;
+
+const MAGIC = "TRIBSNAP";
+const BYTE_ORDER_MARK = 0x01020304;
+const SECTION_ALIGNMENT = 8;
+
+const SECTION_NAMES = [
+  "nodeText",
+  "nodeTextOffsets",
+  "relationText",
+  "relationTextOffsets",
+  "sourceIds",
+  "relationIds",
+  "targetIds",
+  "deletedRows",
+  "metaNodeIds",
+  "metaTypeIds",
+  "metaIdIds",
+  "metaQsOffsets",
+  "metaQsIds",
+  "rowsBySourceOffsets",
+  "rowsBySourceEntries",
+  "rowsByTargetOffsets",
+  "rowsByTargetEntries",
+  "rowsByRelationOffsets",
+  "rowsByRelationEntries",
+  "nodesByTypeOffsets",
+  "nodesByTypeEntries",
+  "nodesByIdOffsets",
+  "nodesByIdEntries",
+  "nodesByQsOffsets",
+  "nodesByQsEntries",
+] as const;
+
+type SectionName = typeof SECTION_NAMES[number];
+type Sections = Record<SectionName, Uint8Array | Uint32Array>;
+
+// magic (2 words), version, byte-order mark, section count
+const HEADER_WORDS = 5;
+
+function alignUp(value: number): number {
+  return Math.ceil(value / SECTION_ALIGNMENT) * SECTION_ALIGNMENT;
+}
+
+/*
+ * Encode an interner's values as a UTF-8 blob plus UTF-16 end offsets.
+ */
+function encodeStrings(interner: StringTable): [Uint8Array, Uint32Array] {
+  const offsets = new Uint32Array(interner.size + 1);
+  const values: string[] = [];
+  let position = 0;
+
+  for (let id = 0; id < interner.size; id++) {
+    const value = interner.valueOf(id);
+    values.push(value);
+    position += value.length;
+    offsets[id + 1] = position;
+  }
+
+  const joined = values.join("");
+  if (!joined.isWellFormed()) {
+    throw new Error("Cannot snapshot strings containing lone surrogates.");
+  }
+  return [new TextEncoder().encode(joined), offsets];
+}
+
+function decodeStrings(text: Uint8Array, offsets: Uint32Array): string[] {
+  const joined = new TextDecoder().decode(text);
+  const values: string[] = new Array(Math.max(offsets.length - 1, 0));
+
+  for (let id = 0; id < values.length; id++) {
+    values[id] = joined.slice(offsets[id], offsets[id + 1]);
+  }
+  return values;
+}
+
+/*
+ * Flatten posting lists keyed by dense ids into CSR form, entries
+ * ascending within each key.
+ */
+function encodePostings(
+  lists: PostingIndex,
+  keySpace: number,
+): [Uint32Array, Uint32Array] {
+  const offsets = new Uint32Array(keySpace + 1);
+  let total = 0;
+
+  for (let key = 0; key < keySpace; key++) {
+    total += lists.get(key)?.size ?? 0;
+    offsets[key + 1] = total;
+  }
+
+  const entries = new Uint32Array(total);
+  for (let key = 0; key < keySpace; key++) {
+    const list = lists.get(key);
+    if (!list) {
+      continue;
+    }
+
+    let position = offsets[key];
+    let sorted = true;
+    for (const entry of list) {
+      if (position > offsets[key] && entries[position - 1] > entry) {
+        sorted = false;
+      }
+      entries[position++] = entry;
+    }
+    if (!sorted) {
+      entries.subarray(offsets[key], position).sort();
+    }
+  }
+
+  return [offsets, entries];
+}
+
+function decodePostings(
+  offsets: Uint32Array,
+  entries: Uint32Array,
+  backend: StoreBackend,
+): PostingIndex {
+  if (backend === "typed") {
+    return CsrPostings.fromCsr(offsets, entries);
+  }
+
+  const sets = new Map<number, Set<number>>();
+  const bitmaps = new Map<number, RowBitmap>();
+
+  for (let key = 0; key + 1 < offsets.length; key++) {
+    const start = offsets[key];
+    const end = offsets[key + 1];
+    if (start === end) {
+      continue;
+    }
+
+    const slice = entries.subarray(start, end);
+    if (backend === "bitmap") {
+      bitmaps.set(key, RowBitmap.from(slice));
+    } else {
+      sets.set(key, new Set(slice));
+    }
+  }
+  return backend === "bitmap"
+    ? new BitmapPostings(bitmaps)
+    : new MapPostings(sets);
+}
+
+function encodeColumn(column: IdColumn, rowCount: number): Uint32Array {
+  return column instanceof Uint32Array
+    ? column.subarray(0, rowCount)
+    : Uint32Array.from(column);
+}
+
+function decodeColumn(column: Uint32Array, backend: StoreBackend): IdColumn {
+  return backend === "map" ? Array.from(column) : column;
+}
+
+function encodeNodeMeta(nodeMeta: Map<number, NodeMeta>): Uint32Array[] {
+  const nodeIds = new Uint32Array(nodeMeta.size);
+  const typeIds = new Uint32Array(nodeMeta.size);
+  const idIds = new Uint32Array(nodeMeta.size);
+  const qsOffsets = new Uint32Array(nodeMeta.size + 1);
+  const qsIds: number[] = [];
+
+  let idx = 0;
+  for (const [nodeId, meta] of nodeMeta) {
+    nodeIds[idx] = nodeId;
+    typeIds[idx] = meta.typeId;
+    idIds[idx] = meta.idId;
+    qsIds.push(...meta.qsIds);
+    qsOffsets[idx + 1] = qsIds.length;
+    idx++;
+  }
+
+  return [nodeIds, typeIds, idIds, qsOffsets, Uint32Array.from(qsIds)];
+}
+
+function decodeNodeMeta(sections: Sections): Map<number, NodeMeta> {
+  const nodeIds = sections.metaNodeIds as Uint32Array;
+  const typeIds = sections.metaTypeIds as Uint32Array;
+  const idIds = sections.metaIdIds as Uint32Array;
+  const qsOffsets = sections.metaQsOffsets as Uint32Array;
+  const qsIds = sections.metaQsIds as Uint32Array;
+
+  const nodeMeta = new Map<number, NodeMeta>();
+  for (let idx = 0; idx < nodeIds.length; idx++) {
+    nodeMeta.set(nodeIds[idx], {
+      typeId: typeIds[idx],
+      idId: idIds[idx],
+      qsIds: Array.from(qsIds.subarray(qsOffsets[idx], qsOffsets[idx + 1])),
+    });
+  }
+  return nodeMeta;
+}
+
+/*
+ * Serialise a store, tombstones included, to snapshot bytes.
+ */
+export function writeSnapshot(store: TripleStore): Uint8Array {
+  const [nodeText, nodeTextOffsets] = encodeStrings(store.nodes);
+  const [relationText, relationTextOffsets] = encodeStrings(
+    store.relationNames,
+  );
+  const [metaNodeIds, metaTypeIds, metaIdIds, metaQsOffsets, metaQsIds] =
+    encodeNodeMeta(store.nodeMeta);
+
+  const nodeSpace = store.nodes.size;
+  const relationSpace = store.relationNames.size;
+
+  const [rowsBySourceOffsets, rowsBySourceEntries] = encodePostings(
+    store.rowsBySource,
+    nodeSpace,
+  );
+  const [rowsByTargetOffsets, rowsByTargetEntries] = encodePostings(
+    store.rowsByTarget,
+    nodeSpace,
+  );
+  const [rowsByRelationOffsets, rowsByRelationEntries] = encodePostings(
+    store.rowsByRelation,
+    relationSpace,
+  );
+  const [nodesByTypeOffsets, nodesByTypeEntries] = encodePostings(
+    store.nodesByType,
+    nodeSpace,
+  );
+  const [nodesByIdOffsets, nodesByIdEntries] = encodePostings(
+    store.nodesById,
+    nodeSpace,
+  );
+  const [nodesByQsOffsets, nodesByQsEntries] = encodePostings(
+    store.nodesByQs,
+    nodeSpace,
+  );
+
+  const sections: Sections = {
+    nodeText,
+    nodeTextOffsets,
+    relationText,
+    relationTextOffsets,
+    sourceIds: encodeColumn(store.sourceIds, store.rowCount),
+    relationIds: encodeColumn(store.relationIds, store.rowCount),
+    targetIds: encodeColumn(store.targetIds, store.rowCount),
+    deletedRows: Uint32Array.from(store.deletedRows),
+    metaNodeIds,
+    metaTypeIds,
+    metaIdIds,
+    metaQsOffsets,
+    metaQsIds,
+    rowsBySourceOffsets,
+    rowsBySourceEntries,
+    rowsByTargetOffsets,
+    rowsByTargetEntries,
+    rowsByRelationOffsets,
+    rowsByRelationEntries,
+    nodesByTypeOffsets,
+    nodesByTypeEntries,
+    nodesByIdOffsets,
+    nodesByIdEntries,
+    nodesByQsOffsets,
+    nodesByQsEntries,
+  };
+
+  return packSections(sections);
+}
+
+function packSections(sections: Sections): Uint8Array {
+  const headerBytes = alignUp((HEADER_WORDS + SECTION_NAMES.length * 2) * 4);
+
+  let size = headerBytes;
+  const placements: [number, number][] = [];
+  for (const name of SECTION_NAMES) {
+    const { byteLength } = sections[name];
+    placements.push([size, byteLength]);
+    size = alignUp(size + byteLength);
+  }
+
+  if (size > 0xFFFFFFFF) {
+    throw new Error("Snapshot exceeds the 4 GiB format limit.");
+  }
+
+  const bytes = new Uint8Array(size);
+  const header = new Uint32Array(bytes.buffer, 0, headerBytes / 4);
+
+  bytes.set(new TextEncoder().encode(MAGIC), 0);
+  header[2] = SNAPSHOT_VERSION;
+  header[3] = BYTE_ORDER_MARK;
+  header[4] = SECTION_NAMES.length;
+
+  SECTION_NAMES.forEach((name, idx) => {
+    const [offset, byteLength] = placements[idx];
+    header[HEADER_WORDS + idx * 2] = offset;
+    header[HEADER_WORDS + idx * 2 + 1] = byteLength;
+
+    const section = sections[name];
+    bytes.set(
+      new Uint8Array(section.buffer, section.byteOffset, byteLength),
+      offset,
+    );
+  });
+
+  return bytes;
+}
+
+/*
+ * View the buffer's sections without copying. A Uint8Array input that is
+ * not 4-byte aligned within its buffer is copied once so the Uint32Array
+ * views are legal.
+ */
+function unpackSections(input: ArrayBuffer | Uint8Array): Sections {
+  let bytes = input instanceof Uint8Array ? input : new Uint8Array(input);
+  if (bytes.byteOffset % 4 !== 0) {
+    bytes = bytes.slice();
+  }
+
+  const headerEnd = HEADER_WORDS * 4;
+  if (
+    bytes.byteLength < headerEnd ||
+    new TextDecoder().decode(bytes.subarray(0, MAGIC.length)) !== MAGIC
+  ) {
+    throw new SyntaxError("Not a tribble snapshot: bad magic bytes.");
+  }
+
+  const header = new Uint32Array(bytes.buffer, bytes.byteOffset, HEADER_WORDS);
+  if (header[3] !== BYTE_ORDER_MARK) {
+    throw new Error("Snapshot was written with a different byte order.");
+  }
+  if (header[2] !== SNAPSHOT_VERSION) {
+    throw new Error(
+      `Unsupported snapshot version ${
+        header[2]
+      } (expected ${SNAPSHOT_VERSION}).`,
+    );
+  }
+  if (header[4] !== SECTION_NAMES.length) {
+    throw new SyntaxError("Corrupt snapshot: unexpected section count.");
+  }
+
+  const directoryWords = SECTION_NAMES.length * 2;
+  if (bytes.byteLength < headerEnd + directoryWords * 4) {
+    throw new SyntaxError("Corrupt snapshot: truncated section directory.");
+  }
+  const directory = new Uint32Array(
+    bytes.buffer,
+    bytes.byteOffset + headerEnd,
+    directoryWords,
+  );
+
+  const sections = {} as Sections;
+  SECTION_NAMES.forEach((name, idx) => {
+    const offset = directory[idx * 2];
+    const byteLength = directory[idx * 2 + 1];
+
+    if (offset % 4 !== 0 || offset + byteLength > bytes.byteLength) {
+      throw new SyntaxError(`Corrupt snapshot: bad bounds for ${name}.`);
+    }
+
+    const start = bytes.byteOffset + offset;
+    sections[name] = name.endsWith("Text")
+      ? new Uint8Array(bytes.buffer, start, byteLength)
+      : new Uint32Array(bytes.buffer, start, byteLength / 4);
+  });
+
+  return sections;
+}
+
+/*
+ * Rebuild a store from snapshot bytes.
+ */
+export function readSnapshot(
+  input: ArrayBuffer | Uint8Array,
+  backend: StoreBackend = "typed",
+  interner: InternerKind = "map",
+): TripleStore {
+  const sections = unpackSections(input);
+  const words = (name: SectionName) => sections[name] as Uint32Array;
+
+  const nodes = stringsFrom(
+    interner,
+    decodeStrings(sections.nodeText as Uint8Array, words("nodeTextOffsets")),
+    MAX_NODE_IDS,
+  );
+  const relationNames = stringsFrom(
+    interner,
+    decodeStrings(
+      sections.relationText as Uint8Array,
+      words("relationTextOffsets"),
+    ),
+    MAX_RELATION_IDS,
+  );
+
+  const postings = (name: string) => {
+    return decodePostings(
+      words(`${name}Offsets` as SectionName),
+      words(`${name}Entries` as SectionName),
+      backend,
+    );
+  };
+
+  return TripleStore.fromParts({
+    backend,
+    interner,
+    nodes,
+    relationNames,
+    sourceIds: decodeColumn(words("sourceIds"), backend),
+    relationIds: decodeColumn(words("relationIds"), backend),
+    targetIds: decodeColumn(words("targetIds"), backend),
+    deletedRows: RowBitmap.from(words("deletedRows")),
+    nodeMeta: decodeNodeMeta(sections),
+    rowsBySource: postings("rowsBySource"),
+    rowsByTarget: postings("rowsByTarget"),
+    rowsByRelation: postings("rowsByRelation"),
+    nodesByType: postings("nodesByType"),
+    nodesById: postings("nodesById"),
+    nodesByQs: postings("nodesByQs"),
+  });
+}
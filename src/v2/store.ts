@@ -1,7 +1,7 @@
 /*
  * Columnar triple store for the v2 engine.
  *
- * Triples are stored as three parallel arrays of interned ids. Identity is
+ * Triples are stored as three parallel columns of interned ids. Identity is
  * exact (packed integer keys, no hashing). Deletion tombstones a row without
  * disturbing its column data or posting lists, so views created before a
  * delete keep resolving their rows — this is what preserves the v1 snapshot
@@ -9,16 +9,29 @@
  * tombstoned rows; all readers filter through a visibility check.
  *
  * Only three row-level posting lists are maintained (full source URN, full
- * target URN, relation): the ingest hot path pays three Set inserts per
+ * target URN, relation): the ingest hot path pays three posting inserts per
  * triple. Type/id/qs lookups intersect at NODE level (one entry per
  * distinct URN, populated once at intern time) and then union the per-node
  * row lists, which costs O(result) at query time instead of O(triples) at
  * ingest time.
+ *
+ * Three storage backends share this interface. "typed" (the default)
+ * keeps columns in capacity-doubling Uint32Arrays and posting lists in CSR
+ * form; "bitmap" swaps the CSR lists for compressed bitmaps; "map" keeps
+ * number[] columns and a Map of Sets per index. Tombstones are a bitmap
+ * in every backend.
  */
 
 import type { ParsedUrn, Triple } from "../types.ts";
 import { asUrn } from "../urn.ts";
-import { Interner } from "./interner.ts";
+import { emptyStrings, stringsFrom } from "./interner.ts";
+import type { StringTable } from "./interner.ts";
+import { LiteralIndex } from "./literals.ts";
+import { TextIndex } from "./text.ts";
+import { RowBitmap } from "./bitmap.ts";
+import { BitmapPostings, CsrPostings, MapPostings } from "./postings.ts";
+import type { PostingIndex } from "./postings.ts";
+import type { CompactOpts, InternerKind, StoreBackend } from "./types.ts";
 import {
   MAX_NODE_IDS,
   MAX_RELATION_IDS,
@@ -35,60 +48,287 @@ export type NodeMeta = {
   qsIds: number[];
 };
 
-type PostingLists = Map<number, Set<number>>;
+/*
+ * An id column. Typed columns carry spare capacity past the last row, so
+ * readers index by row and never rely on .length.
+ */
+export type IdColumn = number[] | Uint32Array;
 
-function addPosting(lists: PostingLists, key: number, row: number): void {
-  let rows = lists.get(key);
-  if (!rows) {
-    rows = new Set();
-    lists.set(key, rows);
+const INITIAL_CAPACITY = 1024;
+
+function emptyColumn(backend: StoreBackend): IdColumn {
+  return backend === "map" ? [] : new Uint32Array(INITIAL_CAPACITY);
+}
+
+function emptyPostings(backend: StoreBackend): PostingIndex {
+  if (backend === "typed") {
+    return new CsrPostings();
   }
-  rows.add(row);
+  return backend === "bitmap" ? new BitmapPostings() : new MapPostings();
+}
+
+function grownColumn(column: Uint32Array): Uint32Array {
+  const grown = new Uint32Array(Math.max(column.length * 2, INITIAL_CAPACITY));
+  grown.set(column);
+  return grown;
 }
 
+/*
+ * A store and the rows of it a reader sees: a row-set, or null for the
+ * store's live rows.
+ */
+export type StoreLayer = {
+  store: TripleStore;
+  rows: RowBitmap | null;
+};
+
+/*
+ * The rows a view has added, in a store laid over the shared one (see
+ * TripleStore.layer()), and which of them the view sees.
+ */
+export type DeltaLayer = {
+  store: TripleStore;
+  rows: RowBitmap;
+};
+
+/*
+ * Everything a store holds except its identity map, which is derivable.
+ */
+export type StoreParts = {
+  backend: StoreBackend;
+  interner: InternerKind;
+  nodes: StringTable;
+  relationNames: StringTable;
+  sourceIds: IdColumn;
+  relationIds: IdColumn;
+  targetIds: IdColumn;
+  deletedRows: RowBitmap;
+  nodeMeta: Map<number, NodeMeta>;
+  rowsBySource: PostingIndex;
+  rowsByTarget: PostingIndex;
+  rowsByRelation: PostingIndex;
+  nodesByType: PostingIndex;
+  nodesById: PostingIndex;
+  nodesByQs: PostingIndex;
+};
+
 export class TripleStore {
-  nodes: Interner;
-  relationNames: Interner;
+  readonly backend: StoreBackend;
+  readonly interner: InternerKind;
+
+  nodes: StringTable;
+  relationNames: StringTable;
 
   // parallel columns; row = position
-  sourceIds: number[];
-  relationIds: number[];
-  targetIds: number[];
+  sourceIds: IdColumn;
+  relationIds: IdColumn;
+  targetIds: IdColumn;
+
+  // rows written to the columns, tombstones included
+  private columnLength: number;
 
-  // exact identity: sourceId -> (relationId * TARGET_PACK_SPAN + targetId) -> row
-  private identity: Map<number, Map<number, number>>;
+  // exact identity: sourceId -> (relationId * TARGET_PACK_SPAN + targetId) -> row;
+  // null until first needed when the store was restored from a snapshot
+  private identity: Map<number, Map<number, number>> | null;
+
+  // the same keys -> every tombstoned row holding that triple, which only
+  // views can still see; null until first needed
+  private retired: Map<number, Map<number, number[]>> | null;
 
   // tombstoned rows; column data is retained for live views
-  deletedRows: Set<number>;
+  deletedRows: RowBitmap;
+
+  // bumped by every mutation, so caches can tell their entries are stale
+  generation: number;
 
   // URN components per distinct node, parsed once at intern time
   nodeMeta: Map<number, NodeMeta>;
 
   // row-level posting lists (the only per-triple index writes)
-  rowsBySource: PostingLists;
-  rowsByTarget: PostingLists;
-  rowsByRelation: PostingLists;
+  rowsBySource: PostingIndex;
+  rowsByTarget: PostingIndex;
+  rowsByRelation: PostingIndex;
 
   // node-level posting lists, populated once per distinct URN
-  nodesByType: Map<number, Set<number>>;
-  nodesById: Map<number, Set<number>>;
-  nodesByQs: Map<number, Set<number>>;
-
-  constructor() {
-    this.nodes = new Interner(MAX_NODE_IDS);
-    this.relationNames = new Interner(MAX_RELATION_IDS);
-    this.sourceIds = [];
-    this.relationIds = [];
-    this.targetIds = [];
+  nodesByType: PostingIndex;
+  nodesById: PostingIndex;
+  nodesByQs: PostingIndex;
+
+  // opt-in sorted target indexes, by relation name
+  literalIndexes: Map<string, LiteralIndex>;
+
+  // opt-in trigram index over literal nodes, for contains/icontains
+  textIndex: TextIndex | null;
+
+  constructor(
+    backend: StoreBackend = "typed",
+    interner: InternerKind = "map",
+  ) {
+    this.backend = backend;
+    this.interner = interner;
+    this.nodes = emptyStrings(interner, MAX_NODE_IDS);
+    this.relationNames = emptyStrings(interner, MAX_RELATION_IDS);
+    this.sourceIds = emptyColumn(backend);
+    this.relationIds = emptyColumn(backend);
+    this.targetIds = emptyColumn(backend);
+    this.columnLength = 0;
     this.identity = new Map();
-    this.deletedRows = new Set();
+    this.retired = null;
+    this.deletedRows = new RowBitmap();
+    this.generation = 0;
     this.nodeMeta = new Map();
-    this.rowsBySource = new Map();
-    this.rowsByTarget = new Map();
-    this.rowsByRelation = new Map();
-    this.nodesByType = new Map();
-    this.nodesById = new Map();
-    this.nodesByQs = new Map();
+    this.rowsBySource = emptyPostings(backend);
+    this.rowsByTarget = emptyPostings(backend);
+    this.rowsByRelation = emptyPostings(backend);
+    this.nodesByType = emptyPostings(backend);
+    this.nodesById = emptyPostings(backend);
+    this.nodesByQs = emptyPostings(backend);
+    this.literalIndexes = new Map();
+    this.textIndex = null;
+  }
+
+  /*
+   * Assemble a store from prebuilt parts (the snapshot loader). The
+   * identity map is derived from the columns on first use, so opening a
+   * snapshot for reading never pays for it. Columns must be exactly as
+   * long as the row count.
+   */
+  static fromParts(parts: StoreParts): TripleStore {
+    const store = new TripleStore(parts.backend, parts.interner);
+    Object.assign(store, parts);
+    store.columnLength = parts.sourceIds.length;
+    store.identity = null;
+    store.retired = null;
+    return store;
+  }
+
+  private identityMap(): Map<number, Map<number, number>> {
+    if (this.identity !== null) {
+      return this.identity;
+    }
+
+    const identity = new Map<number, Map<number, number>>();
+    for (let row = 0; row < this.columnLength; row++) {
+      if (this.deletedRows.has(row)) {
+        continue;
+      }
+
+      const sourceId = this.sourceIds[row];
+      let inner = identity.get(sourceId);
+      if (!inner) {
+        inner = new Map();
+        identity.set(sourceId, inner);
+      }
+      inner.set(
+        this.identityKey(this.relationIds[row], this.targetIds[row]),
+        row,
+      );
+    }
+
+    this.identity = identity;
+    return identity;
+  }
+
+  /*
+   * Keep a sorted index of this relation's targets for range searches.
+   * It is built on first use.
+   */
+  indexLiterals(relation: string): void {
+    if (!this.literalIndexes.has(relation)) {
+      this.literalIndexes.set(relation, new LiteralIndex(relation));
+    }
+  }
+
+  /*
+   * Keep a trigram index over literal nodes for substring searches,
+   * indexing the ones already registered.
+   */
+  indexText(): void {
+    if (this.textIndex !== null) {
+      return;
+    }
+
+    this.textIndex = new TextIndex();
+    for (const nodeId of this.nodeMeta.keys()) {
+      if (this.isLiteral(nodeId)) {
+        this.textIndex.add(nodeId, this.nodes.valueOf(nodeId));
+      }
+    }
+  }
+
+  /*
+   * Whether a node string is a literal rather than a URN: asUrn() gave it
+   * type "unknown".
+   */
+  isLiteral(nodeId: number): boolean {
+    const meta = this.nodeMeta.get(nodeId);
+    return meta !== undefined && meta.typeId === this.nodes.idOf("unknown");
+  }
+
+  /*
+   * A store for rows laid over this one, such as a view's additions. It
+   * shares this store's strings, node metadata and text index, so an id
+   * means the same in both, but has columns, posting lists, tombstones
+   * and a generation of its own: writing to it never changes this store's
+   * rows. With `rows`, it starts with copies of those rows.
+   */
+  layer(rows?: RowBitmap): TripleStore {
+    // a layer's keys are sparse in the shared id space, which CSR offsets
+    // would have to span
+    const store = new TripleStore(
+      this.backend === "map" ? "map" : "bitmap",
+      this.interner,
+    );
+    store.nodes = this.nodes;
+    store.relationNames = this.relationNames;
+    store.nodeMeta = this.nodeMeta;
+    store.nodesByType = this.nodesByType;
+    store.nodesById = this.nodesById;
+    store.nodesByQs = this.nodesByQs;
+    store.textIndex = this.textIndex;
+    for (const relation of this.literalIndexes.keys()) {
+      store.indexLiterals(relation);
+    }
+
+    rows?.forEach((row) => {
+      store.addRowByIds(
+        this.sourceIds[row],
+        this.relationIds[row],
+        this.targetIds[row],
+      );
+    });
+    return store;
+  }
+
+  private retiredMap(): Map<number, Map<number, number[]>> {
+    if (this.retired !== null) {
+      return this.retired;
+    }
+
+    this.retired = new Map();
+    this.deletedRows.forEach((row) => this.retire(row));
+    return this.retired;
+  }
+
+  private retire(row: number): void {
+    if (this.retired === null) {
+      return;
+    }
+
+    const sourceId = this.sourceIds[row];
+    let inner = this.retired.get(sourceId);
+    if (!inner) {
+      inner = new Map();
+      this.retired.set(sourceId, inner);
+    }
+
+    const key = this.identityKey(this.relationIds[row], this.targetIds[row]);
+    const rows = inner.get(key);
+    if (rows) {
+      rows.push(row);
+    } else {
+      inner.set(key, [row]);
+    }
   }
 
   /*
@@ -110,18 +350,128 @@ export class TripleStore {
 
     const qsIds: number[] = [];
     for (const [qsKey, qsValue] of Object.entries(parsed.qs)) {
-      const qsId = this.nodes.intern(`${qsKey}=${qsValue}`);
-      qsIds.push(qsId);
-      addPosting(this.nodesByQs, qsId, nodeId);
+      qsIds.push(this.nodes.intern(`${qsKey}=${qsValue}`));
     }
 
-    this.nodeMeta.set(nodeId, { typeId, idId, qsIds });
-    addPosting(this.nodesByType, typeId, nodeId);
-    addPosting(this.nodesById, idId, nodeId);
-
+    this.registerNode(nodeId, { typeId, idId, qsIds });
     return nodeId;
   }
 
+  private registerNode(nodeId: number, meta: NodeMeta): void {
+    this.nodeMeta.set(nodeId, meta);
+    this.nodesByType.add(meta.typeId, nodeId);
+    this.nodesById.add(meta.idId, nodeId);
+    for (const qsId of meta.qsIds) {
+      this.nodesByQs.add(qsId, nodeId);
+    }
+    if (this.textIndex !== null && this.isLiteral(nodeId)) {
+      this.textIndex.add(nodeId, this.nodes.valueOf(nodeId));
+    }
+  }
+
+  /*
+   * A new store holding only `rows` (by default, the live rows),
+   * renumbered from 0 in row order. It is built from interned ids: no
+   * string is re-interned and no URN re-parsed. Posting lists, node
+   * metadata and the identity map only cover the kept rows and their
+   * nodes. With pruneStrings, strings no kept row references are dropped
+   * and the survivors get fresh, dense ids; otherwise every id is kept.
+   * A `delta` laid over this store has its rows kept after these. The new
+   * store shares nothing mutable with this one.
+   */
+  compacted(
+    rows?: RowBitmap,
+    opts: CompactOpts = {},
+    delta?: DeltaLayer,
+  ): TripleStore {
+    const store = new TripleStore(this.backend, this.interner);
+    const pruneStrings = opts.pruneStrings ?? false;
+
+    const nodeRemap = new Int32Array(this.nodes.size).fill(-1);
+    const nodeValues: string[] = [];
+    const keepString = (nodeId: number): number => {
+      if (nodeRemap[nodeId] === -1) {
+        nodeRemap[nodeId] = nodeValues.length;
+        nodeValues.push(this.nodes.valueOf(nodeId));
+      }
+      return nodeRemap[nodeId];
+    };
+
+    const relationRemap = new Int32Array(this.relationNames.size).fill(-1);
+    const relationValues: string[] = [];
+    const keepRelation = (relationId: number): number => {
+      if (relationRemap[relationId] === -1) {
+        relationRemap[relationId] = relationValues.length;
+        relationValues.push(this.relationNames.valueOf(relationId));
+      }
+      return relationRemap[relationId];
+    };
+
+    if (!pruneStrings) {
+      for (let nodeId = 0; nodeId < this.nodes.size; nodeId++) {
+        keepString(nodeId);
+      }
+      for (let relId = 0; relId < this.relationNames.size; relId++) {
+        keepRelation(relId);
+      }
+    }
+
+    const registered = new Uint8Array(this.nodes.size);
+    const keepNode = (nodeId: number): number => {
+      const kept = keepString(nodeId);
+      if (registered[nodeId] === 0) {
+        registered[nodeId] = 1;
+        const meta = this.nodeMeta.get(nodeId)!;
+        store.registerNode(kept, {
+          typeId: keepString(meta.typeId),
+          idId: keepString(meta.idId),
+          qsIds: meta.qsIds.map(keepString),
+        });
+      }
+      return kept;
+    };
+
+    const capacity = (rows?.size ?? this.aliveCount) + (delta?.rows.size ?? 0);
+    let ids = new Uint32Array(3 * Math.max(capacity, 1));
+    let count = 0;
+    const keepRowOf = (store: TripleStore) => (row: number) => {
+      ids[3 * count] = keepNode(store.sourceIds[row]);
+      ids[3 * count + 1] = keepRelation(store.relationIds[row]);
+      ids[3 * count + 2] = keepNode(store.targetIds[row]);
+      count++;
+    };
+
+    const keepRow = keepRowOf(this);
+    if (rows !== undefined) {
+      rows.forEach(keepRow);
+    } else {
+      for (let row = 0; row < this.columnLength; row++) {
+        if (!this.deletedRows.has(row)) {
+          keepRow(row);
+        }
+      }
+    }
+    delta?.rows.forEach(keepRowOf(delta.store));
+    ids = ids.subarray(0, 3 * count);
+
+    store.nodes = stringsFrom(this.interner, nodeValues, MAX_NODE_IDS);
+    store.relationNames = stringsFrom(
+      this.interner,
+      relationValues,
+      MAX_RELATION_IDS,
+    );
+    store.addRowsByIds(ids, count);
+    store.generation = this.generation + 1;
+    for (const relation of this.literalIndexes.keys()) {
+      store.indexLiterals(relation);
+    }
+    if (this.textIndex !== null) {
+      store.indexText();
+    }
+
+    return store;
+  }
+
   private identityKey(relationId: number, targetId: number): number {
     return relationId * TARGET_PACK_SPAN + targetId;
   }
@@ -132,10 +482,30 @@ export class TripleStore {
   rowOf(sourceId: number, relationId: number, targetId: number):
     | number
     | undefined {
-    const inner = this.identity.get(sourceId);
+    const inner = this.identityMap().get(sourceId);
     return inner?.get(this.identityKey(relationId, targetId));
   }
 
+  /*
+   * Find the row of an exact triple among `rows`, which may include
+   * tombstoned rows (a view's row-set).
+   */
+  rowIn(
+    rows: RowBitmap,
+    sourceId: number,
+    relationId: number,
+    targetId: number,
+  ): number | undefined {
+    const alive = this.rowOf(sourceId, relationId, targetId);
+    if (alive !== undefined && rows.has(alive)) {
+      return alive;
+    }
+
+    const retired = this.retiredMap().get(sourceId)
+      ?.get(this.identityKey(relationId, targetId));
+    return retired?.find((row) => rows.has(row));
+  }
+
   hasTriple(triple: Triple): boolean {
     const sourceId = this.nodes.idOf(triple[0]);
     const relationId = this.relationNames.idOf(triple[1]);
@@ -171,10 +541,11 @@ export class TripleStore {
     relationId: number,
     targetId: number,
   ): boolean {
-    let inner = this.identity.get(sourceId);
+    const identity = this.identityMap();
+    let inner = identity.get(sourceId);
     if (!inner) {
       inner = new Map();
-      this.identity.set(sourceId, inner);
+      identity.set(sourceId, inner);
     }
 
     const innerKey = this.identityKey(relationId, targetId);
@@ -182,62 +553,211 @@ export class TripleStore {
       return false;
     }
 
-    const row = this.sourceIds.length;
+    const row = this.columnLength;
     inner.set(innerKey, row);
+    this.appendColumns(row, sourceId, relationId, targetId);
+    this.generation++;
 
-    this.sourceIds.push(sourceId);
-    this.relationIds.push(relationId);
-    this.targetIds.push(targetId);
-
-    addPosting(this.rowsBySource, sourceId, row);
-    addPosting(this.rowsByTarget, targetId, row);
-    addPosting(this.rowsByRelation, relationId, row);
+    this.rowsBySource.add(sourceId, row);
+    this.rowsByTarget.add(targetId, row);
+    this.rowsByRelation.add(relationId, row);
 
     return true;
   }
 
   /*
-   * Tombstone one triple. Returns true when it was present and alive.
+   * Add rows from interleaved (source, relation, target) ids, in order,
+   * skipping duplicates. An empty store is filled in bulk: candidates are
+   * grouped by source with a counting sort and deduplicated within each
+   * group, posting lists are built in one pass, and the identity map is
+   * left to be derived on first use.
+   */
+  addRowsByIds(rows: Uint32Array, count: number): void {
+    if (this.columnLength > 0) {
+      for (let idx = 0; idx < count; idx++) {
+        this.addRowByIds(rows[3 * idx], rows[3 * idx + 1], rows[3 * idx + 2]);
+      }
+      return;
+    }
+
+    const duplicate = this.duplicateRows(rows, count);
+
+    let kept = 0;
+    for (let idx = 0; idx < count; idx++) {
+      kept += duplicate[idx];
+    }
+    kept = count - kept;
+
+    const sourceIds: IdColumn = this.backend === "map"
+      ? []
+      : new Uint32Array(kept);
+    const relationIds: IdColumn = this.backend === "map"
+      ? []
+      : new Uint32Array(kept);
+    const targetIds: IdColumn = this.backend === "map"
+      ? []
+      : new Uint32Array(kept);
+
+    let row = 0;
+    for (let idx = 0; idx < count; idx++) {
+      if (duplicate[idx] === 0) {
+        sourceIds[row] = rows[3 * idx];
+        relationIds[row] = rows[3 * idx + 1];
+        targetIds[row] = rows[3 * idx + 2];
+        row++;
+      }
+    }
+
+    this.sourceIds = sourceIds;
+    this.relationIds = relationIds;
+    this.targetIds = targetIds;
+    this.columnLength = kept;
+    this.identity = null;
+    this.generation++;
+
+    if (this.backend === "typed") {
+      const nodeSpace = this.nodes.size;
+      this.rowsBySource = CsrPostings.fromKeys(sourceIds, kept, nodeSpace);
+      this.rowsByTarget = CsrPostings.fromKeys(targetIds, kept, nodeSpace);
+      this.rowsByRelation = CsrPostings.fromKeys(
+        relationIds,
+        kept,
+        this.relationNames.size,
+      );
+      return;
+    }
+
+    for (let row = 0; row < kept; row++) {
+      this.rowsBySource.add(sourceIds[row], row);
+      this.rowsByTarget.add(targetIds[row], row);
+      this.rowsByRelation.add(relationIds[row], row);
+    }
+  }
+
+  /*
+   * Flag every candidate row that repeats an earlier one. Candidates are
+   * bucketed by source, so each comparison only spans one source's rows.
+   */
+  private duplicateRows(rows: Uint32Array, count: number): Uint8Array {
+    const nodeSpace = this.nodes.size;
+
+    const starts = new Uint32Array(nodeSpace + 1);
+    for (let idx = 0; idx < count; idx++) {
+      starts[rows[3 * idx] + 1]++;
+    }
+    for (let node = 0; node < nodeSpace; node++) {
+      starts[node + 1] += starts[node];
+    }
+
+    const cursors = starts.slice(0, nodeSpace);
+    const bySource = new Uint32Array(count);
+    for (let idx = 0; idx < count; idx++) {
+      bySource[cursors[rows[3 * idx]]++] = idx;
+    }
+
+    const duplicate = new Uint8Array(count);
+    const seen = new Set<number>();
+
+    for (let node = 0; node < nodeSpace; node++) {
+      const start = starts[node];
+      const end = starts[node + 1];
+      if (end - start < 2) {
+        continue;
+      }
+
+      seen.clear();
+      for (let pos = start; pos < end; pos++) {
+        const idx = bySource[pos];
+        const key = this.identityKey(rows[3 * idx + 1], rows[3 * idx + 2]);
+        if (seen.has(key)) {
+          duplicate[idx] = 1;
+        } else {
+          seen.add(key);
+        }
+      }
+    }
+
+    return duplicate;
+  }
+
+  private appendColumns(
+    row: number,
+    sourceId: number,
+    relationId: number,
+    targetId: number,
+  ): void {
+    if (
+      this.sourceIds instanceof Uint32Array && row === this.sourceIds.length
+    ) {
+      this.sourceIds = grownColumn(this.sourceIds);
+      this.relationIds = grownColumn(this.relationIds as Uint32Array);
+      this.targetIds = grownColumn(this.targetIds as Uint32Array);
+    }
+
+    // assigning at a number[]'s length appends, so both backends share this
+    this.sourceIds[row] = sourceId;
+    this.relationIds[row] = relationId;
+    this.targetIds[row] = targetId;
+    this.columnLength = row + 1;
+  }
+
+  /*
+   * Tombstone one triple. Returns its row when it was present and alive.
    * Column data and posting lists are intentionally left intact.
    */
-  deleteTriple(triple: Triple): boolean {
+  deleteTriple(triple: Triple): number | undefined {
     const sourceId = this.nodes.idOf(triple[0]);
     const relationId = this.relationNames.idOf(triple[1]);
     const targetId = this.nodes.idOf(triple[2]);
 
     if (sourceId === undefined || relationId === undefined) {
-      return false;
+      return undefined;
     }
     if (targetId === undefined) {
-      return false;
+      return undefined;
     }
 
-    const inner = this.identity.get(sourceId);
+    const inner = this.identityMap().get(sourceId);
     const innerKey = this.identityKey(relationId, targetId);
     const row = inner?.get(innerKey);
 
     if (row === undefined) {
-      return false;
+      return undefined;
     }
 
     inner!.delete(innerKey);
     this.deletedRows.add(row);
-    return true;
+    this.retire(row);
+    this.generation++;
+    return row;
   }
 
   isAlive(row: number): boolean {
     return !this.deletedRows.has(row);
   }
 
+  /*
+   * All live rows as a bitmap.
+   */
+  liveRows(): RowBitmap {
+    const rows = new RowBitmap();
+    for (let row = 0; row < this.columnLength; row++) {
+      if (!this.deletedRows.has(row)) {
+        rows.add(row);
+      }
+    }
+    return rows;
+  }
+
   /*
    * Total rows including tombstones.
    */
   get rowCount(): number {
-    return this.sourceIds.length;
+    return this.columnLength;
   }
 
   get aliveCount(): number {
-    return this.sourceIds.length - this.deletedRows.size;
+    return this.columnLength - this.deletedRows.size;
   }
 
   resolveRow(row: number): Triple {
@@ -0,0 +1,22 @@
+/*
+ * Predicates for the parallel search tests, loaded by reference.
+ */
+
+export function endsInOddDigit(value: string): boolean {
+  return /[13579]$/.test(value);
+}
+
+export function isHighRating(value: string): boolean {
+  return Number(value) >= 3;
+}
+
+export function isShortRelation(value: string): boolean {
+  return value.length <= 6;
+}
+
+export function throwsOnBirds(value: string): boolean {
+  if (value.includes(":bird:")) {
+    throw new Error(`no birds: ${value}`);
+  }
+  return true;
+}
@@ -0,0 +1,110 @@
+/*
+ * Substring search tests: contains and icontains must select exactly what
+ * the equivalent predicate over literals selects, with or without a text
+ * index, and the index must follow writes, compaction and snapshots.
+ */
+
+import { assertEquals } from "@std/assert";
+import { TribbleDB } from "./mod.ts";
+import type { RangeSearch, StoreBackend } from "./mod.ts";
+import type { Triple } from "../types.ts";
+import { asUrn } from "../urn.ts";
+
+const SONGS: Triple[] = [
+  ["urn:ró:song:s1", "title", "Swift Wings"],
+  ["urn:ró:song:s2", "title", "the swiftest"],
+  ["urn:ró:song:s3", "title", "SWIFT"],
+  ["urn:ró:song:s4", "title", "Über Swan"],
+  ["urn:ró:song:s5", "title", "über alles"],
+  ["urn:ró:song:s6", "title", "Go"],
+  ["urn:ró:song:s1", "by", "urn:ró:band:swift"],
+  ["urn:ró:song:s2", "by", "urn:ró:band:swift"],
+  ["urn:ró:song:s3", "note", "swift-ish"],
+];
+
+function isLiteral(value: string): boolean {
+  return asUrn(value).type === "unknown";
+}
+
+const CASES: [RangeSearch, (value: string) => boolean][] = [
+  [{ target: { contains: "swift" } }, (value) => value.includes("swift")],
+  [
+    { target: { icontains: "swift" } },
+    (value) => value.toLowerCase().includes("swift"),
+  ],
+  [{ target: { icontains: "ÜBER" } }, (value) => /über/i.test(value)],
+  [{ target: { icontains: "go" } }, (value) => /go/i.test(value)],
+  [{ target: { contains: "" } }, () => true],
+  [{ target: { contains: "zzz" } }, () => false],
+  [
+    { target: { icontains: "swift", prefix: "S" } },
+    (value) => value.startsWith("S") && /swift/i.test(value),
+  ],
+];
+
+function sorted(triples: Triple[]): string[] {
+  return triples.map((triple) => triple.join(" | ")).sort();
+}
+
+Deno.test("text: contains and icontains select what the predicate selects", () => {
+  for (const backend of ["typed", "bitmap", "map"] as StoreBackend[]) {
+    for (const textIndex of [false, true]) {
+      const db = new TribbleDB(SONGS, {}, {
+        backend,
+        textIndex,
+        literalIndex: ["title"],
+      });
+
+      for (const [search, accepts] of CASES) {
+        const expected = db.search({
+          target: { predicate: (value) => isLiteral(value) && accepts(value) },
+        });
+        assertEquals(
+          sorted(db.search(search).triples()),
+          sorted(expected.triples()),
+        );
+      }
+
+      assertEquals(
+        db.search({ relation: "title", target: { icontains: "swift" } })
+          .sources(),
+        new Set(["urn:ró:song:s1", "urn:ró:song:s2", "urn:ró:song:s3"]),
+      );
+      // URN targets never match, though their strings contain the text
+      assertEquals(
+        db.search({ relation: "by", target: { contains: "swift" } })
+          .triplesCount,
+        0,
+      );
+    }
+  }
+
+  const urnsOnly = new TribbleDB([["urn:ró:song:s1", "by", "urn:ró:band:b1"]]);
+  assertEquals(urnsOnly.search({ target: { contains: "" } }).triplesCount, 0);
+});
+
+Deno.test("text: the index follows writes, compaction and snapshots", () => {
+  const db = new TribbleDB(SONGS, {}, { textIndex: true });
+  const swift = { relation: "title", target: { icontains: "swift" } };
+
+  db.add([["urn:ró:song:s7", "title", "Swiftly"]]);
+  assertEquals(db.search(swift).triplesCount, 4);
+
+  db.delete([["urn:ró:song:s3", "title", "SWIFT"]]);
+  const view = db.search({ relation: "title" });
+  assertEquals(db.search(swift).triplesCount, 3);
+  assertEquals(view.search(swift).triplesCount, 3);
+
+  db.compact({ pruneStrings: true });
+  assertEquals(db.search(swift).triplesCount, 3);
+  db.add([["urn:ró:song:s8", "title", "swift again"]]);
+  assertEquals(db.search(swift).triplesCount, 4);
+
+  const restored = TribbleDB.fromSnapshot(db.toSnapshot(), {}, {
+    textIndex: true,
+  });
+  assertEquals(
+    sorted(restored.search(swift).triples()),
+    sorted(db.search(swift).triples()),
+  );
+});
@@ -0,0 +1,118 @@
+/*
+ * The opt-in trigram index behind `contains` and `icontains` searches.
+ *
+ * It covers literal nodes: node strings asUrn() does not parse as a URN
+ * (type "unknown"). Each is split into overlapping three-code-unit
+ * trigrams, case-folded, and the node id is added to one bitmap per
+ * trigram. A needle's candidates are the intersection of its trigrams'
+ * bitmaps, which every literal containing it belongs to; callers verify
+ * the candidates against the real strings.
+ *
+ * Case folding maps each UTF-16 code unit to its lowercase form when that
+ * is a single code unit, and leaves it alone otherwise. Folding unit by
+ * unit keeps it compatible with substrings (a folded needle is a
+ * substring of a folded value whenever the needle is a substring of the
+ * value), so the one folded index serves both case-sensitive and
+ * case-insensitive searches. Nodes are indexed once, when registered.
+ */
+
+import { RowBitmap } from "./bitmap.ts";
+import { BitmapPostings } from "./postings.ts";
+
+const GRAM_LENGTH = 3;
+const UNIT_SPAN = 0x10000;
+
+const FOLD_DECODER = new TextDecoder("utf-16le");
+
+let foldTable: Uint16Array | undefined;
+
+function foldUnits(): Uint16Array {
+  if (foldTable === undefined) {
+    foldTable = new Uint16Array(UNIT_SPAN);
+    for (let unit = 0; unit < UNIT_SPAN; unit++) {
+      const lower = String.fromCharCode(unit).toLowerCase();
+      foldTable[unit] = lower.length === 1 ? lower.charCodeAt(0) : unit;
+    }
+  }
+  return foldTable;
+}
+
+/*
+ * A string case-folded one code unit at a time. ASCII strings fold as
+ * toLowerCase() folds them.
+ */
+export function folded(value: string): string {
+  let ascii = true;
+  for (let idx = 0; idx < value.length && ascii; idx++) {
+    ascii = value.charCodeAt(idx) < 0x80;
+  }
+  if (ascii) {
+    return value.toLowerCase();
+  }
+
+  const table = foldUnits();
+  const units = new Uint16Array(value.length);
+  for (let idx = 0; idx < value.length; idx++) {
+    units[idx] = table[value.charCodeAt(idx)];
+  }
+  return FOLD_DECODER.decode(units);
+}
+
+/*
+ * The distinct folded trigrams of a string, each packed into one number.
+ */
+function trigramsOf(value: string): Set<number> {
+  const table = foldUnits();
+  const grams = new Set<number>();
+  for (let idx = 0; idx + GRAM_LENGTH <= value.length; idx++) {
+    grams.add(
+      (table[value.charCodeAt(idx)] * UNIT_SPAN +
+            table[value.charCodeAt(idx + 1)]) * UNIT_SPAN +
+        table[value.charCodeAt(idx + 2)],
+    );
+  }
+  return grams;
+}
+
+export class TextIndex {
+  #trigrams: BitmapPostings;
+  // every indexed node: the candidates for needles shorter than a trigram
+  #literals: RowBitmap;
+
+  constructor() {
+    this.#trigrams = new BitmapPostings();
+    this.#literals = new RowBitmap();
+  }
+
+  add(nodeId: number, value: string): void {
+    this.#literals.add(nodeId);
+    for (const gram of trigramsOf(value)) {
+      this.#trigrams.add(gram, nodeId);
+    }
+  }
+
+  /*
+   * Indexed nodes that may contain the needle, ignoring case: every one
+   * that does, and possibly some that do not. The bitmap may be one of
+   * the index's own, so callers must not modify it.
+   */
+  candidates(needle: string): RowBitmap {
+    if (needle.length < GRAM_LENGTH) {
+      return this.#literals;
+    }
+
+    const lists: RowBitmap[] = [];
+    for (const gram of trigramsOf(needle)) {
+      const nodes = this.#trigrams.get(gram);
+      if (nodes === undefined) {
+        return new RowBitmap();
+      }
+      lists.push(nodes);
+    }
+    lists.sort((listA, listB) => listA.size - listB.size);
+
+    return lists.slice(1).reduce((matched, nodes) => {
+      return matched.size === 0 ? matched : matched.and(nodes);
+    }, lists[0]);
+  }
+}
@@ -0,0 +1,122 @@
+/*
+ * Query trace tests: a traced database records each search, point read
+ * and hop with its arguments, predicates survive as named markers, and a
+ * serialised trace revives to queries giving the original results.
+ */
+
+import { assertEquals, assertThrows } from "@std/assert";
+import { QueryTrace, revived, TribbleDB } from "./mod.ts";
+import type { RangeSearch } from "./mod.ts";
+import type { Triple } from "../types.ts";
+
+const TRIPLES: Triple[] = [
+  ["urn:ró:photo:x1", "album", "urn:ró:album:a1"],
+  ["urn:ró:photo:x2", "album", "urn:ró:album:a1"],
+  ["urn:ró:photo:x2", "rating", "4"],
+  ["urn:ró:album:a1", "in", "urn:ró:album:a0"],
+];
+
+function isHighlyRated(value: string): boolean {
+  return Number(value) >= 4;
+}
+
+Deno.test("trace: records searches, reads and hops", () => {
+  const trace = new QueryTrace();
+  const db = new TribbleDB(TRIPLES, {}, { trace });
+
+  db.search({ relation: "rating", target: { predicate: isHighlyRated } });
+  db.search({ source: { predicate: (value) => value.endsWith("1") } }, {
+    limit: 1,
+  });
+  db.prepare({ relation: "album" }).run();
+  db.readThing("urn:ró:photo:x2", { relations: ["rating"] });
+  db.nodes("urn:ró:photo:x1").follow("album").follow("in", {
+    transitive: true,
+  });
+  db.nodes("urn:ró:album:a1").referencedBy();
+
+  const { entries } = trace;
+  assertEquals(entries.map((entry) => entry.operation), [
+    "search",
+    "search",
+    "search",
+    "readThing",
+    "follow",
+    "follow",
+    "referencedBy",
+  ]);
+  assertEquals(entries.every((entry) => entry.elapsedMs >= 0), true);
+  assertEquals(entries[0], {
+    operation: "search",
+    params: {
+      relation: "rating",
+      target: { predicate: { $predicate: "isHighlyRated" } },
+    },
+    page: {},
+    elapsedMs: entries[0].elapsedMs,
+  });
+  assertEquals(
+    entries[1].operation === "search" && entries[1].params,
+    { source: { predicate: { $predicate: null } } },
+  );
+  assertEquals(
+    entries[2].operation === "search" && entries[2].params,
+    { relation: "album" },
+  );
+  assertEquals(
+    entries[5].operation === "follow" && [entries[5].from, entries[5].opts],
+    [["urn:ró:album:a1"], { transitive: true }],
+  );
+  assertEquals(
+    entries[6].operation === "referencedBy" && entries[6].relations,
+    null,
+  );
+
+  // views record to their source's trace
+  db.search({ relation: "album" }).readThing("urn:ró:photo:x1");
+  assertEquals(trace.entries.length, 9);
+  trace.clear();
+  assertEquals(trace.entries.length, 0);
+});
+
+Deno.test("trace: a serialised trace replays to the same results", () => {
+  const trace = new QueryTrace();
+  const db = new TribbleDB(TRIPLES, {}, { trace });
+  const searches: RangeSearch[] = [
+    { relation: "rating", target: { predicate: isHighlyRated } },
+    [undefined, "album", "urn:ró:album:a1"],
+    { target: { gte: 3 } },
+  ];
+  const expected = searches.map((search) => db.search(search).triples());
+
+  const missing: (string | null)[] = [];
+  const parsed = QueryTrace.parse(trace.serialise());
+  const replayed = parsed.entries.map((entry) => {
+    if (entry.operation !== "search") {
+      throw new Error("expected a search");
+    }
+    const params = revived(entry.params, { isHighlyRated }, (name) => {
+      missing.push(name);
+    });
+    return db.search(params as RangeSearch, entry.page).triples();
+  });
+  assertEquals(replayed, expected);
+  assertEquals(missing, []);
+
+  const revivedWithout = revived(
+    parsed.entries[0].operation === "search" ? parsed.entries[0].params : null,
+    {},
+    (name) => missing.push(name),
+  ) as RangeSearch;
+  assertEquals(db.search(revivedWithout).triplesCount, 1);
+  assertEquals(missing, ["isHighlyRated"]);
+
+  assertThrows(() => QueryTrace.parse('{"version": 0, "entries": []}'));
+
+  const capped = new QueryTrace(2);
+  const cappedDb = new TribbleDB(TRIPLES, {}, { trace: capped });
+  for (let idx = 0; idx < 5; idx++) {
+    cappedDb.readThing("urn:ró:photo:x1");
+  }
+  assertEquals(capped.entries.length, 2);
+});
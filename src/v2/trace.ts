@@ -0,0 +1,171 @@
+/*
+ * Query traces (TribbleDBOpts `trace`): a record of the searches, point
+ * reads and NodeView hops run against a database, each with how long it
+ * took, for replaying a real workload against other builds and engines
+ * (see benchmark/replay.ts).
+ *
+ * Queries are kept as JSON. A predicate cannot be, so it is kept by its
+ * function name, and replay looks the name up in a table of predicates.
+ * An anonymous predicate, or one whose only name is the `predicate` key
+ * it was written under, is recorded as an opaque marker and replayed as
+ * accepting everything.
+ */
+
+import type { Predicate } from "../types.ts";
+import type {
+  HopOpts,
+  RangeSearch,
+  ReadOpts,
+  SearchPage,
+  TracedPredicate,
+  TracedValue,
+  TraceEntry,
+} from "./types.ts";
+
+export const TRACE_VERSION = 1;
+
+function predicateName(fn: (...args: never[]) => unknown): string | null {
+  return fn.name === "" || fn.name === "predicate" ? null : fn.name;
+}
+
+function isTracedPredicate(value: object): value is TracedPredicate {
+  const keys = Object.keys(value);
+  return keys.length === 1 && keys[0] === "$predicate";
+}
+
+/*
+ * A query argument as JSON, with predicates replaced by markers. Object
+ * fields left undefined are dropped; array slots become null.
+ */
+export function traced(value: unknown): TracedValue {
+  if (typeof value === "function") {
+    return { $predicate: predicateName(value as Predicate) };
+  }
+  if (Array.isArray(value) || value instanceof Set) {
+    return [...value].map((item) => traced(item));
+  }
+  if (value === null || value === undefined) {
+    return null;
+  }
+  if (typeof value === "object") {
+    const copy: { [key: string]: TracedValue } = {};
+    for (const [key, field] of Object.entries(value)) {
+      if (field !== undefined) {
+        copy[key] = traced(field);
+      }
+    }
+    return copy;
+  }
+  return value as TracedValue;
+}
+
+/*
+ * A recorded query argument made runnable again: markers become the named
+ * predicates, or accept-all stand-ins, and null array slots undefined.
+ * `missing` hears of each marker with no predicate to replay.
+ */
+export function revived(
+  value: TracedValue,
+  predicates: Record<string, Predicate> = {},
+  missing?: (name: string | null) => void,
+): unknown {
+  if (Array.isArray(value)) {
+    return value.map((item) => {
+      return item === null ? undefined : revived(item, predicates, missing);
+    });
+  }
+  if (value === null || typeof value !== "object") {
+    return value;
+  }
+  if (isTracedPredicate(value)) {
+    const name = value.$predicate;
+    if (name !== null && Object.hasOwn(predicates, name)) {
+      return predicates[name];
+    }
+    missing?.(name);
+    return () => true;
+  }
+
+  const copy: Record<string, unknown> = {};
+  for (const [key, field] of Object.entries(value)) {
+    copy[key] = revived(field, predicates, missing);
+  }
+  return copy;
+}
+
+export class QueryTrace {
+  readonly entries: TraceEntry[];
+  // queries past this many are not recorded
+  readonly maxEntries: number;
+
+  constructor(maxEntries = Infinity) {
+    this.entries = [];
+    this.maxEntries = maxEntries;
+  }
+
+  #record(entry: TraceEntry): void {
+    if (this.entries.length < this.maxEntries) {
+      this.entries.push(entry);
+    }
+  }
+
+  searched(params: RangeSearch, page: SearchPage, elapsedMs: number): void {
+    this.#record({
+      operation: "search",
+      params: traced(params),
+      page: { ...page },
+      elapsedMs,
+    });
+  }
+
+  readThing(urn: string, opts: ReadOpts, elapsedMs: number): void {
+    this.#record({
+      operation: "readThing",
+      urn,
+      opts: traced(opts) as ReadOpts,
+      elapsedMs,
+    });
+  }
+
+  hopped(
+    operation: "follow" | "referencedBy",
+    from: string[],
+    relations: string | string[] | undefined,
+    opts: HopOpts,
+    elapsedMs: number,
+  ): void {
+    this.#record({
+      operation,
+      from,
+      relations: typeof relations === "string"
+        ? relations
+        : relations === undefined
+        ? null
+        : [...relations],
+      opts: traced(opts),
+      elapsedMs,
+    });
+  }
+
+  clear(): void {
+    this.entries.length = 0;
+  }
+
+  serialise(): string {
+    return JSON.stringify({ version: TRACE_VERSION, entries: this.entries });
+  }
+
+  static parse(text: string): QueryTrace {
+    const { version, entries } = JSON.parse(text);
+    if (version !== TRACE_VERSION) {
+      throw new Error(
+        `Unsupported trace version ${version} (expected ${TRACE_VERSION}).`,
+      );
+    }
+    const trace = new QueryTrace();
+    for (const entry of entries) {
+      trace.entries.push(entry);
+    }
+    return trace;
+  }
+}
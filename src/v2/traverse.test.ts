@@ -71,6 +71,24 @@ const HOP_CASES: HopCase[] = [
     build: (db) => db.nodes(DUBLIN).follow("in", { transitive: true }),
     expected: [LEINSTER, IRELAND],
   },
+  {
+    name: "follow transitively up to a depth",
+    build: (db) =>
+      db.nodes([PHOTO_1, PHOTO_2]).follow("location").follow("in", {
+        transitive: true,
+        maxDepth: 1,
+      }),
+    expected: [LEINSTER, MUNSTER],
+  },
+  {
+    name: "referencedBy transitively up to a depth",
+    build: (db) =>
+      db.nodes(IRELAND).referencedBy(["in", "location"], {
+        transitive: true,
+        maxDepth: 2,
+      }),
+    expected: [LEINSTER, MUNSTER, DUBLIN, CORK],
+  },
   {
     name: "follow with a where constraint",
     build: (db) =>
@@ -145,6 +163,28 @@ Deno.test("traverse: objectsById omits nodes without outgoing edges", () => {
   });
 });
 
+Deno.test("traverse: iterators yield node by node what objects() holds", () => {
+  const db = new TribbleV2([...FIXTURE]);
+  const places = db.nodes([PHOTO_1, PHOTO_3, SWAN]).follow("location");
+
+  assertEquals([...places.iterObjects()], places.objects());
+  assertEquals([...places.iterTriples()], [
+    [DUBLIN, "in", LEINSTER],
+    [DUBLIN, "features", SPIRE],
+  ]);
+
+  const paths = db.paths({ type: "photo" }).follow("subject");
+  assertEquals(
+    [...paths.iterObjects()],
+    db.nodes({ type: "photo" }).follow("subject").objects(),
+  );
+  assertEquals([...paths.iterTriples()].map(([source]) => source), [
+    SWAN,
+    ROBIN,
+    ROBIN,
+  ]);
+});
+
 Deno.test("traverse: paths retain provenance across hops", () => {
   const db = new TribbleV2([...FIXTURE]);
   const pairs = db.paths({ type: "photo" })
@@ -158,6 +198,27 @@ Deno.test("traverse: paths retain provenance across hops", () => {
   ]);
 });
 
+Deno.test("traverse: a where predicate runs once per reached node", () => {
+  const db = new TribbleV2([...FIXTURE]);
+  const checked: string[] = [];
+  const where = {
+    predicate: (urn: string) => {
+      checked.push(urn);
+      return urn.startsWith("urn:ró:place:");
+    },
+  };
+
+  const places = db.nodes({ type: "photo" })
+    .follow("location", { where })
+    .urns();
+  const pairs = db.paths({ type: "photo" })
+    .follow("location", { where })
+    .pairs();
+
+  assertEquals(checked.length, 2 * new Set(checked).size);
+  assertEquals(new Set(pairs.map(([, place]) => place)), places);
+});
+
 Deno.test("traverse: transitive paths pair starts with every ancestor", () => {
   const db = new TribbleV2([...FIXTURE]);
   const pairs = db.paths(DUBLIN)
@@ -173,6 +234,39 @@ Deno.test("traverse: transitive paths pair starts with every ancestor", () => {
   );
 });
 
+Deno.test("traverse: paths stream pairs and groups lazily", () => {
+  const db = new TribbleV2([...FIXTURE]);
+  const photos = [...db.nodes({ type: "photo" }).urns()];
+  const paths = db.paths(photos)
+    .follow("location")
+    .follow("in", { transitive: true });
+
+  const expected: [string, string][] = [];
+  for (const photo of photos) {
+    const ancestors = db.nodes(photo).follow("location")
+      .follow("in", { transitive: true }).urns();
+    for (const place of ancestors) {
+      expected.push([photo, place]);
+    }
+  }
+
+  const pairs = paths.pairs();
+  assertEquals([...pairs].sort(), expected.sort());
+  assertEquals([...paths.iterPairs()], pairs);
+  assertEquals(paths.pairCount(), pairs.length);
+
+  const groups = [...paths.iterGroups()];
+  assertEquals(
+    groups.flatMap(([end, starts]) => {
+      return starts.map((start): [string, string] => [start, end]);
+    }),
+    pairs,
+  );
+  const startsByEnd = new Map(groups);
+  assertEquals(startsByEnd.get(IRELAND)!.length, photos.length);
+  assertEquals(startsByEnd.get(LEINSTER)!.sort(), [PHOTO_1, PHOTO_3]);
+});
+
 Deno.test("traverse: view traversal keeps snapshot semantics", () => {
   const db = new TribbleV2([...FIXTURE]);
   const view = db.search({ relation: "albumId" });
@@ -186,6 +280,134 @@ Deno.test("traverse: view traversal keeps snapshot semantics", () => {
   assertEquals(fromView, new Set(["a1"]));
 });
 
+Deno.test("traverse: shortest paths search from both ends", () => {
+  const db = new TribbleV2([...FIXTURE]);
+
+  assertEquals(db.shortestPath(PHOTO_1, IRELAND, ["location", "in"]), [
+    PHOTO_1,
+    DUBLIN,
+    LEINSTER,
+    IRELAND,
+  ]);
+  assertEquals(db.shortestPath(PHOTO_1, SPIRE), [PHOTO_1, DUBLIN, SPIRE]);
+  assertEquals(db.shortestPath(CORK, CORK), [CORK]);
+  assertEquals(db.shortestPath(IRELAND, PHOTO_1), undefined);
+  assertEquals(db.shortestPath(PHOTO_1, "urn:ró:place:missing"), undefined);
+
+  assertEquals(db.reachable(PHOTO_2, IRELAND, ["location", "in"]), true);
+  assertEquals(db.reachable(PHOTO_2, IRELAND, "in"), false);
+  assertEquals(
+    db.reachable(PHOTO_2, IRELAND, undefined, { maxDepth: 2 }),
+    false,
+  );
+  assertEquals(
+    db.reachable(PHOTO_2, IRELAND, undefined, { maxDepth: 3 }),
+    true,
+  );
+
+  const view = db.search({ relation: ["location", "in"] });
+  db.delete([[LEINSTER, "in", IRELAND]]);
+  assertEquals(db.reachable(PHOTO_1, IRELAND), false);
+  assertEquals(view.reachable(PHOTO_1, IRELAND), true);
+});
+
+/*
+ * A place hierarchy several levels deep, with photos at the leaves.
+ */
+function hierarchy(): Triple[] {
+  const triples: Triple[] = [];
+  for (let idx = 1; idx < 200; idx++) {
+    triples.push([
+      `urn:ró:place:p${idx}`,
+      "in",
+      `urn:ró:place:p${Math.floor((idx - 1) / 3)}`,
+    ]);
+  }
+  for (let idx = 0; idx < 300; idx++) {
+    triples.push([
+      `urn:ró:photo:f${idx}`,
+      "location",
+      `urn:ró:place:p${(idx * 7) % 200}`,
+    ]);
+  }
+  return triples;
+}
+
+Deno.test("traverse: wide paths pair every start with every ancestor", () => {
+  const triples = hierarchy();
+  for (let idx = 300; idx < 6000; idx++) {
+    triples.push([
+      `urn:ró:photo:f${idx}`,
+      "location",
+      `urn:ró:place:p${(idx * 7) % 200}`,
+    ]);
+  }
+
+  for (const closureCache of [false, true]) {
+    const db = new TribbleV2(triples, {}, { closureCache });
+    for (
+      const opts of [{ transitive: true }, { transitive: true, maxDepth: 2 }]
+    ) {
+      const expected: string[] = [];
+      for (
+        const [photo, , place] of triples.filter(([, rel]) =>
+          rel === "location"
+        )
+      ) {
+        for (const ancestor of db.nodes(place).follow("in", opts).urns()) {
+          expected.push(`${photo} ${ancestor}`);
+        }
+      }
+
+      const paths = db.paths({ type: "photo" }).follow("location")
+        .follow("in", opts);
+      assertEquals(
+        [...paths.iterPairs()].map(([photo, place]) => `${photo} ${place}`)
+          .sort(),
+        expected.sort(),
+      );
+      assertEquals(paths.pairCount(), expected.length);
+    }
+  }
+});
+
+Deno.test("traverse: cached closures answer what the search does", () => {
+  const plain = new TribbleV2(hierarchy());
+  const cached = new TribbleV2(hierarchy(), {}, { closureCache: true });
+
+  const ancestors = (db: TribbleV2) => {
+    return db.nodes({ type: "photo" }).follow("location")
+      .follow("in", { transitive: true }).urns();
+  };
+  const descendants = (db: TribbleV2) => {
+    return db.nodes("urn:ró:place:p2")
+      .referencedBy(undefined, { transitive: true }).urns();
+  };
+  const pairs = (db: TribbleV2) => {
+    return db.paths({ type: "photo" }).follow("location")
+      .follow("in", { transitive: true }).pairs();
+  };
+
+  for (let round = 0; round < 2; round++) {
+    assertEquals(ancestors(cached), ancestors(plain));
+    assertEquals(descendants(cached), descendants(plain));
+    assertEquals(pairs(cached), pairs(plain));
+  }
+
+  // writes and views each see their own closures
+  const view = cached.search({ relation: "in" });
+  for (const db of [plain, cached]) {
+    db.delete([["urn:ró:place:p7", "in", "urn:ró:place:p2"]]);
+    db.add([["urn:ró:place:p7", "in", "urn:ró:place:p40"]]);
+  }
+  assertEquals(ancestors(cached), ancestors(plain));
+  assertEquals(descendants(cached), descendants(plain));
+  assertEquals(
+    view.nodes("urn:ró:place:p7").follow("in", { transitive: true }).urns(),
+    new Set(["urn:ró:place:p2", "urn:ró:place:p0"]),
+  );
+});
+
 /*
  * Equivalence with the N+1 patterns from photos.rgrannell.xyz: the
  * traversal expression must return the same data the per-node v1 search
@@ -4,33 +4,60 @@
  * filters operate on interned ids; strings appear only at terminals.
  */
 
-import type { NodeObjectQuery, TripleObject } from "../types.ts";
-import type { TripleStore } from "./store.ts";
-import type { HopOpts, NodeFilterQuery, NodeSelector } from "./types.ts";
+import type { NodeObjectQuery, Triple, TripleObject } from "../types.ts";
+import type { DeltaLayer, StoreLayer, TripleStore } from "./store.ts";
+import type { RowBitmap } from "./bitmap.ts";
+import type {
+  HopOpts,
+  MetricCounters,
+  NodeFilterQuery,
+  NodeSelector,
+} from "./types.ts";
+import { PredicateMemo } from "./memo.ts";
+import type { ClosureCache } from "./closure.ts";
+import type { EngineMetrics } from "./metrics.ts";
+import type { QueryTrace } from "./trace.ts";
+import { StartSets } from "./provenance.ts";
 
 /*
  * The visibility context a traversal runs under: the store plus the row-set
- * of the owning database view (null for a live root database).
+ * of the owning database view (null for a live root database), the rows
+ * the view has added when it has any, and the database's closure cache,
+ * metrics and query trace when it has them.
  */
 export type Visibility = {
   store: TripleStore;
-  rows: Set<number> | null;
+  rows: RowBitmap | null;
+  delta?: DeltaLayer | null;
+  closures?: ClosureCache | null;
+  metrics?: EngineMetrics | null;
+  trace?: QueryTrace | null;
 };
 
-function isRowVisible(visibility: Visibility, row: number): boolean {
-  if (visibility.rows !== null) {
-    return visibility.rows.has(row);
+function isRowVisible(layer: StoreLayer, row: number): boolean {
+  if (layer.rows !== null) {
+    return layer.rows.has(row);
   }
-  return visibility.store.isAlive(row);
+  return layer.store.isAlive(row);
+}
+
+/*
+ * The layers a traversal reads, in row order. They share their string
+ * tables and node metadata, so node ids mean the same in each.
+ */
+function layersOf(visibility: Visibility): StoreLayer[] {
+  return visibility.delta ? [visibility, visibility.delta] : [visibility];
 }
 
 /*
  * Check a node against a node query's type/id/qs/predicate constraints.
+ * With a memo, the predicate runs at most once per node.
  */
 export function matchesNodeQuery(
   store: TripleStore,
   nodeId: number,
   query: NodeObjectQuery,
+  memo?: PredicateMemo,
 ): boolean {
   const meta = store.nodeMeta.get(nodeId);
   if (!meta) {
@@ -62,8 +89,11 @@ export function matchesNodeQuery(
     }
   }
 
-  if (query.predicate && !query.predicate(store.nodes.valueOf(nodeId))) {
-    return false;
+  if (query.predicate) {
+    const valueOf = (id: number) => store.nodes.valueOf(id);
+    return memo
+      ? memo.test(query.predicate, nodeId, valueOf)
+      : query.predicate(valueOf(nodeId));
   }
 
   return true;
@@ -150,7 +180,7 @@ function resolveQuery(
  * Resolve hop relations to a set of interned relation ids.
  * null means "any relation"; an empty set matches nothing.
  */
-function resolveRelationIds(
+export function resolveRelationIds(
   store: TripleStore,
   relations?: string | string[],
 ): Set<number> | null {
@@ -172,16 +202,54 @@ function resolveRelationIds(
 }
 
 /*
- * One hop from a single node: yields the nodes reached over visible rows.
+ * One hop from a single node: visits the nodes reached over visible rows.
+ * A callback rather than a generator, as it runs once per node per level.
  */
-function* hopFromNode(
+function forEachNeighbour(
   visibility: Visibility,
   nodeId: number,
   forward: boolean,
   relationIds: Set<number> | null,
-  where?: NodeObjectQuery,
-): Generator<number> {
-  const { store } = visibility;
+  where: NodeObjectQuery | undefined,
+  memo: PredicateMemo | undefined,
+  visit: (reached: number) => void,
+): void {
+  const counters = visibility.metrics?.counters;
+  forEachNeighbourIn(
+    visibility,
+    counters,
+    nodeId,
+    forward,
+    relationIds,
+    where,
+    memo,
+    visit,
+  );
+  if (visibility.delta) {
+    forEachNeighbourIn(
+      visibility.delta,
+      counters,
+      nodeId,
+      forward,
+      relationIds,
+      where,
+      memo,
+      visit,
+    );
+  }
+}
+
+function forEachNeighbourIn(
+  layer: StoreLayer,
+  counters: MetricCounters | undefined,
+  nodeId: number,
+  forward: boolean,
+  relationIds: Set<number> | null,
+  where: NodeObjectQuery | undefined,
+  memo: PredicateMemo | undefined,
+  visit: (reached: number) => void,
+): void {
+  const { store } = layer;
   const adjacency = forward
     ? store.rowsBySource.get(nodeId)
     : store.rowsByTarget.get(nodeId);
@@ -190,51 +258,133 @@ function* hopFromNode(
     return;
   }
 
+  const reachedColumn = forward ? store.targetIds : store.sourceIds;
+  let hidden = 0;
+  let visited = 0;
   for (const row of adjacency) {
-    if (!isRowVisible(visibility, row)) {
+    if (!isRowVisible(layer, row)) {
+      hidden++;
       continue;
     }
     if (relationIds !== null && !relationIds.has(store.relationIds[row])) {
       continue;
     }
 
-    const reached = forward ? store.targetIds[row] : store.sourceIds[row];
-    if (where !== undefined && !matchesNodeQuery(store, reached, where)) {
+    const reached = reachedColumn[row];
+    if (
+      where !== undefined && !matchesNodeQuery(store, reached, where, memo)
+    ) {
       continue;
     }
 
-    yield reached;
+    visited++;
+    visit(reached);
   }
+
+  if (counters) {
+    counters.postingListsTouched++;
+    counters.rowsScanned += adjacency.size;
+    counters.rowsMatched += visited;
+    if (layer.rows === null) {
+      counters.tombstonesSkipped += hidden;
+    }
+  }
+}
+
+/*
+ * Many rows can reach the same node, so a hop's `where` predicate is
+ * memoised per node for the whole hop.
+ */
+function whereMemo(
+  visibility: Visibility,
+  opts: HopOpts,
+): PredicateMemo | undefined {
+  return opts.where?.predicate
+    ? new PredicateMemo(visibility.store.nodes.size)
+    : undefined;
 }
 
-function hopOnce(
+/*
+ * The cached closures for an unfiltered, unbounded transitive hop, or
+ * undefined when the hop cannot use them.
+ */
+function cachedClosures(
   visibility: Visibility,
-  frontier: Set<number>,
   forward: boolean,
   relationIds: Set<number> | null,
-  where?: NodeObjectQuery,
-): Set<number> {
+  opts: HopOpts,
+): Map<number, Uint32Array> | undefined {
+  if (
+    !visibility.closures || opts.where !== undefined ||
+    opts.maxDepth !== undefined
+  ) {
+    return undefined;
+  }
+  return visibility.closures.closuresFor(
+    visibility.store,
+    visibility.rows,
+    forward,
+    relationIds,
+  );
+}
+
+/*
+ * Every node reachable from a node in one or more hops. The search does
+ * not expand nodes whose closure is already known but takes their
+ * closure whole, and remembers the result.
+ */
+function closureOf(
+  visibility: Visibility,
+  nodeId: number,
+  forward: boolean,
+  relationIds: Set<number> | null,
+  known: Map<number, Uint32Array>,
+): Uint32Array {
+  const cached = known.get(nodeId);
+  if (cached) {
+    return cached;
+  }
+
   const reached = new Set<number>();
+  const queue = [nodeId];
 
-  for (const nodeId of frontier) {
-    for (
-      const nextId of hopFromNode(
-        visibility,
-        nodeId,
-        forward,
-        relationIds,
-        where,
-      )
-    ) {
-      reached.add(nextId);
+  const visit = (nextId: number) => {
+    if (reached.has(nextId)) {
+      return;
     }
+    reached.add(nextId);
+
+    const closure = known.get(nextId);
+    if (closure) {
+      for (const closedId of closure) {
+        reached.add(closedId);
+      }
+    } else {
+      queue.push(nextId);
+    }
+  };
+
+  for (let head = 0; head < queue.length; head++) {
+    forEachNeighbour(
+      visibility,
+      queue[head],
+      forward,
+      relationIds,
+      undefined,
+      undefined,
+      visit,
+    );
   }
 
-  return reached;
+  const closure = Uint32Array.from(reached);
+  known.set(nodeId, closure);
+  return closure;
 }
 
 /*
- * Nodes reachable in one hop, or in one-or-more hops when transitive.
+ * Nodes reachable in one hop, or when transitive in one to `maxDepth`
+ * hops. A transitive search keeps one visited set and two frontier
+ * arrays, swapped per level.
  */
 function hop(
   visibility: Visibility,
@@ -244,36 +394,166 @@ function hop(
   opts: HopOpts = {},
 ): Set<number> {
   const relationIds = resolveRelationIds(visibility.store, relations);
+  const memo = whereMemo(visibility, opts);
+  const reachable = new Set<number>();
 
   if (!opts.transitive) {
-    return hopOnce(visibility, startNodes, forward, relationIds, opts.where);
+    for (const nodeId of startNodes) {
+      forEachNeighbour(
+        visibility,
+        nodeId,
+        forward,
+        relationIds,
+        opts.where,
+        memo,
+        (reached) => reachable.add(reached),
+      );
+    }
+    return reachable;
   }
 
-  const reachable = new Set<number>();
-  let frontier = startNodes;
+  const closures = cachedClosures(visibility, forward, relationIds, opts);
+  if (closures) {
+    for (const nodeId of startNodes) {
+      const closure = closureOf(
+        visibility,
+        nodeId,
+        forward,
+        relationIds,
+        closures,
+      );
+      for (const reached of closure) {
+        reachable.add(reached);
+      }
+    }
+    return reachable;
+  }
 
-  while (frontier.size > 0) {
-    const next = hopOnce(
-      visibility,
-      frontier,
-      forward,
-      relationIds,
-      opts.where,
-    );
-    const fresh = new Set<number>();
+  let frontier = [...startNodes];
+  let next: number[] = [];
+  const collect = (reached: number) => {
+    if (!reachable.has(reached)) {
+      reachable.add(reached);
+      next.push(reached);
+    }
+  };
 
-    for (const nodeId of next) {
-      if (!reachable.has(nodeId)) {
-        reachable.add(nodeId);
-        fresh.add(nodeId);
-      }
+  const maxDepth = opts.maxDepth ?? Infinity;
+  for (let depth = 0; depth < maxDepth && frontier.length > 0; depth++) {
+    for (const nodeId of frontier) {
+      forEachNeighbour(
+        visibility,
+        nodeId,
+        forward,
+        relationIds,
+        opts.where,
+        memo,
+        collect,
+      );
     }
-    frontier = fresh;
+    [frontier, next] = [next, frontier];
+    next.length = 0;
   }
 
   return reachable;
 }
 
+/*
+ * Walk a BFS parent chain from a node back to its root (parent -1).
+ */
+function parentChain(parents: Map<number, number>, nodeId: number): number[] {
+  const chain: number[] = [];
+  for (let current = nodeId; current !== -1; current = parents.get(current)!) {
+    chain.push(current);
+  }
+  return chain;
+}
+
+/*
+ * A shortest path between two nodes over visible rows, as the node ids
+ * along it, or undefined when there is none of at most `maxDepth` hops.
+ * Bidirectional BFS: each level expands the smaller frontier, forward
+ * over source postings from `fromId` or backward over target postings
+ * from `toId`, and the search ends at the first level where the two
+ * sides meet, taking the meeting node nearest the other end.
+ */
+export function shortestPath(
+  visibility: Visibility,
+  fromId: number,
+  toId: number,
+  relationIds: Set<number> | null,
+  maxDepth: number = Infinity,
+): number[] | undefined {
+  if (fromId === toId) {
+    return [fromId];
+  }
+
+  const forwardParents = new Map([[fromId, -1]]);
+  const backwardParents = new Map([[toId, -1]]);
+  const forwardDepths = new Map([[fromId, 0]]);
+  const backwardDepths = new Map([[toId, 0]]);
+  let forwardFrontier = [fromId];
+  let backwardFrontier = [toId];
+
+  for (
+    let hops = 0;
+    hops < maxDepth && forwardFrontier.length > 0 &&
+    backwardFrontier.length > 0;
+    hops++
+  ) {
+    const forward = forwardFrontier.length <= backwardFrontier.length;
+    const frontier = forward ? forwardFrontier : backwardFrontier;
+    const parents = forward ? forwardParents : backwardParents;
+    const depths = forward ? forwardDepths : backwardDepths;
+    const otherDepths = forward ? backwardDepths : forwardDepths;
+
+    const next: number[] = [];
+    let meeting = -1;
+    let meetingDepth = Infinity;
+
+    for (const nodeId of frontier) {
+      const depth = depths.get(nodeId)! + 1;
+      forEachNeighbour(
+        visibility,
+        nodeId,
+        forward,
+        relationIds,
+        undefined,
+        undefined,
+        (reached) => {
+          if (parents.has(reached)) {
+            return;
+          }
+          parents.set(reached, nodeId);
+          depths.set(reached, depth);
+          next.push(reached);
+
+          const otherDepth = otherDepths.get(reached);
+          if (otherDepth !== undefined && otherDepth < meetingDepth) {
+            meeting = reached;
+            meetingDepth = otherDepth;
+          }
+        },
+      );
+    }
+
+    if (meeting !== -1) {
+      return [
+        ...parentChain(forwardParents, meeting).reverse(),
+        ...parentChain(backwardParents, meeting).slice(1),
+      ];
+    }
+
+    if (forward) {
+      forwardFrontier = next;
+    } else {
+      backwardFrontier = next;
+    }
+  }
+
+  return undefined;
+}
+
 /*
  * Does the node have at least one visible outgoing edge of this relation?
  */
@@ -282,25 +562,34 @@ function hasOutgoingRelation(
   nodeId: number,
   relation: string,
 ): boolean {
-  const { store } = visibility;
-  const relationId = store.relationNames.idOf(relation);
+  const relationId = visibility.store.relationNames.idOf(relation);
   if (relationId === undefined) {
     return false;
   }
 
-  const adjacency = store.rowsBySource.get(nodeId);
-  if (!adjacency) {
+  return layersOf(visibility).some((layer) => {
+    const { store } = layer;
+    for (const row of store.rowsBySource.get(nodeId) ?? []) {
+      if (store.relationIds[row] === relationId && isRowVisible(layer, row)) {
+        return true;
+      }
+    }
     return false;
-  }
+  });
+}
 
-  for (const row of adjacency) {
-    if (
-      store.relationIds[row] === relationId && isRowVisible(visibility, row)
-    ) {
-      return true;
-    }
+/*
+ * A node's visible outgoing rows in one layer, in row order.
+ */
+function visibleRowsOf(layer: StoreLayer, nodeId: number): number[] {
+  const adjacency = layer.store.rowsBySource.get(nodeId);
+  if (!adjacency) {
+    return [];
   }
-  return false;
+
+  return [...adjacency]
+    .filter((row) => isRowVisible(layer, row))
+    .sort((rowA, rowB) => rowA - rowB);
 }
 
 /*
@@ -311,34 +600,55 @@ function buildNodeObject(
   visibility: Visibility,
   nodeId: number,
 ): TripleObject | undefined {
-  const { store } = visibility;
-  const adjacency = store.rowsBySource.get(nodeId);
-  if (!adjacency) {
-    return undefined;
+  const { nodes, relationNames } = visibility.store;
+  let obj: TripleObject | undefined;
+
+  for (const layer of layersOf(visibility)) {
+    const { store } = layer;
+    for (const row of visibleRowsOf(layer, nodeId)) {
+      obj ??= { id: nodes.valueOf(nodeId) };
+      const relation = relationNames.valueOf(store.relationIds[row]);
+      const target = nodes.valueOf(store.targetIds[row]);
+
+      const existing = obj[relation];
+      if (existing === undefined) {
+        obj[relation] = [target];
+      } else if (!(existing as string[]).includes(target)) {
+        (existing as string[]).push(target);
+      }
+    }
   }
 
-  const rows = [...adjacency]
-    .filter((row) => isRowVisible(visibility, row))
-    .sort((rowA, rowB) => rowA - rowB);
+  return obj;
+}
 
-  if (rows.length === 0) {
-    return undefined;
+/*
+ * The visible outgoing triples of each node in turn, resolved lazily.
+ */
+function* iterNodeTriples(
+  visibility: Visibility,
+  nodeIds: Iterable<number>,
+): Generator<Triple> {
+  const layers = layersOf(visibility);
+  for (const nodeId of nodeIds) {
+    for (const layer of layers) {
+      for (const row of visibleRowsOf(layer, nodeId)) {
+        yield layer.store.resolveRow(row);
+      }
+    }
   }
+}
 
-  const obj: TripleObject = { id: store.nodes.valueOf(nodeId) };
-  for (const row of rows) {
-    const relation = store.relationNames.valueOf(store.relationIds[row]);
-    const target = store.nodes.valueOf(store.targetIds[row]);
-
-    const existing = obj[relation];
-    if (existing === undefined) {
-      obj[relation] = [target];
-    } else if (!(existing as string[]).includes(target)) {
-      (existing as string[]).push(target);
+function* iterNodeObjects(
+  visibility: Visibility,
+  nodeIds: Iterable<number>,
+): Generator<TripleObject> {
+  for (const nodeId of nodeIds) {
+    const obj = buildNodeObject(visibility, nodeId);
+    if (obj) {
+      yield obj;
     }
   }
-
-  return obj;
 }
 
 export class NodeView {
@@ -351,12 +661,37 @@ export class NodeView {
   }
 
   follow(relations?: string | string[], opts: HopOpts = {}): NodeView {
-    const reached = hop(this.visibility, this.nodeIds, true, relations, opts);
-    return new NodeView(this.visibility, reached);
+    return this.hopFrom("follow", relations, opts);
   }
 
   referencedBy(relations?: string | string[], opts: HopOpts = {}): NodeView {
-    const reached = hop(this.visibility, this.nodeIds, false, relations, opts);
+    return this.hopFrom("referencedBy", relations, opts);
+  }
+
+  private hopFrom(
+    operation: "follow" | "referencedBy",
+    relations: string | string[] | undefined,
+    opts: HopOpts,
+  ): NodeView {
+    const { metrics, store, trace } = this.visibility;
+    const started = trace ? performance.now() : 0;
+    const frame = metrics?.start(store);
+    const reached = hop(
+      this.visibility,
+      this.nodeIds,
+      operation === "follow",
+      relations,
+      opts,
+    );
+    metrics?.end("hop", frame!);
+
+    if (trace) {
+      const elapsedMs = performance.now() - started;
+      const from = [...this.nodeIds].map((nodeId) =>
+        store.nodes.valueOf(nodeId)
+      );
+      trace.hopped(operation, from, relations, opts, elapsedMs);
+    }
     return new NodeView(this.visibility, reached);
   }
 
@@ -471,6 +806,20 @@ export class NodeView {
     return result;
   }
 
+  /*
+   * As objects(), built one node at a time as they are pulled.
+   */
+  iterObjects(): Generator<TripleObject> {
+    return iterNodeObjects(this.visibility, this.sortedNodeIds());
+  }
+
+  /*
+   * The nodes' visible outgoing triples, node by node in objects() order.
+   */
+  iterTriples(): Generator<Triple> {
+    return iterNodeTriples(this.visibility, this.sortedNodeIds());
+  }
+
   /*
    * As objects(), keyed by URN. Nodes with no visible outgoing edges are
    * absent keys, so "not found" is distinguishable from "empty".
@@ -489,116 +838,251 @@ export class NodeView {
   }
 }
 
+/*
+ * Pair an end node with more start sets.
+ */
+function addStarts(
+  endToSets: Map<number, Set<number>>,
+  endId: number,
+  setIds: Iterable<number>,
+): void {
+  let sets = endToSets.get(endId);
+  if (!sets) {
+    sets = new Set();
+    endToSets.set(endId, sets);
+  }
+  for (const setId of setIds) {
+    sets.add(setId);
+  }
+}
+
 /*
  * PathView: (start, end) node pairs. Hops advance the end node while
  * retaining the start, so derivation code can fabricate triples from the
- * pairing. Stored as end -> set of starts.
+ * pairing. Stored as ascending end nodes, each with the id of its start
+ * set in the view's StartSets pool (see provenance.ts). Hops track which
+ * of the previous view's sets reach each node, and pool the unions once
+ * the hop is done.
  */
 export class PathView {
   private visibility: Visibility;
-  private endToStarts: Map<number, Set<number>>;
-
-  constructor(visibility: Visibility, endToStarts: Map<number, Set<number>>) {
+  private startSets: StartSets;
+  private endIds: Uint32Array;
+  private endSets: Uint32Array;
+
+  constructor(
+    visibility: Visibility,
+    startSets: StartSets,
+    endToSet: Map<number, number>,
+  ) {
     this.visibility = visibility;
-    this.endToStarts = endToStarts;
+    this.startSets = startSets;
+    this.endIds = Uint32Array.from(endToSet.keys()).sort();
+    this.endSets = this.endIds.map((endId) => endToSet.get(endId)!);
   }
 
   static fromNodes(visibility: Visibility, nodeIds: Set<number>): PathView {
-    const endToStarts = new Map<number, Set<number>>();
+    const endToSet = new Map<number, number>();
     for (const nodeId of nodeIds) {
-      endToStarts.set(nodeId, new Set([nodeId]));
+      endToSet.set(nodeId, StartSets.single(nodeId));
     }
-    return new PathView(visibility, endToStarts);
+    return new PathView(visibility, new StartSets(), endToSet);
   }
 
   follow(relations?: string | string[], opts: HopOpts = {}): PathView {
+    const { metrics, store } = this.visibility;
+    const frame = metrics?.start(store);
+    const followed = this.hopPaths(relations, opts);
+    metrics?.end("hop", frame!);
+    return followed;
+  }
+
+  /*
+   * A PathView over the nodes reached, each with the union of the start
+   * sets that reached it.
+   */
+  private reached(endToSets: Map<number, Set<number>>): PathView {
+    const startSets = new StartSets();
+    // a set reaching nodes on its own is copied over once
+    const copied = new Map<number, number>();
+    const endToSet = new Map<number, number>();
+
+    for (const [endId, setIds] of endToSets) {
+      if (setIds.size > 1) {
+        endToSet.set(endId, startSets.union(this.startSets, setIds));
+        continue;
+      }
+
+      const [setId] = setIds;
+      if (this.startSets.size(setId) === 1) {
+        endToSet.set(endId, setId);
+        continue;
+      }
+      let copy = copied.get(setId);
+      if (copy === undefined) {
+        copy = startSets.union(this.startSets, setIds);
+        copied.set(setId, copy);
+      }
+      endToSet.set(endId, copy);
+    }
+    return new PathView(this.visibility, startSets, endToSet);
+  }
+
+  // each end node with its own start set
+  private *ends(): Generator<[number, number[]]> {
+    for (let idx = 0; idx < this.endIds.length; idx++) {
+      yield [this.endIds[idx], [this.endSets[idx]]];
+    }
+  }
+
+  private hopPaths(
+    relations: string | string[] | undefined,
+    opts: HopOpts,
+  ): PathView {
+    const relationIds = resolveRelationIds(this.visibility.store, relations);
+    const memo = whereMemo(this.visibility, opts);
+
     if (!opts.transitive) {
-      return new PathView(
-        this.visibility,
-        this.followOnce(this.endToStarts, relations, opts),
+      return this.reached(
+        this.followOnce(this.ends(), relationIds, opts, memo),
       );
     }
 
     // transitive: pair each start with every node reachable in >= 1 hops
     const accumulated = new Map<number, Set<number>>();
-    let frontier = this.endToStarts;
 
-    while (frontier.size > 0) {
-      const next = this.followOnce(frontier, relations, opts);
+    const closures = cachedClosures(
+      this.visibility,
+      true,
+      relationIds,
+      opts,
+    );
+    if (closures) {
+      for (const [endId, setIds] of this.ends()) {
+        const closure = closureOf(
+          this.visibility,
+          endId,
+          true,
+          relationIds,
+          closures,
+        );
+        for (const reachedId of closure) {
+          addStarts(accumulated, reachedId, setIds);
+        }
+      }
+      return this.reached(accumulated);
+    }
+
+    let frontier: Iterable<[number, Iterable<number>]> = this.ends();
+    let frontierSize = this.endIds.length;
+    const maxDepth = opts.maxDepth ?? Infinity;
+
+    for (let depth = 0; depth < maxDepth && frontierSize > 0; depth++) {
+      const next = this.followOnce(frontier, relationIds, opts, memo);
       const fresh = new Map<number, Set<number>>();
 
-      for (const [endId, startIds] of next) {
+      for (const [endId, setIds] of next) {
         let known = accumulated.get(endId);
         if (!known) {
           known = new Set();
           accumulated.set(endId, known);
         }
 
-        const freshStarts = new Set<number>();
-        for (const startId of startIds) {
-          if (!known.has(startId)) {
-            known.add(startId);
-            freshStarts.add(startId);
+        const freshSets = new Set<number>();
+        for (const setId of setIds) {
+          if (!known.has(setId)) {
+            known.add(setId);
+            freshSets.add(setId);
           }
         }
-        if (freshStarts.size > 0) {
-          fresh.set(endId, freshStarts);
+        if (freshSets.size > 0) {
+          fresh.set(endId, freshSets);
         }
       }
       frontier = fresh;
+      frontierSize = fresh.size;
     }
 
-    return new PathView(this.visibility, accumulated);
+    return this.reached(accumulated);
   }
 
   private followOnce(
-    frontier: Map<number, Set<number>>,
-    relations?: string | string[],
-    opts: HopOpts = {},
+    frontier: Iterable<[number, Iterable<number>]>,
+    relationIds: Set<number> | null,
+    opts: HopOpts,
+    memo: PredicateMemo | undefined,
   ): Map<number, Set<number>> {
-    const relationIds = resolveRelationIds(this.visibility.store, relations);
     const next = new Map<number, Set<number>>();
 
-    for (const [endId, startIds] of frontier) {
-      const reached = hopOnce(
+    for (const [endId, setIds] of frontier) {
+      forEachNeighbour(
         this.visibility,
-        new Set([endId]),
+        endId,
         true,
         relationIds,
         opts.where,
+        memo,
+        (reachedId) => addStarts(next, reachedId, setIds),
       );
-
-      for (const reachedId of reached) {
-        let starts = next.get(reachedId);
-        if (!starts) {
-          starts = new Set();
-          next.set(reachedId, starts);
-        }
-        for (const startId of startIds) {
-          starts.add(startId);
-        }
-      }
     }
 
     return next;
   }
 
+  /*
+   * The end nodes as objects, as NodeView.iterObjects() would yield them.
+   */
+  iterObjects(): Generator<TripleObject> {
+    return iterNodeObjects(this.visibility, this.endIds);
+  }
+
+  /*
+   * The end nodes' visible outgoing triples, as NodeView.iterTriples().
+   */
+  iterTriples(): Generator<Triple> {
+    return iterNodeTriples(this.visibility, this.endIds);
+  }
+
+  /*
+   * The number of (start, end) pairs, without resolving any.
+   */
+  pairCount(): number {
+    let count = 0;
+    for (const setId of this.endSets) {
+      count += this.startSets.size(setId);
+    }
+    return count;
+  }
+
   pairs(): [string, string][] {
-    const { store } = this.visibility;
-    const result: [string, string][] = [];
+    return [...this.iterPairs()];
+  }
 
-    const sortedEnds = [...this.endToStarts.keys()].sort((idA, idB) =>
-      idA - idB
-    );
-    for (const endId of sortedEnds) {
-      const startIds = [...this.endToStarts.get(endId)!].sort((idA, idB) =>
-        idA - idB
-      );
-      for (const startId of startIds) {
-        result.push([store.nodes.valueOf(startId), store.nodes.valueOf(endId)]);
+  /*
+   * The (start, end) pairs in pairs() order, resolved as they are reached.
+   */
+  *iterPairs(): Generator<[string, string]> {
+    const { nodes } = this.visibility.store;
+    for (let idx = 0; idx < this.endIds.length; idx++) {
+      const end = nodes.valueOf(this.endIds[idx]);
+      for (const startId of this.startSets.members(this.endSets[idx])) {
+        yield [nodes.valueOf(startId), end];
       }
     }
+  }
 
-    return result;
+  /*
+   * Each end node with its start nodes, by ascending end id, one group
+   * resolved at a time.
+   */
+  *iterGroups(): Generator<[string, string[]]> {
+    const { nodes } = this.visibility.store;
+    for (let idx = 0; idx < this.endIds.length; idx++) {
+      const starts = this.startSets.members(this.endSets[idx]);
+      yield [
+        nodes.valueOf(this.endIds[idx]),
+        Array.from(starts, (startId) => nodes.valueOf(startId)),
+      ];
+    }
   }
 }
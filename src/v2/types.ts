@@ -2,7 +2,346 @@
  * Types specific to the v2 engine's additive API surface.
  */
 
-import type { NodeObjectQuery } from "../types.ts";
+import type {
+  NodeObjectQuery,
+  RelationSearch,
+  Search,
+  Triple,
+} from "../types.ts";
+import type { EngineMetrics } from "./metrics.ts";
+import type { QueryTrace } from "./trace.ts";
+
+/*
+ * Storage layout of a TripleStore: "typed" keeps Uint32Array columns and
+ * CSR posting lists; "bitmap" keeps Uint32Array columns and compressed
+ * bitmap posting lists; "map" keeps number[] columns and a Map of Sets per
+ * posting index.
+ */
+export type StoreBackend = "typed" | "bitmap" | "map";
+
+/*
+ * How a TripleStore holds its strings: "map" as JS strings in a Map and
+ * an array; "arena" as UTF-8 bytes in one buffer, with each URN's prefix
+ * up to its last ":" stored once. The arena is smaller, and slower to
+ * resolve ids to strings.
+ */
+export type InternerKind = "map" | "arena";
+
+/*
+ * Options accepted by compact(). `pruneStrings` also drops interned
+ * strings that no live triple references.
+ */
+export type CompactOpts = {
+  pruneStrings?: boolean;
+};
+
+/*
+ * When a database compacts itself: after a delete leaves more than
+ * `tombstoneRatio` of its rows (0..1) tombstoned, and at least
+ * `minTombstones` of them.
+ */
+export type CompactionPolicy = CompactOpts & {
+  tombstoneRatio: number;
+  minTombstones?: number;
+};
+
+/*
+ * Options accepted by the TribbleDB constructor. `cacheSize` enables the
+ * search()/readThing() result cache, holding at most that many results;
+ * `autoCompact` enables automatic compaction; `literalIndex` names the
+ * relations whose targets get a sorted index for range searches;
+ * `closureCache` remembers the nodes each node reaches in unfiltered
+ * transitive hops until the next write; `interner` picks the string
+ * table; `metrics` collects latencies and counters (see metrics.ts);
+ * `trace` records the queries run, for replay (see trace.ts);
+ * `textIndex` keeps a trigram index over literal nodes for `contains` and
+ * `icontains` searches (see text.ts).
+ */
+export type TribbleDBOpts = {
+  backend?: StoreBackend;
+  interner?: InternerKind;
+  cacheSize?: number;
+  autoCompact?: CompactionPolicy;
+  literalIndex?: string[];
+  closureCache?: boolean;
+  metrics?: EngineMetrics;
+  trace?: QueryTrace;
+  textIndex?: boolean;
+};
+
+/*
+ * Range bounds over node strings. Number bounds compare numerically and
+ * only match nodes that parse as numbers; string bounds compare as JS
+ * strings do. `prefix` matches node strings starting with it. `contains`
+ * and `icontains` match literals (node strings that are not URNs)
+ * containing the text, the latter ignoring case; a `textIndex` answers
+ * them without scanning every node.
+ */
+export type LiteralRange = {
+  gt?: number | string;
+  gte?: number | string;
+  lt?: number | string;
+  lte?: number | string;
+  prefix?: string;
+  contains?: string;
+  icontains?: string;
+};
+
+/*
+ * A search node query that may also carry range bounds.
+ */
+export type RangeNodeQuery = NodeObjectQuery & LiteralRange;
+
+/*
+ * Searches accepted by the v2 engine: the v1 grammar, with range bounds
+ * allowed in object-form node queries.
+ */
+export type RangeSearch = Search | {
+  source?: RangeNodeQuery | string | string[];
+  relation?: RelationSearch;
+  target?: RangeNodeQuery | string | string[];
+};
+
+/*
+ * A predicate a worker can load: the export `name` of the ES module at
+ * `module`, an absolute URL. Used where searchParallel() takes a
+ * predicate, as functions cannot be sent to workers.
+ */
+export type PredicateRef = {
+  module: string;
+  name: string;
+};
+
+/*
+ * A search node query for searchParallel().
+ */
+export type ParallelNodeQuery = Omit<RangeNodeQuery, "predicate"> & {
+  predicate?: PredicateRef;
+};
+
+/*
+ * Searches accepted by searchParallel(): object-form range searches whose
+ * predicates are PredicateRefs.
+ */
+export type ParallelSearch = {
+  source?: ParallelNodeQuery | string | string[];
+  relation?: string | string[] | {
+    relation: string | string[];
+    predicate?: PredicateRef;
+  };
+  target?: ParallelNodeQuery | string | string[];
+};
+
+/*
+ * Options for a SearchWorkerPool: `workers` defaults to the reported
+ * core count; candidate rows are handed out `chunkRows` at a time; below
+ * `minRows` candidates, predicates run on the calling thread instead.
+ */
+export type SearchPoolOpts = {
+  workers?: number;
+  chunkRows?: number;
+  minRows?: number;
+};
+
+/*
+ * A page of search results, in insertion order: skip `offset` matches,
+ * keep at most `limit`. `after` resumes after a page's cursor(), which
+ * unlike an offset costs nothing however deep the page is; cursors stay
+ * valid across adds and deletes, but not across compaction.
+ */
+export type SearchPage = {
+  limit?: number;
+  offset?: number;
+  after?: string;
+};
+
+/*
+ * A match() pattern: a triple whose terms may be variables, written
+ * "?name". A variable may recur across patterns, or within one.
+ */
+export type TriplePattern = [string, string, string];
+
+/*
+ * One match() solution: each variable's name, without the "?", bound to
+ * a term.
+ */
+export type Bindings = Record<string, string>;
+
+/*
+ * What facets() groups by: a triple position, or the URN type of the
+ * node in one.
+ */
+export type FacetKey =
+  | "relation"
+  | "source"
+  | "target"
+  | "source.type"
+  | "target.type";
+
+/*
+ * Options accepted by facets(). `within` restricts the count to a
+ * search's matches; `top` keeps only the largest counts.
+ */
+export type FacetOpts = {
+  by: FacetKey;
+  within?: RangeSearch;
+  top?: number;
+};
+
+/*
+ * Result cache counters. `invalidations` counts the times a mutation
+ * emptied the cache.
+ */
+export type CacheStats = {
+  entries: number;
+  hits: number;
+  misses: number;
+  evictions: number;
+  invalidations: number;
+};
+
+/*
+ * The operations EngineMetrics times.
+ */
+export type InstrumentedOperation =
+  | "search"
+  | "readThing"
+  | "add"
+  | "hop"
+  | "objects";
+
+/*
+ * Work counters. Rows scanned are rows a search, point read or hop
+ * visited; rows matched are those it kept. Posting lists touched are the
+ * lists it enumerated, and tombstones skipped the deleted rows among the
+ * rows it visited. Strings resolved counts interned strings decoded.
+ */
+export type MetricCounters = {
+  rowsScanned: number;
+  rowsMatched: number;
+  postingListsTouched: number;
+  tombstonesSkipped: number;
+  stringsResolved: number;
+};
+
+/*
+ * One completed operation, as delivered to EngineMetrics subscribers.
+ * Counters cover the work done during the operation, including any
+ * operations nested in it.
+ */
+export type OperationEvent = {
+  operation: InstrumentedOperation;
+  durationMs: number;
+  counters: MetricCounters;
+};
+
+/*
+ * Latencies of one operation. Each bucket is [upper bound in ms, count],
+ * on a doubling scale from 1µs, the last bound Infinity; percentiles are
+ * estimated as the upper bound of the bucket they fall in.
+ */
+export type LatencyHistogram = {
+  count: number;
+  totalMs: number;
+  maxMs: number;
+  p50Ms: number;
+  p95Ms: number;
+  p99Ms: number;
+  buckets: [number, number][];
+};
+
+export type MetricsSnapshot = {
+  operations: Record<InstrumentedOperation, LatencyHistogram>;
+  counters: MetricCounters;
+};
+
+/*
+ * A predicate in a recorded query. `name` is the function's own name, or
+ * null for an anonymous predicate, which cannot be replayed faithfully.
+ */
+export type TracedPredicate = { $predicate: string | null };
+
+/*
+ * A query argument as recorded: JSON, with predicates as markers.
+ */
+export type TracedValue =
+  | string
+  | number
+  | boolean
+  | null
+  | TracedPredicate
+  | TracedValue[]
+  | { [key: string]: TracedValue };
+
+/*
+ * One recorded query and how long it took on the recording database.
+ * `follow` and `referencedBy` are NodeView hops from the `from` URNs.
+ */
+export type TraceEntry =
+  | {
+    operation: "search";
+    params: TracedValue;
+    page: SearchPage;
+    elapsedMs: number;
+  }
+  | {
+    operation: "readThing";
+    urn: string;
+    opts: ReadOpts;
+    elapsedMs: number;
+  }
+  | {
+    operation: "follow" | "referencedBy";
+    from: string[];
+    relations: string | string[] | null;
+    opts: TracedValue;
+    elapsedMs: number;
+  };
+
+/*
+ * Options accepted by TribbleDB.fromTribbleParallel(): the constructor
+ * options plus the number of parsing workers, which defaults to
+ * navigator.hardwareConcurrency.
+ */
+export type ParallelLoadOpts = TribbleDBOpts & {
+  workers?: number;
+};
+
+/*
+ * Options accepted by toTribble(). `renumber` assigns dictionary ids in
+ * first-use order, as TribbleStringifier does, instead of writing the
+ * store's own ids.
+ */
+export type TribbleExportOpts = {
+  renumber?: boolean;
+};
+
+/*
+ * When a durable database syncs its log: before each commit resolves, on
+ * a timer, or never (leaving it to the operating system).
+ */
+export type FsyncPolicy = "always" | "interval" | "never";
+
+/*
+ * Options accepted by TribbleDB.openDurable(): the constructor options
+ * plus the fsync policy (default "always"), the sync period under
+ * "interval" (default 100ms), and the log size in bytes past which the
+ * database checkpoints itself (default: never).
+ */
+export type DurableOpts = TribbleDBOpts & {
+  fsync?: FsyncPolicy;
+  fsyncIntervalMs?: number;
+  checkpointBytes?: number;
+};
+
+/*
+ * A change to a materialised search's result (see materialize()): the
+ * triples that entered it and those that left it.
+ */
+export type ViewChange = {
+  added: Triple[];
+  removed: Triple[];
+};
 
 /*
  * Report returned by add(): how many triples were inserted vs already present.
@@ -15,11 +354,13 @@ export type AddReport = {
 /*
  * Read options. `ignoreQs` is the documented spelling; `qs` is kept as a
  * deprecated alias of the v1 option ({ qs: true } means "match the URN's
- * type and id, ignoring its querystring").
+ * type and id, ignoring its querystring"). `relations` projects each
+ * thing onto those relations; its id is always kept.
  */
 export type ReadOpts = {
   qs?: boolean;
   ignoreQs?: boolean;
+  relations?: string[];
 };
 
 /*
@@ -41,11 +382,20 @@ export type NodeFilterQuery = NodeObjectQuery & {
 };
 
 /*
- * Options for NodeView/PathView hops.
+ * Options for NodeView/PathView hops. `maxDepth` bounds a transitive hop
+ * to that many hops.
  */
 export type HopOpts = {
   transitive?: boolean;
   where?: NodeObjectQuery;
+  maxDepth?: number;
+};
+
+/*
+ * Options for reachable()/shortestPath(): the most hops a path may take.
+ */
+export type PathOpts = {
+  maxDepth?: number;
 };
 
 /*
@@ -0,0 +1,228 @@
+/*
+ * Write-ahead log tests: reopening must restore exactly the committed
+ * triples, across compaction and checkpoints, under every fsync policy;
+ * a log cut off or corrupted mid-record must reopen at the last whole
+ * record; a checkpoint interrupted by a crash must not lose records
+ * queued behind an append; and a burst of mutations must commit in one
+ * append.
+ */
+
+import { assertEquals, assertRejects } from "@std/assert";
+import { TribbleDB } from "./mod.ts";
+import type { DurableFiles, FsyncPolicy } from "./mod.ts";
+import type { Triple } from "../types.ts";
+
+/*
+ * Files held in memory. Copying them is a crash: whatever was appended
+ * survives, synced or not.
+ */
+class MemoryFiles implements DurableFiles {
+  log = new Uint8Array(0);
+  snapshot: Uint8Array | undefined = undefined;
+  appends = 0;
+  syncs = 0;
+  failTruncate = false;
+  // appends wait for this, when set
+  appendGate: Promise<void> | undefined = undefined;
+
+  copy(logLength = this.log.length): MemoryFiles {
+    const files = new MemoryFiles();
+    files.log = this.log.slice(0, logLength);
+    files.snapshot = this.snapshot?.slice();
+    return files;
+  }
+
+  readLog(): Promise<Uint8Array> {
+    return Promise.resolve(this.log.slice());
+  }
+
+  async appendLog(bytes: Uint8Array): Promise<void> {
+    await this.appendGate;
+    const log = new Uint8Array(this.log.length + bytes.length);
+    log.set(this.log);
+    log.set(bytes, this.log.length);
+    this.log = log;
+    this.appends++;
+  }
+
+  syncLog(): Promise<void> {
+    this.syncs++;
+    return Promise.resolve();
+  }
+
+  truncateLog(length: number): Promise<void> {
+    if (this.failTruncate) {
+      return Promise.reject(new Error("disk unplugged"));
+    }
+    this.log = this.log.slice(0, length);
+    return Promise.resolve();
+  }
+
+  readSnapshot(): Promise<Uint8Array | undefined> {
+    return Promise.resolve(this.snapshot?.slice());
+  }
+
+  writeSnapshot(bytes: Uint8Array): Promise<void> {
+    this.snapshot = bytes.slice();
+    return Promise.resolve();
+  }
+}
+
+function photos(from: number, count: number): Triple[] {
+  const triples: Triple[] = [];
+  for (let idx = from; idx < from + count; idx++) {
+    triples.push([
+      `urn:ró:photo:x${idx}`,
+      "location",
+      `urn:ró:place:p${idx % 7}`,
+    ]);
+    triples.push([`urn:ró:photo:x${idx}`, "caption", `“${idx}” 🐦`]);
+  }
+  return triples;
+}
+
+function sorted(triples: Triple[]): Triple[] {
+  return triples.map((triple) => triple.join("\u0000")).sort()
+    .map((key) => key.split("\u0000") as Triple);
+}
+
+async function reopened(files: MemoryFiles): Promise<Triple[]> {
+  const db = await TribbleDB.openDurable(files.copy());
+  const triples = sorted(db.triples());
+  await db.close();
+  return triples;
+}
+
+Deno.test("wal: reopening replays every committed mutation", async () => {
+  for (const fsync of ["always", "interval", "never"] as FsyncPolicy[]) {
+    const files = new MemoryFiles();
+    const db = await TribbleDB.openDurable(files, {}, {
+      fsync,
+      fsyncIntervalMs: 1,
+    });
+
+    db.add(photos(0, 50));
+    db.delete(photos(10, 5));
+    db.compact({ pruneStrings: true });
+    db.add(photos(40, 20));
+    db.add([["urn:ró:photo:x0", "location", "urn:ró:place:p9"]]);
+    db.delete([["urn:ró:photo:x1", "location", "urn:ró:place:p1"]]);
+    db.search({ source: "urn:ró:photo:x2" }).add(photos(90, 1));
+    await db.flush();
+
+    assertEquals(await reopened(files), sorted(db.triples()));
+    await db.close();
+    assertEquals(files.syncs > 0, fsync !== "never");
+  }
+});
+
+Deno.test("wal: a record torn or corrupted by a crash is dropped", async () => {
+  const files = new MemoryFiles();
+  const db = await TribbleDB.openDurable(files);
+  db.add(photos(0, 20));
+  db.delete(photos(0, 2));
+  await db.flush();
+
+  const committed = sorted(db.triples());
+  const boundary = files.log.length;
+  db.add(photos(20, 5));
+  await db.flush();
+  await db.close();
+
+  for (
+    const cut of [
+      boundary + 1,
+      boundary + 7,
+      boundary + 8,
+      files.log.length - 1,
+    ]
+  ) {
+    const crashed = files.copy(cut);
+    const recovered = await TribbleDB.openDurable(crashed);
+    assertEquals(sorted(recovered.triples()), committed);
+    assertEquals(crashed.log.length, boundary);
+
+    // the log carries on from its last whole record
+    recovered.add(photos(30, 3));
+    await recovered.close();
+    assertEquals(
+      await reopened(crashed),
+      sorted([...committed, ...photos(30, 3)]),
+    );
+  }
+
+  const corrupted = files.copy();
+  corrupted.log[files.log.length - 2] ^= 0xff;
+  assertEquals(await reopened(corrupted), committed);
+});
+
+Deno.test("wal: checkpoints truncate the log", async () => {
+  const files = new MemoryFiles();
+  const db = await TribbleDB.openDurable(files, {}, { checkpointBytes: 2_000 });
+
+  for (let idx = 0; idx < 20; idx++) {
+    db.add(photos(idx * 10, 10));
+    db.delete(photos(idx * 10, 1));
+    await db.flush();
+    assertEquals(files.log.length < 2_000, true);
+  }
+  assertEquals(files.snapshot !== undefined, true);
+  assertEquals(await reopened(files), sorted(db.triples()));
+
+  db.add(photos(500, 5));
+  await db.checkpoint();
+  assertEquals(files.log.length, 0);
+  assertEquals(await reopened(files), sorted(db.triples()));
+
+  // a crash between the snapshot write and the truncation replays the
+  // old log over the new snapshot
+  db.delete(photos(500, 2));
+  db.add(photos(600, 2));
+  await db.flush();
+  files.failTruncate = true;
+  await assertRejects(() => db.checkpoint(), Error, "disk unplugged");
+  assertEquals(files.log.length > 0, true);
+  assertEquals(await reopened(files), sorted(db.triples()));
+  await db.close();
+});
+
+Deno.test("wal: a checkpoint logs records queued behind an append", async () => {
+  const files = new MemoryFiles();
+  const db = await TribbleDB.openDurable(files, {}, { checkpointBytes: 20 });
+  const triple: Triple = ["urn:ró:a:1", "r", "x"];
+
+  let release = () => {};
+  files.appendGate = new Promise((resolve) => release = resolve);
+  db.add([triple]);
+  // let the add's commit start its append before the delete is queued
+  await new Promise((resolve) => setTimeout(resolve, 0));
+  db.delete([triple]);
+
+  // the add's append crosses checkpointBytes, and the checkpoint it
+  // starts crashes between the snapshot write and the truncation
+  files.failTruncate = true;
+  release();
+  await assertRejects(() => db.flush(), Error, "disk unplugged");
+
+  assertEquals(db.triples(), []);
+  assertEquals(await reopened(files), []);
+  files.failTruncate = false;
+  await db.close();
+});
+
+Deno.test("wal: a burst of mutations commits in one append", async () => {
+  const files = new MemoryFiles();
+  const db = await TribbleDB.openDurable(files);
+
+  for (let idx = 0; idx < 100; idx++) {
+    db.add(photos(idx, 1));
+  }
+  db.add(photos(0, 1));
+  db.delete([]);
+  await db.flush();
+
+  assertEquals(files.appends, 1);
+  assertEquals(files.syncs, 1);
+  assertEquals(await reopened(files), sorted(db.triples()));
+  await db.close();
+});
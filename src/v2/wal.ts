@@ -0,0 +1,486 @@
+/*
+ * Write-ahead log for durable databases (TribbleDB.openDurable()).
+ *
+ * Each root add() or delete() appends one record holding the rows it
+ * changed as varint ids, with every string the log has not yet declared
+ * written once, the first time a record uses it. Log ids are the log's
+ * own, so records stay valid across compaction, which renumbers the
+ * store. Records are framed as (payload length, CRC-32, payload); a
+ * record cut short by a crash fails its length or checksum, and the log
+ * is truncated back to the last whole record when it is next opened.
+ *
+ * Records are encoded synchronously and written by group commit: one
+ * write at a time, taking every record queued behind it, so a burst of
+ * mutations costs one append. The fsync policy decides when appended
+ * records are synced:
+ *   - "always": before the commit resolves;
+ *   - "interval": at most `fsyncIntervalMs` later, on a timer;
+ *   - "never": when the operating system chooses.
+ *
+ * A checkpoint writes a snapshot and truncates the log, starting a new
+ * log with an empty dictionary. A crash between the snapshot write and
+ * the truncation replays the old log over the new snapshot. That is only
+ * safe when the old log holds every change the snapshot holds, so that
+ * replaying it ends in the snapshot's state: records still queued when
+ * the snapshot is taken are appended and synced before the snapshot is
+ * written, never dropped. If either write fails, the next commit
+ * checkpoints again.
+ *
+ * Files are reached through DurableFiles, supplied by the caller, so the
+ * engine itself stays free of runtime-specific file APIs.
+ */
+
+import type { TripleStore } from "./store.ts";
+import type { DurableOpts, FsyncPolicy } from "./types.ts";
+import type { Triple } from "../types.ts";
+
+/*
+ * The two files a durable database keeps: an append-only log, and the
+ * snapshot the log continues from.
+ */
+export interface DurableFiles {
+  // the whole log; empty when there is none
+  readLog(): Promise<Uint8Array>;
+  appendLog(bytes: Uint8Array): Promise<void>;
+  syncLog(): Promise<void>;
+  truncateLog(length: number): Promise<void>;
+  readSnapshot(): Promise<Uint8Array | undefined>;
+  // must replace the snapshot atomically, e.g. by writing and renaming
+  writeSnapshot(bytes: Uint8Array): Promise<void>;
+}
+
+export const LOG_ADD = 1;
+export const LOG_DELETE = 2;
+
+const FRAME_BYTES = 8;
+const DEFAULT_FSYNC_INTERVAL_MS = 100;
+
+const CRC_TABLE = (() => {
+  const table = new Uint32Array(256);
+  for (let byte = 0; byte < 256; byte++) {
+    let crc = byte;
+    for (let bit = 0; bit < 8; bit++) {
+      crc = crc & 1 ? 0xedb88320 ^ (crc >>> 1) : crc >>> 1;
+    }
+    table[byte] = crc >>> 0;
+  }
+  return table;
+})();
+
+function crc32(bytes: Uint8Array, start: number, end: number): number {
+  let crc = 0xffffffff;
+  for (let idx = start; idx < end; idx++) {
+    crc = CRC_TABLE[(crc ^ bytes[idx]) & 0xff] ^ (crc >>> 8);
+  }
+  return (crc ^ 0xffffffff) >>> 0;
+}
+
+/*
+ * A growable byte buffer for one framed record.
+ */
+class RecordWriter {
+  bytes: Uint8Array;
+  length: number;
+
+  constructor() {
+    this.bytes = new Uint8Array(256);
+    this.length = FRAME_BYTES;
+  }
+
+  #reserve(count: number): void {
+    if (this.length + count > this.bytes.length) {
+      const grown = new Uint8Array(
+        Math.max(this.bytes.length * 2, this.length + count),
+      );
+      grown.set(this.bytes.subarray(0, this.length));
+      this.bytes = grown;
+    }
+  }
+
+  varint(value: number): void {
+    this.#reserve(5);
+    let rest = value;
+    while (rest >= 0x80) {
+      this.bytes[this.length++] = (rest & 0x7f) | 0x80;
+      rest >>>= 7;
+    }
+    this.bytes[this.length++] = rest;
+  }
+
+  raw(bytes: Uint8Array): void {
+    this.#reserve(bytes.length);
+    this.bytes.set(bytes, this.length);
+    this.length += bytes.length;
+  }
+
+  /*
+   * The record, framed by its payload length and checksum.
+   */
+  finish(): Uint8Array {
+    const view = new DataView(this.bytes.buffer);
+    view.setUint32(0, this.length - FRAME_BYTES, true);
+    view.setUint32(4, crc32(this.bytes, FRAME_BYTES, this.length), true);
+    return this.bytes.slice(0, this.length);
+  }
+}
+
+/*
+ * Reads varints from one record's payload.
+ */
+class RecordReader {
+  #bytes: Uint8Array;
+  position: number;
+
+  constructor(bytes: Uint8Array, position: number) {
+    this.#bytes = bytes;
+    this.position = position;
+  }
+
+  varint(): number {
+    let value = 0;
+    let shift = 0;
+    let byte: number;
+    do {
+      byte = this.#bytes[this.position++];
+      value += (byte & 0x7f) * 2 ** shift;
+      shift += 7;
+    } while (byte & 0x80);
+    return value;
+  }
+
+  raw(length: number): Uint8Array {
+    const bytes = this.#bytes.subarray(this.position, this.position + length);
+    this.position += length;
+    return bytes;
+  }
+}
+
+/*
+ * Apply every whole record of a log, in order. Returns the length of the
+ * log up to the end of its last whole record, and the number of log ids
+ * those records declared.
+ */
+export function replayLog(
+  log: Uint8Array,
+  apply: (op: number, triples: Triple[]) => void,
+): { length: number; declared: number } {
+  const decoder = new TextDecoder();
+  const view = new DataView(log.buffer, log.byteOffset, log.byteLength);
+  const strings: string[] = [];
+  let position = 0;
+
+  while (position + FRAME_BYTES <= log.length) {
+    const length = view.getUint32(position, true);
+    const start = position + FRAME_BYTES;
+    const end = start + length;
+    if (
+      end > log.length ||
+      crc32(log, start, end) !== view.getUint32(position + 4, true)
+    ) {
+      break;
+    }
+
+    const reader = new RecordReader(log, start);
+    const op = reader.varint();
+    const declarations = reader.varint();
+    for (let idx = 0; idx < declarations; idx++) {
+      const logId = reader.varint();
+      strings[logId] = decoder.decode(reader.raw(reader.varint()));
+    }
+
+    const triples: Triple[] = [];
+    const tripleCount = reader.varint();
+    for (let idx = 0; idx < tripleCount; idx++) {
+      triples.push([
+        strings[reader.varint()],
+        strings[reader.varint()],
+        strings[reader.varint()],
+      ]);
+    }
+
+    apply(op, triples);
+    position = end;
+  }
+  return { length: position, declared: strings.length };
+}
+
+export class WriteAheadLog {
+  #files: DurableFiles;
+  #policy: FsyncPolicy;
+  #intervalMs: number;
+  #checkpointBytes: number;
+  #snapshot: () => Uint8Array;
+
+  // store id -> log id, for the store the cache was filled from
+  #store: TripleStore | null;
+  #nodeLogIds: Int32Array;
+  #relationLogIds: Int32Array;
+  #nextLogId: number;
+
+  #queued: Uint8Array[];
+  #logBytes: number;
+  #unsynced: boolean;
+  // the end of the chain of log writes, syncs and checkpoints
+  #tail: Promise<void>;
+  #commitQueued: boolean;
+  // a checkpoint failed before its snapshot was written, so must be redone
+  #checkpointOwed: boolean;
+  #timer: ReturnType<typeof setTimeout> | null;
+  #error: unknown;
+
+  /*
+   * Continue a log of `logBytes` bytes whose records declared `declared`
+   * log ids.
+   */
+  constructor(
+    files: DurableFiles,
+    logBytes: number,
+    declared: number,
+    opts: DurableOpts,
+    snapshot: () => Uint8Array,
+  ) {
+    this.#files = files;
+    this.#policy = opts.fsync ?? "always";
+    this.#intervalMs = opts.fsyncIntervalMs ?? DEFAULT_FSYNC_INTERVAL_MS;
+    this.#checkpointBytes = opts.checkpointBytes ?? Infinity;
+    this.#snapshot = snapshot;
+    this.#store = null;
+    this.#nodeLogIds = new Int32Array(0);
+    this.#relationLogIds = new Int32Array(0);
+    this.#nextLogId = declared;
+    this.#queued = [];
+    this.#logBytes = logBytes;
+    this.#unsynced = false;
+    this.#tail = Promise.resolve();
+    this.#commitQueued = false;
+    this.#checkpointOwed = false;
+    this.#timer = null;
+    this.#error = undefined;
+  }
+
+  /*
+   * Forget which store ids have log ids, numbering new ones from
+   * `nextLogId`.
+   */
+  #resetDictionary(nextLogId: number): void {
+    this.#store = null;
+    this.#nodeLogIds = new Int32Array(0);
+    this.#relationLogIds = new Int32Array(0);
+    this.#nextLogId = nextLogId;
+  }
+
+  /*
+   * The log id of a node or relation id, declared on first use.
+   */
+  #logIdOf(
+    store: TripleStore,
+    isRelation: boolean,
+    id: number,
+    declare: (logId: number, value: string) => void,
+  ): number {
+    let logIds = isRelation ? this.#relationLogIds : this.#nodeLogIds;
+    if (id >= logIds.length) {
+      const table = isRelation ? store.relationNames : store.nodes;
+      const grown = new Int32Array(Math.max(table.size, logIds.length * 2))
+        .fill(-1);
+      grown.set(logIds);
+      logIds = grown;
+      if (isRelation) {
+        this.#relationLogIds = grown;
+      } else {
+        this.#nodeLogIds = grown;
+      }
+    }
+
+    if (logIds[id] === -1) {
+      logIds[id] = this.#nextLogId++;
+      declare(
+        logIds[id],
+        isRelation ? store.relationNames.valueOf(id) : store.nodes.valueOf(id),
+      );
+    }
+    return logIds[id];
+  }
+
+  /*
+   * Queue a record of rows added to or deleted from a store.
+   */
+  record(op: number, store: TripleStore, rows: number[]): void {
+    if (rows.length === 0) {
+      return;
+    }
+    if (store !== this.#store) {
+      this.#resetDictionary(this.#nextLogId);
+      this.#store = store;
+    }
+
+    const encoder = new TextEncoder();
+    const declared: [number, Uint8Array][] = [];
+    const declare = (logId: number, value: string) => {
+      declared.push([logId, encoder.encode(value)]);
+    };
+
+    const ids: number[] = [];
+    for (const row of rows) {
+      ids.push(
+        this.#logIdOf(store, false, store.sourceIds[row], declare),
+        this.#logIdOf(store, true, store.relationIds[row], declare),
+        this.#logIdOf(store, false, store.targetIds[row], declare),
+      );
+    }
+
+    const writer = new RecordWriter();
+    writer.varint(op);
+    writer.varint(declared.length);
+    for (const [logId, bytes] of declared) {
+      writer.varint(logId);
+      writer.varint(bytes.length);
+      writer.raw(bytes);
+    }
+    writer.varint(rows.length);
+    for (const id of ids) {
+      writer.varint(id);
+    }
+
+    this.#queued.push(writer.finish());
+    this.#queueCommit();
+  }
+
+  #then(step: () => Promise<void>): Promise<void> {
+    this.#tail = this.#tail.then(step).catch((err) => {
+      this.#error ??= err;
+    });
+    return this.#tail;
+  }
+
+  #queueCommit(): void {
+    if (this.#commitQueued) {
+      return;
+    }
+    this.#commitQueued = true;
+    this.#then(() => {
+      this.#commitQueued = false;
+      return this.#commit();
+    });
+  }
+
+  /*
+   * Append every queued record in one write, then sync as the policy
+   * says and checkpoint if the log has grown past its limit.
+   */
+  async #commit(): Promise<void> {
+    if (this.#checkpointOwed) {
+      return this.#checkpoint();
+    }
+    if (this.#queued.length === 0) {
+      return;
+    }
+
+    const records = this.#queued;
+    this.#queued = [];
+    await this.#append(records);
+
+    if (this.#policy === "always") {
+      await this.#sync();
+    } else if (this.#policy === "interval" && this.#timer === null) {
+      this.#timer = setTimeout(() => {
+        this.#timer = null;
+        this.#then(() => this.#sync());
+      }, this.#intervalMs);
+    }
+
+    if (this.#logBytes >= this.#checkpointBytes) {
+      await this.#checkpoint();
+    }
+  }
+
+  async #append(records: Uint8Array[]): Promise<void> {
+    const bytes = new Uint8Array(
+      records.reduce((total, record) => total + record.length, 0),
+    );
+    let offset = 0;
+    for (const record of records) {
+      bytes.set(record, offset);
+      offset += record.length;
+    }
+
+    await this.#files.appendLog(bytes);
+    this.#logBytes += bytes.length;
+    this.#unsynced = true;
+  }
+
+  async #sync(): Promise<void> {
+    if (this.#unsynced) {
+      this.#unsynced = false;
+      await this.#files.syncLog();
+    }
+  }
+
+  async #checkpoint(): Promise<void> {
+    const snapshot = this.#snapshot();
+    const records = this.#queued;
+    this.#queued = [];
+    this.#resetDictionary(0);
+
+    this.#checkpointOwed = true;
+    if (records.length > 0) {
+      try {
+        await this.#append(records);
+      } catch (err) {
+        this.#queued = [...records, ...this.#queued];
+        throw err;
+      }
+    }
+    // the old log is replayed over the snapshot after a crash, so it must
+    // be durable before the snapshot replaces the previous one
+    await this.#sync();
+    await this.#files.writeSnapshot(snapshot);
+    this.#checkpointOwed = false;
+    await this.#files.truncateLog(0);
+    this.#logBytes = 0;
+    this.#unsynced = false;
+  }
+
+  #settle(): void {
+    const err = this.#error;
+    if (err !== undefined) {
+      this.#error = undefined;
+      throw err;
+    }
+  }
+
+  /*
+   * Resolves once every record so far is appended, and synced if the
+   * policy is "always"; rejects with the first failure since the last
+   * call.
+   */
+  async flush(): Promise<void> {
+    this.#queueCommit();
+    await this.#tail;
+    this.#settle();
+  }
+
+  /*
+   * Snapshot the database and truncate the log.
+   */
+  async checkpoint(): Promise<void> {
+    await this.#then(() => this.#checkpoint());
+    this.#settle();
+  }
+
+  /*
+   * Flush and sync whatever the policy has left unsynced, and stop the
+   * interval timer.
+   */
+  async close(): Promise<void> {
+    if (this.#timer !== null) {
+      clearTimeout(this.#timer);
+      this.#timer = null;
+    }
+    this.#queueCommit();
+    await this.#then(() =>
+      this.#policy === "never" ? Promise.resolve() : this.#sync()
+    );
+    this.#settle();
+  }
+}
@@ -0,0 +1,112 @@
+/*
+ * Tribble export tests: renumbered toTribble() output must be
+ * byte-identical to TribbleStringifier over the same triples, and either
+ * numbering must load back to the same triples, across buffer flushes
+ * and declarations larger than the buffer, even through sinks that keep
+ * the chunks they are given.
+ */
+
+import { assertEquals } from "@std/assert";
+import { TribbleStringifier } from "../tribble/stringify.ts";
+import { TribbleDB } from "./mod.ts";
+import type { TribbleExportOpts } from "./mod.ts";
+import type { Triple } from "../types.ts";
+
+const ODD_TRIPLES: Triple[] = [
+  ["urn:ró:bird:robin", "name", 'Robin "Redbreast"'],
+  ["urn:ró:bird:robin", "path", "C:\\birds\\robin"],
+  ["urn:ró:bird:robin", "note", "line one\nline two\ttabbed"],
+  ["urn:ró:bird:robin", "emoji", "🐦 é ✓"],
+  ["urn:ró:bird:robin", "null", "null"],
+  ["urn:ró:bird:wren", "name", "Wren"],
+  ["urn:ró:bird:wren", "seen", "urn:ró:bird:robin"],
+];
+
+/*
+ * Export to text, copying each chunk before its write settles.
+ */
+async function exported(
+  db: TribbleDB,
+  opts: TribbleExportOpts = {},
+): Promise<{ text: string; chunks: number }> {
+  const parts: Uint8Array[] = [];
+  await db.toTribble(
+    new WritableStream({
+      write(chunk) {
+        parts.push(chunk.slice());
+      },
+    }),
+    opts,
+  );
+
+  const bytes = new Uint8Array(
+    parts.reduce((total, part) => total + part.length, 0),
+  );
+  let offset = 0;
+  for (const part of parts) {
+    bytes.set(part, offset);
+    offset += part.length;
+  }
+  return { text: new TextDecoder().decode(bytes), chunks: parts.length };
+}
+
+function stringified(triples: Triple[]): string {
+  const stringifier = new TribbleStringifier();
+  return triples.map((triple) => `${stringifier.stringify(triple)}\n`)
+    .join("");
+}
+
+Deno.test("writer: renumbered output matches TribbleStringifier", async () => {
+  const db = new TribbleDB(ODD_TRIPLES);
+  db.delete([ODD_TRIPLES[5]]);
+  const view = db.search({ source: "urn:ró:bird:robin" });
+
+  for (const source of [db, view]) {
+    assertEquals(
+      (await exported(source, { renumber: true })).text,
+      stringified(source.triples()),
+    );
+  }
+  assertEquals((await exported(new TribbleDB([]))).text, "");
+});
+
+Deno.test("writer: either numbering loads back across buffer flushes", async () => {
+  const triples: Triple[] = [];
+  for (let idx = 0; idx < 5_000; idx++) {
+    triples.push([
+      `urn:ró:photo:x${idx}`,
+      idx % 2 === 0 ? "location" : "rating",
+      idx % 2 === 0 ? `urn:ró:place:p${idx % 30}` : String(idx % 5),
+    ]);
+  }
+  triples.push(["urn:ró:photo:x0", "caption", "é".repeat(100_000)]);
+
+  const db = new TribbleDB(triples);
+  db.delete(triples.slice(0, 100));
+
+  for (const renumber of [false, true]) {
+    const { text, chunks } = await exported(db, { renumber });
+    assertEquals(chunks > 2, true);
+    assertEquals(
+      TribbleDB.fromTribbleLines(text.split("\n")).triples(),
+      db.triples(),
+    );
+  }
+});
+
+Deno.test("writer: sinks may keep chunks after their writes settle", async () => {
+  const triples: Triple[] = [];
+  for (let idx = 0; idx < 20_000; idx++) {
+    triples.push([`urn:ró:photo:x${idx}`, "caption", `caption ${idx}`]);
+  }
+  const db = new TribbleDB(triples);
+  const { text, chunks } = await exported(db);
+  assertEquals(chunks > 1, true);
+
+  const { readable, writable } = new TransformStream<Uint8Array>();
+  const [, piped] = await Promise.all([
+    db.toTribble(writable).then(() => writable.close()),
+    new Response(readable).text(),
+  ]);
+  assertEquals(piped, text);
+});
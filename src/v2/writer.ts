@@ -0,0 +1,295 @@
+/*
+ * Tribble-format export straight from a TripleStore: the writing
+ * counterpart of bulk.ts.
+ *
+ * TribbleStringifier works a triple at a time, through strings: a Map
+ * probe per term, a JSON.stringify per new value, an array joined per
+ * line. Here the store's interned ids already say which strings are new,
+ * so each row costs three array reads, and its line is written as digits
+ * into one reused output buffer. Each distinct string is encoded once,
+ * when it is first used, and only strings that need escaping go through
+ * JSON.stringify.
+ *
+ * Dictionary ids are the store's own (node ids, then relation ids offset
+ * past them) unless `renumber` is set, in which case they are assigned in
+ * first-use order. Renumbered output is dense, so loaders' dictionaries
+ * stay compact arrays, and is byte-identical to TribbleStringifier over
+ * the same triples.
+ */
+
+import type { RowBitmap } from "./bitmap.ts";
+import type { TripleStore } from "./store.ts";
+import type { TribbleExportOpts } from "./types.ts";
+
+const CHUNK_BYTES = 64 * 1024;
+// three ids of at most ten digits, two spaces and a newline
+const TRIPLE_LINE_BYTES = 33;
+
+const NEWLINE = 10;
+const SPACE = 32;
+const QUOTE = 34;
+const BACKSLASH = 92;
+const ZERO = 48;
+
+/*
+ * Encodes rows as tribble lines into a buffer, declaring each string the
+ * first time a row uses it.
+ */
+class TribbleEncoder {
+  #store: TripleStore;
+  #renumber: boolean;
+  // rows and node ids as of the start of the export
+  #rowCount: number;
+  #nodeCount: number;
+
+  // term (node id, or node count + relation id) -> output id
+  #outIds: Int32Array;
+  #nextId: number;
+
+  buffer: Uint8Array;
+  length: number;
+
+  constructor(store: TripleStore, renumber: boolean) {
+    this.#store = store;
+    this.#renumber = renumber;
+    this.#rowCount = store.rowCount;
+    this.#nodeCount = store.nodes.size;
+    this.#outIds = new Int32Array(
+      store.nodes.size + store.relationNames.size,
+    ).fill(-1);
+    this.#nextId = 0;
+    this.buffer = new Uint8Array(CHUNK_BYTES);
+    this.length = 0;
+  }
+
+  /*
+   * Whether `bytes` more fit in the buffer. An empty buffer grows to fit,
+   * so one oversized declaration cannot stall the export.
+   */
+  #room(bytes: number): boolean {
+    if (this.length + bytes <= this.buffer.length) {
+      return true;
+    }
+    if (this.length === 0) {
+      this.buffer = new Uint8Array(bytes);
+      return true;
+    }
+    return false;
+  }
+
+  #writeInt(value: number): void {
+    let digits = 1;
+    for (let rest = value; rest >= 10; rest = Math.floor(rest / 10)) {
+      digits++;
+    }
+
+    const buffer = this.buffer;
+    let position = this.length + digits;
+    this.length = position;
+    let rest = value;
+    do {
+      buffer[--position] = ZERO + rest % 10;
+      rest = Math.floor(rest / 10);
+    } while (rest > 0);
+  }
+
+  /*
+   * Write a string as UTF-8. With `plain` set, returns false, having
+   * written nothing, at the first character that would need escaping (a
+   * quote, a backslash, a control character or a lone surrogate).
+   */
+  #writeText(value: string, plain: boolean): boolean {
+    const buffer = this.buffer;
+    let position = this.length;
+
+    for (let idx = 0; idx < value.length; idx++) {
+      let code = value.charCodeAt(idx);
+      if (code < 0x80) {
+        if (plain && (code < 0x20 || code === QUOTE || code === BACKSLASH)) {
+          return false;
+        }
+        buffer[position++] = code;
+      } else if (code < 0x800) {
+        buffer[position++] = 0xc0 | (code >> 6);
+        buffer[position++] = 0x80 | (code & 0x3f);
+      } else if (code < 0xd800 || code >= 0xe000) {
+        buffer[position++] = 0xe0 | (code >> 12);
+        buffer[position++] = 0x80 | ((code >> 6) & 0x3f);
+        buffer[position++] = 0x80 | (code & 0x3f);
+      } else {
+        const low = value.charCodeAt(idx + 1);
+        if (code >= 0xdc00 || !(low >= 0xdc00 && low < 0xe000)) {
+          // only reachable when plain: JSON.stringify escapes these
+          return false;
+        }
+        code = 0x10000 + ((code - 0xd800) << 10) + (low - 0xdc00);
+        idx++;
+        buffer[position++] = 0xf0 | (code >> 18);
+        buffer[position++] = 0x80 | ((code >> 12) & 0x3f);
+        buffer[position++] = 0x80 | ((code >> 6) & 0x3f);
+        buffer[position++] = 0x80 | (code & 0x3f);
+      }
+    }
+
+    this.length = position;
+    return true;
+  }
+
+  /*
+   * The term holding the same string in the other intern table, if any.
+   */
+  #twinOf(term: number, value: string): number | undefined {
+    if (term >= this.#nodeCount) {
+      const nodeId = this.#store.nodes.idOf(value);
+      return nodeId !== undefined && nodeId < this.#nodeCount
+        ? nodeId
+        : undefined;
+    }
+
+    const relationId = this.#store.relationNames.idOf(value);
+    return relationId !== undefined &&
+        this.#nodeCount + relationId < this.#outIds.length
+      ? this.#nodeCount + relationId
+      : undefined;
+  }
+
+  /*
+   * The output id of a term, writing its declaration line first if this
+   * is its first use; undefined when the declaration does not fit.
+   */
+  #declare(term: number): number | undefined {
+    const known = this.#outIds[term];
+    if (known !== -1) {
+      return known;
+    }
+
+    const value = term < this.#nodeCount
+      ? this.#store.nodes.valueOf(term)
+      : this.#store.relationNames.valueOf(term - this.#nodeCount);
+
+    // TribbleStringifier has one dictionary, so a string that is both a
+    // node and a relation name keeps the id it was first declared under
+    if (this.#renumber) {
+      const twin = this.#twinOf(term, value);
+      if (twin !== undefined && this.#outIds[twin] !== -1) {
+        this.#outIds[term] = this.#outIds[twin];
+        return this.#outIds[term];
+      }
+    }
+
+    // an id, a space, quotes, at most three bytes per code unit, a newline
+    if (!this.#room(TRIPLE_LINE_BYTES + 3 * value.length)) {
+      return undefined;
+    }
+
+    const start = this.length;
+    const outId = this.#renumber ? this.#nextId : term;
+    this.#writeInt(outId);
+    this.buffer[this.length++] = SPACE;
+    this.buffer[this.length++] = QUOTE;
+
+    if (this.#writeText(value, true)) {
+      this.buffer[this.length++] = QUOTE;
+    } else {
+      const escaped = JSON.stringify(value);
+      this.length = start;
+      if (!this.#room(TRIPLE_LINE_BYTES + 3 * escaped.length)) {
+        return undefined;
+      }
+      this.#writeInt(outId);
+      this.buffer[this.length++] = SPACE;
+      this.#writeText(escaped, false);
+    }
+    this.buffer[this.length++] = NEWLINE;
+
+    this.#outIds[term] = outId;
+    this.#nextId++;
+    return outId;
+  }
+
+  /*
+   * Encode one row, after any declarations it needs. Returns false when
+   * the buffer is too full; declarations already written stay written.
+   */
+  encodeRow(row: number): boolean {
+    const store = this.#store;
+    const source = this.#declare(store.sourceIds[row]);
+    if (source === undefined) {
+      return false;
+    }
+    const relation = this.#declare(
+      this.#nodeCount + store.relationIds[row],
+    );
+    if (relation === undefined) {
+      return false;
+    }
+    const target = this.#declare(store.targetIds[row]);
+    if (target === undefined || !this.#room(TRIPLE_LINE_BYTES)) {
+      return false;
+    }
+
+    this.#writeInt(source);
+    this.buffer[this.length++] = SPACE;
+    this.#writeInt(relation);
+    this.buffer[this.length++] = SPACE;
+    this.#writeInt(target);
+    this.buffer[this.length++] = NEWLINE;
+    return true;
+  }
+
+  /*
+   * Encode visible rows from `start` until the buffer fills. Returns the
+   * first row not encoded, or -1 once every row is.
+   */
+  encodeRows(rows: RowBitmap | null, start: number): number {
+    if (rows !== null) {
+      let stopped = -1;
+      rows.forEachFrom(start, (row) => {
+        if (this.encodeRow(row)) {
+          return true;
+        }
+        stopped = row;
+        return false;
+      });
+      return stopped;
+    }
+
+    const store = this.#store;
+    for (let row = start; row < this.#rowCount; row++) {
+      if (store.isAlive(row) && !this.encodeRow(row)) {
+        return row;
+      }
+    }
+    return -1;
+  }
+}
+
+/*
+ * Write the visible rows (rows null: a root's live rows) to a stream as
+ * tribble text, in row order. Rows are encoded into one reused buffer,
+ * and each chunk is a copy of it, since a write settles once the sink
+ * accepts a chunk, not once it is consumed. The stream is left open.
+ * Rows added to a root once the export has begun are not written.
+ */
+export async function writeTribble(
+  store: TripleStore,
+  rows: RowBitmap | null,
+  writable: WritableStream<Uint8Array>,
+  opts: TribbleExportOpts = {},
+): Promise<void> {
+  const encoder = new TribbleEncoder(store, opts.renumber ?? false);
+  const writer = writable.getWriter();
+
+  try {
+    let next = 0;
+    while (next !== -1) {
+      next = encoder.encodeRows(rows, next);
+      if (encoder.length > 0) {
+        await writer.write(encoder.buffer.slice(0, encoder.length));
+        encoder.length = 0;
+      }
+    }
+  } finally {
+    writer.releaseLock();
+  }
+}